@@ -27,7 +27,10 @@ CREATE TABLE STAGING_Products (
     vnd_cashback INT DEFAULT 0,
     has_video BOOLEAN DEFAULT FALSE,
     category TEXT,
-    quantity_sold INT DEFAULT 0
+    quantity_sold INT DEFAULT 0,
+
+    -- JOIN theo product id (revenue_scoring.py, analytics_api.py /predictions/top)
+    INDEX idx_staging_id (id)
 );
 
 -- Main Fact Table - theo schema diagram  
@@ -42,6 +45,7 @@ CREATE TABLE Fact_product_stats (
     quantity_sold INT DEFAULT 0,
     rating_average DECIMAL(3,2) DEFAULT 0.00,
     review_count INT DEFAULT 0,
+    predicted_revenue DECIMAL(18,2) NULL,  -- ghi bởi revenue_scoring.py
     created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
     -- Foreign Key Constraints
@@ -6,35 +6,47 @@
 USE ProductDW;
 
 -- Populate Fact_product_stats - theo schema diagram (no time dimension)
+-- Chuẩn hóa tên brand/seller/fulfillment một lần trong derived table,
+-- sau đó JOIN bằng cột thường để dùng được uk_brand_name / uk_seller_name.
+-- (run_etl_process.py gán khóa bằng dim_key_cache.py thay cho câu lệnh này)
 INSERT INTO Fact_product_stats (
     product_id, brand_id, seller_id, fulfillment_id,
     price, quantity_sold, rating_average, review_count
 )
 SELECT 
-    sp.id as product_id,
+    sp.product_id,
     db.brand_id,
     ds.seller_id,
     df.fulfillment_id,
-    IFNULL(sp.price, 0) as price,
-    IFNULL(sp.quantity_sold, 0) as quantity_sold,
-    IFNULL(sp.rating_average, 0.0) as rating_average,
-    IFNULL(sp.review_count, 0) as review_count
-FROM STAGING_Products sp
-INNER JOIN DIM_Brand db ON db.brand_name = CASE 
-    WHEN sp.brand IS NULL OR TRIM(sp.brand) = '' THEN 'Unknown'
-    ELSE TRIM(sp.brand)
-END
-INNER JOIN DIM_Seller ds ON ds.seller_name = CASE 
-    WHEN sp.current_seller IS NULL OR TRIM(sp.current_seller) = '' THEN 'Unknown Seller'
-    ELSE TRIM(sp.current_seller)
-END
-INNER JOIN DIM_Fulfillment_Type df ON df.fulfillment_type = CASE 
-    WHEN sp.fulfillment_type = 'dropship' THEN 'dropship'
-    WHEN sp.fulfillment_type = 'tiki_delivery' THEN 'tiki_delivery'
-    WHEN sp.fulfillment_type = 'seller_delivery' THEN 'seller_delivery'
-    ELSE 'unknown'
-END
-WHERE sp.id IS NOT NULL;
+    sp.price,
+    sp.quantity_sold,
+    sp.rating_average,
+    sp.review_count
+FROM (
+    SELECT 
+        id as product_id,
+        CASE 
+            WHEN brand IS NULL OR TRIM(brand) = '' THEN 'Unknown'
+            ELSE TRIM(brand)
+        END as brand_name,
+        CASE 
+            WHEN current_seller IS NULL OR TRIM(current_seller) = '' THEN 'Unknown Seller'
+            ELSE TRIM(current_seller)
+        END as seller_name,
+        CASE 
+            WHEN fulfillment_type IN ('dropship', 'tiki_delivery', 'seller_delivery') THEN fulfillment_type
+            ELSE 'unknown'
+        END as fulfillment_type,
+        IFNULL(price, 0) as price,
+        IFNULL(quantity_sold, 0) as quantity_sold,
+        IFNULL(rating_average, 0.0) as rating_average,
+        IFNULL(review_count, 0) as review_count
+    FROM STAGING_Products
+    WHERE id IS NOT NULL
+) sp
+INNER JOIN DIM_Brand db ON db.brand_name = sp.brand_name
+INNER JOIN DIM_Seller ds ON ds.seller_name = sp.seller_name
+INNER JOIN DIM_Fulfillment_Type df ON df.fulfillment_type = sp.fulfillment_type;
 
 SELECT CONCAT('Fact_product_stats populated: ', COUNT(*), ' records') as Status FROM Fact_product_stats;
 
@@ -0,0 +1,29 @@
+-- ========================================
+-- 06_MYSQL_CREATE_ETL_STATE_TABLES.sql
+-- ========================================
+-- MySQL Data Warehouse Creation Pipeline - Step 6
+-- Creates state tables for incremental (delta) ETL
+
+USE ProductDW;
+
+-- Hash nội dung của từng sản phẩm ở lần ETL gần nhất
+CREATE TABLE IF NOT EXISTS ETL_Product_State (
+    product_id BIGINT PRIMARY KEY,
+    content_hash BIGINT UNSIGNED NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Watermark: mỗi lần ETL (full hoặc incremental) ghi một dòng
+CREATE TABLE IF NOT EXISTS ETL_Watermark (
+    watermark_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    mode VARCHAR(20) NOT NULL,
+    snapshot_hash BIGINT UNSIGNED NOT NULL,
+    total_products INT DEFAULT 0,
+    inserted_count INT DEFAULT 0,
+    updated_count INT DEFAULT 0,
+    deleted_count INT DEFAULT 0,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+SELECT 'ETL State Tables created successfully!' as Status;
+SHOW TABLES LIKE 'ETL_%';
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Aggregate Tables (materialized summary) cho ProductDW
+MySQL không có materialized view, nên các bảng AGG_* được duy trì bằng ETL:
+  - AGG_Brand              : theo brand
+  - AGG_Seller             : theo seller
+  - AGG_Fulfillment        : theo fulfillment type
+  - AGG_Brand_Fulfillment  : theo brand x fulfillment type
+Mỗi bảng lưu các measure cộng dồn được (count, sum, min, max) nên có thể
+roll-up tiếp lên mức thấp hơn mà không cần quét Fact_product_stats.
+
+Refresh:
+  - full        : xóa và tính lại toàn bộ (sau full ETL)
+  - incremental : chỉ tính lại các nhóm có khóa dimension bị ảnh hưởng bởi delta
+
+AggregateRouter chọn bảng aggregate nhỏ nhất trả lời được truy vấn
+(fallback về Fact_product_stats nếu không bảng nào đủ chiều).
+DDL tương ứng: create_views.sql
+"""
+
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+from bulk_loader import insert_values
+from query_cache import cached_fetchall
+
+DIMENSIONS = {
+    'brand': {'key': 'brand_id', 'name': 'brand_name', 'table': 'DIM_Brand'},
+    'seller': {'key': 'seller_id', 'name': 'seller_name', 'table': 'DIM_Seller'},
+    'fulfillment': {'key': 'fulfillment_id', 'name': 'fulfillment_type', 'table': 'DIM_Fulfillment_Type'},
+}
+
+AGGREGATE_TABLES = {
+    'AGG_Brand': ['brand'],
+    'AGG_Seller': ['seller'],
+    'AGG_Fulfillment': ['fulfillment'],
+    'AGG_Brand_Fulfillment': ['brand', 'fulfillment'],
+}
+
+# Measure lưu trong bảng aggregate: (biểu thức trên Fact, hàm roll-up, kiểu cột)
+MEASURES = {
+    'product_count': ('COUNT(*)', 'SUM', 'BIGINT NOT NULL DEFAULT 0'),
+    'total_revenue': ('SUM(f.price * f.quantity_sold)', 'SUM', 'DECIMAL(24,2) NOT NULL DEFAULT 0'),
+    'total_quantity': ('SUM(f.quantity_sold)', 'SUM', 'BIGINT NOT NULL DEFAULT 0'),
+    'total_reviews': ('SUM(f.review_count)', 'SUM', 'BIGINT NOT NULL DEFAULT 0'),
+    'rating_sum': ('SUM(f.rating_average)', 'SUM', 'DECIMAL(20,2) NOT NULL DEFAULT 0'),
+    'rating_count': ('COUNT(f.rating_average)', 'SUM', 'BIGINT NOT NULL DEFAULT 0'),
+    'priced_count': ('SUM(f.price > 0)', 'SUM', 'BIGINT NOT NULL DEFAULT 0'),
+    'price_sum': ('SUM(CASE WHEN f.price > 0 THEN f.price ELSE 0 END)', 'SUM', 'DECIMAL(24,2) NOT NULL DEFAULT 0'),
+    'min_price': ('MIN(CASE WHEN f.price > 0 THEN f.price END)', 'MIN', 'DECIMAL(15,2) NULL'),
+    'max_price': ('MAX(CASE WHEN f.price > 0 THEN f.price END)', 'MAX', 'DECIMAL(15,2) NULL'),
+}
+
+# Metric trả về cho người dùng: (biểu thức khi đúng grain, biểu thức khi roll-up)
+METRICS = {name: (name, f'{rollup}({name})') for name, (_, rollup, _) in MEASURES.items()}
+METRICS['avg_rating'] = ('rating_sum / NULLIF(rating_count, 0)',
+                         'SUM(rating_sum) / NULLIF(SUM(rating_count), 0)')
+METRICS['avg_price'] = ('price_sum / NULLIF(priced_count, 0)',
+                        'SUM(price_sum) / NULLIF(SUM(priced_count), 0)')
+
+FACT_TABLE = 'Fact_product_stats'
+
+
+def _covering_indexes(table, dims):
+    """Index bao phủ cho các truy vấn top-N theo doanh thu / số sản phẩm"""
+    names = ', '.join(DIMENSIONS[d]['name'] for d in dims)
+    lead = f"{DIMENSIONS[dims[-1]]['key']}, " if len(dims) > 1 else ''
+    return [
+        f'INDEX idx_{table.lower()}_revenue ({lead}total_revenue, {names}, product_count, total_quantity)',
+        f'INDEX idx_{table.lower()}_count ({lead}product_count, {names})',
+    ]
+
+
+def table_ddl(table):
+    """CREATE TABLE IF NOT EXISTS cho một bảng aggregate (giống create_views.sql)"""
+    dims = AGGREGATE_TABLES[table]
+    columns = []
+    for d in dims:
+        columns.append(f"{DIMENSIONS[d]['key']} INT NOT NULL")
+        columns.append(f"{DIMENSIONS[d]['name']} VARCHAR(255) NOT NULL")
+    columns += [f'{name} {sql_type}' for name, (_, _, sql_type) in MEASURES.items()]
+    columns.append('refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')
+    columns.append(f"PRIMARY KEY ({', '.join(DIMENSIONS[d]['key'] for d in dims)})")
+    columns += _covering_indexes(table, dims)
+    body = ',\n        '.join(columns)
+    return f'CREATE TABLE IF NOT EXISTS {table} (\n        {body}\n    )'
+
+
+def ensure_aggregate_tables(cursor):
+    """Tạo các bảng aggregate nếu chưa có"""
+    for table in AGGREGATE_TABLES:
+        cursor.execute(table_ddl(table))
+
+
+def fact_aggregate_select(dims, key_table=None):
+    """
+    SELECT tính measure từ Fact_product_stats theo dims.
+    key_table: bảng tạm chứa các khóa cần tính lại (chỉ các nhóm bị ảnh hưởng)
+    """
+    select = []
+    joins = []
+    group = []
+    for d in dims:
+        spec = DIMENSIONS[d]
+        alias = f'd_{d}'
+        select += [f"f.{spec['key']}", f"{alias}.{spec['name']}"]
+        joins.append(f"INNER JOIN {spec['table']} {alias} ON {alias}.{spec['key']} = f.{spec['key']}")
+        group += [f"f.{spec['key']}", f"{alias}.{spec['name']}"]
+    if key_table:
+        on = ' AND '.join(f"k.{DIMENSIONS[d]['key']} = f.{DIMENSIONS[d]['key']}" for d in dims)
+        joins.insert(0, f'INNER JOIN {key_table} k ON {on}')
+    select += [f'{expr} AS {name}' for name, (expr, _, _) in MEASURES.items()]
+
+    sql = f"SELECT {', '.join(select)}\nFROM {FACT_TABLE} f\n" + '\n'.join(joins)
+    if group:
+        sql += f"\nGROUP BY {', '.join(group)}"
+    return sql
+
+
+def _insert_columns(dims):
+    columns = []
+    for d in dims:
+        columns += [DIMENSIONS[d]['key'], DIMENSIONS[d]['name']]
+    return columns + list(MEASURES)
+
+
+def _load_key_table(cursor, table, keys):
+    """Bảng tạm chứa các bộ khóa dimension cần refresh"""
+    columns = list(keys.columns)
+    cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS {table}')
+    cursor.execute(f"CREATE TEMPORARY TABLE {table} "
+                   f"({', '.join(f'{c} INT NOT NULL' for c in columns)}, PRIMARY KEY ({', '.join(columns)}))")
+    if len(keys):
+        insert_values(cursor, table, columns, keys.to_numpy(dtype=np.int64).astype(object))
+
+
+def refresh_aggregates(cursor, touched=None):
+    """
+    Refresh các bảng aggregate.
+    touched: None = tính lại toàn bộ; DataFrame [brand_id, seller_id, fulfillment_id]
+             của các dòng fact đã bị xóa / thêm = chỉ tính lại các nhóm đó
+    Trả về dict table -> số nhóm được tính lại
+    """
+    ensure_aggregate_tables(cursor)
+    refreshed = {}
+    for table, dims in AGGREGATE_TABLES.items():
+        columns = ', '.join(_insert_columns(dims))
+        if touched is None:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(f'INSERT INTO {table} ({columns})\n{fact_aggregate_select(dims)}')
+            refreshed[table] = cursor.rowcount
+            continue
+
+        key_columns = [DIMENSIONS[d]['key'] for d in dims]
+        keys = touched[key_columns].drop_duplicates()
+        if keys.empty:
+            refreshed[table] = 0
+            continue
+        _load_key_table(cursor, 'AGG_Refresh_Keys', keys)
+        on = ' AND '.join(f'k.{c} = a.{c}' for c in key_columns)
+        cursor.execute(f'DELETE a FROM {table} a INNER JOIN AGG_Refresh_Keys k ON {on}')
+        cursor.execute(f'INSERT INTO {table} ({columns})\n'
+                       f'{fact_aggregate_select(dims, key_table="AGG_Refresh_Keys")}')
+        cursor.execute('DROP TEMPORARY TABLE IF EXISTS AGG_Refresh_Keys')
+        refreshed[table] = len(keys)
+    return refreshed
+
+
+def fact_keys_for_products(cursor, id_table):
+    """Khóa dimension của các dòng fact có product_id trong bảng tạm id_table"""
+    cursor.execute(f'''
+    SELECT DISTINCT f.brand_id, f.seller_id, f.fulfillment_id
+    FROM {FACT_TABLE} f
+    INNER JOIN {id_table} r ON r.product_id = f.product_id
+    ''')
+    return pd.DataFrame(cursor.fetchall(), columns=['brand_id', 'seller_id', 'fulfillment_id'])
+
+
+class AggregateRouter:
+    """
+    Định tuyến truy vấn báo cáo tới bảng aggregate nhỏ nhất có đủ chiều.
+    Số dòng của từng bảng được đọc một lần (gọi refresh_sizes() sau khi ETL refresh).
+    cache/version: QueryCache + warehouse version để dùng lại kết quả khi dữ liệu chưa đổi
+    sizes: số dòng đã đọc sẵn (vd. router tạo cho từng request của API) -> bỏ qua refresh_sizes()
+    """
+
+    def __init__(self, cursor, cache=None, version=None, sizes=None):
+        self.cursor = cursor
+        self.cache = cache
+        self.version = version
+        self.sizes = {}
+        self.routed = {}
+        if sizes is None:
+            self.refresh_sizes()
+        else:
+            self.sizes = dict(sizes)
+
+    def refresh_sizes(self):
+        self.sizes = {}
+        for table in AGGREGATE_TABLES:
+            try:
+                count = self._fetchall(f'SELECT COUNT(*) FROM {table}')[0][0]
+            except Error:
+                continue
+            # Bảng rỗng coi như chưa refresh -> không dùng
+            if count:
+                self.sizes[table] = count
+
+    def route(self, dims):
+        """Tên bảng sẽ dùng cho tập chiều dims (FACT_TABLE nếu không có aggregate phù hợp)"""
+        candidates = [(size, table) for table, size in self.sizes.items()
+                      if set(dims) <= set(AGGREGATE_TABLES[table])]
+        return min(candidates)[1] if candidates else FACT_TABLE
+
+    def build_sql(self, dims, metrics, order_by=None, limit=None, where=None):
+        """
+        (bảng, câu SQL, tham số). where = {dim: tên hoặc danh sách tên}: chiều dùng để lọc
+        cũng phải có trong bảng nguồn, lọc xong thì roll-up về dims
+        """
+        where = {d: [v] if isinstance(v, str) else list(v) for d, v in (where or {}).items() if v}
+        source_dims = list(dims) + [d for d in where if d not in dims]
+        table = self.route(source_dims)
+        names = [DIMENSIONS[d]['name'] for d in dims]
+        if table == FACT_TABLE:
+            source = f'({fact_aggregate_select(source_dims)}) a'
+            exact = source_dims == list(dims)
+        else:
+            source = table
+            exact = list(dims) == AGGREGATE_TABLES[table]
+
+        select = list(names)
+        for metric in metrics:
+            direct, rollup = METRICS[metric]
+            expr = direct if exact else rollup
+            select.append(metric if expr == metric else f'{expr} AS {metric}')
+        sql = f"SELECT {', '.join(select)}\nFROM {source}"
+        params = []
+        if where:
+            conditions = []
+            for d, values in where.items():
+                conditions.append(f"{DIMENSIONS[d]['name']} IN ({', '.join(['%s'] * len(values))})")
+                params += values
+            sql += f"\nWHERE {' AND '.join(conditions)}"
+        if not exact and dims:
+            keys = [DIMENSIONS[d]['key'] for d in dims]
+            sql += f"\nGROUP BY {', '.join(keys + names)}"
+        if order_by:
+            sql += f'\nORDER BY {order_by} DESC'
+        if limit:
+            sql += f'\nLIMIT {int(limit)}'
+        return table, sql, params
+
+    def query(self, dims, metrics, order_by=None, limit=None, where=None):
+        """
+        Chạy truy vấn tổng hợp. Trả về (rows, table) với mỗi dòng = tên các chiều + metrics.
+        dims: tập con của 'brand', 'seller', 'fulfillment'; where: lọc theo tên (như FactStore.query)
+        """
+        table, sql, params = self.build_sql(list(dims), list(metrics), order_by, limit, where)
+        rows = self._fetchall(sql, params)
+        self.routed[table] = self.routed.get(table, 0) + 1
+        return rows, table
+
+    def _fetchall(self, sql, params=None):
+        if self.cache is None:
+            self.cursor.execute(sql, params or None)
+            return self.cursor.fetchall()
+        return cached_fetchall(self.cursor, self.cache, sql, params or None, version=self.version)
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Analytics API
+API HTTP/JSON chỉ đọc cho warehouse (thay cho verify_etl_results() chỉ in ra màn hình + index.html tĩnh):
+    GET /health
+    GET /brands/top?metric=total_revenue&limit=10&fulfillment=tiki_delivery
+    GET /sellers/top?metric=product_count&brand=oem
+    GET /price-stats?by=fulfillment
+    GET /pivot?rows=brand&columns=fulfillment&metric=total_revenue&limit=20
+    GET /predictions/top?limit=20
+    GET /metrics
+  - Server asyncio (asyncio.start_server, HTTP/1.1 keep-alive), handler là coroutine;
+    truy vấn MySQL (blocking) chạy trong ThreadPoolExecutor, mỗi request mượn một kết nối
+    của MySQLConnectionPool (db_config.get_connection_pool) rồi trả lại ngay -> không mở
+    kết nối mới cho từng request, số truy vấn đồng thời = pool size
+  - Truy vấn tổng hợp đi qua AggregateRouter (bảng AGG_* nhỏ nhất đủ chiều) + QueryCache
+    trong bộ nhớ theo warehouse version; version và kích thước AGG_* đọc lại sau VERSION_TTL giây
+  - --source fact-store: phục vụ từ snapshot của fact_store.py (không cần MySQL)
+  - Latency theo route: số request, lỗi, p50 / p90 / p99 / max trên LATENCY_WINDOW request gần nhất
+    (GET /metrics), header X-Response-Time cho từng response
+  - Filter brand / seller / fulfillment lặp lại được (?brand=a&brand=b)
+
+Cách dùng:
+    python analytics_api.py --port 8000 --pool-size 8
+    python analytics_api.py --source fact-store
+    curl 'http://127.0.0.1:8000/brands/top?limit=5'
+    python load_test_api.py --clients 32 --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+import columnar_store
+from aggregate_tables import FACT_TABLE, METRICS, AggregateRouter
+from db_config import get_connection_pool
+from fact_store import STORE_DIR, FactStore
+from query_cache import QueryCache, cached_fetchall, warehouse_version
+from revenue_scoring import PREDICTION_COLUMN, PREDICTIONS_CSV
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_POOL_SIZE = 8
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 1000
+VERSION_TTL = 5.0               # giây giữa hai lần đọc lại warehouse version / kích thước AGG_*
+LATENCY_WINDOW = 10000          # số request gần nhất giữ lại để tính percentile cho mỗi route
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024      # API chỉ đọc: body bị bỏ qua, lớn hơn -> 413 rồi đóng kết nối
+KEEP_ALIVE_TIMEOUT = 15.0
+
+DIMS = ['brand', 'seller', 'fulfillment']
+TOP_METRICS = ['product_count', 'total_revenue', 'total_quantity', 'avg_price', 'avg_rating']
+PRICE_METRICS = ['priced_count', 'min_price', 'max_price', 'avg_price']
+
+PREDICTIONS_SELECT = f"""
+SELECT f.product_id, sp.name, b.brand_name, s.seller_name, f.price, f.quantity_sold, f.{PREDICTION_COLUMN}
+FROM {FACT_TABLE} f
+JOIN DIM_Brand b ON b.brand_id = f.brand_id
+JOIN DIM_Seller s ON s.seller_id = f.seller_id
+LEFT JOIN STAGING_Products sp ON sp.id = f.product_id
+WHERE f.{PREDICTION_COLUMN} IS NOT NULL
+ORDER BY f.{PREDICTION_COLUMN} DESC
+LIMIT %s
+"""
+PREDICTION_FIELDS = ['product_id', 'name', 'brand', 'seller', 'price', 'quantity_sold', PREDICTION_COLUMN]
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class NotFound(Exception):
+    """Dữ liệu được hỏi chưa có (vd. chưa chấm điểm predicted_revenue) -> 404"""
+
+
+# ----------------------------------------------------------------------
+# Nguồn dữ liệu (chạy trong thread của executor)
+# ----------------------------------------------------------------------
+class WarehouseBackend:
+    """MySQL qua connection pool; mỗi lời gọi mượn một kết nối rồi trả lại pool"""
+
+    name = 'mysql'
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, cache=None):
+        self.pool = get_connection_pool(pool_size, pool_name='analytics_api')
+        self.pool_size = pool_size
+        # Chỉ tầng bộ nhớ: tầng đĩa không dành cho nhiều thread ghi/xóa cùng lúc
+        self.cache = cache or QueryCache()
+        self.version = None
+        self.sizes = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _state(self, cursor):
+        """(version, kích thước AGG_*) - đọc lại tối đa một lần mỗi VERSION_TTL giây"""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is None or now - self._checked > VERSION_TTL:
+                self.version = warehouse_version(cursor)
+                self.sizes = AggregateRouter(cursor).sizes
+                self._checked = now
+            return self.version, self.sizes
+
+    def _run(self, work):
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            try:
+                version, sizes = self._state(cursor)
+                return work(cursor, version, sizes)
+            finally:
+                cursor.close()
+        finally:
+            connection.close()      # kết nối của pool: close() = trả lại pool
+
+    def aggregate(self, dims, metrics, where=None, order_by=None, limit=None):
+        def work(cursor, version, sizes):
+            router = AggregateRouter(cursor, self.cache, version, sizes=sizes)
+            return router.query(dims, metrics, order_by, limit, where)[0]
+        return self._run(work)
+
+    def predictions(self, limit):
+        def work(cursor, version, sizes):
+            try:
+                return cached_fetchall(cursor, self.cache, PREDICTIONS_SELECT, (int(limit),), version)
+            except Error as exc:
+                if exc.errno == 1054:   # chưa có cột predicted_revenue
+                    raise NotFound("Chưa có predicted_revenue, chạy: python revenue_scoring.py "
+                                   "--source warehouse") from exc
+                raise
+        return self._run(work)
+
+    def describe(self):
+        return {'source': self.name, 'version': self.version, 'pool_size': self.pool_size,
+                'aggregate_tables': self.sizes, 'cache': self.cache.stats()}
+
+
+class FactStoreBackend:
+    """Snapshot fact_store (memory-map, chỉ đọc -> dùng chung giữa các thread không cần khóa)"""
+
+    name = 'fact-store'
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store = FactStore.load(store_dir)
+        self.store_dir = store_dir
+        self._predictions = None
+        self._lock = threading.Lock()
+
+    def aggregate(self, dims, metrics, where=None, order_by=None, limit=None):
+        return self.store.query(dims, metrics, where, order_by, limit)
+
+    def _load_predictions(self):
+        """(product_id, tên hoặc None, predicted_revenue) sắp xếp giảm dần, nạp một lần"""
+        with self._lock:
+            if self._predictions is None:
+                if (columnar_store.store_exists()
+                        and PREDICTION_COLUMN in columnar_store.derived_columns()):
+                    df = columnar_store.read_table(['id', 'name', PREDICTION_COLUMN])
+                elif os.path.exists(PREDICTIONS_CSV):
+                    df = pd.read_csv(PREDICTIONS_CSV)
+                    df['name'] = None
+                else:
+                    raise NotFound("Chưa có predicted_revenue, chạy: python revenue_scoring.py")
+                df = df.dropna(subset=[PREDICTION_COLUMN])
+                order = np.argsort(-df[PREDICTION_COLUMN].to_numpy(dtype=float), kind='stable')
+                self._predictions = (df['id'].to_numpy(dtype=np.int64)[order],
+                                     df['name'].to_numpy(dtype=object)[order],
+                                     df[PREDICTION_COLUMN].to_numpy(dtype=float)[order])
+            return self._predictions
+
+    def _dimension_name(self, dim, row):
+        """Tên dimension của dòng row (None nếu mã -1: khóa không có trong dimension)"""
+        code = self.store[dim][row]
+        return self.store.dimensions[dim].names[code] if code >= 0 else None
+
+    def predictions(self, limit):
+        ids, names, values = self._load_predictions()
+        ids, names, values = ids[:limit], names[:limit], values[:limit]
+        # Brand / seller / giá lấy từ fact store theo product_id
+        rows = pd.Index(self.store['product_id']).get_indexer(ids)
+        result = []
+        for i, row in enumerate(rows.tolist()):
+            fact = [None] * 4
+            if row >= 0:
+                fact = [self._dimension_name('brand', row), self._dimension_name('seller', row),
+                        float(self.store['price'][row]), int(self.store['quantity_sold'][row])]
+            result.append((int(ids[i]), names[i], *fact, round(float(values[i]), 2)))
+        return result
+
+    def describe(self):
+        return {'source': self.name, 'store_dir': self.store_dir, 'rows': len(self.store),
+                'version': self.store.version, 'snapshot_source': self.store.source}
+
+
+# ----------------------------------------------------------------------
+# Latency theo route
+# ----------------------------------------------------------------------
+class LatencyMetrics:
+    """Số request / lỗi / percentile latency theo route (chỉ gọi từ event loop -> không cần khóa)"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.routes = {}
+        self.in_flight = 0
+        self.started = time.monotonic()
+
+    def observe(self, route, seconds, status):
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {'count': 0, 'errors': 0, 'latencies': deque(maxlen=self.window)}
+        stats['count'] += 1
+        stats['errors'] += status >= 500
+        stats['latencies'].append(seconds)
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        routes = {}
+        for route, stats in sorted(self.routes.items()):
+            latencies = np.fromiter(stats['latencies'], dtype=float) * 1000
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            routes[route] = {'count': stats['count'], 'errors': stats['errors'],
+                             'p50_ms': round(p50, 2), 'p90_ms': round(p90, 2), 'p99_ms': round(p99, 2),
+                             'max_ms': round(latencies.max(), 2)}
+        total = sum(stats['count'] for stats in self.routes.values())
+        return {'uptime_seconds': round(uptime, 1), 'requests': total,
+                'requests_per_sec': round(total / uptime, 1) if uptime else 0.0,
+                'in_flight': self.in_flight, 'routes': routes}
+
+    def report(self):
+        snapshot = self.snapshot()
+        print(f"\n⏱️  {snapshot['requests']:,} request trong {snapshot['uptime_seconds']}s")
+        print(f"{'Route':18} {'Count':>8} {'Lỗi':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for route, stats in snapshot['routes'].items():
+            print(f"{route:18} {stats['count']:8,} {stats['errors']:6} {stats['p50_ms']:9.2f} "
+                  f"{stats['p99_ms']:9.2f} {stats['max_ms']:9.2f}")
+
+
+# ----------------------------------------------------------------------
+# Tham số request
+# ----------------------------------------------------------------------
+def _one(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _limit(params, default=DEFAULT_LIMIT):
+    try:
+        limit = int(_one(params, 'limit', default))
+    except ValueError:
+        raise ValueError("limit phải là số nguyên") from None
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit phải trong khoảng 1..{MAX_LIMIT}")
+    return limit
+
+
+def _metric(params, name='metric', default='total_revenue'):
+    metric = _one(params, name, default)
+    if metric not in METRICS:
+        raise ValueError(f"Metric không hợp lệ: {metric} (hợp lệ: {', '.join(METRICS)})")
+    return metric
+
+
+def _dims(values):
+    dims = [d for value in values for d in value.split(',') if d]
+    unknown = [d for d in dims if d not in DIMS]
+    if unknown:
+        raise ValueError(f"Chiều không hợp lệ: {unknown} (hợp lệ: {', '.join(DIMS)})")
+    return list(dict.fromkeys(dims))
+
+
+def _where(params):
+    return {dim: params[dim] for dim in DIMS if params.get(dim)}
+
+
+def _records(fields, rows):
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} không chuyển được sang JSON')
+
+
+# ----------------------------------------------------------------------
+# Server
+# ----------------------------------------------------------------------
+class AnalyticsAPI:
+    """Định tuyến + handler async; công việc blocking đẩy sang executor"""
+
+    def __init__(self, backend, workers=DEFAULT_POOL_SIZE):
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analytics')
+        self.metrics = LatencyMetrics()
+        self.routes = {
+            '/health': self.health,
+            '/brands/top': lambda params: self.top('brand', params),
+            '/sellers/top': lambda params: self.top('seller', params),
+            '/price-stats': self.price_stats,
+            '/pivot': self.pivot,
+            '/predictions/top': self.predictions,
+            '/metrics': self.latency,
+        }
+
+    async def call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    # --- handler ------------------------------------------------------
+    async def health(self, params):
+        return {'status': 'ok', **self.backend.describe()}
+
+    async def latency(self, params):
+        return self.metrics.snapshot()
+
+    async def top(self, dim, params):
+        metric = _metric(params)
+        metrics = TOP_METRICS + [m for m in [metric] if m not in TOP_METRICS]
+        where = _where(params)
+        rows = await self.call(self.backend.aggregate, [dim], metrics, where, metric, _limit(params))
+        return {'dimension': dim, 'order_by': metric, 'where': where,
+                'rows': _records([dim] + metrics, rows)}
+
+    async def price_stats(self, params):
+        dims = _dims(params.get('by', []))
+        where = _where(params)
+        limit = _limit(params, MAX_LIMIT) if dims else None
+        rows = await self.call(self.backend.aggregate, dims, PRICE_METRICS, where,
+                               'priced_count' if dims else None, limit)
+        return {'by': dims, 'where': where, 'rows': _records(dims + PRICE_METRICS, rows)}
+
+    async def pivot(self, params):
+        """Bảng rows x columns của một metric; chỉ giữ limit giá trị rows có metric lớn nhất"""
+        row_dim = _dims([_one(params, 'rows', 'brand')])
+        col_dim = _dims([_one(params, 'columns', 'fulfillment')])
+        if len(row_dim) != 1 or len(col_dim) != 1 or row_dim == col_dim:
+            raise ValueError("rows và columns phải là hai chiều khác nhau")
+        row_dim, col_dim = row_dim[0], col_dim[0]
+        metric = _metric(params)
+        where = _where(params)
+
+        top = await self.call(self.backend.aggregate, [row_dim], [metric], where, metric, _limit(params))
+        top = [row for row in top if row[0] is not None]
+        labels = [row[0] for row in top]
+        if not labels:
+            return {'rows': [], 'columns': [], 'metric': metric, 'values': [], 'totals': []}
+        cells = await self.call(self.backend.aggregate, [row_dim, col_dim], [metric],
+                                {**where, row_dim: labels})
+        columns = sorted({col for _, col, _ in cells if col is not None})
+        position = {label: i for i, label in enumerate(labels)}
+        column_position = {col: j for j, col in enumerate(columns)}
+        values = [[None] * len(columns) for _ in labels]
+        for row, col, value in cells:
+            if row in position and col in column_position:
+                values[position[row]][column_position[col]] = value
+        return {'rows': labels, 'columns': columns, 'row_dimension': row_dim, 'column_dimension': col_dim,
+                'metric': metric, 'where': where, 'values': values, 'totals': [row[1] for row in top]}
+
+    async def predictions(self, params):
+        rows = await self.call(self.backend.predictions, _limit(params))
+        return {'order_by': PREDICTION_COLUMN, 'rows': _records(PREDICTION_FIELDS, rows)}
+
+    # --- HTTP ---------------------------------------------------------
+    async def dispatch(self, method, target):
+        """(status, body dict, route) của một request"""
+        url = urlsplit(target)
+        route = url.path.rstrip('/') or '/'
+        handler = self.routes.get(route)
+        if handler is None:
+            return 404, {'error': f'Không có endpoint {route}', 'endpoints': list(self.routes)}, 'other'
+        if method not in ('GET', 'HEAD'):
+            return 405, {'error': 'API chỉ đọc, dùng GET'}, route
+        try:
+            return 200, await handler(parse_qs(url.query)), route
+        except ValueError as exc:
+            return 400, {'error': str(exc)}, route
+        except NotFound as exc:
+            return 404, {'error': str(exc)}, route
+        except Error as exc:
+            return 503, {'error': f'Lỗi MySQL: {exc}'}, route
+        except Exception as exc:
+            print(f"❌ {route}: {type(exc).__name__}: {exc}")
+            return 500, {'error': f'{type(exc).__name__}: {exc}'}, route
+
+    async def handle_connection(self, reader, writer):
+        """Một kết nối HTTP/1.1, xử lý tuần tự nhiều request (keep-alive)"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError,
+                        ConnectionError):
+                    break
+                start = time.perf_counter()
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get('content-length') or '0'
+                # Không biết body dài bao nhiêu / body quá lớn -> trả lỗi rồi đóng kết nối (không đọc body)
+                body_ok = length.isdigit() and int(length) <= MAX_BODY_BYTES
+                if body_ok:
+                    if int(length):
+                        try:
+                            await asyncio.wait_for(reader.readexactly(int(length)), KEEP_ALIVE_TIMEOUT)
+                        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                            break   # client gửi thiếu body -> đóng kết nối
+                    self.metrics.in_flight += 1
+                    try:
+                        status, body, route = await self.dispatch(method, target)
+                    finally:
+                        self.metrics.in_flight -= 1
+                elif length.isdigit():
+                    status, body, route = 413, {'error': f'Body quá lớn: {length} byte '
+                                                         f'(tối đa {MAX_BODY_BYTES})'}, 'other'
+                else:
+                    status, body, route = 400, {'error': f'Content-Length không hợp lệ: {length!r}'}, 'other'
+                payload = json.dumps(body, ensure_ascii=False, default=_json_default).encode('utf-8')
+                keep_alive = (body_ok and headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+                elapsed = time.perf_counter() - start
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"X-Response-Time: {elapsed * 1000:.2f}ms\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(payload)
+                await writer.drain()
+                self.metrics.observe(route, elapsed, status)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        print(f"🌐 Analytics API ({self.backend.name}) tại http://{host}:{port}")
+        print(f"   Endpoint: {', '.join(self.routes)}")
+        async with server:
+            await server.serve_forever()
+
+
+def create_backend(source, pool_size=DEFAULT_POOL_SIZE, store_dir=STORE_DIR):
+    if source == 'fact-store':
+        return FactStoreBackend(store_dir)
+    return WarehouseBackend(pool_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API HTTP/JSON chỉ đọc cho ProductDW')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--source', choices=['mysql', 'fact-store'], default='mysql')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help='Số kết nối MySQL trong pool = số worker thread')
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    print("🚀 ANALYTICS API")
+    print("=" * 60)
+    start = time.perf_counter()
+    try:
+        backend = create_backend(args.source, args.pool_size, args.store_dir)
+    except (Error, OSError) as exc:
+        print(f"❌ Không khởi tạo được nguồn dữ liệu '{args.source}': {exc}")
+        return
+    print(f"📂 Nguồn: {backend.name} (khởi tạo {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    api = AnalyticsAPI(backend, workers=args.pool_size)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n🛑 Dừng server")
+    finally:
+        api.executor.shutdown(wait=False)
+        api.metrics.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark Bulk Loader
+So sánh tốc độ nạp STAGING_Products giữa cách cũ (iterrows + executemany 500 dòng)
+và bulk_loader (LOAD DATA LOCAL INFILE / INSERT VALUES nhiều dòng)
+
+Cách dùng:
+    python benchmark_bulk_loader.py                 # đo trên MySQL
+    python benchmark_bulk_loader.py --no-db         # chỉ đo phần chuẩn bị dữ liệu phía Python
+    python benchmark_bulk_loader.py --repeat 10     # nhân bản CSV 10 lần để giả lập catalog lớn
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+
+from bulk_loader import (
+    STAGING_COLUMNS, bulk_load_staging, frame_to_matrix, prepare_staging_frame, write_infile
+)
+from db_config import get_connection
+
+CSV_FILE = 'vietnamese_tiki_products_backpacks_suitcases.csv'
+
+LEGACY_INSERT_QUERY = f'''
+INSERT INTO STAGING_Products ({', '.join(STAGING_COLUMNS)})
+VALUES ({', '.join(['%s'] * len(STAGING_COLUMNS))})
+'''
+
+
+def load_staging_legacy(connection, df):
+    """Cách nạp cũ trong run_etl_process.py: iterrows() + executemany 500 dòng"""
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    cursor.execute('TRUNCATE TABLE STAGING_Products')
+
+    data_to_insert = []
+    for index, row in df.iterrows():
+        data_to_insert.append(tuple(row))
+        if len(data_to_insert) >= 500:
+            cursor.executemany(LEGACY_INSERT_QUERY, data_to_insert)
+            data_to_insert = []
+    if data_to_insert:
+        cursor.executemany(LEGACY_INSERT_QUERY, data_to_insert)
+
+    connection.commit()
+    cursor.close()
+    seconds = time.perf_counter() - start
+    return {'rows': len(df), 'seconds': seconds, 'rows_per_sec': len(df) / seconds,
+            'method': 'legacy'}
+
+
+def benchmark_prepare(df):
+    """Đo riêng chi phí chuẩn bị dữ liệu phía Python (không cần MySQL)"""
+    results = []
+
+    start = time.perf_counter()
+    rows = [tuple(row) for _, row in df.iterrows()]
+    seconds = time.perf_counter() - start
+    results.append(('legacy iterrows', len(rows), seconds))
+
+    start = time.perf_counter()
+    matrix = frame_to_matrix(prepare_staging_frame(df))
+    flat = matrix.ravel().tolist()
+    seconds = time.perf_counter() - start
+    results.append(('numpy matrix (values)', len(matrix), seconds))
+    del flat
+
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        write_infile(prepare_staging_frame(df), path)
+        seconds = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    results.append(('infile writer', len(df), seconds))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark nạp STAGING_Products')
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--repeat', type=int, default=1, help='Nhân bản dữ liệu N lần')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--no-db', action='store_true', help='Không kết nối MySQL')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    if args.repeat > 1:
+        df = pd.concat([df] * args.repeat, ignore_index=True)
+        df.iloc[:, 0] = np.arange(len(df))
+    print(f"📂 Dữ liệu benchmark: {len(df):,} dòng")
+    print("=" * 60)
+
+    if args.no_db:
+        for name, rows, seconds in benchmark_prepare(df):
+            print(f"{name:25}: {seconds:8.3f}s  ({rows / seconds:12,.0f} rows/sec)")
+        return
+
+    connection = get_connection()
+
+    runs = [
+        lambda: load_staging_legacy(connection, df),
+        lambda: bulk_load_staging(connection, df, method='values', batch_size=args.batch_size),
+        lambda: bulk_load_staging(connection, df, method='infile'),
+    ]
+    results = []
+    for run in runs:
+        try:
+            stats = run()
+        except mysql.connector.Error as e:
+            print(f"⚠️  Bỏ qua: {e}")
+            continue
+        results.append(stats)
+        print(f"{stats['method']:10}: {stats['seconds']:8.3f}s  "
+              f"({stats['rows_per_sec']:12,.0f} rows/sec)")
+
+    connection.close()
+
+    legacy = next((r for r in results if r['method'] == 'legacy'), None)
+    if legacy:
+        print("-" * 60)
+        for stats in results:
+            if stats is not legacy:
+                print(f"{stats['method']:10}: nhanh hơn {legacy['seconds'] / stats['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark Pipeline
+Đo end-to-end pipeline (data_preprocessing.py -> product_dedup.py -> etl_pipeline.py -> part3_olap_datamining.py)
+trên catalog giả lập (synthetic_catalog.py) ở nhiều kích thước.
+  - Mỗi stage chạy trong process riêng, thư mục làm việc riêng (data/benchmarks/work/<size>),
+    không đụng tới data/clean, data/models ... của bản chạy thật
+  - Đo thời gian, CPU, peak RSS của đúng process đó (os.wait4) và throughput (rows/sec)
+  - Kết quả nối vào data/benchmarks/results.csv kèm version (git commit) để so sánh giữa các phiên bản;
+    stage chậm hơn baseline quá ngưỡng được đánh dấu
+  - Stage cần MySQL (etl) lỗi kết nối thì ghi status=failed rồi chạy tiếp
+  - Stage etl chạy trên schema riêng (--database, mặc định ProductDW_bench, truyền qua MYSQL_DATABASE)
+    vì bước prepare của etl_pipeline.py TRUNCATE STAGING / Fact / DIM_*; schema này cần được tạo
+    trước bằng các script 0*_mysql_*.sql (đổi tên database)
+
+Cách dùng:
+    python benchmark_pipeline.py --rows 10k
+    python benchmark_pipeline.py --rows 10k,1m --stages preprocess,part3 --chunk-size 200000
+    python benchmark_pipeline.py --rows 1m --baseline a1b2c3d     # so với một version cụ thể
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from db_config import DB_CONFIG
+from synthetic_catalog import default_output, parse_rows, size_label
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = 'data/benchmarks/work'
+RESULTS_FILE = 'data/benchmarks/results.csv'
+STAGES = ['generate', 'preprocess', 'dedup', 'etl', 'part3']
+RESULT_COLUMNS = ['timestamp', 'version', 'size', 'rows', 'stage', 'status', 'seconds',
+                  'cpu_seconds', 'peak_rss_mb', 'rows_per_sec']
+REGRESSION_THRESHOLD = 0.10
+BENCHMARK_DATABASE = 'ProductDW_bench'
+
+
+def code_version():
+    """Commit hiện tại (+ '-dirty' nếu có thay đổi chưa commit), 'unknown' nếu không có git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+
+def stage_command(stage, catalog, rows, args):
+    """Lệnh chạy một stage (đường dẫn catalog tuyệt đối, chạy trong thư mục làm việc)"""
+    script = lambda name: os.path.join(ROOT_DIR, name)
+    if stage == 'generate':
+        return [sys.executable, script('synthetic_catalog.py'), '--rows', str(rows),
+                '--output', catalog, '--seed', str(args.seed), '--source', os.path.join(ROOT_DIR, args.source)]
+    if stage == 'preprocess':
+        command = [sys.executable, script('data_preprocessing.py'), '--input', catalog]
+        return command + (['--chunk-size', str(args.chunk_size)] if args.chunk_size else [])
+    if stage == 'dedup':
+        return [sys.executable, script('product_dedup.py'), '--show', '0']
+    if stage == 'etl':
+        return [sys.executable, script('etl_pipeline.py'), '--csv', catalog]
+    if stage == 'part3':
+        return [sys.executable, script('part3_olap_datamining.py')]
+    raise ValueError(f'Stage không hợp lệ: {stage}')
+
+
+def stage_env(stage, args):
+    """Biến môi trường của stage: etl luôn trỏ tới database benchmark, không phải warehouse thật"""
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1')
+    if stage == 'etl':
+        env['MYSQL_DATABASE'] = args.database
+    return env
+
+
+def run_stage(command, cwd, log_file, timeout=None, env=None):
+    """
+    Chạy command, trả về (status, số giây, CPU giây, peak RSS MB) của đúng process con.
+    status: ok / failed / timeout
+    """
+    env = env or dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1')
+    with open(log_file, 'w', encoding='utf-8') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), process.kill()))
+            timer.start()
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        if timer is not None:
+            timer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    # Linux: ru_maxrss tính bằng KB, macOS: bytes
+    peak_rss_mb = usage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else usage.ru_maxrss / 1024
+    if timed_out.is_set():
+        state = 'timeout'
+    else:
+        state = 'ok' if process.returncode == 0 else 'failed'
+    return state, seconds, usage.ru_utime + usage.ru_stime, peak_rss_mb
+
+
+def append_results(records, results_file=RESULTS_FILE):
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    new_file = not os.path.exists(results_file)
+    with open(results_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(records)
+
+
+def compare(records, results_file=RESULTS_FILE, baseline=None, threshold=REGRESSION_THRESHOLD):
+    """
+    So sánh các stage vừa đo với lần chạy thành công gần nhất của version khác
+    (hoặc version baseline), cùng số dòng. Trả về danh sách stage bị chậm đi.
+    """
+    if not os.path.exists(results_file):
+        return []
+    history = pd.read_csv(results_file, dtype={'version': str})
+    history = history[history['status'] == 'ok']
+    regressions = []
+    print(f"\n📈 SO SÁNH VỚI {'version ' + baseline if baseline else 'version trước'}:")
+    for record in records:
+        if record['status'] != 'ok':
+            continue
+        previous = history[(history['rows'] == record['rows']) & (history['stage'] == record['stage'])]
+        previous = previous[previous['version'] == baseline] if baseline else \
+            previous[(previous['version'] != record['version']) & (previous['timestamp'] < record['timestamp'])]
+        if previous.empty:
+            continue
+        last = previous.iloc[-1]
+        ratio = record['seconds'] / last['seconds'] if last['seconds'] else float('inf')
+        rss_ratio = record['peak_rss_mb'] / last['peak_rss_mb'] if last['peak_rss_mb'] else float('inf')
+        flag = '  ⚠️  CHẬM HƠN' if ratio > 1 + threshold else ''
+        print(f"   {record['size']:>5} {record['stage']:11}: {last['seconds']:8.2f}s -> {record['seconds']:8.2f}s "
+              f"(x{ratio:.2f}), RSS x{rss_ratio:.2f} so với {last['version']}{flag}")
+        if flag:
+            regressions.append(record)
+    return regressions
+
+
+def benchmark(sizes, stages, args):
+    """Chạy các stage cho từng kích thước, trả về danh sách bản ghi kết quả"""
+    version = code_version()
+    records = []
+    for rows in sizes:
+        label = size_label(rows)
+        catalog = os.path.abspath(default_output(rows))
+        work_dir = os.path.abspath(os.path.join(args.work_dir, label))
+        os.makedirs(os.path.join(work_dir, 'logs'), exist_ok=True)
+        print(f"\n📦 Catalog {label} ({rows:,} dòng) - thư mục làm việc '{work_dir}'")
+        print("-" * 60)
+
+        for stage in stages:
+            if stage == 'generate' and os.path.exists(catalog) and not args.regenerate:
+                print(f"   {stage:11}: dùng lại '{catalog}'")
+                continue
+            if stage != 'generate' and not os.path.exists(catalog):
+                print(f"   {stage:11}: ⚠️  chưa có catalog, bỏ qua (thêm stage generate)")
+                continue
+            command = stage_command(stage, catalog, rows, args)
+            log_file = os.path.join(work_dir, 'logs', f'{stage}.log')
+            status, seconds, cpu_seconds, peak_rss_mb = run_stage(command, work_dir, log_file, args.timeout,
+                                                                  stage_env(stage, args))
+            record = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'), 'version': version,
+                'size': label, 'rows': rows, 'stage': stage, 'status': status,
+                'seconds': round(seconds, 3), 'cpu_seconds': round(cpu_seconds, 3),
+                'peak_rss_mb': round(peak_rss_mb, 1), 'rows_per_sec': round(rows / seconds, 1),
+            }
+            records.append(record)
+            icon = '✅' if status == 'ok' else '❌'
+            print(f"   {stage:11}: {icon} {seconds:8.2f}s  CPU {cpu_seconds:8.2f}s  "
+                  f"RSS {peak_rss_mb:8.1f} MB  {rows / seconds:12,.0f} rows/sec"
+                  + ('' if status == 'ok' else f"  ({status}, log: {log_file})"))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end pipeline trên catalog giả lập')
+    parser.add_argument('--rows', default='10k', help='Danh sách kích thước, vd. 10k,1m,10m')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f'Mặc định {",".join(STAGES)}')
+    parser.add_argument('--regenerate', action='store_true', help='Sinh lại catalog dù đã có')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--source', default='vietnamese_tiki_products_backpacks_suitcases.csv')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Chạy data_preprocessing ở chế độ streaming với N dòng mỗi chunk')
+    parser.add_argument('--timeout', type=float, default=None, help='Giới hạn giây cho mỗi stage')
+    parser.add_argument('--work-dir', default=WORK_DIR)
+    parser.add_argument('--database', default=BENCHMARK_DATABASE,
+                        help='Database MySQL cho stage etl (bị TRUNCATE, không dùng warehouse thật)')
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=None, help='Version (git commit) để so sánh')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Chậm hơn baseline quá tỉ lệ này thì báo regression')
+    args = parser.parse_args()
+
+    sizes = [parse_rows(value) for value in args.rows.split(',')]
+    stages = [stage.strip() for stage in args.stages.split(',')]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Stage không hợp lệ: {', '.join(sorted(unknown))}")
+    if 'etl' in stages and args.database == DB_CONFIG['database']:
+        parser.error(f"--database {args.database} là warehouse thật (stage etl TRUNCATE bảng đích)")
+
+    records = benchmark(sizes, [stage for stage in STAGES if stage in stages], args)
+    if not records:
+        return
+    regressions = compare(records, args.results, args.baseline, args.threshold)
+    append_results(records, args.results)
+    print(f"\n💾 Đã lưu {len(records)} kết quả vào '{args.results}'")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Bulk Loader cho STAGING_Products
+Nạp DataFrame vào STAGING_Products theo cột (column-wise) bằng NumPy,
+không tạo tuple cho từng dòng như cách dùng df.iterrows() trước đây.
+
+Hai phương thức:
+  - 'infile': ghi DataFrame ra file tạm rồi dùng LOAD DATA LOCAL INFILE
+              (giống 03_mysql_import_csv_data.sql)
+  - 'values': INSERT nhiều dòng trong một câu lệnh VALUES (...),(...)
+              với batch_size cấu hình được
+"""
+
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+from mysql.connector import Error
+
+STAGING_TABLE = 'STAGING_Products'
+LOAD_METHODS = ('auto', 'infile', 'values')
+
+STAGING_COLUMNS = [
+    'row_index', 'id', 'name', 'description', 'original_price', 'price',
+    'fulfillment_type', 'brand', 'review_count', 'rating_average',
+    'favourite_count', 'pay_later', 'current_seller', 'date_created',
+    'number_of_images', 'vnd_cashback', 'has_video', 'category', 'quantity_sold'
+]
+
+TEXT_COLUMNS = ['name', 'description', 'fulfillment_type', 'brand', 'current_seller', 'category']
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Thư mục tmpfs (nằm trong RAM) nếu hệ điều hành hỗ trợ
+MEMORY_TMP_DIR = '/dev/shm'
+
+
+def prepare_staging_frame(df):
+    """Chuẩn hóa DataFrame về đúng thứ tự cột của STAGING_Products"""
+    frame = df.rename(columns={'Unnamed: 0': 'row_index', '': 'row_index'})
+    if 'row_index' not in frame.columns:
+        frame = frame.assign(row_index=np.arange(len(frame)))
+    return frame.reindex(columns=STAGING_COLUMNS)
+
+
+def frame_to_matrix(frame):
+    """Chuyển DataFrame thành ma trận object 2 chiều, NaN -> None (theo từng cột)"""
+    matrix = np.empty((len(frame), len(STAGING_COLUMNS)), dtype=object)
+    for j, column in enumerate(STAGING_COLUMNS):
+        values = frame[column]
+        if values.dtype == bool:
+            values = values.astype(np.int8)
+        col = values.to_numpy(dtype=object)
+        col[values.isna().to_numpy()] = None
+        matrix[:, j] = col
+    return matrix
+
+
+def _values_query(table, columns, n_rows, suffix='', ignore=False):
+    """Tạo câu INSERT nhiều dòng với n_rows nhóm placeholder"""
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    return (
+        f"INSERT {'IGNORE ' if ignore else ''}INTO {table} ({', '.join(columns)}) VALUES "
+        + ', '.join([row_placeholder] * n_rows) + suffix
+    )
+
+
+def insert_values(cursor, table, columns, matrix, batch_size=DEFAULT_BATCH_SIZE, suffix='',
+                  ignore=False):
+    """
+    INSERT ma trận 2 chiều (n_rows x len(columns)) theo batch VALUES nhiều dòng.
+    suffix: phần thêm vào cuối câu lệnh, ví dụ 'ON DUPLICATE KEY UPDATE ...'
+    ignore: dùng INSERT IGNORE (bỏ qua dòng trùng unique key)
+    """
+    total = len(matrix)
+    if total >= batch_size:
+        full_query = _values_query(table, columns, batch_size, suffix, ignore)
+    else:
+        full_query = None
+
+    for start in range(0, total, batch_size):
+        batch = matrix[start:start + batch_size]
+        if len(batch) == batch_size:
+            query = full_query
+        else:
+            query = _values_query(table, columns, len(batch), suffix, ignore)
+        cursor.execute(query, batch.ravel().tolist())
+    return total
+
+
+def load_staging_values(cursor, frame, batch_size=DEFAULT_BATCH_SIZE):
+    """Nạp bằng INSERT ... VALUES nhiều dòng, mỗi batch là một câu lệnh"""
+    return insert_values(cursor, STAGING_TABLE, STAGING_COLUMNS, frame_to_matrix(frame),
+                         batch_size=batch_size)
+
+
+def write_infile(frame, path):
+    """Ghi DataFrame ra file theo định dạng LOAD DATA (NULL = \\N)"""
+    out = frame.copy()
+    for column in STAGING_COLUMNS:
+        if out[column].dtype == bool:
+            out[column] = out[column].astype(np.int8)
+        elif column in TEXT_COLUMNS:
+            # Ký tự escape mặc định của MySQL là '\', cần nhân đôi trong dữ liệu text
+            out[column] = out[column].astype('string').str.replace('\\', '\\\\', regex=False)
+    out.to_csv(path, header=False, index=False, na_rep='\\N', encoding='utf-8',
+               quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+
+
+def load_staging_infile(cursor, frame, use_memory=True):
+    """Nạp bằng LOAD DATA LOCAL INFILE từ file tạm (ưu tiên tmpfs trong RAM)"""
+    tmp_dir = MEMORY_TMP_DIR if use_memory and os.path.isdir(MEMORY_TMP_DIR) else None
+    fd, path = tempfile.mkstemp(prefix='staging_', suffix='.csv', dir=tmp_dir)
+    os.close(fd)
+    try:
+        write_infile(frame, path)
+        cursor.execute(f'''
+        LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}'
+        INTO TABLE {STAGING_TABLE}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ','
+        OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        ({', '.join(STAGING_COLUMNS)})
+        ''')
+    finally:
+        os.remove(path)
+    return len(frame)
+
+
+def bulk_load_staging(connection, df, method='auto', batch_size=DEFAULT_BATCH_SIZE,
+                      truncate=True):
+    """
+    Nạp DataFrame vào STAGING_Products.
+    method: 'infile', 'values' hoặc 'auto' (thử infile, lỗi thì dùng values)
+    Trả về dict thống kê: rows, seconds, rows_per_sec, method
+    """
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Phương thức nạp không hợp lệ: {method} (hợp lệ: {', '.join(LOAD_METHODS)})")
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    frame = prepare_staging_frame(df)
+
+    if truncate:
+        cursor.execute(f'TRUNCATE TABLE {STAGING_TABLE}')
+
+    if method in ('auto', 'infile'):
+        try:
+            rows = load_staging_infile(cursor, frame)
+            used = 'infile'
+        except Error as e:
+            if method == 'infile':
+                raise
+            print(f"⚠️  LOAD DATA LOCAL INFILE không khả dụng ({e}), chuyển sang VALUES batch")
+            connection.rollback()
+            if truncate:
+                cursor.execute(f'TRUNCATE TABLE {STAGING_TABLE}')
+            method = 'values'
+
+    if method == 'values':
+        rows = load_staging_values(cursor, frame, batch_size=batch_size)
+        used = 'values'
+
+    connection.commit()
+    cursor.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else float('inf'),
+        'method': used,
+    }
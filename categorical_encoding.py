@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Categorical Encoding
+Mã hóa brand / category / current_seller cho ML với mã ổn định giữa các lần chạy:
+  - StableEncoder   : vocabulary lưu ra file (data/models/vocabularies/<name>.json),
+                      chỉ thêm giá trị mới vào cuối -> mã của giá trị cũ không bao giờ đổi,
+                      model cũ vẫn dùng được với dữ liệu mới
+  - DimensionEncoder: dùng thẳng surrogate key của DIM_Brand / DIM_Seller
+                      (qua cache của dim_key_cache.py) để ML và warehouse chung một không gian id
+Cả hai mã hóa theo giá trị distinct (pd.factorize / categories của cột categorical),
+không astype(str) trên toàn bộ cột; giá trị chưa gặp -> UNKNOWN_CODE (-1).
+Lần fit đầu tiên sắp xếp vocabulary giống LabelEncoder nên cho cùng mã.
+
+Ví dụ:
+    encoder = StableEncoder.load('brand')
+    df['brand_encoded'] = encoder.fit_transform(df['brand'])   # thêm brand mới + lưu file
+    encoder.code('sakos')                                      # online, một giá trị
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dim_key_cache import (DEFAULT_CACHE_FILE, DimensionKeyCache, name_key,
+                           normalize_brand_names, normalize_seller_names)
+
+VOCAB_DIR = 'data/models/vocabularies'
+UNKNOWN_CODE = -1
+MISSING_LABEL = 'nan'   # nhãn của giá trị thiếu (None / NaN), giống astype(str) trước đây
+
+# Cột nguồn -> (dimension trong dim_key_cache, hàm chuẩn hóa tên giống ETL)
+WAREHOUSE_DIMENSIONS = {
+    'brand': ('brand', normalize_brand_names),
+    'current_seller': ('seller', normalize_seller_names),
+}
+
+
+def factorize_labels(values):
+    """
+    (codes, uniques): codes trỏ vào uniques (nhãn dạng chuỗi, giá trị thiếu -> MISSING_LABEL).
+    Cột categorical dùng luôn categories, chỉ chuyển chuỗi trên các giá trị distinct.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Chỉ giữ category thực sự xuất hiện; mã -1 (NaN) trỏ vào ô MISSING_LABEL cuối cùng
+        codes = series.cat.codes.to_numpy()
+        labels = series.cat.categories.astype(str).append(pd.Index([MISSING_LABEL]))
+        used = np.zeros(len(labels), dtype=bool)
+        used[codes] = True
+        remap = np.cumsum(used) - 1
+        return remap[codes], labels[used]
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    # astype(str) giữ NaN là giá trị thiếu (pandas >= 3) -> đổi sang nhãn chuỗi trước
+    uniques = pd.Index(uniques, dtype=object)
+    return codes, uniques.where(uniques.notna(), MISSING_LABEL).astype(str)
+
+
+class StableEncoder:
+    """Vocabulary chỉ thêm (append-only), lưu ra file JSON"""
+
+    def __init__(self, name, categories=(), path=None):
+        self.name = name
+        self.path = path or os.path.join(VOCAB_DIR, f'{name}.json')
+        self.categories = pd.Index(list(categories), dtype=object)
+        self._codes = None
+
+    @classmethod
+    def load(cls, name, path=None):
+        """Nạp vocabulary đã lưu (rỗng nếu chưa có)"""
+        path = path or os.path.join(VOCAB_DIR, f'{name}.json')
+        categories = []
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                categories = json.load(f)['categories']
+        # File cũ có thể lưu giá trị thiếu thành NaN (JSON không chuẩn)
+        categories = [MISSING_LABEL if pd.isna(c) else c for c in categories]
+        return cls(name, categories, path)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'name': self.name, 'categories': list(self.categories)}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def classes_(self):
+        return np.asarray(self.categories)
+
+    def get_params(self, deep=True):
+        # Cho model_registry.fingerprint(): chỉ tên (+ dữ liệu đầu vào do fingerprint tự băm).
+        # Không băm vocabulary đã lưu: nó thay đổi ngay sau lần fit (rỗng -> đầy đủ) nên lần chạy
+        # sau luôn lệch fingerprint; vocabulary chỉ thêm nên encoder đã lưu vẫn đúng với mã cũ
+        return {'name': self.name}
+
+    def update(self, values):
+        """Thêm các giá trị chưa có vào cuối vocabulary, trả về số giá trị mới"""
+        _, uniques = factorize_labels(values)
+        new = uniques[self.categories.get_indexer(uniques) == UNKNOWN_CODE].unique().sort_values()
+        if len(new):
+            self.categories = self.categories.append(pd.Index(new, dtype=object))
+            self._codes = None
+        return len(new)
+
+    def fit(self, values, y=None):
+        if self.update(values):
+            self.save()
+        return self
+
+    def transform(self, values):
+        codes, uniques = factorize_labels(values)
+        return self.categories.get_indexer(uniques)[codes].astype(np.int64)
+
+    def fit_transform(self, values, y=None):
+        return self.fit(values).transform(values)
+
+    def to_categorical(self, values):
+        """pd.Categorical với categories = vocabulary (giá trị chưa gặp -> NaN)"""
+        return pd.Categorical.from_codes(self.transform(values), categories=self.categories)
+
+    def inverse_transform(self, codes):
+        codes = np.asarray(codes)
+        labels = np.asarray(self.categories, dtype=object)[np.clip(codes, 0, None)]
+        labels[codes == UNKNOWN_CODE] = None
+        return labels
+
+    def code(self, value):
+        """Mã của một giá trị (online), tra dict dựng một lần"""
+        if self._codes is None:
+            self._codes = {label: i for i, label in enumerate(self.categories)}
+        label = MISSING_LABEL if pd.isna(value) else str(value)
+        return self._codes.get(label, UNKNOWN_CODE)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_codes'] = None
+        return state
+
+
+class DimensionEncoder:
+    """Mã = surrogate key (brand_id / seller_id) của dimension trong warehouse"""
+
+    def __init__(self, column, keys):
+        self.column = column
+        self.dim, self.normalize = WAREHOUSE_DIMENSIONS[column]
+        self.keys = dict(keys)
+
+    @classmethod
+    def from_cache(cls, column, cache_file=DEFAULT_CACHE_FILE, cursor=None):
+        """
+        Lấy bảng name -> id từ cache của dim_key_cache (đồng bộ lại với MySQL nếu có cursor).
+        Raise KeyError nếu chưa có cache nào cho dimension này.
+        """
+        cache = DimensionKeyCache(cache_file)
+        if cursor is not None:
+            cache.load(cursor)
+            cache.save()
+        else:
+            cache.load_file()
+        dim = WAREHOUSE_DIMENSIONS[column][0]
+        if not cache.keys.get(dim):
+            raise KeyError(f"Chưa có cache khóa cho dimension '{dim}' ({cache_file})")
+        return cls(column, cache.keys[dim])
+
+    def get_params(self, deep=True):
+        digest = hashlib.sha1(repr(sorted(self.keys.items())).encode('utf-8')).hexdigest()
+        return {'column': self.column, 'keys': digest}
+
+    def fit(self, values, y=None):
+        # Khóa do warehouse cấp (ETL), ở đây chỉ đọc
+        return self
+
+    def transform(self, values):
+        codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+        # Chuẩn hóa tên (TRIM, NULL -> 'Unknown' ...) chỉ trên các giá trị distinct
+        uniques = self.normalize(pd.Series(np.asarray(uniques, dtype=object)))
+        lookup = np.array([self.keys.get(name_key(n), UNKNOWN_CODE) for n in uniques], dtype=np.int64)
+        return lookup[codes]
+
+    def fit_transform(self, values, y=None):
+        return self.transform(values)
+
+    def code(self, value):
+        return int(self.transform([value])[0])
+
+
+def make_encoder(column, use_warehouse_keys=False, cache_file=DEFAULT_CACHE_FILE):
+    """
+    DimensionEncoder nếu được yêu cầu và cột có dimension + cache khóa,
+    ngược lại StableEncoder với vocabulary đã lưu
+    """
+    if use_warehouse_keys and column in WAREHOUSE_DIMENSIONS:
+        try:
+            return DimensionEncoder.from_cache(column, cache_file)
+        except KeyError as e:
+            print(f"⚠️  {e} - dùng vocabulary riêng cho '{column}'")
+    return StableEncoder.load(column)
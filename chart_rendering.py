@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Chart Rendering
+Vẽ các dashboard của part 3 (OLAP / clustering / DBSCAN / ML) không cần màn hình:
+  - Backend Agg, không plt.show() -> chạy batch không bao giờ bị chặn
+  - Script chính chỉ chuẩn bị dữ liệu đã tổng hợp (dict các mảng numpy / list nhỏ),
+    việc dựng figure + mã hóa PNG chạy trên process pool (loky) song song với phần tính toán còn lại
+  - Scatter vượt quá ngân sách điểm (POINT_BUDGET) được lấy mẫu phân tầng theo cluster
+  - Mỗi chart có hash dữ liệu đầu vào (data/cache/charts.json): hash không đổi và file PNG
+    vẫn là file đã vẽ -> bỏ qua, không vẽ lại
+  - Scatter theo cluster vẽ một lần với mảng màu thay vì lọc DataFrame cho từng cluster
+
+Ví dụ:
+    renderer = ChartRenderer()
+    renderer.submit(clustering_dashboard, data, 'data/clean/clustering_analysis.png')
+    ...
+    renderer.wait()     # {path: 'rendered' | 'skipped'}
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from joblib.externals.loky import get_reusable_executor
+from matplotlib import cbook
+from matplotlib.lines import Line2D
+
+import instrumentation
+
+MANIFEST_FILE = 'data/cache/charts.json'
+DEFAULT_DPI = 150
+POINT_BUDGET = 5000
+# Đổi khi sửa code vẽ để các chart cũ được vẽ lại
+RENDER_VERSION = 1
+
+
+def downsample(n, budget=POINT_BUDGET, labels=None, random_state=42):
+    """
+    Chỉ số (đã sắp xếp) của tối đa budget điểm trong n điểm.
+    Có labels -> lấy mẫu phân tầng: mỗi nhóm giữ tỉ lệ, nhóm nhỏ vẫn có ít nhất vài điểm.
+    """
+    if n <= budget:
+        return np.arange(n)
+    rng = np.random.RandomState(random_state)
+    if labels is None:
+        return np.sort(rng.choice(n, budget, replace=False))
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    groups, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+    quotas = np.minimum(counts, np.maximum(np.round(counts * budget / n).astype(int), 10))
+    picked = [order[start:start + count][rng.choice(count, quota, replace=False)]
+              for start, count, quota in zip(starts, counts, quotas)]
+    return np.sort(np.concatenate(picked))
+
+
+def scatter_points(df, columns, budget=POINT_BUDGET, label=None, scale=None):
+    """
+    Dict cột -> mảng numpy (đã lấy mẫu nếu quá budget) để gửi sang worker.
+    scale: {cột: hệ số chia} (vd. price / 1000).
+    """
+    index = downsample(len(df), budget, None if label is None else df[label].to_numpy())
+    points = {}
+    for column in columns + ([label] if label else []):
+        values = df[column].to_numpy()[index]
+        if scale and column in scale:
+            values = values / scale[column]
+        points[column] = values
+    points['total'] = len(df)
+    return points
+
+
+def box_stats(values, groups):
+    """Thống kê boxplot (median, tứ phân vị, râu, outlier) theo nhóm, tính một lần trên dữ liệu đầy đủ"""
+    values = np.asarray(values)
+    groups = np.asarray(groups, dtype=object)
+    labels = list(dict.fromkeys(groups))
+    stats = []
+    for label in labels:
+        stat = cbook.boxplot_stats(values[groups == label], labels=[label])[0]
+        if len(stat['fliers']) > POINT_BUDGET:
+            stat['fliers'] = stat['fliers'][downsample(len(stat['fliers']))]
+        stats.append(stat)
+    return stats
+
+
+def _update_hash(digest, value):
+    """
+    Băm dạng chuẩn của dữ liệu chart (không dùng pickle: bytes của pickle không cố định,
+    vd. Series sau một vòng unpickle từ cache cho bytes khác dù cùng giá trị):
+    mảng -> dtype + shape + tobytes(), list / tuple / dict -> duyệt đệ quy, scalar -> json.dumps
+    """
+    if isinstance(value, dict):
+        digest.update(f'dict{len(value)}'.encode())
+        for key, item in value.items():
+            _update_hash(digest, key)
+            _update_hash(digest, item)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            _update_hash(digest, item)
+    elif isinstance(value, pd.DataFrame):
+        digest.update(b'DataFrame')
+        _update_hash(digest, value.columns)
+        _update_hash(digest, value.index)
+        for column in value.columns:
+            _update_hash(digest, value[column].to_numpy())
+    elif isinstance(value, pd.Series):
+        digest.update(b'Series')
+        _update_hash(digest, value.name)
+        _update_hash(digest, value.index)
+        _update_hash(digest, value.to_numpy())
+    elif isinstance(value, pd.Index):
+        _update_hash(digest, value.to_numpy())
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        digest.update(f'ndarray{array.dtype.str}{array.shape}'.encode())
+        if array.dtype == object:
+            _update_hash(digest, array.ravel().tolist())
+        else:
+            digest.update(array.tobytes())
+    else:
+        if isinstance(value, np.generic):
+            value = value.item()
+        digest.update(json.dumps(value, default=repr).encode('utf-8'))
+
+
+def data_hash(func, data, dpi):
+    """Hash dữ liệu đầu vào + tên hàm vẽ + dpi + RENDER_VERSION"""
+    digest = hashlib.sha1(f'{func.__module__}.{func.__name__}:{dpi}:{RENDER_VERSION}'.encode())
+    _update_hash(digest, data)
+    return digest.hexdigest()
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _render(func, data, path, dpi):
+    start = time.perf_counter()
+    fig = func(data)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+class ChartRenderer:
+    """Hàng đợi chart: submit() gửi sang worker ngay, wait() chờ xong và cập nhật manifest"""
+
+    def __init__(self, max_workers=None, dpi=DEFAULT_DPI, manifest_file=MANIFEST_FILE):
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 4)
+        self.dpi = dpi
+        self.manifest_file = manifest_file
+        self.manifest = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        self.pending = {}
+        self.status = {}
+
+    def is_current(self, path, digest):
+        entry = self.manifest.get(path)
+        return (entry is not None and entry['hash'] == digest and os.path.exists(path)
+                and entry['stamp'] == _file_stamp(path))
+
+    def submit(self, func, data, path):
+        """Trả về 'skipped' nếu chart không đổi, ngược lại 'submitted' (đang vẽ ở worker)"""
+        digest = data_hash(func, data, self.dpi)
+        if self.is_current(path, digest):
+            self.status[path] = 'skipped'
+            return 'skipped'
+        executor = get_reusable_executor(max_workers=self.max_workers)
+        self.pending[path] = (executor.submit(_render, func, data, path, self.dpi), digest)
+        return 'submitted'
+
+    def wait(self):
+        """Chờ các chart đang vẽ, lưu manifest, trả về {path: 'rendered' | 'skipped'}"""
+        for path, (future, digest) in self.pending.items():
+            seconds = future.result()
+            self.manifest[path] = {'hash': digest, 'stamp': _file_stamp(path),
+                                   'seconds': round(seconds, 3)}
+            self.status[path] = 'rendered'
+            instrumentation.record(f'chart/{os.path.basename(path)}', seconds, bytes=os.path.getsize(path))
+        self.pending = {}
+        os.makedirs(os.path.dirname(self.manifest_file) or '.', exist_ok=True)
+        tmp_file = f'{self.manifest_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+        return dict(self.status)
+
+
+# ========================================
+# CÁC DASHBOARD (chạy trong worker, chỉ nhận dữ liệu đã tổng hợp)
+# ========================================
+
+def _cluster_colors(n):
+    return plt.cm.tab10(np.linspace(0, 1, n))
+
+
+def _scatter_by_cluster(ax, x, y, labels, color_map, sizes=None, noise_alpha=None):
+    """Một lần scatter cho tất cả cluster (màu theo nhãn), legend dựng bằng proxy"""
+    labels = np.asarray(labels)
+    alpha = 0.6
+    if noise_alpha is not None and (labels == -1).any():
+        alpha = np.where(labels == -1, noise_alpha, 0.6)
+    colors = np.array([matplotlib.colors.to_rgba(color_map[label]) for label in labels]).reshape(-1, 4)
+    colors[:, 3] = alpha
+    ax.scatter(x, y, s=sizes, c=colors)
+    handles = [Line2D([], [], linestyle='', marker='o', color=color_map[label],
+                      alpha=noise_alpha if label == -1 and noise_alpha is not None else 0.6,
+                      label='Noise' if label == -1 else f'Cluster {label}')
+               for label in sorted(color_map)]
+    ax.legend(handles=handles)
+
+
+def _sample_note(ax, points):
+    shown = len(next(iter(points.values())))
+    if shown < points['total']:
+        ax.annotate(f'{shown:,}/{points["total"]:,} diem (lay mau)', xy=(0.99, 0.01),
+                    xycoords='axes fraction', ha='right', va='bottom', fontsize=8, color='dimgray')
+
+
+def olap_dashboard(data):
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('PHAN TICH OLAP - BUSINESS INTELLIGENCE', fontsize=16, fontweight='bold', y=1.08)
+
+    # 1. Bar chart: Top 10 thuong hieu co doanh thu cao nhat
+    brands, revenue = data['top_brands']
+    axes[0, 0].bar(range(len(brands)), revenue, color='skyblue')
+    axes[0, 0].set_title('Top 10 Thuong hieu - Tong Doanh thu', fontweight='bold')
+    axes[0, 0].set_xlabel('Thuong hieu')
+    axes[0, 0].set_ylabel('Doanh thu (VND)')
+    axes[0, 0].set_xticks(range(len(brands)))
+    axes[0, 0].set_xticklabels(brands, rotation=45, ha='right')
+
+    # 2. Scatter plot: Gia vs Rating vs So luong ban
+    points = data['price_rating']
+    scatter = axes[0, 1].scatter(points['price'], points['rating_average'], s=points['quantity_sold'] * 2,
+                                 alpha=0.6, c=points['revenue'], cmap='viridis')
+    axes[0, 1].set_title('Gia vs Rating (size=quantity, color=revenue)', fontweight='bold')
+    axes[0, 1].set_xlabel('Gia (nghin VND)')
+    axes[0, 1].set_ylabel('Rating Average')
+    _sample_note(axes[0, 1], points)
+    fig.colorbar(scatter, ax=axes[0, 1], label='Revenue (nghin VND)')
+
+    # 3. Boxplot: Rating theo fulfillment_type
+    axes[1, 0].bxp(data['fulfillment_box'])
+    axes[1, 0].set_title('So sanh Rating theo Fulfillment Type', fontweight='bold')
+    axes[1, 0].set_xlabel('Fulfillment Type')
+    axes[1, 0].set_ylabel('Rating Average')
+    axes[1, 0].tick_params(axis='x', rotation=45)
+
+    # 4. Doanh thu theo price_segment
+    segments, revenue = data['segment_revenue']
+    axes[1, 1].pie(revenue, labels=segments, autopct='%1.1f%%', startangle=90)
+    axes[1, 1].set_title('Phan bo Doanh thu theo Price Segment', fontweight='bold')
+
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return fig
+
+
+def clustering_dashboard(data):
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('PHAN TICH DATA MINING - CLUSTERING', fontsize=16, fontweight='bold')
+    colors = _cluster_colors(data['k'])
+    color_map = dict(enumerate(colors))
+    points = data['points']
+
+    # 1. Scatter plot: Price vs Quantity_sold voi mau theo cluster
+    _scatter_by_cluster(axes[0, 0], points['price'], points['quantity_sold'], points['cluster'], color_map)
+    axes[0, 0].set_title('Gia vs So luong ban (theo Cluster)', fontweight='bold')
+    axes[0, 0].set_xlabel('Gia (nghin VND)')
+    axes[0, 0].set_ylabel('So luong ban')
+    _sample_note(axes[0, 0], points)
+
+    # 2. Bieu do cot: Rating trung binh theo cluster
+    clusters, rating = data['cluster_rating']
+    axes[0, 1].bar(clusters, rating, color=colors)
+    axes[0, 1].set_title('Rating trung binh theo Cluster', fontweight='bold')
+    axes[0, 1].set_xlabel('Cluster')
+    axes[0, 1].set_ylabel('Rating Average')
+
+    # 3. Bieu do cot: Gia trung binh theo cluster
+    clusters, price = data['cluster_price']
+    axes[1, 0].bar(clusters, price, color=colors)
+    axes[1, 0].set_title('Gia trung binh theo Cluster', fontweight='bold')
+    axes[1, 0].set_xlabel('Cluster')
+    axes[1, 0].set_ylabel('Gia (nghin VND)')
+
+    # 4. Scatter plot 3D-like: Price vs Rating voi size theo quantity_sold
+    _scatter_by_cluster(axes[1, 1], points['price'], points['rating_average'], points['cluster'],
+                        color_map, sizes=points['quantity_sold'] * 3)
+    axes[1, 1].set_title('Gia vs Rating (size=quantity)', fontweight='bold')
+    axes[1, 1].set_xlabel('Gia (nghin VND)')
+    axes[1, 1].set_ylabel('Rating Average')
+
+    fig.tight_layout()
+    return fig
+
+
+def dbscan_dashboard(data):
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('DBSCAN CLUSTERING ANALYSIS', fontsize=16, fontweight='bold')
+
+    # Mau theo cluster, noise mau xam
+    clusters = data['clusters']
+    palette = _cluster_colors(max(len(clusters), 10))
+    color_map = {cluster: 'gray' if cluster == -1 else palette[cluster] for cluster in clusters}
+    points = data['points']
+
+    # 1. Scatter plot: Price vs Quantity_sold (DBSCAN)
+    _scatter_by_cluster(axes[0, 0], points['price'], points['quantity_sold'], points['dbscan_cluster'],
+                        color_map, noise_alpha=0.3)
+    axes[0, 0].set_title('DBSCAN: Gia vs So luong ban', fontweight='bold')
+    axes[0, 0].set_xlabel('Gia (nghin VND)')
+    axes[0, 0].set_ylabel('So luong ban')
+    _sample_note(axes[0, 0], points)
+
+    # 2. Scatter plot: Price vs Rating (DBSCAN)
+    _scatter_by_cluster(axes[0, 1], points['price'], points['rating_average'], points['dbscan_cluster'],
+                        color_map, noise_alpha=0.3)
+    axes[0, 1].set_title('DBSCAN: Gia vs Rating', fontweight='bold')
+    axes[0, 1].set_xlabel('Gia (nghin VND)')
+    axes[0, 1].set_ylabel('Rating Average')
+
+    # 3. So sanh so luong san pham giua K-means va DBSCAN
+    kmeans_counts, dbscan_counts = data['kmeans_counts'], data['dbscan_counts']
+    axes[1, 0].bar(np.arange(len(kmeans_counts)) - 0.2, kmeans_counts, width=0.4,
+                   label='K-Means', alpha=0.7, color='blue')
+    axes[1, 0].bar(np.arange(len(dbscan_counts)) + 0.2, dbscan_counts, width=0.4,
+                   label='DBSCAN', alpha=0.7, color='red')
+    axes[1, 0].set_title('So sanh phan bo Cluster: K-Means vs DBSCAN', fontweight='bold')
+    axes[1, 0].set_xlabel('Cluster ID')
+    axes[1, 0].set_ylabel('So luong san pham')
+    axes[1, 0].legend()
+    axes[1, 0].set_xticks(range(max(len(kmeans_counts), len(dbscan_counts))))
+
+    # 4. Phan bo diem nhieu cua DBSCAN
+    axes[1, 1].pie(data['valid_noise'], explode=(0.05, 0.1), labels=['Valid Clusters', 'Noise'],
+                   colors=['lightgreen', 'lightcoral'], autopct='%1.1f%%', shadow=True, startangle=90)
+    axes[1, 1].set_title('DBSCAN: Phan bo diem hop le vs Noise', fontweight='bold')
+
+    fig.tight_layout()
+    return fig
+
+
+def ml_dashboard(data):
+    fig, axes = plt.subplots(3, 2, figsize=(16, 18))
+    fig.suptitle('MACHINE LEARNING & PREDICTIVE ANALYTICS', fontsize=16, fontweight='bold')
+
+    # 1. Model Performance Comparison (Revenue)
+    models, r2_scores = data['r2_scores']
+    axes[0, 0].bar(models, r2_scores, color=['red', 'green', 'blue', 'orange', 'purple'])
+    axes[0, 0].set_title('Model Performance - Revenue Prediction (R2)', fontweight='bold')
+    axes[0, 0].set_ylabel('R2 Score')
+    axes[0, 0].tick_params(axis='x', rotation=45)
+
+    # 2. Classification Accuracy Comparison
+    class_names, class_acc = data['class_accuracy']
+    axes[0, 1].bar(class_names, class_acc, color=['darkred', 'darkgreen', 'darkblue', 'darkorange'])
+    axes[0, 1].set_title('Classification Accuracy Comparison', fontweight='bold')
+    axes[0, 1].set_ylabel('Accuracy')
+    axes[0, 1].tick_params(axis='x', rotation=45)
+
+    # 3. Feature Importance
+    features, importance = data['feature_importance']
+    axes[1, 0].barh(features, importance, color='coral')
+    axes[1, 0].set_title('Feature Importance (Random Forest)', fontweight='bold')
+    axes[1, 0].set_xlabel('Importance')
+
+    # 4. Actual vs Predicted Revenue (Best Model)
+    points = data['predictions']
+    low, high = data['actual_range']
+    axes[1, 1].scatter(points['actual'], points['predicted'], alpha=0.5, color='green')
+    axes[1, 1].plot([low, high], [low, high], 'r--', lw=2)
+    axes[1, 1].set_title(f'Actual vs Predicted Revenue ({data["best_model"]})', fontweight='bold')
+    axes[1, 1].set_xlabel('Actual Revenue')
+    axes[1, 1].set_ylabel('Predicted Revenue')
+    _sample_note(axes[1, 1], points)
+
+    # 5. CLV by Cluster
+    clusters, clv = data['clv']
+    axes[2, 0].bar(clusters, clv, color='purple', alpha=0.7)
+    axes[2, 0].set_title('Customer Lifetime Value by Cluster', fontweight='bold')
+    axes[2, 0].set_xlabel('Cluster')
+    axes[2, 0].set_ylabel('CLV Score')
+
+    # 6. Brand Revenue Distribution (Top 10)
+    brands, revenue = data['top_brands']
+    axes[2, 1].pie(revenue, labels=brands, autopct='%1.1f%%', startangle=90)
+    axes[2, 1].set_title('Revenue Distribution - Top 10 Brands', fontweight='bold')
+
+    fig.tight_layout()
+    return fig
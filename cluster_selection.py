@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cluster Selection
+Chọn số cluster K cho KMeans trong một lượt:
+  - Mỗi K được fit đúng 1 lần, model của K tốt nhất được dùng lại (không fit lại)
+  - Silhouette tính trên một mẫu cố định (sample_size dòng, dùng chung cho mọi K)
+    thay vì toàn bộ dữ liệu (O(n^2))
+  - Các K được đánh giá song song trên nhiều core (joblib)
+  - Catalog lớn: dùng MiniBatchKMeans (method='minibatch' hoặc 'auto')
+compare_with_exact() so sánh lựa chọn với silhouette chính xác trên toàn bộ dữ liệu
+(dùng lại các model đã fit) để kiểm tra chất lượng của cách lấy mẫu.
+"""
+
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+DEFAULT_K_RANGE = range(2, 8)
+DEFAULT_SAMPLE_SIZE = 10000
+# Từ số dòng này trở lên, method='auto' chuyển sang MiniBatchKMeans
+MINIBATCH_THRESHOLD = 100000
+MINIBATCH_SIZE = 4096
+
+
+def make_model(k, method='kmeans', random_state=42):
+    if method == 'minibatch':
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state,
+                               batch_size=MINIBATCH_SIZE, n_init=3)
+    return KMeans(n_clusters=k, random_state=random_state)
+
+
+def sample_indices(n_rows, sample_size, random_state=42):
+    """Chỉ số mẫu dùng chung cho mọi K (None = dùng toàn bộ dữ liệu)"""
+    if not sample_size or n_rows <= sample_size:
+        return None
+    rng = np.random.RandomState(random_state)
+    return np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+
+
+def _evaluate(X, k, method, sample, random_state):
+    start = time.perf_counter()
+    model = make_model(k, method, random_state)
+    labels = model.fit_predict(X)
+    fit_seconds = time.perf_counter() - start
+
+    X_eval, labels_eval = (X, labels) if sample is None else (X[sample], labels[sample])
+    # Mẫu có thể chỉ rơi vào 1 cluster -> silhouette không xác định
+    score = silhouette_score(X_eval, labels_eval) if len(np.unique(labels_eval)) > 1 else -1.0
+    return {'k': k, 'model': model, 'labels': labels, 'silhouette': score,
+            'fit_seconds': fit_seconds, 'seconds': time.perf_counter() - start}
+
+
+def select_k(X, k_range=DEFAULT_K_RANGE, method='auto', sample_size=DEFAULT_SAMPLE_SIZE,
+             n_jobs=-1, random_state=42):
+    """
+    Fit KMeans cho mỗi K trong k_range (song song) và chọn K có silhouette cao nhất.
+    Trả về dict: best_k, model, labels, scores {k: silhouette}, candidates, method,
+                 sample_size (số dòng dùng để tính silhouette), seconds
+    """
+    X = np.asarray(X)
+    if method == 'auto':
+        method = 'minibatch' if len(X) >= MINIBATCH_THRESHOLD else 'kmeans'
+    sample = sample_indices(len(X), sample_size, random_state)
+
+    start = time.perf_counter()
+    candidates = Parallel(n_jobs=n_jobs)(
+        delayed(_evaluate)(X, k, method, sample, random_state) for k in k_range
+    )
+    best = max(candidates, key=lambda c: c['silhouette'])
+    return {
+        'best_k': best['k'],
+        'model': best['model'],
+        'labels': best['labels'],
+        'scores': {c['k']: c['silhouette'] for c in candidates},
+        'candidates': candidates,
+        'method': method,
+        'sample_size': len(X) if sample is None else len(sample),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def compare_with_exact(X, result):
+    """
+    Tính silhouette chính xác trên toàn bộ X cho các model đã fit (không fit lại)
+    và so sánh với lựa chọn bằng mẫu.
+    Trả về dict: exact_scores, exact_best_k, same_choice, max_abs_error, seconds
+    """
+    X = np.asarray(X)
+    start = time.perf_counter()
+    exact = {c['k']: silhouette_score(X, c['labels']) for c in result['candidates']}
+    exact_best_k = max(exact, key=exact.get)
+    return {
+        'exact_scores': exact,
+        'exact_best_k': exact_best_k,
+        'same_choice': exact_best_k == result['best_k'],
+        # Chênh lệch silhouette (chính xác) giữa K được chọn và K tốt nhất thật sự
+        'regret': exact[exact_best_k] - exact[result['best_k']],
+        'max_abs_error': max(abs(exact[k] - result['scores'][k]) for k in exact),
+        'seconds': time.perf_counter() - start,
+    }
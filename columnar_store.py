@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Columnar Store (Arrow IPC)
+Lưu dữ liệu sạch dạng cột thay cho việc chuyển giao products_clean.csv giữa các bước:
+  - Kiểu dữ liệu được giữ nguyên, các cột phân loại (brand, current_seller, category,
+    fulfillment_type, price_segment) được dictionary-encode
+  - Đọc bằng memory-map + chỉ lấy các cột cần thiết (column projection),
+    cột text dài như description không bị đọc nếu không yêu cầu
+  - Cột dẫn xuất (cluster, dbscan_cluster, ...) lưu thành file riêng trong derived/
+    thay vì ghi lại toàn bộ bảng
+
+Cấu trúc thư mục:
+    data/columnar/products/base.arrow
+    data/columnar/products/derived/<column>.arrow
+
+Cần pyarrow; nếu chưa cài, ARROW_AVAILABLE = False và các bước dùng CSV như cũ.
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+STORE_DIR = 'data/columnar/products'
+BASE_FILE = 'base.arrow'
+DERIVED_DIR = 'derived'
+
+CATEGORICAL_COLUMNS = ['brand', 'current_seller', 'category', 'fulfillment_type', 'price_segment']
+
+
+def _require_arrow():
+    if not ARROW_AVAILABLE:
+        raise ImportError("Columnar store cần pyarrow: pip install pyarrow")
+
+
+def _base_path(store_dir):
+    return os.path.join(store_dir, BASE_FILE)
+
+
+def _derived_path(store_dir, name):
+    return os.path.join(store_dir, DERIVED_DIR, f'{name}.arrow')
+
+
+def store_exists(store_dir=STORE_DIR):
+    return ARROW_AVAILABLE and os.path.exists(_base_path(store_dir))
+
+
+class ColumnarWriter:
+    """
+    Ghi base.arrow theo từng batch (dùng được cho cả chế độ streaming).
+    Từ điển của cột phân loại chỉ được nối thêm giữa các batch (dictionary delta),
+    nên mã của một giá trị không đổi trong toàn bộ file.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        _require_arrow()
+        self.store_dir = store_dir
+        self.schema = None
+        self.vocab = {}
+        self.rows = 0
+        self._sink = None
+        self._writer = None
+
+        # Ghi lại base -> các cột dẫn xuất cũ không còn khớp
+        shutil.rmtree(os.path.join(store_dir, DERIVED_DIR), ignore_errors=True)
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _categorical_array(self, column, series):
+        vocab = self.vocab.setdefault(column, [])
+        values = series.astype(object).where(series.notna(), None)
+        known = set(vocab)
+        vocab.extend(v for v in pd.unique(values.dropna()) if v not in known)
+        codes = pd.Categorical(values, categories=vocab).codes.astype(np.int32)
+        indices = pa.array(codes, mask=codes < 0, type=pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, pa.array(vocab, type=pa.string()))
+
+    def write(self, df):
+        plain = df.drop(columns=[c for c in CATEGORICAL_COLUMNS if c in df.columns])
+        plain_table = pa.Table.from_pandas(plain, preserve_index=False,
+                                           schema=None if self.schema is None else
+                                           pa.schema([f for f in self.schema
+                                                      if f.name in plain.columns]))
+        arrays, fields = [], []
+        for column in df.columns:
+            if column in CATEGORICAL_COLUMNS:
+                arrays.append(self._categorical_array(column, df[column]))
+                fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                arrays.append(plain_table.column(column).combine_chunks())
+                fields.append(plain_table.schema.field(column))
+
+        if self.schema is None:
+            self.schema = pa.schema(fields)
+            self._sink = pa.OSFile(_base_path(self.store_dir), 'wb')
+            self._writer = pa.ipc.new_file(
+                self._sink, self.schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+
+def write_table(df, store_dir=STORE_DIR):
+    """Ghi toàn bộ DataFrame thành base.arrow"""
+    writer = ColumnarWriter(store_dir)
+    writer.write(df)
+    writer.close()
+    return writer.rows
+
+
+def _read_arrow(path, columns=None):
+    """Đọc file Arrow IPC bằng memory-map, chỉ lấy các cột yêu cầu"""
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas()
+
+
+def base_columns(store_dir=STORE_DIR):
+    _require_arrow()
+    with pa.memory_map(_base_path(store_dir), 'r') as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def derived_columns(store_dir=STORE_DIR):
+    directory = os.path.join(store_dir, DERIVED_DIR)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-len('.arrow')] for f in os.listdir(directory) if f.endswith('.arrow'))
+
+
+def num_rows(store_dir=STORE_DIR):
+    _require_arrow()
+    with pa.memory_map(_base_path(store_dir), 'r') as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def read_table(columns=None, store_dir=STORE_DIR):
+    """
+    Đọc store thành DataFrame.
+    columns: danh sách cột (cả cột base và cột dẫn xuất), None = tất cả cột base
+    """
+    _require_arrow()
+    base = base_columns(store_dir)
+    derived = derived_columns(store_dir)
+    if columns is None:
+        columns = base
+
+    missing = [c for c in columns if c not in base and c not in derived]
+    if missing:
+        raise KeyError(f"Không có cột trong columnar store: {missing}")
+
+    df = _read_arrow(_base_path(store_dir), [c for c in columns if c in base])
+    for column in columns:
+        if column not in base:
+            df[column] = _read_arrow(_derived_path(store_dir, column))[column].to_numpy()
+    return df[list(columns)]
+
+
+def write_column(name, values, store_dir=STORE_DIR):
+    """Lưu một cột dẫn xuất (cùng thứ tự dòng với base) vào derived/<name>.arrow"""
+    _require_arrow()
+    values = pd.Series(values).reset_index(drop=True)
+    expected = num_rows(store_dir)
+    if len(values) != expected:
+        raise ValueError(f"Cột '{name}' có {len(values)} dòng, base có {expected} dòng")
+
+    os.makedirs(os.path.join(store_dir, DERIVED_DIR), exist_ok=True)
+    table = pa.Table.from_pandas(values.to_frame(name), preserve_index=False)
+    with pa.OSFile(_derived_path(store_dir, name), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
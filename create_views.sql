@@ -0,0 +1,214 @@
+-- ========================================
+-- CREATE_VIEWS.sql
+-- ========================================
+-- Aggregate tables (materialized summary) + views cho báo cáo
+-- MySQL không có materialized view: các bảng AGG_* được refresh bởi ETL
+-- (aggregate_tables.refresh_aggregates: full sau full ETL, chỉ các nhóm bị ảnh hưởng sau incremental ETL)
+-- Chạy sau 05_mysql_populate_fact_table_fixed.sql
+
+USE ProductDW;
+
+-- AGG_Brand: theo brand
+DROP TABLE IF EXISTS AGG_Brand;
+CREATE TABLE AGG_Brand (
+    brand_id INT NOT NULL,
+    brand_name VARCHAR(255) NOT NULL,
+    product_count BIGINT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(24,2) NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    total_reviews BIGINT NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(20,2) NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    priced_count BIGINT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(24,2) NOT NULL DEFAULT 0,
+    min_price DECIMAL(15,2) NULL,
+    max_price DECIMAL(15,2) NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (brand_id),
+    INDEX idx_agg_brand_revenue (total_revenue, brand_name, product_count, total_quantity),
+    INDEX idx_agg_brand_count (product_count, brand_name)
+);
+
+-- AGG_Seller: theo seller
+DROP TABLE IF EXISTS AGG_Seller;
+CREATE TABLE AGG_Seller (
+    seller_id INT NOT NULL,
+    seller_name VARCHAR(255) NOT NULL,
+    product_count BIGINT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(24,2) NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    total_reviews BIGINT NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(20,2) NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    priced_count BIGINT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(24,2) NOT NULL DEFAULT 0,
+    min_price DECIMAL(15,2) NULL,
+    max_price DECIMAL(15,2) NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (seller_id),
+    INDEX idx_agg_seller_revenue (total_revenue, seller_name, product_count, total_quantity),
+    INDEX idx_agg_seller_count (product_count, seller_name)
+);
+
+-- AGG_Fulfillment: theo fulfillment
+DROP TABLE IF EXISTS AGG_Fulfillment;
+CREATE TABLE AGG_Fulfillment (
+    fulfillment_id INT NOT NULL,
+    fulfillment_type VARCHAR(255) NOT NULL,
+    product_count BIGINT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(24,2) NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    total_reviews BIGINT NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(20,2) NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    priced_count BIGINT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(24,2) NOT NULL DEFAULT 0,
+    min_price DECIMAL(15,2) NULL,
+    max_price DECIMAL(15,2) NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fulfillment_id),
+    INDEX idx_agg_fulfillment_revenue (total_revenue, fulfillment_type, product_count, total_quantity),
+    INDEX idx_agg_fulfillment_count (product_count, fulfillment_type)
+);
+
+-- AGG_Brand_Fulfillment: theo brand x fulfillment
+DROP TABLE IF EXISTS AGG_Brand_Fulfillment;
+CREATE TABLE AGG_Brand_Fulfillment (
+    brand_id INT NOT NULL,
+    brand_name VARCHAR(255) NOT NULL,
+    fulfillment_id INT NOT NULL,
+    fulfillment_type VARCHAR(255) NOT NULL,
+    product_count BIGINT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(24,2) NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    total_reviews BIGINT NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(20,2) NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    priced_count BIGINT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(24,2) NOT NULL DEFAULT 0,
+    min_price DECIMAL(15,2) NULL,
+    max_price DECIMAL(15,2) NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (brand_id, fulfillment_id),
+    INDEX idx_agg_brand_fulfillment_revenue (fulfillment_id, total_revenue, brand_name, fulfillment_type, product_count, total_quantity),
+    INDEX idx_agg_brand_fulfillment_count (fulfillment_id, product_count, brand_name, fulfillment_type)
+);
+
+-- Nạp dữ liệu lần đầu (full refresh)
+INSERT INTO AGG_Brand (
+    brand_id, brand_name,
+    product_count, total_revenue, total_quantity, total_reviews, rating_sum, rating_count, priced_count, price_sum, min_price, max_price
+)
+SELECT
+    f.brand_id,
+    d_brand.brand_name,
+    COUNT(*) AS product_count,
+    SUM(f.price * f.quantity_sold) AS total_revenue,
+    SUM(f.quantity_sold) AS total_quantity,
+    SUM(f.review_count) AS total_reviews,
+    SUM(f.rating_average) AS rating_sum,
+    COUNT(f.rating_average) AS rating_count,
+    SUM(f.price > 0) AS priced_count,
+    SUM(CASE WHEN f.price > 0 THEN f.price ELSE 0 END) AS price_sum,
+    MIN(CASE WHEN f.price > 0 THEN f.price END) AS min_price,
+    MAX(CASE WHEN f.price > 0 THEN f.price END) AS max_price
+FROM Fact_product_stats f
+INNER JOIN DIM_Brand d_brand ON d_brand.brand_id = f.brand_id
+GROUP BY f.brand_id, d_brand.brand_name;
+
+INSERT INTO AGG_Seller (
+    seller_id, seller_name,
+    product_count, total_revenue, total_quantity, total_reviews, rating_sum, rating_count, priced_count, price_sum, min_price, max_price
+)
+SELECT
+    f.seller_id,
+    d_seller.seller_name,
+    COUNT(*) AS product_count,
+    SUM(f.price * f.quantity_sold) AS total_revenue,
+    SUM(f.quantity_sold) AS total_quantity,
+    SUM(f.review_count) AS total_reviews,
+    SUM(f.rating_average) AS rating_sum,
+    COUNT(f.rating_average) AS rating_count,
+    SUM(f.price > 0) AS priced_count,
+    SUM(CASE WHEN f.price > 0 THEN f.price ELSE 0 END) AS price_sum,
+    MIN(CASE WHEN f.price > 0 THEN f.price END) AS min_price,
+    MAX(CASE WHEN f.price > 0 THEN f.price END) AS max_price
+FROM Fact_product_stats f
+INNER JOIN DIM_Seller d_seller ON d_seller.seller_id = f.seller_id
+GROUP BY f.seller_id, d_seller.seller_name;
+
+INSERT INTO AGG_Fulfillment (
+    fulfillment_id, fulfillment_type,
+    product_count, total_revenue, total_quantity, total_reviews, rating_sum, rating_count, priced_count, price_sum, min_price, max_price
+)
+SELECT
+    f.fulfillment_id,
+    d_fulfillment.fulfillment_type,
+    COUNT(*) AS product_count,
+    SUM(f.price * f.quantity_sold) AS total_revenue,
+    SUM(f.quantity_sold) AS total_quantity,
+    SUM(f.review_count) AS total_reviews,
+    SUM(f.rating_average) AS rating_sum,
+    COUNT(f.rating_average) AS rating_count,
+    SUM(f.price > 0) AS priced_count,
+    SUM(CASE WHEN f.price > 0 THEN f.price ELSE 0 END) AS price_sum,
+    MIN(CASE WHEN f.price > 0 THEN f.price END) AS min_price,
+    MAX(CASE WHEN f.price > 0 THEN f.price END) AS max_price
+FROM Fact_product_stats f
+INNER JOIN DIM_Fulfillment_Type d_fulfillment ON d_fulfillment.fulfillment_id = f.fulfillment_id
+GROUP BY f.fulfillment_id, d_fulfillment.fulfillment_type;
+
+INSERT INTO AGG_Brand_Fulfillment (
+    brand_id, brand_name, fulfillment_id, fulfillment_type,
+    product_count, total_revenue, total_quantity, total_reviews, rating_sum, rating_count, priced_count, price_sum, min_price, max_price
+)
+SELECT
+    f.brand_id,
+    d_brand.brand_name,
+    f.fulfillment_id,
+    d_fulfillment.fulfillment_type,
+    COUNT(*) AS product_count,
+    SUM(f.price * f.quantity_sold) AS total_revenue,
+    SUM(f.quantity_sold) AS total_quantity,
+    SUM(f.review_count) AS total_reviews,
+    SUM(f.rating_average) AS rating_sum,
+    COUNT(f.rating_average) AS rating_count,
+    SUM(f.price > 0) AS priced_count,
+    SUM(CASE WHEN f.price > 0 THEN f.price ELSE 0 END) AS price_sum,
+    MIN(CASE WHEN f.price > 0 THEN f.price END) AS min_price,
+    MAX(CASE WHEN f.price > 0 THEN f.price END) AS max_price
+FROM Fact_product_stats f
+INNER JOIN DIM_Brand d_brand ON d_brand.brand_id = f.brand_id
+INNER JOIN DIM_Fulfillment_Type d_fulfillment ON d_fulfillment.fulfillment_id = f.fulfillment_id
+GROUP BY f.brand_id, d_brand.brand_name, f.fulfillment_id, d_fulfillment.fulfillment_type;
+
+-- Views đọc từ aggregate (thêm các chỉ số trung bình)
+CREATE OR REPLACE VIEW vw_brand_summary AS
+SELECT brand_id, brand_name, product_count, total_revenue, total_quantity, total_reviews,
+       rating_sum / NULLIF(rating_count, 0) AS avg_rating,
+       price_sum / NULLIF(priced_count, 0) AS avg_price,
+       min_price, max_price
+FROM AGG_Brand;
+
+CREATE OR REPLACE VIEW vw_seller_summary AS
+SELECT seller_id, seller_name, product_count, total_revenue, total_quantity, total_reviews,
+       rating_sum / NULLIF(rating_count, 0) AS avg_rating,
+       price_sum / NULLIF(priced_count, 0) AS avg_price,
+       min_price, max_price
+FROM AGG_Seller;
+
+CREATE OR REPLACE VIEW vw_fulfillment_summary AS
+SELECT fulfillment_id, fulfillment_type, product_count, total_revenue, total_quantity, total_reviews,
+       rating_sum / NULLIF(rating_count, 0) AS avg_rating,
+       price_sum / NULLIF(priced_count, 0) AS avg_price,
+       min_price, max_price
+FROM AGG_Fulfillment;
+
+CREATE OR REPLACE VIEW vw_brand_fulfillment_summary AS
+SELECT brand_id, brand_name, fulfillment_id, fulfillment_type, product_count, total_revenue, total_quantity,
+       rating_sum / NULLIF(rating_count, 0) AS avg_rating,
+       price_sum / NULLIF(priced_count, 0) AS avg_price
+FROM AGG_Brand_Fulfillment;
+
+SELECT 'Aggregate Tables and Views created successfully!' as Status;
+SHOW TABLES LIKE 'AGG_%';
@@ -3,36 +3,255 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
+import argparse
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+import columnar_store
+import instrumentation
+from data_validation import Validator
+from instrumentation import peak_rss_mb
 
+INPUT_FILE = 'vietnamese_tiki_products_backpacks_suitcases.csv'
+OUTPUT_FILE = 'data/clean/products_clean.csv'
 
-df = pd.read_csv('vietnamese_tiki_products_backpacks_suitcases.csv')
+PRICE_BINS = [0, 100000, 500000, 2000000, float('inf')]
+PRICE_LABELS = ['<100k', '100k-500k', '500k-2M', '>2M']
 
-desc_stats = df.describe(include='all').T
-original_count = len(df)
-missing_data = df.isnull().sum()
-df = df.dropna(subset=['id', 'name', 'price'])
-df = df[df['price'] > 0]
-df = df[df['quantity_sold'] >= 0]
-df['brand'] = df['brand'].fillna('Unknown').str.lower().str.strip()
-df['current_seller'] = df['current_seller'].fillna('Unknown').str.lower().str.strip()
-df['fulfillment_type'] = df['fulfillment_type'].fillna('Unknown').str.lower().str.strip()
-df['discount_rate'] = np.where(
-	df['original_price'] > 0,
-	1 - df['price'] / df['original_price'],
-	0
-)
-bins = [0, 100000, 500000, 2000000, float('inf')]
-labels = ['<100k', '100k-500k', '500k-2M', '>2M']
-df['price_segment'] = pd.cut(df['price'], bins=bins, labels=labels)
+# Các cột phân loại: giữ value counts để tính top/freq khi thống kê online
+CATEGORICAL_COLUMNS = ['brand', 'current_seller', 'fulfillment_type', 'category']
+# Số hash nhỏ nhất giữ lại cho mỗi cột text (KMV sketch, sai số tương đối ~ 1/sqrt(K) ≈ 3%)
+DISTINCT_SKETCH_SIZE = 1024
+SUMMARY_COLUMNS = ['count', 'missing', 'unique', 'top', 'freq', 'mean', 'std', 'min', 'max']
 
-df['rating_average'] = df['rating_average'].astype(float)
-df['quantity_sold'] = df['quantity_sold'].astype(int)
 
-print("\n💾 BƯỚC 5: Xuất dữ liệu sạch")
-import os
-os.makedirs('data/clean', exist_ok=True)
-df.to_csv('data/clean/products_clean.csv', index=False, encoding='utf-8')
-print("✅ Đã xuất dữ liệu sạch ra 'data/clean/products_clean.csv'")
\ No newline at end of file
+def clean_chunk(df):
+	"""
+	Áp dụng các quy tắc làm sạch cho một DataFrame (toàn bộ file hoặc một chunk).
+	Dòng thiếu id/name/price, price <= 0, quantity_sold < 0, id trùng ... đã bị
+	data_validation.Validator loại (kèm mã lý do trong file quarantine) trước bước này.
+	"""
+	df = df.copy()
+	df['brand'] = df['brand'].fillna('Unknown').str.lower().str.strip()
+	df['current_seller'] = df['current_seller'].fillna('Unknown').str.lower().str.strip()
+	df['fulfillment_type'] = df['fulfillment_type'].fillna('Unknown').str.lower().str.strip()
+	df['discount_rate'] = np.where(
+		df['original_price'] > 0,
+		1 - df['price'] / df['original_price'],
+		0
+	)
+	df['price_segment'] = pd.cut(df['price'], bins=PRICE_BINS, labels=PRICE_LABELS)
+
+	df['rating_average'] = df['rating_average'].astype(float)
+	df['quantity_sold'] = df['quantity_sold'].astype(int)
+	return df
+
+
+class OnlineSummary:
+	"""
+	Thống kê mô tả tích lũy theo từng chunk (thay cho df.describe(include='all')
+	trên toàn bộ file): count, mean, std, min, max cho cột số (gộp mean/M2 theo
+	Chan et al.), count/unique/top/freq cho cột phân loại. Cột text dài (name,
+	description): unique ước lượng bằng KMV sketch kích thước cố định
+	(DISTINCT_SKETCH_SIZE hash nhỏ nhất) -> bộ nhớ không tăng theo số dòng.
+	"""
+
+	def __init__(self):
+		self.rows = 0
+		self.missing = None
+		self.numeric = {}
+		self.sketches = {}
+		self.text_counts = {}
+		self.value_counts = {}
+
+	def update(self, chunk):
+		self.rows += len(chunk)
+		missing = chunk.isnull().sum()
+		self.missing = missing if self.missing is None else self.missing.add(missing, fill_value=0)
+
+		for column in chunk.columns:
+			values = chunk[column]
+			if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+				self._update_numeric(column, values.dropna().to_numpy(dtype=float))
+			else:
+				self._update_text(column, values.dropna())
+
+	def _update_numeric(self, column, values):
+		n_b = len(values)
+		if n_b == 0:
+			return
+		mean_b = values.mean()
+		m2_b = ((values - mean_b) ** 2).sum()
+		stats = self.numeric.get(column)
+		if stats is None:
+			self.numeric[column] = {'count': n_b, 'mean': mean_b, 'm2': m2_b,
+			                        'min': values.min(), 'max': values.max()}
+			return
+		n_a = stats['count']
+		n = n_a + n_b
+		delta = mean_b - stats['mean']
+		stats['mean'] += delta * n_b / n
+		stats['m2'] += m2_b + delta ** 2 * n_a * n_b / n
+		stats['count'] = n
+		stats['min'] = min(stats['min'], values.min())
+		stats['max'] = max(stats['max'], values.max())
+
+	def _update_text(self, column, values):
+		if column in CATEGORICAL_COLUMNS or pd.api.types.is_bool_dtype(values):
+			counts = values.value_counts()
+			previous = self.value_counts.get(column)
+			self.value_counts[column] = counts if previous is None else previous.add(counts, fill_value=0)
+		else:
+			# Cột text dài (name, description): giữ K hash 64-bit nhỏ nhất (distinct)
+			hashes = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+			sketch = self.sketches.get(column, np.empty(0, dtype=np.uint64))
+			if len(sketch) == DISTINCT_SKETCH_SIZE:
+				hashes = hashes[hashes < sketch[-1]]
+			merged = np.sort(np.concatenate([sketch, hashes]))
+			if len(merged):
+				merged = merged[np.concatenate([[True], merged[1:] != merged[:-1]])]
+			self.sketches[column] = merged[:DISTINCT_SKETCH_SIZE]
+			self.text_counts[column] = self.text_counts.get(column, 0) + len(values)
+
+	@staticmethod
+	def estimate_distinct(sketch):
+		"""Số giá trị distinct: đếm chính xác nếu sketch chưa đầy, ngược lại (K-1) / (hash thứ K / 2^64)"""
+		if len(sketch) < DISTINCT_SKETCH_SIZE:
+			return len(sketch)
+		return int(round((DISTINCT_SKETCH_SIZE - 1) * 2.0 ** 64 / (float(sketch[-1]) + 1)))
+
+	def result(self):
+		"""Trả về DataFrame tương tự df.describe(include='all').T"""
+		rows = {}
+		for column, stats in self.numeric.items():
+			std = np.sqrt(stats['m2'] / (stats['count'] - 1)) if stats['count'] > 1 else np.nan
+			rows[column] = {'count': stats['count'], 'mean': stats['mean'], 'std': std,
+			                'min': stats['min'], 'max': stats['max']}
+		for column, counts in self.value_counts.items():
+			if len(counts):
+				rows[column] = {'count': counts.sum(), 'unique': len(counts),
+				                'top': counts.idxmax(), 'freq': counts.max()}
+		for column, sketch in self.sketches.items():
+			rows[column] = {'count': self.text_counts[column], 'unique': self.estimate_distinct(sketch)}
+		result = pd.DataFrame.from_dict(rows, orient='index')
+		if self.missing is not None:
+			result['missing'] = self.missing
+		return result
+
+
+def report_summary(desc_stats):
+	"""In thống kê mô tả của dữ liệu gốc (count / missing / unique / top / mean ... theo cột)"""
+	print("\n📊 Thống kê mô tả dữ liệu gốc")
+	table = desc_stats.reindex(columns=SUMMARY_COLUMNS)
+	table = table.dropna(axis=1, how='all')
+	for column in ('count', 'missing', 'unique', 'freq'):
+		if column in table:
+			values = pd.to_numeric(table[column], errors='coerce')
+			table[column] = [f'{value:,.0f}' if pd.notna(value) else '' for value in values]
+	if 'top' in table:
+		table['top'] = table['top'].astype(str).str.slice(0, 30)
+	with pd.option_context('display.width', 160, 'display.max_columns', None,
+	                       'display.float_format', '{:,.2f}'.format):
+		print(table.to_string(na_rep=''))
+
+
+def run_full(input_file=INPUT_FILE, output_file=OUTPUT_FILE, store_dir=columnar_store.STORE_DIR):
+	"""Làm sạch toàn bộ file trong bộ nhớ"""
+	with instrumentation.span('csv_read', bytes=os.path.getsize(input_file)) as span:
+		df = pd.read_csv(input_file)
+		span['rows'] = len(df)
+
+	with instrumentation.span('describe', rows=len(df)):
+		desc_stats = df.describe(include='all').T
+		desc_stats['missing'] = df.isnull().sum()
+		original_count = len(df)
+	validator = Validator(source=input_file)
+	with instrumentation.span('validate', rows=len(df)) as span:
+		df = validator.validate(df)
+		span['rejected'] = validator.rejected
+	validator.report()
+	with instrumentation.span('clean', rows=len(df)) as span:
+		df = clean_chunk(df)
+		span['rows_out'] = len(df)
+
+	print("\n💾 BƯỚC 5: Xuất dữ liệu sạch")
+	os.makedirs(os.path.dirname(output_file), exist_ok=True)
+	with instrumentation.span('write_csv', rows=len(df)) as span:
+		df.to_csv(output_file, index=False, encoding='utf-8')
+		span['bytes'] = os.path.getsize(output_file)
+	print(f"✅ Đã xuất dữ liệu sạch ra '{output_file}'")
+	if columnar_store.ARROW_AVAILABLE:
+		with instrumentation.span('columnar', rows=len(df)):
+			columnar_store.write_table(df, store_dir)
+		print(f"✅ Đã ghi columnar store '{store_dir}'")
+	return original_count, len(df), desc_stats
+
+
+def run_streaming(input_file=INPUT_FILE, output_file=OUTPUT_FILE, chunk_size=50000,
+                  store_dir=columnar_store.STORE_DIR):
+	"""
+	Làm sạch theo từng chunk, ghi nối tiếp ra file output.
+	Bộ nhớ chỉ phụ thuộc chunk_size (và tập id đã gặp để loại trùng giữa các chunk).
+	"""
+	summary = OnlineSummary()
+	validator = Validator(source=input_file)
+	original_count = 0
+	clean_count = 0
+
+	os.makedirs(os.path.dirname(output_file), exist_ok=True)
+	writer = columnar_store.ColumnarWriter(store_dir) if columnar_store.ARROW_AVAILABLE else None
+	print("\n💾 BƯỚC 5: Xuất dữ liệu sạch (streaming)")
+	for index, chunk in enumerate(pd.read_csv(input_file, chunksize=chunk_size)):
+		with instrumentation.span('chunk', rows=len(chunk), chunk=index) as span:
+			original_count += len(chunk)
+			summary.update(chunk)
+
+			# Dòng không hợp lệ / id trùng với chunk trước -> quarantine
+			chunk = clean_chunk(validator.validate(chunk, index))
+
+			chunk.to_csv(output_file, mode='w' if index == 0 else 'a', header=(index == 0),
+			             index=False, encoding='utf-8')
+			if writer is not None:
+				writer.write(chunk)
+			clean_count += len(chunk)
+			span['rows_out'] = len(chunk)
+
+	validator.report()
+	print(f"✅ Đã xuất dữ liệu sạch ra '{output_file}'")
+	if writer is not None:
+		writer.close()
+		print(f"✅ Đã ghi columnar store '{store_dir}'")
+	return original_count, clean_count, summary.result()
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Làm sạch dữ liệu sản phẩm Tiki')
+	parser.add_argument('--input', default=INPUT_FILE)
+	parser.add_argument('--output', default=OUTPUT_FILE)
+	parser.add_argument('--store-dir', default=columnar_store.STORE_DIR,
+	                    help='Thư mục columnar store (Arrow), cần pyarrow')
+	parser.add_argument('--chunk-size', type=int, default=None,
+	                    help='Bật chế độ streaming, xử lý N dòng mỗi lần')
+	instrumentation.add_arguments(parser)
+	args = parser.parse_args()
+	metrics = instrumentation.configure('data_preprocessing', args.metrics_dir, args.profile, args.trace_memory)
+
+	with metrics.span('preprocess', bytes=os.path.getsize(args.input)) as span:
+		if args.chunk_size:
+			original_count, clean_count, desc_stats = run_streaming(args.input, args.output, args.chunk_size,
+			                                                         args.store_dir)
+		else:
+			original_count, clean_count, desc_stats = run_full(args.input, args.output, args.store_dir)
+		span['rows'] = original_count
+
+	report_summary(desc_stats)
+	print(f"   {original_count:,} dòng gốc -> {clean_count:,} dòng sạch")
+	rss = peak_rss_mb()
+	if rss is not None:
+		print(f"   Peak RSS: {rss:,.1f} MB")
+	print(f"📏 Metrics: '{metrics.write()}'")
+
+
+if __name__ == "__main__":
+	main()
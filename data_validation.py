@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Data Validation
+Kiểm tra chất lượng dữ liệu khi ingest (data_preprocessing.py, run_etl_process.py, etl_pipeline.py):
+  - Luật khai báo theo cột trong RULES: required, kiểu (integer / number), khoảng giá trị
+    (price > 0, 0 <= rating_average <= 5 ...), tập giá trị cho phép (fulfillment_type), id duy nhất
+  - Mỗi luật là một mask NumPy trên cả chunk (không apply / iterrows), chi phí nhỏ so với đọc + nạp
+  - Dòng bị loại được ghi vào file quarantine (data/quarantine/rejected_rows.csv) kèm mã lý do
+    (vd. PRICE_OUT_OF_RANGE|RATING_AVERAGE_OUT_OF_RANGE), file nguồn, chunk và vị trí dòng
+  - id duy nhất được kiểm tra cả giữa các chunk (giữ bản ghi hợp lệ đầu tiên); id đã gặp lưu trong
+    SortedRuns (các đoạn đã sắp xếp, gộp theo kích thước gấp đôi) -> chi phí mỗi chunk không tăng
+    tuyến tính theo số dòng đã đọc
+
+Ví dụ:
+    validator = Validator(source='products.csv')
+    for chunk in pd.read_csv('products.csv', chunksize=50000):
+        valid = validator.validate(chunk)
+    validator.report()
+"""
+
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+QUARANTINE_FILE = 'data/quarantine/rejected_rows.csv'
+
+ALLOWED_FULFILLMENT_TYPES = ['dropship', 'tiki_delivery', 'seller_delivery']
+
+# Luật theo cột. Giá trị thiếu chỉ bị loại khi 'required';
+# 'normalize' = so sánh sau khi lower() + strip() (giống bước làm sạch)
+RULES = {
+    'id': {'required': True, 'type': 'integer', 'unique': True},
+    'name': {'required': True},
+    'price': {'required': True, 'type': 'number', 'min': 0, 'min_exclusive': True},
+    'original_price': {'type': 'number', 'min': 0},
+    'quantity_sold': {'required': True, 'type': 'integer', 'min': 0},
+    'rating_average': {'type': 'number', 'min': 0, 'max': 5},
+    'review_count': {'type': 'number', 'min': 0},
+    'favourite_count': {'type': 'number', 'min': 0},
+    'fulfillment_type': {'allowed': ALLOWED_FULFILLMENT_TYPES, 'normalize': True},
+}
+
+
+def reason_code(column, check):
+    return f'{column.upper()}_{check}'
+
+
+def _numeric(values):
+    """Cột dạng số (giá trị không chuyển được -> NaN), không copy nếu đã là số"""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+def column_failures(column, values, rule):
+    """{mã lý do: mask bool} của một cột theo luật (chưa tính unique)"""
+    failures = {}
+    missing = values.isna().to_numpy()
+    if rule.get('required'):
+        failures[reason_code(column, 'MISSING')] = missing
+
+    kind = rule.get('type')
+    if kind or 'min' in rule or 'max' in rule:
+        numbers = _numeric(values)
+        # Có giá trị nhưng không phải số
+        not_number = np.isnan(numbers) & ~missing
+        if kind == 'integer':
+            not_number |= np.isfinite(numbers) & (numbers != np.floor(numbers))
+        if kind:
+            failures[reason_code(column, 'NOT_' + kind.upper())] = not_number
+        out_of_range = np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            if 'min' in rule:
+                out_of_range |= numbers <= rule['min'] if rule.get('min_exclusive') else numbers < rule['min']
+            if 'max' in rule:
+                out_of_range |= numbers > rule['max']
+        failures[reason_code(column, 'OUT_OF_RANGE')] = out_of_range
+
+    if 'allowed' in rule:
+        # So sánh trên các giá trị distinct rồi trải lại theo mã factorize
+        codes, uniques = pd.factorize(values)
+        labels = pd.Index(uniques).astype(str)
+        if rule.get('normalize'):
+            labels = labels.str.lower().str.strip()
+        allowed = np.append(labels.isin(rule['allowed']), True)   # mã -1 (NaN) xét ở 'required'
+        failures[reason_code(column, 'NOT_ALLOWED')] = ~allowed[codes]
+    return failures
+
+
+class SortedRuns:
+    """
+    Tập số nguyên chỉ thêm: danh sách các đoạn đã sắp xếp, kích thước giảm dần.
+    Đoạn mới được gộp với đoạn trước khi đoạn trước không lớn hơn gấp đôi (giống đếm nhị phân)
+    -> mỗi id được gộp lại O(log N) lần, tra cứu = searchsorted trên O(log N) đoạn.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, values):
+        """Mask các giá trị đã có (values nên được sắp xếp tăng dần để tra nhanh)"""
+        found = np.zeros(len(values), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, values), len(run) - 1)
+            found |= run[pos] == values
+        return found
+
+    def add_sorted(self, values):
+        """Thêm mảng đã sắp xếp (không trùng với các giá trị đã có)"""
+        if not len(values):
+            return
+        self.runs.append(values)
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            # Gộp hai đoạn đã sắp xếp (timsort nhận ra 2 run -> tuyến tính theo kích thước hai đoạn)
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind='stable')
+
+
+class Validator:
+    """Áp dụng RULES cho từng chunk, ghi dòng bị loại vào quarantine"""
+
+    def __init__(self, rules=RULES, quarantine_file=QUARANTINE_FILE, source=None):
+        self.rules = rules
+        self.quarantine_file = quarantine_file
+        self.source = source
+        self.seen_ids = {column: SortedRuns() for column, rule in rules.items() if rule.get('unique')}
+        self.reasons = Counter()
+        self.rows = 0
+        self.rejected = 0
+        self.seconds = 0.0
+        self.chunks = 0
+        self._quarantine_started = False
+
+    def check(self, chunk):
+        """(mask dòng hợp lệ, {mã lý do: mask}) của một chunk"""
+        failures = {}
+        for column, rule in self.rules.items():
+            if column not in chunk.columns:
+                if rule.get('required'):
+                    failures[reason_code(column, 'MISSING')] = np.ones(len(chunk), dtype=bool)
+                continue
+            failures.update(column_failures(column, chunk[column], rule))
+
+        valid = np.ones(len(chunk), dtype=bool)
+        for mask in failures.values():
+            valid &= ~mask
+
+        # Unique: chỉ xét các dòng đã hợp lệ, trùng trong chunk hoặc với chunk trước -> loại
+        for column, seen in self.seen_ids.items():
+            if column not in chunk.columns:
+                continue
+            ids = np.zeros(len(chunk), dtype=np.int64)
+            ids[valid] = _numeric(chunk[column])[valid].astype(np.int64)
+            # Trùng trong chunk: sort ổn định, dòng đầu tiên của mỗi giá trị được giữ
+            candidates = np.flatnonzero(valid)
+            order = candidates[np.argsort(ids[candidates], kind='stable')]
+            sorted_ids = ids[order]
+            duplicate = np.zeros(len(chunk), dtype=bool)
+            duplicate[order[1:][sorted_ids[1:] == sorted_ids[:-1]]] = True
+            # Tra cứu theo thứ tự đã sắp xếp (searchsorted nhanh hơn nhiều với khóa tăng dần)
+            duplicate[order[seen.contains(sorted_ids)]] = True
+            failures[reason_code(column, 'DUPLICATE')] = duplicate
+            valid &= ~duplicate
+            seen.add_sorted(sorted_ids[~duplicate[order]])
+        return valid, failures
+
+    def validate(self, chunk, chunk_index=None):
+        """Trả về các dòng hợp lệ; dòng bị loại -> quarantine với mã lý do"""
+        start = time.perf_counter()
+        chunk_index = self.chunks if chunk_index is None else chunk_index
+        valid, failures = self.check(chunk)
+        rejected = ~valid
+        n_rejected = int(rejected.sum())
+        if n_rejected:
+            # Ghép mã lý do chỉ trên các dòng bị loại
+            reasons = np.full(n_rejected, '', dtype=object)
+            for code, mask in failures.items():
+                hit = mask[rejected]
+                if hit.any():
+                    self.reasons[code] += int(hit.sum())
+                    reasons[hit] = reasons[hit] + ('|' + code)
+            quarantined = chunk[rejected].copy()
+            quarantined.insert(0, '_row', self.rows + np.flatnonzero(rejected))
+            quarantined.insert(0, '_chunk', chunk_index)
+            quarantined.insert(0, '_source', self.source)
+            quarantined.insert(0, '_reason', [reason[1:] for reason in reasons])
+            self._quarantine(quarantined)
+            chunk = chunk[valid]
+
+        self.rows += len(valid)
+        self.rejected += n_rejected
+        self.chunks += 1
+        self.seconds += time.perf_counter() - start
+        return chunk
+
+    def _quarantine(self, rows):
+        os.makedirs(os.path.dirname(self.quarantine_file) or '.', exist_ok=True)
+        rows.to_csv(self.quarantine_file, mode='a' if self._quarantine_started else 'w',
+                    header=not self._quarantine_started, index=False, encoding='utf-8')
+        self._quarantine_started = True
+
+    def summary(self):
+        return {'rows': self.rows, 'rejected': self.rejected, 'valid': self.rows - self.rejected,
+                'seconds': self.seconds, 'reasons': dict(self.reasons.most_common()),
+                'quarantine_file': self.quarantine_file if self.rejected else None}
+
+    def report(self):
+        rate = self.rows / self.seconds if self.seconds > 0 else 0
+        print(f"🧪 Validation: {self.rows:,} dòng, loại {self.rejected:,} "
+              f"({self.seconds:.3f}s, {rate:,.0f} rows/sec)")
+        for code, count in self.reasons.most_common():
+            print(f"   {code:30}: {count:,}")
+        if self.rejected:
+            print(f"   Quarantine: '{self.quarantine_file}'")
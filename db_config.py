@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Cấu hình kết nối MySQL dùng chung
+Đọc từ biến môi trường / file .env (MYSQL_HOST, MYSQL_USER, ...),
+mặc định giống cấu hình cũ trong run_etl_process.py.
+"""
+
+import os
+
+import mysql.connector
+from mysql.connector import pooling
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', 'localhost'),
+    'port': int(os.getenv('MYSQL_PORT', '3306')),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DATABASE', 'ProductDW'),
+    'charset': 'utf8mb4',
+    'allow_local_infile': True,
+}
+
+
+def get_connection(**overrides):
+    """Mở một kết nối MySQL mới"""
+    return mysql.connector.connect(**{**DB_CONFIG, **overrides})
+
+
+def get_connection_pool(pool_size=4, pool_name='productdw_pool', **overrides):
+    """Tạo connection pool (tối đa 32 kết nối theo giới hạn của mysql-connector)"""
+    return pooling.MySQLConnectionPool(
+        pool_name=pool_name,
+        pool_size=min(max(pool_size, 1), 32),
+        pool_reset_session=True,
+        **{**DB_CONFIG, **overrides}
+    )
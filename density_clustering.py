@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Density Clustering (DBSCAN cho catalog lớn)
+Thay cho NearestNeighbors trên toàn bộ dữ liệu + DBSCAN của sklearn:
+  - estimate_eps      : k-distance chỉ tính cho một mẫu điểm (cây KD-tree dựng trên toàn bộ dữ liệu)
+  - ScalableDBSCAN    : region query theo từng chunk, song song (threads),
+                        không giữ toàn bộ danh sách láng giềng trong bộ nhớ;
+                        các cạnh core-core được gộp dần bằng connected components
+  - predict()         : gán điểm mới vào cluster đã có (core point gần nhất trong eps)
+                        mà không cần chạy lại toàn bộ
+  - sampled_silhouette: silhouette trên mẫu các điểm không phải noise
+
+Cluster của core point giống DBSCAN gốc; border point nằm trong eps của nhiều cluster
+được gán cho core point gần nhất (DBSCAN gốc phụ thuộc thứ tự duyệt).
+"""
+
+import os
+from functools import partial
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.metrics import silhouette_score
+from sklearn.neighbors import KDTree
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_SAMPLE_SIZE = 20000
+# Số cạnh tối đa giữ trong bộ nhớ trước khi gộp component
+MAX_PENDING_EDGES = 5000000
+
+
+def _count_neighbors(tree, X, eps, idx):
+    return tree.query_radius(X[idx], eps, count_only=True)
+
+
+def _chunks(n_rows, chunk_size):
+    return [np.arange(start, min(start + chunk_size, n_rows))
+            for start in range(0, n_rows, chunk_size)]
+
+
+def estimate_eps(X, n_neighbors=5, percentile=90, sample_size=DEFAULT_SAMPLE_SIZE,
+                 random_state=42, tree=None):
+    """
+    eps = percentile của khoảng cách tới láng giềng thứ n_neighbors (tính cả chính điểm đó,
+    giống NearestNeighbors(n_neighbors).kneighbors(X)), chỉ query cho một mẫu điểm.
+    """
+    X = np.asarray(X, dtype=float)
+    tree = tree or KDTree(X)
+    if sample_size and len(X) > sample_size:
+        rng = np.random.RandomState(random_state)
+        points = X[rng.choice(len(X), size=sample_size, replace=False)]
+    else:
+        points = X
+    distances, _ = tree.query(points, k=n_neighbors)
+    return float(np.percentile(distances[:, -1], percentile))
+
+
+class ScalableDBSCAN:
+    """DBSCAN dùng KD-tree, region query theo chunk song song, bộ nhớ giới hạn"""
+
+    def __init__(self, eps, min_samples=5, chunk_size=DEFAULT_CHUNK_SIZE, n_jobs=-1,
+                 leaf_size=40):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.leaf_size = leaf_size
+
+    def _parallel(self, func, chunks):
+        return Parallel(n_jobs=self.n_jobs, prefer='threads')(delayed(func)(idx) for idx in chunks)
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=float)
+        n_rows = len(X)
+        tree = KDTree(X, leaf_size=self.leaf_size)
+        chunks = _chunks(n_rows, self.chunk_size)
+
+        # 1. Đếm láng giềng trong eps (tính cả chính điểm đó) -> core points
+        counts = np.concatenate(self._parallel(partial(_count_neighbors, tree, X, self.eps), chunks))
+        core = counts >= self.min_samples
+        core_idx = np.flatnonzero(core)
+        del tree
+
+        # 2. Nối các core point trong eps của nhau (cây chỉ chứa core point),
+        #    gộp component theo từng đợt để không giữ toàn bộ cạnh trong bộ nhớ
+        self.core_sample_indices_ = core_idx
+        self.components_ = X[core_idx]
+        self._core_tree = KDTree(self.components_, leaf_size=self.leaf_size) if len(core_idx) else None
+        n_core = len(core_idx)
+        parent = np.arange(n_core)
+        pending, pending_size = [], 0
+
+        def core_edges(idx):
+            neighbors = self._core_tree.query_radius(self.components_[idx], self.eps)
+            src = np.repeat(idx, [len(n) for n in neighbors])
+            dst = np.concatenate(neighbors)
+            keep = src < dst
+            return np.stack([src[keep], dst[keep]])
+
+        core_chunks = _chunks(n_core, self.chunk_size)
+        batch_size = self._n_workers()
+        for start in range(0, len(core_chunks), batch_size):
+            for edges in self._parallel(core_edges, core_chunks[start:start + batch_size]):
+                # Chỉ giữ cạnh giữa các component khác nhau, rút gọn thành dạng hình sao
+                edges = _star_edges(parent[edges])
+                if edges.size:
+                    pending.append(edges)
+                    pending_size += edges.shape[1]
+            if pending_size > MAX_PENDING_EDGES:
+                parent = _merge_components(parent, pending)
+                pending, pending_size = [], 0
+        parent = _merge_components(parent, pending)
+
+        # 3. Đánh số cluster theo core point có chỉ số nhỏ nhất (giống thứ tự của DBSCAN gốc)
+        labels = np.full(n_rows, -1, dtype=np.intp)
+        self.core_labels_ = np.searchsorted(np.unique(parent), parent)
+        labels[core_idx] = self.core_labels_
+
+        # 4. Border point: gán theo core point gần nhất trong eps
+        border = np.flatnonzero(~core)
+        if len(border):
+            labels[border] = self.predict(X[border])
+        self.labels_ = labels
+        return self
+
+    def fit_predict(self, X):
+        return self.fit(X).labels_
+
+    def predict(self, X):
+        """Gán điểm (mới) vào cluster của core point gần nhất nếu nằm trong eps, ngược lại -1"""
+        X = np.asarray(X, dtype=float)
+        if self._core_tree is None:
+            return np.full(len(X), -1, dtype=np.intp)
+
+        def assign(idx):
+            distances, nearest = self._core_tree.query(X[idx], k=1)
+            result = self.core_labels_[nearest[:, 0]]
+            return np.where(distances[:, 0] <= self.eps, result, -1)
+
+        return np.concatenate(self._parallel(assign, _chunks(len(X), self.chunk_size)))
+
+    def _n_workers(self):
+        if self.n_jobs is None:
+            return 1
+        if self.n_jobs < 0:
+            return max((os.cpu_count() or 1) + 1 + self.n_jobs, 1)
+        return self.n_jobs
+
+
+def _star_edges(edges):
+    """
+    Rút gọn một tập cạnh thành các cạnh (điểm -> điểm nhỏ nhất trong component của nó):
+    cùng kết quả connected components nhưng số cạnh <= số điểm xuất hiện
+    """
+    edges = edges[:, edges[0] != edges[1]]
+    if edges.size == 0:
+        return edges
+    nodes, local = np.unique(edges.ravel(), return_inverse=True)
+    local = local.reshape(2, -1)
+    graph = coo_matrix((np.ones(local.shape[1], dtype=np.int32), (local[0], local[1])),
+                       shape=(len(nodes), len(nodes)))
+    _, component = connected_components(graph, directed=False)
+    # nodes đã sắp xếp tăng dần -> lần xuất hiện đầu tiên của mỗi component là điểm nhỏ nhất
+    _, first = np.unique(component, return_index=True)
+    star = np.stack([nodes, nodes[first][component]])
+    return star[:, star[0] != star[1]]
+
+
+def _merge_components(parent, pending):
+    """Gộp các cạnh đang chờ vào parent (mỗi điểm trỏ tới điểm nhỏ nhất trong component)"""
+    n_rows = len(parent)
+    linked = np.flatnonzero(parent != np.arange(n_rows))
+    edges = [np.stack([linked, parent[linked]])] + pending
+    edges = np.concatenate(edges, axis=1)
+    if edges.size == 0:
+        return parent
+    graph = coo_matrix((np.ones(edges.shape[1], dtype=np.int32), (edges[0], edges[1])),
+                       shape=(n_rows, n_rows))
+    _, component = connected_components(graph, directed=False)
+    representative = np.full(component.max() + 1, n_rows, dtype=np.intp)
+    np.minimum.at(representative, component, np.arange(n_rows))
+    return representative[component]
+
+
+def sampled_silhouette(X, labels, sample_size=DEFAULT_SAMPLE_SIZE, random_state=42):
+    """Silhouette trên các điểm không phải noise, tối đa sample_size điểm (None nếu < 2 cluster)"""
+    X = np.asarray(X)
+    labels = np.asarray(labels)
+    mask = labels != -1
+    if len(np.unique(labels[mask])) < 2:
+        return None
+    sample = sample_size if sample_size and mask.sum() > sample_size else None
+    return silhouette_score(X[mask], labels[mask], sample_size=sample, random_state=random_state)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Dimension Key Cache
+Cache name -> surrogate key (brand_id, seller_id, fulfillment_id) phía Python
+để gán khóa cho cả batch bằng pandas thay vì JOIN STAGING_Products với
+DIM_Brand / DIM_Seller trên biểu thức CASE ... TRIM(...).
+
+Cache được lưu ra file giữa các lần chạy và tự kiểm tra lại với MySQL
+bằng fingerprint (COUNT, MAX(id), BIT_XOR(CRC32(id:name))) của từng dimension.
+"""
+
+import os
+import pickle
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from bulk_loader import insert_values
+
+DEFAULT_CACHE_FILE = 'data/cache/dim_keys.pkl'
+
+FULFILLMENT_TYPES = ['dropship', 'tiki_delivery', 'seller_delivery']
+
+# (bảng, cột id, cột tên)
+DIMENSIONS = {
+    'brand': ('DIM_Brand', 'brand_id', 'brand_name'),
+    'seller': ('DIM_Seller', 'seller_id', 'seller_name'),
+    'fulfillment': ('DIM_Fulfillment_Type', 'fulfillment_id', 'fulfillment_type'),
+}
+
+FACT_COLUMNS = [
+    'product_id', 'brand_id', 'seller_id', 'fulfillment_id',
+    'price', 'quantity_sold', 'rating_average', 'review_count'
+]
+
+
+def _clean_names(series, default):
+    """TRIM + thay NULL/rỗng bằng giá trị mặc định (giống CASE trong SQL cũ)"""
+    names = series.astype(object).where(series.notna(), '').astype(str).str.strip()
+    # brand_name / seller_name là VARCHAR(255)
+    return names.where(names != '', default).str.slice(0, 255)
+
+
+def normalize_brand_names(series):
+    return _clean_names(series, 'Unknown')
+
+
+def normalize_seller_names(series):
+    return _clean_names(series, 'Unknown Seller')
+
+
+def normalize_fulfillment_types(series):
+    values = series.astype(object).where(series.notna(), '').astype(str)
+    return values.where(values.isin(FULFILLMENT_TYPES), 'unknown')
+
+
+def name_key(name):
+    """
+    Khóa so sánh gần với collation utf8mb4_unicode_ci của MySQL
+    (không phân biệt hoa/thường và dấu)
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold().rstrip()
+
+
+class DimensionKeyCache:
+    """Cache name -> surrogate key cho DIM_Brand, DIM_Seller, DIM_Fulfillment_Type"""
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE):
+        self.cache_file = cache_file
+        self.keys = {dim: {} for dim in DIMENSIONS}
+        self.fingerprints = {}
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Đồng bộ với MySQL
+    # ------------------------------------------------------------------
+    def _fingerprint(self, cursor, dim):
+        table, id_col, name_col = DIMENSIONS[dim]
+        cursor.execute(f'''
+        SELECT COUNT(*), IFNULL(MAX({id_col}), 0),
+               IFNULL(BIT_XOR(CRC32(CONCAT({id_col}, ':', {name_col}))), 0)
+        FROM {table}
+        ''')
+        return tuple(int(v) for v in cursor.fetchone())
+
+    def _reload(self, cursor, dim):
+        table, id_col, name_col = DIMENSIONS[dim]
+        cursor.execute(f'SELECT {id_col}, {name_col} FROM {table}')
+        self.keys[dim] = {name_key(name): key_id for key_id, name in cursor.fetchall()}
+        self.fingerprints[dim] = self._fingerprint(cursor, dim)
+
+    def load_file(self):
+        """Chỉ nạp cache từ file (không kiểm tra với MySQL); False nếu không có / hỏng"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'rb') as f:
+                    saved = pickle.load(f)
+                self.keys = saved['keys']
+                self.fingerprints = saved['fingerprints']
+                return True
+            except (OSError, pickle.UnpicklingError, KeyError, EOFError):
+                pass
+        self.keys = {dim: {} for dim in DIMENSIONS}
+        self.fingerprints = {}
+        return False
+
+    def load(self, cursor):
+        """Nạp cache từ file nếu còn khớp với MySQL, ngược lại đọc lại dimension"""
+        self.load_file()
+        reloaded = []
+        for dim in DIMENSIONS:
+            if self.fingerprints.get(dim) != self._fingerprint(cursor, dim):
+                self._reload(cursor, dim)
+                reloaded.append(dim)
+        return reloaded
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        with open(self.cache_file, 'wb') as f:
+            pickle.dump({'keys': self.keys, 'fingerprints': self.fingerprints}, f)
+
+    def invalidate(self):
+        """Xóa cache (gọi khi dimension bị TRUNCATE trong full ETL)"""
+        self.keys = {dim: {} for dim in DIMENSIONS}
+        self.fingerprints = {}
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def _insert_unseen(self, cursor, dim, names):
+        """Thêm các tên chưa có vào dimension (1 câu INSERT nhiều dòng) rồi lấy lại id"""
+        table, id_col, name_col = DIMENSIONS[dim]
+        matrix = np.array(names, dtype=object).reshape(-1, 1)
+        insert_values(cursor, table, [name_col], matrix, ignore=True)
+
+        mapping = self.keys[dim]
+        for start in range(0, len(names), 1000):
+            batch = names[start:start + 1000]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'SELECT {id_col}, {name_col} FROM {table} WHERE {name_col} IN ({placeholders})',
+                batch)
+            for key_id, name in cursor.fetchall():
+                mapping[name_key(name)] = key_id
+
+        # Trường hợp hiếm: collation MySQL gộp 2 tên mà name_key() phân biệt
+        for name in names:
+            if name_key(name) not in mapping:
+                cursor.execute(f'SELECT {id_col} FROM {table} WHERE {name_col} = %s', (name,))
+                row = cursor.fetchone()
+                if row:
+                    mapping[name_key(name)] = row[0]
+
+        self.fingerprints[dim] = self._fingerprint(cursor, dim)
+
+    def _resolve_dim(self, cursor, dim, names):
+        """Gán id cho một cột tên: chỉ tra cứu trên các giá trị distinct"""
+        codes, uniques = pd.factorize(names)
+        mapping = self.keys[dim]
+        unique_keys = [name_key(n) for n in uniques]
+        unseen = [n for n, k in zip(uniques, unique_keys) if k not in mapping]
+
+        self.misses += len(unseen)
+        self.hits += len(uniques) - len(unseen)
+        if unseen:
+            self._insert_unseen(cursor, dim, unseen)
+
+        lookup = np.array([mapping.get(k, -1) for k in unique_keys], dtype=np.int64)
+        return lookup[codes]
+
+    def resolve(self, cursor, df):
+        """
+        Gán brand_id, seller_id, fulfillment_id cho toàn bộ batch.
+        Tên chưa có trong dimension sẽ được thêm vào theo lô.
+        """
+        return pd.DataFrame({
+            'brand_id': self._resolve_dim(cursor, 'brand', normalize_brand_names(df['brand'])),
+            'seller_id': self._resolve_dim(cursor, 'seller',
+                                           normalize_seller_names(df['current_seller'])),
+            'fulfillment_id': self._resolve_dim(cursor, 'fulfillment',
+                                                normalize_fulfillment_types(df['fulfillment_type'])),
+        }, index=df.index)
+
+
+def build_fact_matrix(df, keys):
+    """Ghép measures với surrogate key thành ma trận để INSERT vào Fact_product_stats"""
+    fact = pd.DataFrame({
+        'product_id': df['id'],
+        'brand_id': keys['brand_id'],
+        'seller_id': keys['seller_id'],
+        'fulfillment_id': keys['fulfillment_id'],
+        'price': df['price'].fillna(0),
+        'quantity_sold': df['quantity_sold'].fillna(0),
+        'rating_average': df['rating_average'].fillna(0.0),
+        'review_count': df['review_count'].fillna(0),
+    })
+    fact = fact[(fact['brand_id'] > 0) & (fact['seller_id'] > 0) & (fact['fulfillment_id'] > 0)]
+    return fact[FACT_COLUMNS].to_numpy(dtype=object)
+
+
+def insert_fact_rows(cursor, df, keys):
+    """INSERT Fact_product_stats theo batch VALUES nhiều dòng với khóa đã gán sẵn"""
+    matrix = build_fact_matrix(df, keys)
+    insert_values(cursor, 'Fact_product_stats', FACT_COLUMNS, matrix)
+    return len(matrix)
+
+
+def read_staging_for_fact(cursor):
+    """Đọc các cột cần cho fact từ STAGING_Products (khi không có DataFrame CSV)"""
+    columns = ['id', 'brand', 'current_seller', 'fulfillment_type',
+               'price', 'quantity_sold', 'rating_average', 'review_count']
+    cursor.execute(f"SELECT {', '.join(columns)} FROM STAGING_Products WHERE id IS NOT NULL")
+    return pd.DataFrame(cursor.fetchall(), columns=columns)
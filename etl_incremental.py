@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Incremental (Delta) ETL
+Thay vì TRUNCATE và nạp lại toàn bộ Fact/Dimension, so sánh snapshot hiện tại
+với trạng thái lần ETL trước (ETL_Product_State) theo product id + content hash,
+rồi chỉ upsert các sản phẩm mới / thay đổi và xóa các sản phẩm đã biến mất.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregate_tables import fact_keys_for_products, refresh_aggregates
+from bulk_loader import STAGING_COLUMNS, insert_values, prepare_staging_frame
+from dim_key_cache import DimensionKeyCache, insert_fact_rows
+
+# Các cột dùng để tính content hash (bỏ row_index vì chỉ là số thứ tự dòng trong file)
+HASH_COLUMNS = [c for c in STAGING_COLUMNS if c != 'row_index']
+
+STATE_TABLES_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS ETL_Product_State (
+        product_id BIGINT PRIMARY KEY,
+        content_hash BIGINT UNSIGNED NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS ETL_Watermark (
+        watermark_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        mode VARCHAR(20) NOT NULL,
+        snapshot_hash BIGINT UNSIGNED NOT NULL,
+        total_products INT DEFAULT 0,
+        inserted_count INT DEFAULT 0,
+        updated_count INT DEFAULT 0,
+        deleted_count INT DEFAULT 0,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+
+def ensure_state_tables(cursor):
+    """Tạo các bảng trạng thái nếu chưa có (giống 06_mysql_create_etl_state_tables.sql)"""
+    for ddl in STATE_TABLES_DDL:
+        cursor.execute(ddl)
+
+
+def compute_content_hashes(df):
+    """
+    Tính content hash 64-bit cho từng sản phẩm (vectorized, không lặp từng dòng).
+    Trả về DataFrame [product_id, content_hash], mỗi id một dòng (giữ bản ghi cuối).
+    """
+    frame = prepare_staging_frame(df)
+    frame = frame[frame['id'].notna()].drop_duplicates(subset='id', keep='last')
+
+    # Chuẩn hóa kiểu dữ liệu để hash ổn định giữa các lần chạy
+    # (int/float/bool -> float64, text -> str)
+    normalized = pd.DataFrame(index=frame.index)
+    for column in HASH_COLUMNS:
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            normalized[column] = values.astype('float64')
+        else:
+            normalized[column] = values.astype(object).where(values.notna(), '').astype(str)
+
+    hashes = pd.util.hash_pandas_object(normalized, index=False).to_numpy(dtype=np.uint64)
+    return pd.DataFrame({
+        'product_id': frame['id'].astype('int64').to_numpy(),
+        'content_hash': hashes,
+    })
+
+
+def snapshot_hash(hashes):
+    """Hash của toàn bộ snapshot (không phụ thuộc thứ tự dòng)"""
+    combined = pd.util.hash_array(hashes['product_id'].to_numpy()) ^ hashes['content_hash'].to_numpy()
+    return int(np.add.reduce(combined, dtype=np.uint64))
+
+
+def load_previous_state(cursor):
+    """Đọc trạng thái product_id -> content_hash của lần ETL trước"""
+    cursor.execute('SELECT product_id, content_hash FROM ETL_Product_State')
+    rows = cursor.fetchall()
+    if not rows:
+        return pd.DataFrame({'product_id': np.array([], dtype='int64'),
+                             'content_hash': np.array([], dtype=np.uint64)})
+    previous = pd.DataFrame(rows, columns=['product_id', 'content_hash'])
+    return previous.astype({'product_id': 'int64', 'content_hash': np.uint64})
+
+
+def last_snapshot_hash(cursor):
+    """snapshot_hash của lần ETL gần nhất (None nếu chưa có)"""
+    cursor.execute('SELECT snapshot_hash FROM ETL_Watermark ORDER BY watermark_id DESC LIMIT 1')
+    row = cursor.fetchone()
+    return int(row[0]) if row else None
+
+
+def diff_snapshot(current, previous):
+    """
+    So sánh snapshot hiện tại với trạng thái trước.
+    Trả về dict các mảng id: new, changed, deleted
+    """
+    in_previous = current['product_id'].isin(previous['product_id'])
+    in_current = previous['product_id'].isin(current['product_id'])
+
+    both = current[in_previous].merge(previous, on='product_id', suffixes=('', '_prev'))
+    changed = both['content_hash'] != both['content_hash_prev']
+    return {
+        'new': current.loc[~in_previous, 'product_id'].to_numpy(dtype='int64'),
+        'changed': both.loc[changed, 'product_id'].to_numpy(dtype='int64'),
+        'deleted': previous.loc[~in_current, 'product_id'].to_numpy(dtype='int64'),
+    }
+
+
+def _load_id_table(cursor, table, ids):
+    """Tạo bảng tạm chứa danh sách product_id để JOIN"""
+    cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS {table}')
+    cursor.execute(f'CREATE TEMPORARY TABLE {table} (product_id BIGINT PRIMARY KEY)')
+    if len(ids):
+        insert_values(cursor, table, ['product_id'], ids.astype(object).reshape(-1, 1))
+
+
+def apply_delta(cursor, delta, df, cache):
+    """
+    Áp dụng delta lên Fact_product_stats và các dimension.
+    Trả về DataFrame khóa dimension của các dòng fact bị xóa / thêm (để refresh aggregate)
+    """
+    upsert_ids = np.concatenate([delta['new'], delta['changed']])
+    # Id 'mới' cũng được xóa trước (idempotent): ETL_Product_State có thể rỗng / lệch so với Fact
+    # (full load trước khi có bảng state, nạp bằng quick_setup.sql / etl_process.sql ...)
+    # -> không nhân đôi dòng fact đã có
+    remove_ids = np.concatenate([delta['new'], delta['changed'], delta['deleted']])
+
+    _load_id_table(cursor, 'ETL_Remove_Ids', remove_ids)
+    touched = [fact_keys_for_products(cursor, 'ETL_Remove_Ids')]
+
+    # Xóa fact của sản phẩm mới / thay đổi / đã bị xóa
+    cursor.execute('''
+    DELETE f FROM Fact_product_stats f
+    INNER JOIN ETL_Remove_Ids r ON r.product_id = f.product_id
+    ''')
+
+    cursor.execute('''
+    INSERT IGNORE INTO DIM_Fulfillment_Type (fulfillment_type, description)
+    VALUES
+        ('dropship', 'Dropshipping fulfillment'),
+        ('tiki_delivery', 'Tiki delivery'),
+        ('seller_delivery', 'Seller delivery'),
+        ('unknown', 'Unknown fulfillment')
+    ''')
+
+    # Dimension + Fact: chỉ các sản phẩm mới / thay đổi, khóa gán bằng cache
+    upsert_df = df[df['id'].isin(upsert_ids)]
+    if len(upsert_df):
+        keys = cache.resolve(cursor, upsert_df)
+        insert_fact_rows(cursor, upsert_df, keys)
+        touched.append(keys[['brand_id', 'seller_id', 'fulfillment_id']])
+
+    # Cập nhật trạng thái
+    cursor.execute('''
+    DELETE s FROM ETL_Product_State s
+    INNER JOIN ETL_Remove_Ids r ON r.product_id = s.product_id
+    ''')
+
+    cursor.execute('DROP TEMPORARY TABLE IF EXISTS ETL_Remove_Ids')
+    return pd.concat(touched, ignore_index=True).drop_duplicates()
+
+
+def save_state(cursor, hashes, full=False):
+    """Ghi content hash vào ETL_Product_State (full=True: thay toàn bộ bảng)"""
+    if full:
+        cursor.execute('TRUNCATE TABLE ETL_Product_State')
+    if len(hashes):
+        matrix = hashes[['product_id', 'content_hash']].to_numpy(dtype=object)
+        insert_values(cursor, 'ETL_Product_State', ['product_id', 'content_hash'], matrix,
+                      suffix=' ON DUPLICATE KEY UPDATE content_hash = VALUES(content_hash)')
+
+
+def record_watermark(cursor, mode, snap_hash, total, inserted=0, updated=0, deleted=0):
+    """Ghi một dòng watermark cho lần ETL vừa áp dụng"""
+    cursor.execute('''
+    INSERT INTO ETL_Watermark
+        (mode, snapshot_hash, total_products, inserted_count, updated_count, deleted_count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ''', (mode, snap_hash, int(total), int(inserted), int(updated), int(deleted)))
+
+
+def record_version_bump(cursor, mode, total=0, updated=0):
+    """
+    Ghi watermark cho thay đổi không đến từ snapshot CSV (vd. chấm điểm predicted_revenue):
+    giữ nguyên snapshot_hash của lần trước để incremental không coi là snapshot mới,
+    chỉ tăng watermark_id (= version mà cache kết quả truy vấn dùng)
+    """
+    ensure_state_tables(cursor)
+    record_watermark(cursor, mode, last_snapshot_hash(cursor) or 0, total, updated=updated)
+
+
+def record_full_snapshot(connection, df):
+    """Sau một lần full ETL: lưu lại toàn bộ hash để lần incremental sau so sánh"""
+    save_full_snapshot(connection, compute_content_hashes(df))
+
+
+def record_unhashed_snapshot(connection, product_ids):
+    """
+    Full ETL nạp lại từ STAGING_Products (không có DataFrame CSV để tính content hash):
+    lưu các product id với content_hash = 0 (chưa biết) và ghi watermark 'full' như thường
+    -> version warehouse vẫn tăng; lần incremental sau coi mọi id còn trong CSV là thay đổi
+    và xóa các id không còn
+    """
+    ids = pd.unique(pd.Series(product_ids, dtype='Int64').dropna()).astype('int64')
+    save_full_snapshot(connection, pd.DataFrame({'product_id': ids,
+                                                 'content_hash': np.zeros(len(ids), dtype=np.uint64)}))
+
+
+def save_full_snapshot(connection, hashes):
+    """Ghi hash đã tính sẵn (ví dụ gộp từ nhiều partition) làm trạng thái full"""
+    hashes = hashes.drop_duplicates(subset='product_id', keep='last')
+    cursor = connection.cursor()
+    ensure_state_tables(cursor)
+    save_state(cursor, hashes, full=True)
+    record_watermark(cursor, 'full', snapshot_hash(hashes), len(hashes), inserted=len(hashes))
+    connection.commit()
+    cursor.close()
+
+
+def run_incremental_etl(connection, df):
+    """
+    Chạy incremental ETL cho snapshot df (STAGING_Products đã được nạp df).
+    Trả về dict thống kê: new, changed, deleted, unchanged, seconds
+    và 'delta' (mảng id new / changed / deleted) nếu snapshot có thay đổi
+    """
+    start = time.perf_counter()
+    cursor = connection.cursor(buffered=True)
+    ensure_state_tables(cursor)
+
+    hashes = compute_content_hashes(df)
+    snap_hash = snapshot_hash(hashes)
+
+    stats = {'new': 0, 'changed': 0, 'deleted': 0, 'unchanged': len(hashes)}
+    if snap_hash == last_snapshot_hash(cursor):
+        # Snapshot không đổi so với lần trước -> không cần làm gì
+        cursor.close()
+        stats['seconds'] = time.perf_counter() - start
+        return stats
+
+    previous = load_previous_state(cursor)
+    delta = diff_snapshot(hashes, previous)
+
+    # Cache khóa dimension được giữ giữa các lần incremental
+    cache = DimensionKeyCache()
+    cache.load(cursor)
+    touched = apply_delta(cursor, delta, df, cache)
+    refresh_aggregates(cursor, touched)
+    upsert_ids = np.concatenate([delta['new'], delta['changed']])
+    save_state(cursor, hashes[hashes['product_id'].isin(upsert_ids)])
+    record_watermark(cursor, 'incremental', snap_hash, len(hashes),
+                     inserted=len(delta['new']), updated=len(delta['changed']),
+                     deleted=len(delta['deleted']))
+    connection.commit()
+    cache.save()
+    cursor.close()
+
+    stats = {
+        'new': len(delta['new']),
+        'changed': len(delta['changed']),
+        'deleted': len(delta['deleted']),
+        'unchanged': len(hashes) - len(delta['new']) - len(delta['changed']),
+        'seconds': time.perf_counter() - start,
+        'delta': delta,
+    }
+    return stats
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Parallel ETL Pipeline
+Chạy ETL theo từng stage, chia CSV thành nhiều partition:
+  1. prepare    : TRUNCATE bảng đích (1 lần)
+  2. stage      : validate (data_validation) + làm sạch + nạp STAGING_Products song song bằng process pool
+  3. dimensions : gán surrogate key / populate dimension 1 lần (dim_key_cache)
+  4. fact       : nạp Fact_product_stats song song theo partition qua connection pool
+  5. aggregates : tính lại các bảng AGG_* (aggregate_tables)
+  6. snapshot   : lưu content hash cho incremental ETL
+  7. fact_store : dựng lại snapshot fact_store.py (nếu đang dùng)
+  8. verify     : kiểm tra kết quả
+Mỗi stage là một span của instrumentation (thời gian, số dòng, RSS), in ra và ghi vào data/metrics
+để thấy catalog lớn tốn thời gian ở đâu.
+
+Cách dùng:
+    python etl_pipeline.py --chunk-size 50000 --workers 4 --fact-workers 4
+    python etl_pipeline.py --profile                 # thêm cProfile hot path vào metrics
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from aggregate_tables import refresh_aggregates
+from bulk_loader import STAGING_COLUMNS, TEXT_COLUMNS, bulk_load_staging, prepare_staging_frame
+from db_config import get_connection, get_connection_pool
+from dim_key_cache import DimensionKeyCache, insert_fact_rows
+from data_validation import Validator
+from etl_incremental import compute_content_hashes, save_full_snapshot
+from fact_store import refresh_snapshot
+
+CSV_FILE = 'vietnamese_tiki_products_backpacks_suitcases.csv'
+DEFAULT_CHUNK_SIZE = 50000
+
+FACT_SOURCE_COLUMNS = [
+    'id', 'brand', 'current_seller', 'fulfillment_type',
+    'price', 'quantity_sold', 'rating_average', 'review_count'
+]
+
+NUMERIC_COLUMNS = [c for c in STAGING_COLUMNS if c not in TEXT_COLUMNS]
+
+
+# ----------------------------------------------------------------------
+# Worker process: làm sạch + stage một partition
+# ----------------------------------------------------------------------
+_worker_connection = None
+
+
+def _init_worker():
+    """Mỗi worker process giữ một kết nối MySQL riêng trong suốt vòng đời"""
+    global _worker_connection
+    _worker_connection = get_connection()
+
+
+def clean_partition(chunk):
+    """Chuẩn hóa cột và ép kiểu số (giá trị lỗi -> NULL) trước khi stage"""
+    frame = prepare_staging_frame(chunk)
+    for column in NUMERIC_COLUMNS:
+        values = frame[column]
+        if not (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)):
+            frame[column] = pd.to_numeric(values, errors='coerce')
+    return frame
+
+
+def stage_partition(index, chunk):
+    """Chạy trong worker: làm sạch, nạp staging, tính hash, trả về cột cần cho fact"""
+    start = time.perf_counter()
+    frame = clean_partition(chunk)
+    stats = bulk_load_staging(_worker_connection, frame, truncate=False)
+    return {
+        'partition': index,
+        'rows': stats['rows'],
+        'seconds': time.perf_counter() - start,
+        'method': stats['method'],
+        'fact_source': frame.loc[frame['id'].notna(), FACT_SOURCE_COLUMNS],
+        'hashes': compute_content_hashes(frame),
+    }
+
+
+# ----------------------------------------------------------------------
+# Fact partition: chạy trong thread, lấy kết nối từ pool
+# ----------------------------------------------------------------------
+def load_fact_partition(pool, fact_df, keys):
+    connection = pool.get_connection()
+    try:
+        cursor = connection.cursor()
+        rows = insert_fact_rows(cursor, fact_df, keys)
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()  # trả kết nối về pool
+    return rows
+
+
+def run_pipeline(csv_file=CSV_FILE, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, fact_workers=4,
+                 metrics=None):
+    workers = workers or os.cpu_count() or 1
+    metrics = metrics or instrumentation.current()
+
+    connection = get_connection()
+    cursor = connection.cursor(buffered=True)
+
+    with metrics.span('prepare', echo=True):
+        cursor.execute('SET FOREIGN_KEY_CHECKS = 0')
+        for table in ['STAGING_Products', 'Fact_product_stats',
+                      'DIM_Brand', 'DIM_Seller', 'DIM_Fulfillment_Type']:
+            cursor.execute(f'TRUNCATE TABLE {table}')
+        cursor.execute('''
+        INSERT INTO DIM_Fulfillment_Type (fulfillment_type, description)
+        VALUES
+            ('dropship', 'Dropshipping fulfillment'),
+            ('tiki_delivery', 'Tiki delivery'),
+            ('seller_delivery', 'Seller delivery'),
+            ('unknown', 'Unknown fulfillment')
+        ''')
+        cursor.execute('SET FOREIGN_KEY_CHECKS = 1')
+        connection.commit()
+
+    fact_parts, hash_parts = [], []
+    validator = Validator(source=csv_file)
+    with metrics.span('stage', bytes=os.path.getsize(csv_file), echo=True) as record:
+        # Giới hạn số partition đang xử lý để không đọc cả file vào RAM
+        max_in_flight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            pending = set()
+            reader = pd.read_csv(csv_file, chunksize=chunk_size)
+            for index, chunk in enumerate(reader):
+                # Validate ở process chính (vector hóa, rẻ) để kiểm tra id trùng giữa các partition
+                chunk = validator.validate(chunk, index)
+                pending.add(executor.submit(stage_partition, index, chunk))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _collect_partition(future.result(), record, fact_parts, hash_parts, metrics)
+            for future in pending:
+                _collect_partition(future.result(), record, fact_parts, hash_parts, metrics)
+        record['rejected'] = validator.rejected
+    validator.report()
+
+    # Partition hoàn thành không theo thứ tự -> sắp xếp lại theo thứ tự trong file
+    fact_parts = [part for _, part in sorted(fact_parts, key=lambda p: p[0])]
+    hash_parts = [part for _, part in sorted(hash_parts, key=lambda p: p[0])]
+    fact_source = pd.concat(fact_parts, ignore_index=True) if fact_parts else \
+        pd.DataFrame(columns=FACT_SOURCE_COLUMNS)
+
+    with metrics.span('dimensions', echo=True) as record:
+        cache = DimensionKeyCache()
+        cache.invalidate()
+        cache.load(cursor)
+        keys = cache.resolve(cursor, fact_source)
+        connection.commit()
+        cache.save()
+        record['rows'] = len(fact_source)
+
+    with metrics.span('fact', echo=True) as record:
+        pool = get_connection_pool(pool_size=fact_workers, pool_name='etl_fact_pool')
+        splits = np.array_split(np.arange(len(fact_source)), max(fact_workers, 1))
+        with ThreadPoolExecutor(max_workers=fact_workers) as executor:
+            futures = [
+                executor.submit(load_fact_partition, pool,
+                                fact_source.iloc[idx], keys.iloc[idx])
+                for idx in splits if len(idx)
+            ]
+            record['rows'] = sum(f.result() for f in futures)
+
+    with metrics.span('aggregates', echo=True) as record:
+        record['rows'] = sum(refresh_aggregates(cursor).values())
+        connection.commit()
+
+    with metrics.span('snapshot', echo=True) as record:
+        hashes = pd.concat(hash_parts, ignore_index=True) if hash_parts else None
+        if hashes is not None:
+            save_full_snapshot(connection, hashes)
+            record['rows'] = len(hashes)
+
+    with metrics.span('fact_store', echo=True) as record:
+        store = refresh_snapshot(cursor)
+        record['rows'] = len(store) if store is not None else 0
+
+    with metrics.span('verify', echo=True):
+        from run_etl_process import verify_etl_results
+        verify_etl_results(cursor, validation=validator.summary())
+
+    cursor.close()
+    connection.close()
+    metrics.report()
+    return metrics.top_level()
+
+
+def _collect_partition(result, record, fact_parts, hash_parts, metrics):
+    record['rows'] += result['rows']
+    metrics.record('partition', result['seconds'], rows=result['rows'],
+                   partition=result['partition'], method=result['method'])
+    fact_parts.append((result['partition'], result['fact_source']))
+    hash_parts.append((result['partition'], result['hashes']))
+    print(f"   Partition {result['partition']}: {result['rows']:,} rows, "
+          f"{result['seconds']:.2f}s ({result['method']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel ETL pipeline CSV -> ProductDW')
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Số dòng mỗi partition')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Số process làm sạch + stage (mặc định = số CPU)')
+    parser.add_argument('--fact-workers', type=int, default=4,
+                        help='Số kết nối song song khi nạp fact')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    metrics = instrumentation.configure('etl_pipeline', args.metrics_dir, args.profile, args.trace_memory)
+
+    print("🏗️  PARALLEL ETL PIPELINE")
+    print("=" * 60)
+    try:
+        run_pipeline(args.csv, args.chunk_size, args.workers, args.fact_workers, metrics)
+    finally:
+        print(f"📏 Metrics: '{metrics.write()}'")
+    print("🎉 HOÀN THÀNH ETL PIPELINE!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Fact Store
+Bản sao chỉ đọc, gọn trong bộ nhớ của Fact_product_stats + các dimension để phục vụ
+dashboard / API ngay trong process (không phải truy vấn MySQL, không giữ DataFrame có cột text):
+  - Measure là mảng NumPy có kiểu cố định: price float64, quantity_sold / review_count int32,
+    rating_average float32 (NaN = NULL); product_id int64
+  - Khóa dimension lưu thành mã int32 liên tục 0..n-1 (kèm surrogate key gốc của MySQL),
+    tên brand / seller / fulfillment được intern một lần trong Dimension
+  - Lọc theo brand / seller / fulfillment bằng mask trên mã, tổng hợp bằng bincount
+    theo mã nhóm (không groupby, không tạo object cho từng dòng); metric giống AggregateRouter
+  - Snapshot: mỗi cột một file .npy (np.load mmap_mode='r') + meta.json chứa tên dimension
+    -> process mới nạp trong vài chục mili-giây, chỉ đọc trang dữ liệu nào thực sự dùng;
+    save() thay từng file bằng os.replace nên process đang phục vụ snapshot cũ không bị ảnh hưởng
+
+Cấu trúc thư mục:
+    data/fact_store/<cột>.npy
+    data/fact_store/meta.json
+
+Ví dụ:
+    store = FactStore.load()
+    rows = store.query(['brand'], ['total_revenue', 'avg_rating'],
+                       where={'fulfillment': 'tiki_delivery'}, order_by='total_revenue', limit=10)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from aggregate_tables import FACT_TABLE, METRICS
+from db_config import get_connection
+from dim_key_cache import (DIMENSIONS, FACT_COLUMNS, name_key, normalize_brand_names,
+                           normalize_fulfillment_types, normalize_seller_names)
+from query_cache import warehouse_version
+
+STORE_DIR = 'data/fact_store'
+META_FILE = 'meta.json'
+FETCH_BATCH = 100000
+DENSE_GROUPS = 1 << 20          # số tổ hợp khóa tối đa để nhóm bằng bảng đếm thay vì factorize
+
+# Cột của snapshot: (tên, kiểu)
+COLUMNS = {
+    'product_id': np.int64,
+    'brand': np.int32,
+    'seller': np.int32,
+    'fulfillment': np.int32,
+    'price': np.float64,
+    'quantity_sold': np.int32,
+    'rating_average': np.float32,
+    'review_count': np.int32,
+}
+MEASURE_COLUMNS = ['price', 'quantity_sold', 'rating_average', 'review_count']
+
+# Metric tính từ measure cơ sở (các metric còn lại của AggregateRouter là measure cơ sở)
+DERIVED = {'avg_rating': ('rating_sum', 'rating_count'), 'avg_price': ('price_sum', 'priced_count')}
+
+# Cột tên trong clean data tương ứng với từng dimension
+SOURCE_COLUMNS = {'brand': 'brand', 'seller': 'current_seller', 'fulfillment': 'fulfillment_type'}
+NORMALIZERS = {'brand': normalize_brand_names, 'seller': normalize_seller_names,
+               'fulfillment': normalize_fulfillment_types}
+
+
+class Dimension:
+    """Tên (đã intern) + surrogate key của một dimension; mã trong fact = vị trí trong names"""
+
+    __slots__ = ('names', 'keys', '_lookup')
+
+    def __init__(self, names, keys):
+        self.names = [sys.intern(str(name)) for name in names]
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self._lookup = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def codes(self, values):
+        """Mã của các tên (so sánh như collation MySQL: không phân biệt hoa/thường, dấu); tên lạ bị bỏ qua"""
+        if self._lookup is None:
+            self._lookup = {name_key(name): code for code, name in enumerate(self.names)}
+        values = [values] if isinstance(values, str) else values
+        return [self._lookup[name_key(str(v))] for v in values if name_key(str(v)) in self._lookup]
+
+    def encode(self, surrogate_keys):
+        """surrogate key -> mã 0..n-1 (-1 nếu không có trong dimension)"""
+        order = np.argsort(self.keys, kind='stable')
+        sorted_keys = self.keys[order]
+        surrogate_keys = np.asarray(surrogate_keys, dtype=np.int64)
+        if not len(sorted_keys):
+            return np.full(len(surrogate_keys), -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(sorted_keys, surrogate_keys), len(sorted_keys) - 1)
+        return np.where(sorted_keys[pos] == surrogate_keys, order[pos], -1).astype(np.int32)
+
+
+class FactStore:
+    """Các cột của Fact_product_stats dạng mảng có kiểu + dimension, chỉ đọc"""
+
+    __slots__ = ('columns', 'dimensions', 'source', 'version', 'load_seconds')
+
+    def __init__(self, columns, dimensions, source=None, version=None):
+        self.columns = {name: np.asarray(columns[name]) for name in COLUMNS}
+        self.dimensions = dimensions
+        self.source = source
+        self.version = version
+        self.load_seconds = None
+
+    def __len__(self):
+        return len(self.columns['product_id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    # ------------------------------------------------------------------
+    # Dựng store
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_mysql(cls, cursor, version=None):
+        """Đọc Fact_product_stats + DIM_* theo lô (fetchmany), chỉ giữ mảng có kiểu"""
+        dimensions = {}
+        for dim, (table, id_col, name_col) in DIMENSIONS.items():
+            cursor.execute(f'SELECT {id_col}, {name_col} FROM {table} ORDER BY {id_col}')
+            rows = cursor.fetchall()
+            dimensions[dim] = Dimension([name for _, name in rows], [key for key, _ in rows])
+
+        cursor.execute(f"SELECT {', '.join(FACT_COLUMNS)} FROM {FACT_TABLE}")
+        parts = []
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            # DECIMAL -> float, NULL -> NaN; ma trận object chỉ sống trong một lô
+            parts.append(pd.DataFrame(rows, columns=FACT_COLUMNS).astype(float).to_numpy())
+        matrix = np.concatenate(parts) if parts else np.empty((0, len(FACT_COLUMNS)))
+        values = dict(zip(FACT_COLUMNS, matrix.T))
+
+        columns = {'product_id': values['product_id']}
+        for dim, (_, id_col, _) in DIMENSIONS.items():
+            columns[dim] = dimensions[dim].encode(values[id_col])
+        for measure in MEASURE_COLUMNS:
+            columns[measure] = values[measure]
+        # SUM của MySQL bỏ qua NULL -> với cột đếm, NULL tương đương 0; rating giữ NaN (AVG bỏ qua)
+        for measure in ['price', 'quantity_sold', 'review_count']:
+            columns[measure] = np.nan_to_num(columns[measure])
+        return cls(_typed(columns), dimensions, source=FACT_TABLE, version=version)
+
+    @classmethod
+    def from_frame(cls, df, source=None):
+        """
+        Dựng từ dữ liệu sạch (không cần MySQL), cùng quy tắc với ETL: tên dimension được chuẩn hóa
+        và gộp theo name_key (như collation MySQL), measure thiếu -> 0; surrogate key = thứ tự xuất hiện
+        """
+        columns = {'product_id': df['id'].to_numpy(dtype=np.int64)}
+        dimensions = {}
+        for dim, column in SOURCE_COLUMNS.items():
+            codes, uniques = pd.factorize(NORMALIZERS[dim](df[column]))
+            key_codes, _ = pd.factorize(pd.Series([name_key(name) for name in uniques], dtype=object))
+            first = np.full(len(uniques), -1, dtype=np.int64)
+            first[key_codes[::-1]] = np.arange(len(uniques))[::-1]      # tên đầu tiên của mỗi khóa
+            first = first[first >= 0]
+            dimensions[dim] = Dimension(uniques[first], np.arange(1, len(first) + 1))
+            columns[dim] = key_codes[codes]
+        for measure in MEASURE_COLUMNS:
+            columns[measure] = pd.to_numeric(df[measure], errors='coerce').fillna(0).to_numpy(dtype=float)
+        return cls(_typed(columns), dimensions, source=source)
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+    def save(self, store_dir=STORE_DIR):
+        """
+        Ghi snapshot; mỗi file ghi ra file tạm rồi os.replace -> process đang memory-map
+        snapshot cũ vẫn đọc inode cũ (ghi đè tại chỗ làm file bị cắt ngắn -> SIGBUS)
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        for name, values in self.columns.items():
+            _replace(os.path.join(store_dir, f'{name}.npy'), lambda f, values=values: np.save(f, values))
+        meta = {'rows': len(self), 'source': self.source, 'version': self.version,
+                'dimensions': {dim: {'names': d.names, 'keys': d.keys.tolist()}
+                               for dim, d in self.dimensions.items()}}
+        _replace(os.path.join(store_dir, META_FILE),
+                 lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+        return store_dir
+
+    @classmethod
+    def load(cls, store_dir=STORE_DIR, mmap=True):
+        """Nạp snapshot; mmap=True: các cột là memory-map (chỉ đọc, dùng chung page cache giữa các process)"""
+        start = time.perf_counter()
+        with open(os.path.join(store_dir, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                   for name in COLUMNS}
+        dimensions = {dim: Dimension(d['names'], d['keys']) for dim, d in meta['dimensions'].items()}
+        store = cls(columns, dimensions, source=meta.get('source'), version=meta.get('version'))
+        store.load_seconds = time.perf_counter() - start
+        return store
+
+    # ------------------------------------------------------------------
+    # Lọc + tổng hợp
+    # ------------------------------------------------------------------
+    def mask(self, where=None):
+        """
+        Mask bool các dòng thỏa where = {dim: tên hoặc danh sách tên}; None nếu không lọc.
+        Mỗi dimension: bảng True/False theo mã rồi tra theo cột mã (không so sánh chuỗi trên từng dòng)
+        """
+        mask = None
+        for dim, values in (where or {}).items():
+            if values is None:
+                continue
+            if dim not in self.dimensions:
+                raise ValueError(f"Dimension không hợp lệ: {dim}")
+            allowed = np.zeros(len(self.dimensions[dim]) + 1, dtype=bool)   # mã -1 -> False
+            allowed[self.dimensions[dim].codes(values)] = True
+            selected = allowed[self.columns[dim]]
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def aggregate(self, dims=(), where=None, metrics=None):
+        """
+        (mã từng chiều của các nhóm, dict metric theo nhóm) cho các dòng thỏa where.
+        Nhóm = tổ hợp mã các chiều, đánh số lại chỉ trên các tổ hợp có mặt;
+        metrics: chỉ tính các metric này (và measure chúng cần), None = tất cả.
+        """
+        mask = self.mask(where)
+        rows = np.flatnonzero(mask) if mask is not None else None
+        take = (lambda name: self.columns[name][rows]) if rows is not None else (lambda name: self.columns[name])
+
+        dims = list(dims)
+        group = np.zeros(len(rows) if rows is not None else len(self), dtype=np.int64)
+        for dim in dims:
+            group = group * (len(self.dimensions[dim]) + 1) + (take(dim).astype(np.int64) + 1)
+        n_keys = int(np.prod([len(self.dimensions[dim]) + 1 for dim in dims]))
+        if not dims:
+            keys, inverse = np.zeros(1, dtype=np.int64), group
+        elif n_keys <= DENSE_GROUPS:
+            # Không gian khóa nhỏ: đánh số nhóm qua bảng đếm trực tiếp, không cần sort
+            present = np.bincount(group, minlength=n_keys) > 0
+            keys = np.flatnonzero(present)
+            inverse = (np.cumsum(present) - 1)[group]
+        else:
+            inverse, keys = pd.factorize(group, sort=True)
+        n_groups = len(keys)
+
+        needed = set(METRICS if metrics is None else metrics)
+        needed |= {base for metric in list(needed) for base in DERIVED.get(metric, ())}
+
+        def total(values=None, subset=None):
+            # values ứng với các dòng trong subset (None = mọi dòng); một nhóm: sum / đếm thẳng
+            if n_groups == 1:
+                count = len(inverse) if subset is None else len(subset)
+                return np.array([values.sum() if values is not None else count])
+            return np.bincount(inverse if subset is None else inverse[subset], weights=values, minlength=n_groups)
+
+        def extreme(ufunc, values, subset, initial):
+            result = np.full(n_groups, initial)
+            if n_groups == 1:
+                if len(values):
+                    result[0] = ufunc.reduce(values)
+            else:
+                ufunc.at(result, inverse if subset is None else inverse[subset], values)
+            return np.where(np.isfinite(result), result, np.nan)
+
+        measures = {'product_count': total()}
+        if needed & {'total_revenue', 'total_quantity', 'priced_count', 'price_sum', 'min_price', 'max_price'}:
+            price = take('price')
+            quantity = take('quantity_sold')
+            # Chỉ lấy tập con khi thật sự có giá <= 0 (thường không có -> không copy)
+            priced = np.flatnonzero(price > 0) if (price <= 0).any() else None
+            priced_price = price if priced is None else price[priced]
+        if 'total_revenue' in needed:
+            measures['total_revenue'] = total(price * quantity)
+        if 'total_quantity' in needed:
+            measures['total_quantity'] = total(quantity.astype(np.float64))
+        if 'total_reviews' in needed:
+            measures['total_reviews'] = total(take('review_count').astype(np.float64))
+        if needed & {'rating_sum', 'rating_count'}:
+            rating = take('rating_average').astype(np.float64)
+            rated = np.flatnonzero(~np.isnan(rating)) if np.isnan(rating).any() else None
+            rated_rating = rating if rated is None else rating[rated]
+            measures['rating_sum'] = total(rated_rating, rated)
+            measures['rating_count'] = total(subset=rated)
+        if needed & {'priced_count', 'price_sum'}:
+            measures['priced_count'] = total(subset=priced)
+            measures['price_sum'] = total(priced_price, priced)
+        if 'min_price' in needed:
+            measures['min_price'] = extreme(np.minimum, priced_price, priced, np.inf)
+        if 'max_price' in needed:
+            measures['max_price'] = extreme(np.maximum, priced_price, priced, -np.inf)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if 'avg_rating' in needed:
+                measures['avg_rating'] = measures['rating_sum'] / np.where(measures['rating_count'] > 0,
+                                                                           measures['rating_count'], np.nan)
+            if 'avg_price' in needed:
+                measures['avg_price'] = measures['price_sum'] / np.where(measures['priced_count'] > 0,
+                                                                         measures['priced_count'], np.nan)
+
+        # Tách mã nhóm ngược lại thành mã từng chiều
+        codes = {}
+        for dim in reversed(dims):
+            base = len(self.dimensions[dim]) + 1
+            codes[dim] = (keys % base) - 1
+            keys = keys // base
+        return {dim: codes[dim] for dim in dims}, measures
+
+    def query(self, dims, metrics, where=None, order_by=None, limit=None):
+        """
+        Giống AggregateRouter.query: danh sách tuple (tên các chiều..., metrics...),
+        order_by = metric sắp xếp giảm dần
+        """
+        unknown = [m for m in list(metrics) + ([order_by] if order_by else []) if m not in METRICS]
+        if unknown:
+            raise ValueError(f"Metric không hợp lệ: {unknown}")
+        codes, measures = self.aggregate(dims, where, list(metrics) + ([order_by] if order_by else []))
+        n_groups = len(measures['product_count'])
+        order = np.arange(n_groups)
+        if order_by:
+            values = np.nan_to_num(measures[order_by].astype(float), nan=-np.inf)
+            order = np.argsort(-values, kind='stable')
+        if limit:
+            order = order[:int(limit)]
+
+        columns = [[self.dimensions[dim].names[c] if c >= 0 else None for c in codes[dim][order]]
+                   for dim in dims]
+        for metric in metrics:
+            values = measures[metric][order]
+            columns.append([None if isinstance(v, float) and np.isnan(v) else v for v in values.tolist()])
+        return list(zip(*columns))
+
+
+def _typed(columns):
+    return {name: np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def _replace(path, write):
+    """Ghi file qua file tạm cùng thư mục rồi os.replace (thay nguyên tử, không sửa inode cũ)"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def snapshot_exists(store_dir=STORE_DIR):
+    return os.path.exists(os.path.join(store_dir, META_FILE))
+
+
+def refresh_snapshot(cursor, store_dir=STORE_DIR):
+    """Gọi sau ETL: dựng lại snapshot từ MySQL nếu đang có snapshot (đang được dùng), trả về store hoặc None"""
+    if not snapshot_exists(store_dir):
+        return None
+    store = FactStore.from_mysql(cursor, version=warehouse_version(cursor))
+    store.save(store_dir)
+    return store
+
+
+def build_from_clean(store_dir=STORE_DIR):
+    """Dựng snapshot từ dữ liệu sạch (columnar store nếu có, không thì CSV)"""
+    columns = ['id'] + list(SOURCE_COLUMNS.values()) + MEASURE_COLUMNS
+    if columnar_store.ARROW_AVAILABLE and columnar_store.store_exists():
+        df, source = columnar_store.read_table(columns), columnar_store.STORE_DIR
+    else:
+        source = 'data/clean/products_clean.csv'
+        df = pd.read_csv(source, usecols=columns)
+    store = FactStore.from_frame(df, source=source)
+    store.save(store_dir)
+    return store
+
+
+def build_from_mysql(store_dir=STORE_DIR):
+    connection = get_connection()
+    try:
+        cursor = connection.cursor()
+        store = FactStore.from_mysql(cursor, version=warehouse_version(cursor))
+        cursor.close()
+    finally:
+        connection.close()
+    store.save(store_dir)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fact store gọn trong bộ nhớ (snapshot memory-map)')
+    parser.add_argument('--build', choices=['mysql', 'clean'], help='Dựng snapshot từ MySQL hoặc dữ liệu sạch')
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--by', default='brand', help='Các chiều, cách nhau bởi dấu phẩy (brand,seller,fulfillment)')
+    parser.add_argument('--metrics', default='product_count,total_revenue,avg_price,avg_rating')
+    parser.add_argument('--brand', action='append')
+    parser.add_argument('--seller', action='append')
+    parser.add_argument('--fulfillment', action='append')
+    parser.add_argument('--order-by', default='total_revenue')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--bench', type=int, default=0, help='Đo latency N lần truy vấn')
+    args = parser.parse_args()
+
+    if args.build:
+        start = time.perf_counter()
+        store = build_from_mysql(args.store_dir) if args.build == 'mysql' else build_from_clean(args.store_dir)
+        print(f"✅ Đã dựng fact store {len(store):,} dòng từ '{store.source}' "
+              f"({time.perf_counter() - start:.2f}s) -> '{args.store_dir}'")
+
+    store = FactStore.load(args.store_dir)
+    sizes = ', '.join(f'{dim} {len(d):,}' for dim, d in store.dimensions.items())
+    print(f"📂 Nạp fact store {len(store):,} dòng ({store.nbytes / 1024 / 1024:.1f} MB cột, {sizes}) "
+          f"trong {store.load_seconds * 1000:.1f} ms")
+
+    dims = [d for d in args.by.split(',') if d]
+    metrics = args.metrics.split(',')
+    where = {'brand': args.brand, 'seller': args.seller, 'fulfillment': args.fulfillment}
+    start = time.perf_counter()
+    rows = store.query(dims, metrics, where, args.order_by, args.limit)
+    print(f"\n📊 {','.join(dims) or '(tất cả)'} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    print(pd.DataFrame(rows, columns=dims + metrics).to_string(index=False))
+
+    if args.bench:
+        latencies = []
+        for _ in range(args.bench):
+            start = time.perf_counter()
+            store.query(dims, metrics, where, args.order_by, args.limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"\n⏱️  {args.bench} truy vấn: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Instrumentation
+Lớp đo dùng chung cho toàn pipeline (ETL, làm sạch, part 3, train model, vẽ chart):
+  - span(name): đo thời gian (wall + CPU), số dòng, số byte, RSS; span lồng nhau
+    được ghi theo đường dẫn 'cha/con' (vd. 'etl/fact_insert')
+  - section(name): như span nhưng cho script phẳng (part 3), section sau tự đóng section trước
+  - record(name, seconds, ...): ghi kết quả đã đo sẵn (vd. thời gian fit model trong worker)
+  - cProfile / tracemalloc chỉ bật khi có cờ (--profile / --trace-memory hoặc biến môi trường
+    PIPELINE_PROFILE=cpu,memory) -> tìm hot path khi chạy thật mà không phải sửa code
+  - write(): JSON cho từng lần chạy (data/metrics/<run>-<thời gian>.json, gồm hot path của
+    cProfile / top cấp phát của tracemalloc) và nối các span vào data/metrics/<run>.csv
+
+Module giữ một Metrics hiện hành: script chính gọi configure() một lần,
+các module khác chỉ cần instrumentation.span(...) / instrumentation.record(...).
+
+Ví dụ:
+    metrics = instrumentation.configure('etl', profile=args.profile)
+    with metrics.span('csv_read', bytes=os.path.getsize(path)) as span:
+        df = pd.read_csv(path)
+        span['rows'] = len(df)
+    metrics.write()
+"""
+
+import cProfile
+import csv
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR = 'data/metrics'
+PROFILE_ENV = 'PIPELINE_PROFILE'
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+CSV_COLUMNS = ['run_id', 'path', 'depth', 'start', 'seconds', 'cpu_seconds', 'rows', 'bytes',
+               'rows_per_sec', 'rss_mb', 'py_peak_mb']
+
+
+def peak_rss_mb():
+    """Peak RSS của process (MB), None nếu hệ điều hành không hỗ trợ"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def profile_flags(profile=None, trace_memory=None):
+    """Cờ truyền vào được ưu tiên, None -> đọc PIPELINE_PROFILE (vd. 'cpu', 'memory', 'cpu,memory')"""
+    options = {flag.strip() for flag in os.environ.get(PROFILE_ENV, '').lower().split(',')}
+    return (('cpu' in options) if profile is None else profile,
+            ('memory' in options) if trace_memory is None else trace_memory)
+
+
+class Metrics:
+    """Tập các span của một lần chạy"""
+
+    def __init__(self, run_name='pipeline', output_dir=METRICS_DIR, profile=False, trace_memory=False):
+        self.run_name = run_name
+        self.output_dir = output_dir
+        self.run_id = f"{run_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._section = None
+
+        self.profiler = None
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _flush_memory_peak(self):
+        # Peak tracemalloc từ lần reset trước được tính cho mọi span đang mở
+        if not self.trace_memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for record in self._stack:
+            record['_py_peak'] = max(record['_py_peak'], peak)
+        tracemalloc.reset_peak()
+
+    def _append(self, record):
+        rate = record['rows'] / record['seconds'] if record['rows'] and record['seconds'] > 0 else None
+        record['rows_per_sec'] = round(rate, 1) if rate is not None else None
+        record['rss_mb'] = peak_rss_mb()
+        with self._lock:
+            self.spans.append(record)
+
+    @contextmanager
+    def span(self, name, rows=0, bytes=0, echo=False, **attrs):
+        """
+        Đo một đoạn code; yield dict để gán record['rows'] / record['bytes'] / thuộc tính khác.
+        echo=True: in ra khi bắt đầu / kết thúc (kiểu log theo stage).
+        """
+        stack = self._stack
+        path = '/'.join([r['path'] for r in stack[-1:]] + [name])
+        record = {'name': name, 'path': path, 'depth': len(stack), 'rows': rows, 'bytes': bytes,
+                  'start': round(time.perf_counter() - self._start, 4), '_py_peak': 0}
+        record.update(attrs)
+        if echo:
+            print(f"\n▶️  Stage: {name}")
+        self._flush_memory_peak()
+        stack.append(record)
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            self._flush_memory_peak()
+            stack.pop()
+            peak = record.pop('_py_peak')
+            record['py_peak_mb'] = round(peak / (1024 * 1024), 2) if self.trace_memory else None
+            self._append(record)
+            if echo:
+                print(f"   ⏱️  {name}: {record['seconds']:.2f}s, {record['rows']:,} rows")
+
+    def record(self, name, seconds, rows=0, bytes=0, **attrs):
+        """Ghi một kết quả đã đo ở nơi khác (worker process, thread ...) làm span con của span hiện tại"""
+        stack = self._stack
+        path = '/'.join([r['path'] for r in stack[-1:]] + [name])
+        record = {'name': name, 'path': path, 'depth': len(stack), 'rows': rows, 'bytes': bytes,
+                  'start': None, 'seconds': seconds, 'cpu_seconds': None, 'py_peak_mb': None}
+        record.update(attrs)
+        self._append(record)
+        return record
+
+    def section(self, name, **attrs):
+        """
+        Span tuần tự cho script dạng phẳng (không bọc được bằng with):
+        đóng section đang mở rồi mở section mới; end_section() đóng section cuối
+        """
+        self.end_section()
+        self._section = self.span(name, **attrs)
+        return self._section.__enter__()
+
+    def end_section(self):
+        if self._section is not None:
+            section, self._section = self._section, None
+            section.__exit__(None, None, None)
+
+    def top_level(self):
+        return [r for r in self.spans if r['depth'] == 0]
+
+    def report(self, depth=0):
+        """Bảng thời gian các span ở một độ sâu (mặc định các stage chính)"""
+        spans = [r for r in self.spans if r['depth'] == depth]
+        total = sum(r['seconds'] for r in spans)
+        print("\n⏱️  THỜI GIAN THEO STAGE")
+        print("=" * 60)
+        print(f"{'Stage':15} {'Giây':>10} {'%':>7} {'Rows':>12} {'Rows/sec':>12}")
+        for r in spans:
+            share = r['seconds'] / total * 100 if total > 0 else 0
+            print(f"{r['name']:15} {r['seconds']:10.2f} {share:6.1f}% {r['rows']:12,} "
+                  f"{r['rows_per_sec'] or 0:12,.0f}")
+        print(f"{'TOTAL':15} {total:10.2f}")
+
+    def hot_paths(self, limit=TOP_FUNCTIONS):
+        """Các hàm tốn thời gian nhất (cumulative) theo cProfile"""
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler)
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({'function': f'{os.path.basename(filename)}:{line}({function})', 'calls': calls,
+                         'total_seconds': round(total, 4), 'cumulative_seconds': round(cumulative, 4)})
+        rows.sort(key=lambda r: r['cumulative_seconds'], reverse=True)
+        return rows[:limit]
+
+    def top_allocations(self, limit=TOP_ALLOCATIONS):
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        return [{'location': str(stat.traceback), 'size_mb': round(stat.size / (1024 * 1024), 3),
+                 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:limit]]
+
+    def write(self):
+        """Ghi JSON của lần chạy + nối span vào CSV, trả về đường dẫn file JSON"""
+        self.end_section()
+        if self.profiler is not None:
+            self.profiler.disable()
+        os.makedirs(self.output_dir, exist_ok=True)
+        summary = {
+            'run_id': self.run_id, 'run_name': self.run_name,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': round(time.perf_counter() - self._start, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'spans': self.spans,
+            'hot_paths': self.hot_paths(),
+            'top_allocations': self.top_allocations(),
+        }
+        json_file = os.path.join(self.output_dir, f'{self.run_id}.json')
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.join(self.output_dir, f'{self.run_id}.prof'))
+
+        csv_file = os.path.join(self.output_dir, f'{self.run_name}.csv')
+        new_file = not os.path.exists(csv_file)
+        with open(csv_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for record in self.spans:
+                writer.writerow(dict(record, run_id=self.run_id,
+                                     seconds=round(record['seconds'], 4),
+                                     cpu_seconds=None if record['cpu_seconds'] is None
+                                     else round(record['cpu_seconds'], 4)))
+        return json_file
+
+
+_current = Metrics('default')
+
+
+def configure(run_name, output_dir=METRICS_DIR, profile=None, trace_memory=None):
+    """Tạo Metrics hiện hành cho lần chạy (cờ None -> đọc PIPELINE_PROFILE)"""
+    global _current
+    profile, trace_memory = profile_flags(profile, trace_memory)
+    _current = Metrics(run_name, output_dir, profile, trace_memory)
+    return _current
+
+
+def current():
+    return _current
+
+
+def span(name, rows=0, bytes=0, echo=False, **attrs):
+    return _current.span(name, rows, bytes, echo, **attrs)
+
+
+def record(name, seconds, rows=0, bytes=0, **attrs):
+    return _current.record(name, seconds, rows, bytes, **attrs)
+
+
+def add_arguments(parser):
+    """Thêm --profile / --trace-memory / --metrics-dir vào argparse của script"""
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help=f'Bật cProfile (hoặc {PROFILE_ENV}=cpu)')
+    parser.add_argument('--trace-memory', action='store_true', default=None,
+                        help=f'Bật tracemalloc theo span (hoặc {PROFILE_ENV}=memory)')
+    parser.add_argument('--metrics-dir', default=METRICS_DIR, help='Thư mục ghi metrics JSON / CSV')
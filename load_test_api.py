@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Load Test cho Analytics API
+Mô phỏng N client đồng thời gọi analytics_api.py và báo cáo latency phía client:
+  - Mỗi client là một coroutine giữ một kết nối keep-alive (asyncio, không cần thư viện HTTP),
+    gửi request tuần tự theo vòng các endpoint trong MIX
+  - Dừng khi đủ --requests request hoặc hết --duration giây; --warmup request đầu không tính
+  - Báo cáo theo endpoint + tổng: số request, lỗi (status != 200 / mất kết nối), p50 / p90 / p99 / max,
+    throughput; cuối cùng in latency phía server (GET /metrics) để so sánh
+  - --output: ghi kết quả JSON (vd. data/benchmarks/api_load.json)
+
+Cách dùng:
+    python analytics_api.py --source fact-store &
+    python load_test_api.py --clients 32 --requests 2000
+    python load_test_api.py --url http://127.0.0.1:8000 --clients 64 --duration 30 \\
+        --endpoints '/brands/top?limit=10,/pivot?rows=brand&columns=fulfillment'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+DEFAULT_URL = 'http://127.0.0.1:8000'
+DEFAULT_CLIENTS = 16
+DEFAULT_REQUESTS = 2000
+DEFAULT_WARMUP = 50
+REQUEST_TIMEOUT = 30.0
+
+# Các endpoint gọi lần lượt (request đọc nhiều lặp lại nhiều lần hơn)
+MIX = [
+    '/brands/top?limit=10',
+    '/sellers/top?limit=10&metric=product_count',
+    '/brands/top?limit=20&fulfillment=tiki_delivery',
+    '/price-stats?by=fulfillment',
+    '/pivot?rows=brand&columns=fulfillment&metric=total_revenue&limit=20',
+    '/brands/top?limit=10',
+    '/price-stats',
+    '/sellers/top?limit=10&metric=avg_rating',
+]
+
+
+async def fetch(reader, writer, host, path):
+    """Gửi một GET trên kết nối keep-alive, trả về (status, body bytes)"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length) if length else b''
+    return status, body
+
+
+class LoadTest:
+    def __init__(self, url, endpoints, clients, requests=None, duration=None, warmup=DEFAULT_WARMUP):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.endpoints = endpoints
+        self.clients = clients
+        self.requests = requests
+        self.duration = duration
+        self.warmup = warmup
+        self.issued = 0
+        self.samples = []          # (endpoint, giây, status)
+        self.failures = 0
+        self.start = None
+        self.seconds = 0.0
+
+    def _next(self):
+        """Endpoint tiếp theo, None khi đã đủ số request / hết thời gian"""
+        if self.requests is not None and self.issued >= self.requests + self.warmup:
+            return None
+        if self.duration is not None and self.start and time.perf_counter() - self.start > self.duration:
+            return None
+        endpoint = self.endpoints[self.issued % len(self.endpoints)]
+        self.issued += 1
+        if self.issued == self.warmup + 1:
+            self.start = time.perf_counter()
+        return endpoint
+
+    async def client(self):
+        reader = writer = None
+        while True:
+            endpoint = self._next()
+            if endpoint is None:
+                break
+            measured = self.issued > self.warmup
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                status, _ = await asyncio.wait_for(fetch(reader, writer, self.host, endpoint), REQUEST_TIMEOUT)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+                # Mất kết nối: tính là lỗi, client mở kết nối mới cho request sau
+                status = 0
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            if measured:
+                self.samples.append((endpoint, time.perf_counter() - started, status))
+                self.failures += status != 200
+        if writer is not None:
+            writer.close()
+
+    async def run(self):
+        if self.warmup == 0:
+            self.start = time.perf_counter()
+        await asyncio.gather(*(self.client() for _ in range(self.clients)))
+        self.seconds = time.perf_counter() - (self.start or time.perf_counter())
+        return self.summary()
+
+    def summary(self):
+        def stats(latencies):
+            latencies = np.asarray(latencies) * 1000
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            return {'p50_ms': round(p50, 2), 'p90_ms': round(p90, 2), 'p99_ms': round(p99, 2),
+                    'max_ms': round(latencies.max(), 2)}
+
+        endpoints = {}
+        for endpoint in self.endpoints:
+            rows = [(seconds, status) for name, seconds, status in self.samples if name == endpoint]
+            if rows:
+                endpoints[endpoint] = {'count': len(rows), 'errors': sum(status != 200 for _, status in rows),
+                                       **stats([seconds for seconds, _ in rows])}
+        total = {'count': len(self.samples), 'errors': self.failures,
+                 **(stats([seconds for _, seconds, _ in self.samples]) if self.samples else {})}
+        return {'clients': self.clients, 'seconds': round(self.seconds, 3),
+                'requests_per_sec': round(len(self.samples) / self.seconds, 1) if self.seconds else 0.0,
+                'total': total, 'endpoints': endpoints}
+
+
+async def server_metrics(url):
+    parts = urlsplit(url)
+    host = parts.hostname or '127.0.0.1'
+    reader, writer = await asyncio.open_connection(host, parts.port or 80)
+    try:
+        status, body = await fetch(reader, writer, host, '/metrics')
+    finally:
+        writer.close()
+    return json.loads(body) if status == 200 else None
+
+
+def print_summary(summary):
+    print(f"\n📊 {summary['total']['count']:,} request, {summary['clients']} client, "
+          f"{summary['seconds']:.2f}s -> {summary['requests_per_sec']:,.1f} req/s, "
+          f"lỗi {summary['total']['errors']}")
+    print(f"{'Endpoint':62} {'Count':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = list(summary['endpoints'].items()) + [('TOTAL', summary['total'])]
+    for endpoint, stats in rows:
+        if 'p50_ms' not in stats:
+            continue
+        print(f"{endpoint[:62]:62} {stats['count']:6,} {stats['p50_ms']:8.2f} {stats['p90_ms']:8.2f} "
+              f"{stats['p99_ms']:8.2f} {stats['max_ms']:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test analytics_api.py (p50/p99 với N client đồng thời)')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument('--requests', type=int, default=None,
+                        help=f'Tổng số request đo (mặc định {DEFAULT_REQUESTS} nếu không có --duration)')
+    parser.add_argument('--duration', type=float, default=None, help='Chạy trong N giây')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    parser.add_argument('--endpoints', default=None, help='Danh sách path cách nhau bởi dấu phẩy (mặc định: MIX)')
+    parser.add_argument('--output', default=None, help='Ghi kết quả JSON')
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(',') if args.endpoints else MIX
+    requests = args.requests if args.requests or args.duration else DEFAULT_REQUESTS
+    print("🔥 LOAD TEST ANALYTICS API")
+    print("=" * 60)
+    print(f"URL: {args.url}, {args.clients} client, {len(endpoints)} endpoint, "
+          + (f"{requests:,} request" if requests else f"{args.duration:g}s"))
+
+    test = LoadTest(args.url, endpoints, args.clients, requests, args.duration, args.warmup)
+    summary = asyncio.run(test.run())
+    print_summary(summary)
+
+    try:
+        server = asyncio.run(server_metrics(args.url))
+    except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+        print(f"❌ Không đọc được /metrics từ {args.url}: {exc}")
+        server = None
+    if server:
+        summary['server'] = server
+        print(f"\n🌐 Phía server: {server['requests']:,} request, in-flight {server['in_flight']}")
+        for route, stats in server['routes'].items():
+            print(f"   {route:18} p50 {stats['p50_ms']:7.2f} ms, p99 {stats['p99_ms']:7.2f} ms, "
+                  f"lỗi {stats['errors']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Đã lưu '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Model Registry
+Lưu model, scaler, encoder đã fit (joblib) kèm fingerprint của dữ liệu train/eval
+và hyperparameter. Lần chạy sau nếu fingerprint trùng thì bỏ qua bước train,
+chỉ đọc lại điểm đánh giá đã lưu; file model chỉ được nạp khi thật sự cần predict.
+
+Cấu trúc thư mục:
+    data/models/index.json          name -> {fingerprint, file, meta, saved_at}
+    data/models/<name>.joblib
+
+Ví dụ:
+    registry = ModelRegistry()
+    model, scores = registry.fit_or_load(
+        'revenue/random_forest', RandomForestRegressor(random_state=42),
+        X_train, y_train, X_test, y_test, evaluate=regression_scores)
+    model.predict(X_new)   # lúc này mới nạp file model
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+REGISTRY_DIR = 'data/models'
+INDEX_FILE = 'index.json'
+# Tham số chỉ ảnh hưởng tốc độ, không ảnh hưởng model -> không đưa vào fingerprint
+RUNTIME_PARAMS = ('n_jobs', 'verbose')
+
+
+def _hash_data(hasher, data):
+    if data is None:
+        hasher.update(b'None')
+    elif isinstance(data, (pd.DataFrame, pd.Series)):
+        hasher.update(repr(list(data.columns) if isinstance(data, pd.DataFrame) else data.name).encode())
+        hasher.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    else:
+        array = np.ascontiguousarray(data)
+        hasher.update(f'{array.dtype}{array.shape}'.encode())
+        if array.dtype == object:
+            hasher.update(pd.util.hash_array(array.ravel()).tobytes())
+        else:
+            hasher.update(array.tobytes())
+
+
+def fingerprint(estimator, *datasets):
+    """Fingerprint = loại estimator + hyperparameter + phiên bản sklearn + dữ liệu"""
+    hasher = hashlib.sha1()
+    params = sorted((k, repr(v)) for k, v in estimator.get_params(deep=True).items()
+                    if k.rsplit('__', 1)[-1] not in RUNTIME_PARAMS)
+    hasher.update(f'{type(estimator).__module__}.{type(estimator).__name__}'.encode())
+    hasher.update(repr(params).encode())
+    hasher.update(sklearn.__version__.encode())
+    for data in datasets:
+        _hash_data(hasher, data)
+    return hasher.hexdigest()
+
+
+class LazyModel:
+    """Đại diện cho model trong registry, chỉ nạp file khi truy cập thuộc tính / predict"""
+
+    def __init__(self, path):
+        self.path = path
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = joblib.load(self.path)
+        return self._model
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def __getattr__(self, name):
+        # Chỉ được gọi khi thuộc tính không có trên LazyModel -> chuyển cho model thật
+        if name.startswith('__') or name in ('path', '_model'):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+
+class ModelRegistry:
+    """Lưu / nạp lại model theo tên và fingerprint"""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.index = {}
+        self.trained = []
+        self.reused = []
+        os.makedirs(root, exist_ok=True)
+        index_path = os.path.join(root, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def _path(self, name):
+        return os.path.join(self.root, name.replace('/', '__') + '.joblib')
+
+    def _lookup(self, name, fp):
+        entry = self.index.get(name)
+        if entry and entry['fingerprint'] == fp and os.path.exists(self._path(name)):
+            return entry
+        return None
+
+    def _save(self, name, obj, fp, meta=None, seconds=0.0):
+        joblib.dump(obj, self._path(name))
+        self.index[name] = {
+            'fingerprint': fp,
+            'file': os.path.basename(self._path(name)),
+            'meta': meta or {},
+            'fit_seconds': seconds,
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._write_index()
+
+    def _write_index(self):
+        index_path = os.path.join(self.root, INDEX_FILE)
+        tmp_path = f'{index_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2, default=float)
+        os.replace(tmp_path, index_path)
+
+    def cached(self, name, fp):
+        """(LazyModel, entry) nếu đã có bản lưu cùng fingerprint, ngược lại None"""
+        entry = self._lookup(name, fp)
+        if entry is None:
+            return None
+        self.reused.append(name)
+        return LazyModel(self._path(name)), entry
+
+    def register(self, name, model, fp, meta=None, seconds=0.0):
+        """Lưu model đã được fit ở nơi khác (vd. trong process pool)"""
+        self._save(name, model, fp, meta, seconds)
+        self.trained.append(name)
+
+    def update_meta(self, name, **meta):
+        """Bổ sung thông tin (vd. danh sách feature, scaler đi kèm) cho model đã lưu"""
+        entry = self.index[name]
+        if any(entry['meta'].get(k) != v for k, v in meta.items()):
+            entry['meta'].update(meta)
+            self._write_index()
+        return entry['meta']
+
+    def fit_or_load(self, name, estimator, X, y, X_eval=None, y_eval=None, evaluate=None):
+        """
+        Train estimator trên (X, y) nếu chưa có bản lưu cùng fingerprint.
+        evaluate(model, X_eval, y_eval) -> dict điểm đánh giá, được lưu cùng model.
+        Trả về (model, meta): model là LazyModel nếu dùng lại bản đã lưu.
+        """
+        fp = fingerprint(estimator, X, y, X_eval, y_eval)
+        found = self.cached(name, fp)
+        if found is not None:
+            model, entry = found
+            return model, entry['meta']
+
+        start = time.perf_counter()
+        estimator.fit(X, y)
+        seconds = time.perf_counter() - start
+        meta = evaluate(estimator, X_eval, y_eval) if evaluate else {}
+        self.register(name, estimator, fp, meta, seconds)
+        return estimator, meta
+
+    def fit_transformer(self, name, transformer, X):
+        """Fit scaler / encoder (hoặc nạp lại bản đã lưu nếu dữ liệu không đổi)"""
+        fp = fingerprint(transformer, X)
+        entry = self._lookup(name, fp)
+        if entry is not None:
+            self.reused.append(name)
+            return joblib.load(self._path(name))
+
+        start = time.perf_counter()
+        transformer.fit(X)
+        self._save(name, transformer, fp, seconds=time.perf_counter() - start)
+        self.trained.append(name)
+        return transformer
+
+    def load(self, name):
+        """Nạp lazy một model đã lưu theo tên (không kiểm tra fingerprint)"""
+        if name not in self.index:
+            raise KeyError(f"Không có model '{name}' trong registry")
+        return LazyModel(self._path(name))
+
+    def meta(self, name):
+        return self.index[name]['meta']
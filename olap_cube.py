@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+OLAP Cube
+Materialize một lần các aggregate sum / count / min / max theo tổ hợp chiều
+brand x current_seller x fulfillment_type x price_segment x category (base cuboid),
+sau đó trả lời roll-up, drill-down, slice, dice và pivot từ các aggregate này
+thay vì groupby lại trên dữ liệu gốc.
+
+Các cuboid con (roll-up) được tính từ cuboid nhỏ nhất đã có chứa đủ chiều
+và được cache lại, nên các truy vấn lặp lại chỉ tốn vài mili-giây.
+
+Ví dụ:
+    cube = OlapCube(df)
+    cube.query(['brand'], 'revenue', ['mean', 'sum', 'count'])
+    cube.drill_down(['brand'], 'fulfillment_type', 'revenue')
+    cube.slice('fulfillment_type', 'tiki_delivery').top('brand', 'revenue', 5)
+    cube.pivot('brand', 'fulfillment_type', 'revenue', where={'brand': top5})
+"""
+
+import time
+
+import pandas as pd
+
+DIMENSIONS = ['brand', 'current_seller', 'fulfillment_type', 'price_segment', 'category']
+MEASURES = ['revenue', 'price', 'quantity_sold', 'rating_average', 'review_count', 'favourite_count']
+
+
+class OlapCube:
+    """Cube aggregate dựng sẵn trên DataFrame sản phẩm"""
+
+    def __init__(self, df=None, dimensions=None, measures=None, base=None):
+        self.dimensions = list(dimensions or DIMENSIONS)
+        self.measures = list(measures or MEASURES)
+        self.build_seconds = 0.0
+        self.source_rows = 0
+
+        if base is None:
+            start = time.perf_counter()
+            self.source_rows = len(df)
+            base = self._materialize(df)
+            self.build_seconds = time.perf_counter() - start
+        self.base = base
+        self._cuboids = {tuple(self.dimensions): base}
+
+    # ------------------------------------------------------------------
+    # Materialize
+    # ------------------------------------------------------------------
+    def _materialize(self, df):
+        frame = pd.DataFrame(index=df.index)
+        for dim in self.dimensions:
+            # Categorical để groupby nhanh; thứ tự categories giống groupby trên dữ liệu gốc
+            if isinstance(df[dim].dtype, pd.CategoricalDtype):
+                # categories từ dictionary Arrow theo thứ tự xuất hiện -> sắp lại
+                categories = df[dim].cat.categories
+                frame[dim] = df[dim].cat.reorder_categories(sorted(categories, key=str))
+            else:
+                values = df[dim].astype(object)
+                frame[dim] = pd.Categorical(values, categories=sorted(values.dropna().unique(), key=str))
+        for m in self.measures:
+            frame[m] = df[m]
+
+        spec = {}
+        for m in self.measures:
+            spec[f'{m}_sum'] = (m, 'sum')
+            spec[f'{m}_count'] = (m, 'count')
+            spec[f'{m}_min'] = (m, 'min')
+            spec[f'{m}_max'] = (m, 'max')
+        spec['row_count'] = (self.measures[0], 'size')
+
+        grouped = frame.groupby(self.dimensions, observed=True, dropna=False, sort=True)
+        return grouped.agg(**spec).reset_index()
+
+    def _canonical(self, dims):
+        unknown = [d for d in dims if d not in self.dimensions]
+        if unknown:
+            raise KeyError(f"Chiều không có trong cube: {unknown}")
+        return tuple(d for d in self.dimensions if d in dims)
+
+    def cuboid(self, dims):
+        """Aggregate theo tập chiều dims (tính từ cuboid nhỏ nhất đã có và cache lại)"""
+        key = self._canonical(dims)
+        if key in self._cuboids:
+            return self._cuboids[key]
+
+        parents = [(len(c), k) for k, c in self._cuboids.items() if set(key) <= set(k)]
+        parent = self._cuboids[min(parents)[1]]
+        cub = _regroup(parent, list(key), self.measures)
+        self._cuboids[key] = cub
+        return cub
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def query(self, dims, measure, aggs=('sum',), where=None):
+        """
+        Trả về DataFrame index theo dims, mỗi cột là một aggregate của measure.
+        aggs: sum, count, mean, min, max, size (số dòng gốc)
+        where: {dim: giá trị hoặc list giá trị} để lọc trước khi aggregate
+        """
+        if isinstance(aggs, str):
+            aggs = [aggs]
+        cube = self.dice(**where) if where else self
+        dims = list(dims)
+        cub = cube.cuboid(dims)
+        if dims:
+            cub = cub.dropna(subset=dims).set_index(dims)
+            if tuple(dims) != cube._canonical(dims):
+                # cuboid sắp theo thứ tự chiều của cube -> sắp lại theo thứ tự dims như groupby
+                cub = cub.sort_index()
+
+        result = pd.DataFrame(index=cub.index)
+        for agg in aggs:
+            if agg == 'mean':
+                result[agg] = cub[f'{measure}_sum'] / cub[f'{measure}_count']
+            elif agg == 'size':
+                result[agg] = cub['row_count']
+            else:
+                result[agg] = cub[f'{measure}_{agg}']
+        if dims:
+            result.index = _plain_index(result.index)
+        return result
+
+    def rollup(self, dims, dim, measure, aggs=('sum',), where=None):
+        """Bỏ chiều dim khỏi dims và tổng hợp lên mức cao hơn"""
+        return self.query([d for d in dims if d != dim], measure, aggs, where)
+
+    def drill_down(self, dims, dim, measure, aggs=('sum',), where=None):
+        """Thêm chiều dim vào dims để đi xuống mức chi tiết hơn"""
+        return self.query(list(dims) + [d for d in [dim] if d not in dims], measure, aggs, where)
+
+    def slice(self, dim, value):
+        """Cố định một chiều = value, trả về cube con không còn chiều đó"""
+        dims = [d for d in self.dimensions if d != dim]
+        base = self.base[self.base[dim] == value]
+        return OlapCube(dimensions=dims, measures=self.measures,
+                        base=_regroup(base, dims, self.measures))
+
+    def dice(self, **filters):
+        """Lọc nhiều chiều cùng lúc: dice(brand=['oem', 'sakos'], price_segment='<100k')"""
+        mask = pd.Series(True, index=self.base.index)
+        for dim, values in filters.items():
+            if dim not in self.dimensions:
+                raise KeyError(f"Chiều không có trong cube: {dim}")
+            if isinstance(values, (list, tuple, set, pd.Index, pd.Series)):
+                mask &= self.base[dim].isin(list(values))
+            else:
+                mask &= self.base[dim] == values
+        return OlapCube(dimensions=self.dimensions, measures=self.measures,
+                        base=self.base[mask].reset_index(drop=True))
+
+    def pivot(self, index, columns, measure, aggfunc='sum', where=None, fill_value=0):
+        """Pivot table index x columns từ cuboid 2 chiều"""
+        result = self.query([index, columns], measure, [aggfunc], where=where)[aggfunc]
+        return result.unstack(columns, fill_value=fill_value).sort_index().sort_index(axis=1)
+
+    def top(self, dim, measure, n=10, agg='sum', where=None):
+        """n giá trị của dim có aggregate lớn nhất"""
+        return self.query([dim], measure, [agg], where=where)[agg].nlargest(n)
+
+
+def _regroup(cuboid, dims, measures):
+    """Gộp một cuboid lên tập chiều dims (sum của sum/count, min của min, max của max)"""
+    spec = {}
+    for m in measures:
+        spec[f'{m}_sum'] = (f'{m}_sum', 'sum')
+        spec[f'{m}_count'] = (f'{m}_count', 'sum')
+        spec[f'{m}_min'] = (f'{m}_min', 'min')
+        spec[f'{m}_max'] = (f'{m}_max', 'max')
+    spec['row_count'] = ('row_count', 'sum')
+    if not dims:
+        # Cuboid rỗng (apex): một dòng tổng toàn bộ
+        return pd.DataFrame([{name: cuboid[column].agg(func) for name, (column, func) in spec.items()}])
+    return cuboid.groupby(dims, observed=True, dropna=False, sort=True).agg(**spec).reset_index()
+
+
+def _plain_index(index):
+    """Chuyển index categorical về giá trị thường (giống kết quả groupby trên dữ liệu gốc)"""
+    if isinstance(index, pd.MultiIndex):
+        return pd.MultiIndex.from_arrays(
+            [index.get_level_values(i).astype(object) for i in range(index.nlevels)],
+            names=index.names)
+    return pd.Index(index.astype(object), name=index.name)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Online Clustering
+Gán cluster cho sản phẩm mới mà không fit lại KMeans trên toàn catalog:
+  - Khởi tạo từ model KMeans + StandardScaler của part 3 trong ModelRegistry
+  - Giữ tâm cụm (theo đơn vị gốc) và thống kê scaler (mean / variance / số dòng)
+    dạng running, cập nhật theo từng mini-batch (Chan / Welford, không giữ dữ liệu cũ)
+  - assign(): O(k) mỗi sản phẩm (khoảng cách tới k tâm cụm trong không gian đã chuẩn hóa)
+  - partial_fit(): gán + cập nhật tâm cụm kiểu mini-batch KMeans (learning rate 1/count,
+    count bị chặn ở max_count để tâm cụm vẫn theo kịp dữ liệu mới)
+  - Drift: khoảng cách trung bình tới tâm cụm (EWMA) vượt drift_threshold lần mức lúc fit,
+    hoặc mean của feature lệch quá mean_shift_threshold độ lệch chuẩn
+    -> fit lại KMeans trên reservoir sample trong thread nền; trong lúc đó vẫn gán
+    bằng tâm cụm cũ. Tâm cụm mới được ghép với tâm cũ (Hungarian) để giữ nguyên mã cluster.
+Dùng được cho cả batch (DataFrame / mảng lớn) và streaming (streaming_ingest.py).
+
+Ví dụ:
+    clusterer = load_clusterer(ModelRegistry())
+    labels = clusterer.partial_fit(batch_df)
+    clusterer.save(registry)
+    python online_clustering.py --chunk-size 500 --drift-factor 3
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+
+import columnar_store
+from model_registry import ModelRegistry
+
+BASE_MODEL = 'clustering/kmeans'
+ONLINE_MODEL = 'clustering/online'
+CATALOG_CSV = 'data/clean/products_clean.csv'
+
+DEFAULT_DRIFT_THRESHOLD = 1.5
+DEFAULT_MEAN_SHIFT_THRESHOLD = 0.5
+DEFAULT_MAX_COUNT = 10000
+DEFAULT_RESERVOIR_SIZE = 20000
+# Số dòng tối thiểu giữa 2 lần fit lại (tránh fit liên tục khi drift kéo dài)
+DEFAULT_MIN_REFIT_ROWS = 2000
+# Hệ số EWMA cho khoảng cách / mean của các batch gần đây
+EWMA_ALPHA = 0.2
+
+
+def _merge_stats(n, mean, var, batch):
+    """Gộp (n, mean, var) với một batch (Chan et al.) - var là phương sai tổng thể"""
+    n_b = len(batch)
+    mean_b = batch.mean(axis=0)
+    var_b = batch.var(axis=0)
+    total = n + n_b
+    delta = mean_b - mean
+    new_mean = mean + delta * n_b / total
+    m2 = var * n + var_b * n_b + delta ** 2 * n * n_b / total
+    return total, new_mean, m2 / total
+
+
+def _scale(var):
+    scale = np.sqrt(var)
+    return np.where(scale > 0, scale, 1.0)
+
+
+class OnlineClusterer:
+    """Tâm cụm + thống kê scaler dạng running, cập nhật theo mini-batch, tự fit lại khi drift"""
+
+    def __init__(self, centers, mean, var, n_seen, counts, features, baseline_cost,
+                 drift_threshold=DEFAULT_DRIFT_THRESHOLD,
+                 mean_shift_threshold=DEFAULT_MEAN_SHIFT_THRESHOLD,
+                 max_count=DEFAULT_MAX_COUNT, reservoir_size=DEFAULT_RESERVOIR_SIZE,
+                 min_refit_rows=DEFAULT_MIN_REFIT_ROWS, background=True, random_state=42):
+        self.centers = np.asarray(centers, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.var = np.asarray(var, dtype=float)
+        self.n_seen = int(n_seen)
+        self.counts = np.asarray(counts, dtype=float)
+        self.features = list(features)
+        self.drift_threshold = drift_threshold
+        self.mean_shift_threshold = mean_shift_threshold
+        self.max_count = max_count
+        self.reservoir_size = reservoir_size
+        self.min_refit_rows = min_refit_rows
+        self.background = background
+        self.random_state = random_state
+        self.rng = np.random.RandomState(random_state)
+
+        self._set_baseline(baseline_cost)
+        self.reservoir = np.empty((0, len(self.features)))
+        self.reservoir_seen = 0
+        self.rows_since_refit = 0
+        self.refits = 0
+        self.drift_events = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = None
+
+    @property
+    def n_clusters(self):
+        return len(self.centers)
+
+    def _set_baseline(self, cost):
+        self.baseline_cost = float(cost)
+        self.baseline_mean = self.mean.copy()
+        self.baseline_scale = _scale(self.var)
+        self.recent_cost = self.baseline_cost
+        self.recent_mean = self.mean.copy()
+
+    def _matrix(self, X):
+        if isinstance(X, pd.DataFrame):
+            return np.column_stack([
+                pd.to_numeric(X[f], errors='coerce').fillna(0).to_numpy(dtype=float)
+                if f in X else np.zeros(len(X)) for f in self.features])
+        return np.asarray(X, dtype=float)
+
+    def _distances(self, X):
+        """Bình phương khoảng cách (đã chuẩn hóa) tới từng tâm cụm: n x k"""
+        scale = _scale(self.var)
+        return (((X[:, None, :] - self.centers[None, :, :]) / scale) ** 2).sum(axis=2)
+
+    def assign(self, X):
+        """Mã cluster cho từng dòng (không cập nhật model)"""
+        self._apply_refit()
+        X = self._matrix(X)
+        if not len(X):
+            return np.empty(0, dtype=np.intp)
+        return self._distances(X).argmin(axis=1)
+
+    def partial_fit(self, X):
+        """Gán cluster cho batch rồi cập nhật scaler, tâm cụm, reservoir và kiểm tra drift"""
+        self._apply_refit()
+        X = self._matrix(X)
+        if not len(X):
+            return np.empty(0, dtype=np.intp)
+        with self._lock:
+            distances = self._distances(X)
+            labels = distances.argmin(axis=1)
+            cost = distances[np.arange(len(X)), labels].mean()
+
+            self.n_seen, self.mean, self.var = _merge_stats(self.n_seen, self.mean, self.var, X)
+            self._update_centers(X, labels)
+            self._sample(X)
+
+        self.rows_since_refit += len(X)
+        self.recent_cost = EWMA_ALPHA * cost + (1 - EWMA_ALPHA) * self.recent_cost
+        self.recent_mean = EWMA_ALPHA * X.mean(axis=0) + (1 - EWMA_ALPHA) * self.recent_mean
+        reason = self.drift()
+        if reason and self.rows_since_refit >= self.min_refit_rows and self._thread is None:
+            self.drift_events.append({'rows': self.n_seen, 'reason': reason,
+                                      'time': time.time()})
+            self.refit()
+        return labels
+
+    def _update_centers(self, X, labels):
+        k = self.n_clusters
+        batch_counts = np.bincount(labels, minlength=k).astype(float)
+        sums = np.zeros_like(self.centers)
+        for j in range(X.shape[1]):
+            sums[:, j] = np.bincount(labels, weights=X[:, j], minlength=k)
+        counts = np.minimum(self.counts, self.max_count) + batch_counts
+        hit = batch_counts > 0
+        self.centers[hit] += (sums[hit] - batch_counts[hit, None] * self.centers[hit]) / counts[hit, None]
+        self.counts = counts
+
+    def _sample(self, X):
+        """Reservoir sampling (Algorithm R, vector hóa) để có mẫu đại diện khi fit lại"""
+        free = self.reservoir_size - len(self.reservoir)
+        if free > 0:
+            self.reservoir = np.vstack([self.reservoir, X[:free]])
+        rest = X[max(free, 0):]
+        if len(rest):
+            seen = self.reservoir_seen + max(free, 0) + np.arange(len(rest))
+            slots = self.rng.randint(0, seen + 1)
+            keep = slots < self.reservoir_size
+            self.reservoir[slots[keep]] = rest[keep]
+        self.reservoir_seen += len(X)
+
+    def drift(self):
+        """Lý do drift (chuỗi) hoặc None"""
+        if self.recent_cost > self.drift_threshold * self.baseline_cost:
+            return f'cost {self.recent_cost:.2f} > {self.drift_threshold} x {self.baseline_cost:.2f}'
+        shift = np.abs(self.recent_mean - self.baseline_mean) / self.baseline_scale
+        if shift.max() > self.mean_shift_threshold:
+            return f"mean shift {shift.max():.2f} std ({self.features[int(shift.argmax())]})"
+        return None
+
+    def refit(self):
+        """Fit lại KMeans trên reservoir (trong thread nền nếu background=True)"""
+        with self._lock:
+            data = self.reservoir.copy()
+            mean, scale = self.mean.copy(), _scale(self.var)
+            old_centers = self.centers.copy()
+        self.rows_since_refit = 0
+        if len(data) < self.n_clusters:
+            return
+        if self.background:
+            self._thread = threading.Thread(target=self._refit_job, args=(data, mean, scale, old_centers),
+                                            daemon=True)
+            self._thread.start()
+        else:
+            self._refit_job(data, mean, scale, old_centers)
+            self._apply_refit()
+
+    def _refit_job(self, data, mean, scale, old_centers):
+        Z = (data - mean) / scale
+        model = KMeans(n_clusters=self.n_clusters, random_state=self.random_state).fit(Z)
+        # Ghép tâm mới với tâm cũ để mã cluster không bị đổi chỗ
+        cost = (((model.cluster_centers_[:, None, :] - (old_centers[None, :, :] - mean) / scale)) ** 2).sum(axis=2)
+        new_idx, old_idx = linear_sum_assignment(cost)
+        order = new_idx[np.argsort(old_idx)]
+        centers = model.cluster_centers_[order] * scale + mean
+        remap = np.empty(self.n_clusters, dtype=np.intp)
+        remap[order] = np.arange(self.n_clusters)
+        counts = np.bincount(remap[model.labels_], minlength=self.n_clusters)
+        self._pending = (centers, counts, model.inertia_ / len(Z))
+
+    def _apply_refit(self):
+        """Dùng kết quả fit lại nếu thread nền đã xong"""
+        if self._pending is None:
+            return
+        with self._lock:
+            centers, counts, cost = self._pending
+            self.centers, self.counts = centers, counts.astype(float)
+            self._set_baseline(cost)
+            self._pending = None
+            self._thread = None
+            self.refits += 1
+
+    def wait(self):
+        """Chờ lần fit lại đang chạy (nếu có) và áp dụng kết quả"""
+        if self._thread is not None:
+            self._thread.join()
+        self._apply_refit()
+
+    # ------------------------------------------------------------------
+    # Lưu / nạp
+    # ------------------------------------------------------------------
+
+    def state(self):
+        return {
+            'centers': self.centers, 'mean': self.mean, 'var': self.var, 'n_seen': self.n_seen,
+            'counts': self.counts, 'features': self.features, 'baseline_cost': self.baseline_cost,
+            'reservoir': self.reservoir, 'reservoir_seen': self.reservoir_seen, 'refits': self.refits,
+        }
+
+    @classmethod
+    def from_state(cls, state, **kwargs):
+        clusterer = cls(state['centers'], state['mean'], state['var'], state['n_seen'],
+                        state['counts'], state['features'], state['baseline_cost'], **kwargs)
+        clusterer.reservoir = state['reservoir']
+        clusterer.reservoir_seen = state['reservoir_seen']
+        clusterer.refits = state['refits']
+        return clusterer
+
+    @classmethod
+    def from_registry(cls, registry, key=BASE_MODEL, **kwargs):
+        """Khởi tạo từ KMeans + StandardScaler đã lưu bởi part 3"""
+        meta = registry.meta(key)
+        kmeans = registry.load(key).model
+        scaler = registry.load(meta['scaler']).model
+        centers = kmeans.cluster_centers_ * scaler.scale_ + scaler.mean_
+        counts = np.bincount(kmeans.labels_, minlength=len(centers))
+        return cls(centers, scaler.mean_, scaler.var_, scaler.n_samples_seen_, counts,
+                   meta['features'], kmeans.inertia_ / len(kmeans.labels_), **kwargs)
+
+    def save(self, registry, key=ONLINE_MODEL, base=BASE_MODEL):
+        """Lưu trạng thái vào registry, gắn với fingerprint của model KMeans gốc"""
+        self.wait()
+        base_fp = registry.index[base]['fingerprint']
+        registry.register(key, self.state(), f'{base_fp}:{self.n_seen}',
+                          meta={'base': base_fp, 'features': self.features, 'n_seen': self.n_seen,
+                                'refits': self.refits})
+
+
+def load_clusterer(registry, key=ONLINE_MODEL, base=BASE_MODEL, **kwargs):
+    """
+    Trạng thái online đã lưu nếu còn ứng với model KMeans hiện tại của part 3,
+    ngược lại khởi tạo lại từ model đó
+    """
+    entry = registry.index.get(key)
+    if entry and entry['meta'].get('base') == registry.index.get(base, {}).get('fingerprint'):
+        return OnlineClusterer.from_state(registry.load(key).model, **kwargs)
+    return OnlineClusterer.from_registry(registry, base, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gán cluster tăng dần cho catalog theo mini-batch')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--drift-factor', type=float, default=1.0,
+                        help='Nhân giá nửa sau catalog với hệ số này để mô phỏng drift')
+    parser.add_argument('--save', action='store_true', help='Lưu trạng thái vào registry')
+    args = parser.parse_args()
+
+    print("🔄 ONLINE CLUSTERING")
+    print("=" * 60)
+    registry = ModelRegistry()
+    try:
+        clusterer = load_clusterer(registry)
+    except KeyError as e:
+        print(f"❌ Thiếu model trong registry ({e}) - hãy chạy part3_olap_datamining.py trước")
+        return
+
+    if columnar_store.store_exists():
+        df = columnar_store.read_table(clusterer.features)
+    else:
+        df = pd.read_csv(CATALOG_CSV, usecols=clusterer.features, on_bad_lines='skip')
+    X = clusterer._matrix(df)
+    if args.drift_factor != 1.0:
+        X[len(X) // 2:, clusterer.features.index('price')] *= args.drift_factor
+
+    start = time.perf_counter()
+    labels = np.concatenate([clusterer.partial_fit(X[i:i + args.chunk_size])
+                             for i in range(0, len(X), args.chunk_size)])
+    clusterer.wait()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Đã gán {len(labels):,} sản phẩm trong {elapsed:.2f}s "
+          f"({len(labels) / elapsed:,.0f} dòng/giây), {clusterer.refits} lần fit lại")
+    for event in clusterer.drift_events:
+        print(f"   Drift tại dòng {event['rows']:,}: {event['reason']}")
+    print(f"   Phân bố: {np.bincount(labels, minlength=clusterer.n_clusters).tolist()}")
+    if args.save:
+        clusterer.save(registry)
+        print(f"   Đã lưu trạng thái: '{ONLINE_MODEL}'")
+
+
+if __name__ == "__main__":
+    main()
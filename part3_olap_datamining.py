@@ -1,10 +1,10 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use('Agg')  # chay batch khong can man hinh, khong bao gio bi chan boi plt.show()
 import seaborn as sns
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.cluster import KMeans, DBSCAN
-from sklearn.metrics import silhouette_score, mean_squared_error, r2_score, classification_report, accuracy_score
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import mean_squared_error, r2_score, classification_report, accuracy_score
 from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier, GradientBoostingRegressor
 from sklearn.neural_network import MLPRegressor, MLPClassifier
@@ -15,18 +15,55 @@ from sklearn.neighbors import KNeighborsRegressor, KNeighborsClassifier
 import warnings
 warnings.filterwarnings('ignore')
 
+import os
+
+import chart_rendering
+import columnar_store
+import instrumentation
+from categorical_encoding import make_encoder
+from cluster_selection import select_k, compare_with_exact
+from density_clustering import ScalableDBSCAN, estimate_eps, sampled_silhouette
+from model_registry import ModelRegistry, fingerprint
+from training_scheduler import TrainingScheduler
+from olap_cube import OlapCube
+from product_dedup import GROUPS_FILE
+from query_cache import QueryCache, DEFAULT_CACHE_DIR, file_version
+
+# Moi phan la mot section cua instrumentation (PIPELINE_PROFILE=cpu,memory de bat cProfile / tracemalloc)
+metrics = instrumentation.configure('part3')
+
 print("=== PHAN 3. AP DUNG CONG CU / THUAT TOAN ===")
+metrics.section('load')
 print("Dang tai du lieu sach...")
 
-# Doc du lieu da duoc lam sach
-try:
-    df = pd.read_csv('data/clean/products_clean.csv', encoding='utf-8', low_memory=False, 
-                     error_bad_lines=False, warn_bad_lines=False, engine='python')
-except:
-    # Neu loi, thu doc voi cac tham so khac
-    df = pd.read_csv('data/clean/products_clean.csv', encoding='utf-8', 
-                     on_bad_lines='skip', engine='python')
+# Cac cot can cho phan 3 (khong doc name/description)
+PART3_COLUMNS = ['id', 'price', 'original_price', 'quantity_sold', 'rating_average', 'review_count',
+                 'favourite_count', 'brand', 'current_seller', 'category', 'fulfillment_type',
+                 'price_segment', 'discount_rate']
+
+# Doc du lieu da duoc lam sach: uu tien columnar store (memory-map + chi doc cot can dung)
+if columnar_store.store_exists():
+    df = columnar_store.read_table(PART3_COLUMNS)
+    data_file = os.path.join(columnar_store.STORE_DIR, columnar_store.BASE_FILE)
+    print(f"Doc tu columnar store: '{columnar_store.STORE_DIR}'")
+else:
+    data_file = 'data/clean/products_clean.csv'
+    try:
+        df = pd.read_csv('data/clean/products_clean.csv', encoding='utf-8', low_memory=False, 
+                         error_bad_lines=False, warn_bad_lines=False, engine='python')
+    except:
+        # Neu loi, thu doc voi cac tham so khac
+        df = pd.read_csv('data/clean/products_clean.csv', encoding='utf-8', 
+                         on_bad_lines='skip', engine='python')
+
+# Khoa san pham that (product_dedup.py): cac listing gan trung cua nhieu seller chung mot product_group
+if columnar_store.store_exists() and 'product_group' in columnar_store.derived_columns():
+    df['product_group'] = columnar_store.read_table(['product_group'])['product_group'].to_numpy()
+elif os.path.exists(GROUPS_FILE):
+    groups = pd.read_csv(GROUPS_FILE, usecols=['id', 'product_group']).drop_duplicates('id')
+    df['product_group'] = df['id'].map(groups.set_index('id')['product_group']).fillna(df['id']).astype('int64')
 print(f"Da tai {len(df):,} san pham tu du lieu sach")
+metrics.section('olap', rows=len(df))
 
 # ========================================
 # 3.1. KY THUAT OLAP / VISUALIZATION
@@ -38,86 +75,89 @@ print("=" * 60)
 df['revenue'] = df['price'] * df['quantity_sold']
 print(f"Da tinh doanh thu cho {len(df)} san pham")
 
+# Cac query OLAP doc tu cube aggregate (dung 1 lan) thay vi groupby lai tren df.
+# Ket qua duoc cache theo version cua file du lieu: chay lai khi du lieu chua doi
+# se lay tu cache, khong can dung cube.
+cube = None
+olap_cache = QueryCache(disk_dir=DEFAULT_CACHE_DIR)
+# Bieu do ve song song o worker, chart co du lieu khong doi thi bo qua
+charts = chart_rendering.ChartRenderer()
+data_version = file_version(data_file)
+
+
+def olap(method, *args, **kwargs):
+    """Goi cube.<method>(...) qua query cache"""
+    def run():
+        global cube
+        if cube is None:
+            cube = OlapCube(df)
+            print(f"Da dung OLAP cube: {len(cube.base):,} o (cell) tu {cube.source_rows:,} dong, "
+                  f"{cube.build_seconds * 1000:.0f} ms")
+        return getattr(cube, method)(*args, **kwargs)
+    # copy() de cac buoc sau doi ten cot khong lam hong ket qua trong cache
+    return olap_cache.get_or_compute(('olap', method, args, sorted(kwargs.items())),
+                                     data_version, run).copy()
+
+
 # OLAP Query 1: Doanh thu trung binh theo brand
 print("\n\nOLAP Query 1: Doanh thu trung binh theo brand")
-revenue_by_brand = df.groupby('brand')['revenue'].agg(['mean', 'sum', 'count']).round(0)
+revenue_by_brand = olap('query', ['brand'], 'revenue', ['mean', 'sum', 'count']).round(0)
 revenue_by_brand.columns = ['Doanh_thu_TB', 'Tong_doanh_thu', 'So_san_pham']
 top_brands = revenue_by_brand.sort_values('Tong_doanh_thu', ascending=False).head(10)
 print(top_brands)
 
 # OLAP Query 2: Trung binh rating_average theo fulfillment_type
 print("\nOLAP Query 2: Trung binh rating theo fulfillment_type")
-rating_by_fulfillment = df.groupby('fulfillment_type')['rating_average'].agg(['mean', 'count']).round(2)
+rating_by_fulfillment = olap('query', ['fulfillment_type'], 'rating_average', ['mean', 'count']).round(2)
 rating_by_fulfillment.columns = ['Rating_TB', 'So_san_pham']
 print(rating_by_fulfillment)
 
 # OLAP Query 3: San pham duoc yeu thich nhat theo price_segment
 print("\nOLAP Query 3: Favourite_count trung binh theo price_segment")
-favourite_by_segment = df.groupby('price_segment')['favourite_count'].agg(['mean', 'sum', 'count']).round(1)
+favourite_by_segment = olap('query', ['price_segment'], 'favourite_count', ['mean', 'sum', 'count']).round(1)
 favourite_by_segment.columns = ['Favourite_TB', 'Tong_favourite', 'So_san_pham']
 print(favourite_by_segment)
 
 # Pivot Table: Doanh thu theo brand va fulfillment_type
 print("\nPivot Table: Doanh thu theo brand va fulfillment_type (Top 5 brands)")
-top5_brands = df.groupby('brand')['revenue'].sum().nlargest(5).index
-df_top5 = df[df['brand'].isin(top5_brands)]
-pivot_revenue = df_top5.pivot_table(
-    values='revenue', 
-    index='brand', 
-    columns='fulfillment_type', 
-    aggfunc='sum', 
-    fill_value=0
-).round(0)
+top5_brands = olap('top', 'brand', 'revenue', 5).index
+pivot_revenue = olap('pivot', 'brand', 'fulfillment_type', 'revenue', aggfunc='sum',
+                     where={'brand': list(top5_brands)}).round(0)
 print(pivot_revenue)
 
+# OLAP Query 4: Gop cac listing gan trung thanh san pham that (product_group)
+if 'product_group' in df.columns:
+    print("\nOLAP Query 4: Doanh thu theo san pham that (gop listing gan trung)")
+    real_products = df.groupby('product_group').agg(
+        So_listing=('id', 'size'), So_seller=('current_seller', 'nunique'),
+        Tong_doanh_thu=('revenue', 'sum'), Gia_min=('price', 'min'), Gia_max=('price', 'max'))
+    print(f"{len(df):,} listing -> {len(real_products):,} san pham that "
+          f"({(real_products['So_seller'] > 1).sum():,} san pham ban boi nhieu seller)")
+    print(real_products[real_products['So_listing'] > 1]
+          .sort_values('Tong_doanh_thu', ascending=False).head(10).round(0))
+
 print("\nDang tao bieu do OLAP...")
 
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-fig.suptitle('PHAN TICH OLAP - BUSINESS INTELLIGENCE', fontsize=16, fontweight='bold', y=1.08)
-
-# 1. Bar chart: Top 10 thuong hieu co doanh thu cao nhat
-top_10_brands = df.groupby('brand')['revenue'].sum().nlargest(10)
-axes[0, 0].bar(range(len(top_10_brands)), top_10_brands.values, color='skyblue')
-axes[0, 0].set_title('Top 10 Thuong hieu - Tong Doanh thu', fontweight='bold')
-axes[0, 0].set_xlabel('Thuong hieu')
-axes[0, 0].set_ylabel('Doanh thu (VND)')
-axes[0, 0].tick_params(axis='x', rotation=45)
-axes[0, 0].set_xticks(range(len(top_10_brands)))
-axes[0, 0].set_xticklabels(top_10_brands.index, rotation=45, ha='right')
-
-# 2. Scatter plot: Gia vs Rating vs So luong ban
-scatter = axes[0, 1].scatter(df['price']/1000, df['rating_average'], 
-                           s=df['quantity_sold']*2, alpha=0.6, c=df['revenue']/1000, cmap='viridis')
-axes[0, 1].set_title('Gia vs Rating (size=quantity, color=revenue)', fontweight='bold')
-axes[0, 1].set_xlabel('Gia (nghin VND)')
-axes[0, 1].set_ylabel('Rating Average')
-plt.colorbar(scatter, ax=axes[0, 1], label='Revenue (nghin VND)')
-
-# 3. Boxplot: Rating theo fulfillment_type
-fulfillment_data = [df[df['fulfillment_type'] == ft]['rating_average'].values 
-                   for ft in df['fulfillment_type'].unique()]
-fulfillment_labels = df['fulfillment_type'].unique()
-axes[1, 0].boxplot(fulfillment_data, labels=fulfillment_labels)
-axes[1, 0].set_title('So sanh Rating theo Fulfillment Type', fontweight='bold')
-axes[1, 0].set_xlabel('Fulfillment Type')
-axes[1, 0].set_ylabel('Rating Average')
-axes[1, 0].tick_params(axis='x', rotation=45)
-
-# 4. Doanh thu theo price_segment
-segment_revenue = df.groupby('price_segment')['revenue'].sum()
-axes[1, 1].pie(segment_revenue.values, labels=segment_revenue.index, autopct='%1.1f%%', startangle=90)
-axes[1, 1].set_title('Phan bo Doanh thu theo Price Segment', fontweight='bold')
-
-plt.tight_layout()
-plt.tight_layout(rect=[0, 0, 1, 0.96])
-plt.savefig('data/clean/olap_analysis.png', dpi=300, bbox_inches='tight')
-plt.show()
-
-print("Da luu bieu do OLAP: 'data/clean/olap_analysis.png'")
+# Chi chuan bi du lieu da tong hop, viec ve + luu PNG chay o worker (headless)
+top_10_brands = olap('top', 'brand', 'revenue', 10)
+segment_revenue = olap('query', ['price_segment'], 'revenue', 'sum')['sum']
+charts.submit(chart_rendering.olap_dashboard, {
+    'top_brands': (top_10_brands.index.tolist(), top_10_brands.to_numpy()),
+    'price_rating': chart_rendering.scatter_points(
+        df, ['price', 'rating_average', 'quantity_sold', 'revenue'],
+        scale={'price': 1000, 'revenue': 1000}),
+    'fulfillment_box': chart_rendering.box_stats(df['rating_average'], df['fulfillment_type']),
+    'segment_revenue': (segment_revenue.index.tolist(), segment_revenue.to_numpy()),
+}, 'data/clean/olap_analysis.png')
+
+cache_stats = olap_cache.stats()
+print(f"OLAP query cache: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+      f"(hit ratio {cache_stats['hit_ratio']:.0%})")
 
 # ========================================
 # 3.2. KY THUAT DATA MINING
 # ========================================
+metrics.section('clustering', rows=len(df))
 print("\n3.2. KY THUAT DATA MINING - CLUSTERING")
 print("=" * 60)
 
@@ -130,30 +170,49 @@ X = X.fillna(0)  # Thay the NaN bang 0
 print("Thong ke du lieu truoc khi chuan hoa:")
 print(X.describe().round(2))
 
+# Model / scaler / encoder duoc luu trong registry (data/models) kem fingerprint du lieu +
+# hyperparameter: lan chay sau neu du lieu khong doi thi khong train lai
+registry = ModelRegistry()
+
 # Chuan hoa du lieu
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+scaler = registry.fit_transformer('clustering/scaler', StandardScaler(), X)
+X_scaled = scaler.transform(X)
 print("Da chuan hoa du lieu bang StandardScaler")
 
 # Tim so cluster toi uu bang Silhouette Score
+# (moi K fit 1 lan, song song; silhouette tinh tren mau toi da SILHOUETTE_SAMPLE_SIZE dong)
+SILHOUETTE_SAMPLE_SIZE = 10000
+# Chi so sanh voi silhouette chinh xac (O(n^2)) khi du lieu con nho
+EXACT_CHECK_MAX_ROWS = 50000
+
 print("\nTim so cluster toi uu:")
-silhouette_scores = []
 K_range = range(2, 8)
-
+selection = select_k(X_scaled, K_range, method='auto', sample_size=SILHOUETTE_SAMPLE_SIZE)
+silhouette_scores = [selection['scores'][k] for k in K_range]
 for k in K_range:
-    kmeans = KMeans(n_clusters=k, random_state=42)
-    cluster_labels = kmeans.fit_predict(X_scaled)
-    silhouette_avg = silhouette_score(X_scaled, cluster_labels)
-    silhouette_scores.append(silhouette_avg)
-    print(f"   K={k}: Silhouette Score = {silhouette_avg:.3f}")
+    print(f"   K={k}: Silhouette Score = {selection['scores'][k]:.3f}")
+print(f"   ({selection['method']}, silhouette tren {selection['sample_size']:,} dong, "
+      f"{selection['seconds']:.2f}s)")
 
 # Chon K tot nhat
-best_k = K_range[np.argmax(silhouette_scores)]
+best_k = selection['best_k']
 print(f"\nSo cluster toi uu: K = {best_k} (Silhouette Score = {max(silhouette_scores):.3f})")
 
-# Thuc hien clustering voi K toi uu
-final_kmeans = KMeans(n_clusters=best_k, random_state=42)
-df['cluster'] = final_kmeans.fit_predict(X_scaled)
+if selection['sample_size'] < len(X_scaled) <= EXACT_CHECK_MAX_ROWS:
+    check = compare_with_exact(X_scaled, selection)
+    print(f"   So voi silhouette chinh xac: K = {check['exact_best_k']} "
+          f"({'trung' if check['same_choice'] else 'khac'}), "
+          f"sai so lon nhat = {check['max_abs_error']:.3f}, regret = {check['regret']:.3f}")
+
+# Dung lai model cua K toi uu (khong fit lai)
+final_kmeans = selection['model']
+df['cluster'] = selection['labels']
+
+# Luu model KMeans de streaming_ingest.py gan cluster cho san pham moi
+kmeans_fp = fingerprint(final_kmeans, X_scaled)
+if registry.cached('clustering/kmeans', kmeans_fp) is None:
+    registry.register('clustering/kmeans', final_kmeans, kmeans_fp, seconds=selection['seconds'],
+                      meta={'features': clustering_features, 'scaler': 'clustering/scaler', 'k': best_k})
 
 print(f"\nPhan bo cluster:")
 cluster_counts = df['cluster'].value_counts().sort_index()
@@ -189,59 +248,29 @@ for i in range(best_k):
 
 print(f"\nDang tao bieu do Data Mining...")
 
-# Tao figure cho Data Mining visualization
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-fig.suptitle('PHAN TICH DATA MINING - CLUSTERING', fontsize=16, fontweight='bold')
-
-# 1. Scatter plot: Price vs Quantity_sold voi mau theo cluster
-colors = plt.cm.tab10(np.linspace(0, 1, best_k))
-for i in range(best_k):
-    cluster_data = df[df['cluster'] == i]
-    axes[0, 0].scatter(cluster_data['price']/1000, cluster_data['quantity_sold'], 
-                      c=colors[i], label=f'Cluster {i}', alpha=0.6)
-axes[0, 0].set_title('Gia vs So luong ban (theo Cluster)', fontweight='bold')
-axes[0, 0].set_xlabel('Gia (nghin VND)')
-axes[0, 0].set_ylabel('So luong ban')
-axes[0, 0].legend()
-
-# 2. Bieu do cot: Rating trung binh theo cluster
 cluster_rating = df.groupby('cluster')['rating_average'].mean()
-axes[0, 1].bar(cluster_rating.index, cluster_rating.values, color=colors)
-axes[0, 1].set_title('Rating trung binh theo Cluster', fontweight='bold')
-axes[0, 1].set_xlabel('Cluster')
-axes[0, 1].set_ylabel('Rating Average')
-
-# 3. Bieu do cot: Gia trung binh theo cluster
 cluster_price = df.groupby('cluster')['price'].mean()
-axes[1, 0].bar(cluster_price.index, cluster_price.values/1000, color=colors)
-axes[1, 0].set_title('Gia trung binh theo Cluster', fontweight='bold')
-axes[1, 0].set_xlabel('Cluster')
-axes[1, 0].set_ylabel('Gia (nghin VND)')
-
-# 4. Scatter plot 3D-like: Price vs Rating voi size theo quantity_sold
-for i in range(best_k):
-    cluster_data = df[df['cluster'] == i]
-    axes[1, 1].scatter(cluster_data['price']/1000, cluster_data['rating_average'], 
-                      s=cluster_data['quantity_sold']*3, c=colors[i], 
-                      label=f'Cluster {i}', alpha=0.6)
-axes[1, 1].set_title('Gia vs Rating (size=quantity)', fontweight='bold')
-axes[1, 1].set_xlabel('Gia (nghin VND)')
-axes[1, 1].set_ylabel('Rating Average')
-axes[1, 1].legend()
-
-plt.tight_layout()
-plt.savefig('data/clean/clustering_analysis.png', dpi=300, bbox_inches='tight')
-plt.show()
-
-print("Da luu bieu do Clustering: 'data/clean/clustering_analysis.png'")
-
-# Luu ket qua clustering
-df.to_csv('data/clean/products_with_clusters.csv', index=False, encoding='utf-8')
-print("Da luu du lieu co cluster: 'data/clean/products_with_clusters.csv'")
+charts.submit(chart_rendering.clustering_dashboard, {
+    'k': best_k,
+    'points': chart_rendering.scatter_points(df, ['price', 'quantity_sold', 'rating_average'],
+                                             label='cluster', scale={'price': 1000}),
+    'cluster_rating': (cluster_rating.index.to_numpy(), cluster_rating.to_numpy()),
+    'cluster_price': (cluster_price.index.to_numpy(), cluster_price.to_numpy() / 1000),
+}, 'data/clean/clustering_analysis.png')
+
+
+# Luu ket qua clustering: chi ghi cot cluster vao columnar store thay vi ca bang
+if columnar_store.store_exists():
+    columnar_store.write_column('cluster', df['cluster'])
+    print(f"Da luu cot cluster: '{columnar_store.STORE_DIR}/derived/cluster.arrow'")
+else:
+    df.to_csv('data/clean/products_with_clusters.csv', index=False, encoding='utf-8')
+    print("Da luu du lieu co cluster: 'data/clean/products_with_clusters.csv'")
 
 # ========================================
 # 3.2.2. DBSCAN CLUSTERING
 # ========================================
+metrics.section('dbscan', rows=len(df))
 print("\n3.2.2. DBSCAN CLUSTERING - DENSITY-BASED CLUSTERING")
 print("=" * 60)
 
@@ -250,24 +279,17 @@ print("\nThuc hien DBSCAN clustering...")
 print("DBSCAN khong can chi dinh so cluster truoc, tu dong phat hien dua tren mat do")
 
 # Tim tham so eps va min_samples tot nhat
-from sklearn.neighbors import NearestNeighbors
-
-# Tim khoang cach den k-nearest neighbors
-neighbors = NearestNeighbors(n_neighbors=5)
-neighbors_fit = neighbors.fit(X_scaled)
-distances, indices = neighbors_fit.kneighbors(X_scaled)
-
-# Sap xep khoang cach
-distances = np.sort(distances[:, -1], axis=0)
-
-# Chon eps tu diem khuu cua do thi khoang cach (tam ung dung)
-eps = np.percentile(distances, 90)  # Chon percentile 90 lam eps
+# Khoang cach den k-nearest neighbors chi tinh tren mau toi da EPS_SAMPLE_SIZE diem (KD-tree)
+EPS_SAMPLE_SIZE = 20000
+# Chon eps tu diem khuu cua do thi khoang cach (tam ung dung): percentile 90
+eps = estimate_eps(X_scaled, n_neighbors=5, percentile=90, sample_size=EPS_SAMPLE_SIZE)
 min_samples = 5  # So mau toi thieu de tao mot cluster
 
 print(f"Tham so DBSCAN: eps={eps:.3f}, min_samples={min_samples}")
 
-# Chay DBSCAN
-dbscan = DBSCAN(eps=eps, min_samples=min_samples)
+# Chay DBSCAN: region query theo chunk tren KD-tree, bo nho khong tang theo n^2.
+# Model giu lai core points de gan san pham moi vao cluster (dbscan.predict) ma khong chay lai.
+dbscan = ScalableDBSCAN(eps=eps, min_samples=min_samples)
 df['dbscan_cluster'] = dbscan.fit_predict(X_scaled)
 
 # Thong ke ket qua DBSCAN
@@ -311,11 +333,10 @@ print(f"   - Moi diem deu duoc gan vao 1 cluster")
 print(f"\nDBSCAN:")
 print(f"   - So cluster: {n_clusters_dbscan} (tu dong phat hien)")
 if n_clusters_dbscan > 1:
-    # Chi tinh silhouette cho DBSCAN neu co it nhat 2 cluster (khong ke noise)
-    dbscan_data_for_silhouette = df[df['dbscan_cluster'] != -1]
-    if len(dbscan_data_for_silhouette) > 0:
-        X_scaled_for_silhouette = X_scaled[df['dbscan_cluster'] != -1]
-        dbscan_silhouette = silhouette_score(X_scaled_for_silhouette, dbscan_data_for_silhouette['dbscan_cluster'])
+    # Chi tinh silhouette cho DBSCAN neu co it nhat 2 cluster (khong ke noise), tren mau
+    dbscan_silhouette = sampled_silhouette(X_scaled, df['dbscan_cluster'].to_numpy(),
+                                           sample_size=SILHOUETTE_SAMPLE_SIZE)
+    if dbscan_silhouette is not None:
         print(f"   - Silhouette Score: {dbscan_silhouette:.3f} (khong ke noise)")
 print(f"   - Phat hien {n_noise:,} diem nhieu/ngoai le")
 print(f"   - Dua tren mat do du lieu, khong can chi dinh K")
@@ -323,79 +344,30 @@ print(f"   - Dua tren mat do du lieu, khong can chi dinh K")
 # Tao bieu do so sanh DBSCAN
 print(f"\nDang tao bieu do DBSCAN clustering...")
 
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-fig.suptitle('DBSCAN CLUSTERING ANALYSIS', fontsize=16, fontweight='bold')
-
-# Tao color map cho DBSCAN (noise co mau den)
-unique_dbscan_clusters = sorted(df['dbscan_cluster'].unique())
-dbscan_colors = plt.cm.tab10(np.linspace(0, 1, max(len(unique_dbscan_clusters), 10)))
-color_map = {cluster: 'gray' if cluster == -1 else dbscan_colors[cluster] for cluster in unique_dbscan_clusters}
-
-# 1. Scatter plot: Price vs Quantity_sold (DBSCAN)
-for cluster in unique_dbscan_clusters:
-    cluster_data = df[df['dbscan_cluster'] == cluster]
-    label = 'Noise' if cluster == -1 else f'Cluster {cluster}'
-    color = color_map[cluster]
-    axes[0, 0].scatter(cluster_data['price']/1000, cluster_data['quantity_sold'], 
-                      c=[color], label=label, alpha=0.6 if cluster != -1 else 0.3)
-axes[0, 0].set_title('DBSCAN: Gia vs So luong ban', fontweight='bold')
-axes[0, 0].set_xlabel('Gia (nghin VND)')
-axes[0, 0].set_ylabel('So luong ban')
-axes[0, 0].legend()
-
-# 2. Scatter plot: Price vs Rating (DBSCAN)
-for cluster in unique_dbscan_clusters:
-    cluster_data = df[df['dbscan_cluster'] == cluster]
-    label = 'Noise' if cluster == -1 else f'Cluster {cluster}'
-    color = color_map[cluster]
-    axes[0, 1].scatter(cluster_data['price']/1000, cluster_data['rating_average'], 
-                      c=[color], label=label, alpha=0.6 if cluster != -1 else 0.3)
-axes[0, 1].set_title('DBSCAN: Gia vs Rating', fontweight='bold')
-axes[0, 1].set_xlabel('Gia (nghin VND)')
-axes[0, 1].set_ylabel('Rating Average')
-axes[0, 1].legend()
-
-# 3. So sanh so luong san pham giua K-means va DBSCAN
 kmeans_counts = df['cluster'].value_counts().sort_index()
-dbscan_valid_counts = df[df['dbscan_cluster'] != -1]['dbscan_cluster'].value_counts().sort_index()
-
-x_kmeans = np.arange(len(kmeans_counts))
-x_dbscan = np.arange(len(dbscan_valid_counts))
-
-axes[1, 0].bar(x_kmeans - 0.2, kmeans_counts.values, width=0.4, label='K-Means', alpha=0.7, color='blue')
-axes[1, 0].bar(x_dbscan + 0.2, dbscan_valid_counts.values, width=0.4, label='DBSCAN', alpha=0.7, color='red')
-axes[1, 0].set_title('So sanh phan bo Cluster: K-Means vs DBSCAN', fontweight='bold')
-axes[1, 0].set_xlabel('Cluster ID')
-axes[1, 0].set_ylabel('So luong san pham')
-axes[1, 0].legend()
-axes[1, 0].set_xticks(range(max(len(kmeans_counts), len(dbscan_valid_counts))))
+dbscan_valid_counts = dbscan_counts.drop(-1, errors='ignore').sort_index()
+charts.submit(chart_rendering.dbscan_dashboard, {
+    'clusters': sorted(df['dbscan_cluster'].unique().tolist()),
+    'points': chart_rendering.scatter_points(df, ['price', 'quantity_sold', 'rating_average'],
+                                             label='dbscan_cluster', scale={'price': 1000}),
+    'kmeans_counts': kmeans_counts.to_numpy(),
+    'dbscan_counts': dbscan_valid_counts.to_numpy(),
+    'valid_noise': [len(df) - n_noise, n_noise],
+}, 'data/clean/dbscan_clustering_analysis.png')
 
-# 4. Phan bo diem nhieu cua DBSCAN
-noise_data = df[df['dbscan_cluster'] == -1]
-valid_data = df[df['dbscan_cluster'] != -1]
-
-labels = ['Valid Clusters', 'Noise']
-sizes = [len(valid_data), len(noise_data)]
-colors_pie = ['lightgreen', 'lightcoral']
-explode = (0.05, 0.1)  # Lam noi bat phan noise
-
-axes[1, 1].pie(sizes, explode=explode, labels=labels, colors=colors_pie,
-              autopct='%1.1f%%', shadow=True, startangle=90)
-axes[1, 1].set_title('DBSCAN: Phan bo diem hop le vs Noise', fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('data/clean/dbscan_clustering_analysis.png', dpi=300, bbox_inches='tight')
-plt.show()
-
-print("Da luu bieu do DBSCAN: 'data/clean/dbscan_clustering_analysis.png'")
 
 # Luu ket qua DBSCAN
-df.to_csv('data/clean/products_with_all_clusters.csv', index=False, encoding='utf-8')
-print("Da luu du lieu co tat ca cluster (K-means + DBSCAN): 'data/clean/products_with_all_clusters.csv'")
+if columnar_store.store_exists():
+    columnar_store.write_column('dbscan_cluster', df['dbscan_cluster'])
+    print(f"Da luu cot dbscan_cluster: '{columnar_store.STORE_DIR}/derived/dbscan_cluster.arrow'")
+else:
+    df.to_csv('data/clean/products_with_all_clusters.csv', index=False, encoding='utf-8')
+    print("Da luu du lieu co tat ca cluster (K-means + DBSCAN): 'data/clean/products_with_all_clusters.csv'")
 
 # ========================================
 # 3.3. DU DOAN VA PHAN TICH NANG CAO
 # ========================================
+metrics.section('ml_features', rows=len(df))
 print("\n3.3. DU DOAN VA PHAN TICH NANG CAO")
 print("=" * 60)
 
@@ -407,13 +379,18 @@ df['price_category'] = pd.cut(df['price'], bins=4, labels=['Gia_thap', 'Gia_TB',
 df['revenue_per_item'] = df['revenue'] / (df['quantity_sold'] + 1)  # Tranh chia cho 0
 
 # Encode categorical variables
-le_brand = LabelEncoder()
-le_category = LabelEncoder()
-le_seller = LabelEncoder()
-
-df['brand_encoded'] = le_brand.fit_transform(df['brand'].astype(str))
-df['category_encoded'] = le_category.fit_transform(df['category'].astype(str))
-df['seller_encoded'] = le_seller.fit_transform(df['current_seller'].astype(str))
+# Vocabulary on dinh giua cac lan chay (categorical_encoding.py): ma cua gia tri cu khong doi.
+# USE_WAREHOUSE_KEYS = True: brand / seller dung thang brand_id / seller_id cua warehouse
+# (can cache khoa data/cache/dim_keys.pkl do ETL tao)
+USE_WAREHOUSE_KEYS = False
+encoded_columns = {'brand_encoded': 'brand', 'category_encoded': 'category',
+                   'seller_encoded': 'current_seller'}
+encoder_keys = {'brand': 'encoders/brand', 'category': 'encoders/category',
+                'current_seller': 'encoders/seller'}
+for feature, column in encoded_columns.items():
+    encoder = registry.fit_transformer(encoder_keys[column], make_encoder(column, USE_WAREHOUSE_KEYS),
+                                       df[column])
+    df[feature] = encoder.transform(df[column])
 
 # Tao features cho ML
 features_for_ml = ['price', 'rating_average', 'review_count', 'quantity_sold', 'brand_encoded', 
@@ -423,9 +400,36 @@ X_ml = df[features_for_ml].fillna(0)
 print(f"Features cho ML: {len(features_for_ml)} features")
 print(f"So mau du lieu: {len(X_ml)}")
 
+
+def regression_metrics(y_true, y_pred):
+    return {'R2': r2_score(y_true, y_pred), 'RMSE': np.sqrt(mean_squared_error(y_true, y_pred))}
+
+
+def classification_metrics(y_true, y_pred):
+    return {'Accuracy': accuracy_score(y_true, y_pred)}
+
+
+# Cac model trong moi nhom duoc train song song (process pool), tong so core
+# khong vuot qua MODEL_CORE_BUDGET (None = tat ca core cua may)
+MODEL_CORE_BUDGET = None
+scheduler = TrainingScheduler(registry, core_budget=MODEL_CORE_BUDGET)
+model_timings = {}
+
+
+def print_schedule(results):
+    for model_name, result in results.items():
+        scores = result['scores']
+        source = 'registry' if result['cached'] else 'train'
+        print(f"   {model_name:15}: fit {scores.get('fit_seconds', 0):6.2f}s, "
+              f"predict {scores.get('predict_seconds', 0):6.3f}s ({source})")
+    print(f"   Tong thoi gian: {scheduler.seconds:.2f}s "
+          f"(tuan tu: {scheduler.sequential_seconds(results):.2f}s)")
+
+
 # ========================================
 # 3.3.1. DU DOAN DOANH THU (REVENUE PREDICTION)
 # ========================================
+metrics.section('regression')
 print("\n3.3.1. DU DOAN DOANH THU - ADVANCED REGRESSION MODELS")
 print("-" * 55)
 
@@ -435,8 +439,8 @@ X_train_rev, X_test_rev, y_train_rev, y_test_rev = train_test_split(
 )
 
 # Chuan hoa du lieu
-scaler_rev = StandardScaler()
-X_train_rev_scaled = scaler_rev.fit_transform(X_train_rev)
+scaler_rev = registry.fit_transformer('revenue/scaler', StandardScaler(), X_train_rev)
+X_train_rev_scaled = scaler_rev.transform(X_train_rev)
 X_test_rev_scaled = scaler_rev.transform(X_test_rev)
 
 print("Training cac mo hinh du doan doanh thu...")
@@ -445,55 +449,40 @@ print("Training cac mo hinh du doan doanh thu...")
 revenue_models = {}
 revenue_scores = {}
 
-# Model 1: Random Forest
-rf_rev = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
-rf_rev.fit(X_train_rev, y_train_rev)
-rf_pred = rf_rev.predict(X_test_rev)
-revenue_models['Random Forest'] = rf_rev
-revenue_scores['Random Forest'] = {
-    'R2': r2_score(y_test_rev, rf_pred),
-    'RMSE': np.sqrt(mean_squared_error(y_test_rev, rf_pred))
+# Thong tin luu kem model trong registry de revenue_scoring.py tai tao duoc features
+revenue_serving = {
+    'features': features_for_ml,
+    'encoders': {feature: [column, encoder_keys[column]] for feature, column in encoded_columns.items()},
 }
 
-# Model 2: Gradient Boosting
-gb_rev = GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
-gb_rev.fit(X_train_rev, y_train_rev)
-gb_pred = gb_rev.predict(X_test_rev)
-revenue_models['Gradient Boosting'] = gb_rev
-revenue_scores['Gradient Boosting'] = {
-    'R2': r2_score(y_test_rev, gb_pred),
-    'RMSE': np.sqrt(mean_squared_error(y_test_rev, gb_pred))
-}
-
-# Model 3: Neural Network (MLP)
-mlp_rev = MLPRegressor(hidden_layer_sizes=(100, 50), max_iter=1000, random_state=42)
-mlp_rev.fit(X_train_rev_scaled, y_train_rev)
-mlp_pred = mlp_rev.predict(X_test_rev_scaled)
-revenue_models['Neural Network'] = mlp_rev
-revenue_scores['Neural Network'] = {
-    'R2': r2_score(y_test_rev, mlp_pred),
-    'RMSE': np.sqrt(mean_squared_error(y_test_rev, mlp_pred))
-}
-
-# Model 4: Support Vector Regression
-svr_rev = SVR(kernel='rbf', C=100, gamma=0.001)
-svr_rev.fit(X_train_rev_scaled, y_train_rev)
-svr_pred = svr_rev.predict(X_test_rev_scaled)
-revenue_models['Support Vector'] = svr_rev
-revenue_scores['Support Vector'] = {
-    'R2': r2_score(y_test_rev, svr_pred),
-    'RMSE': np.sqrt(mean_squared_error(y_test_rev, svr_pred))
-}
-
-# Model 5: K-Nearest Neighbors
-knn_rev = KNeighborsRegressor(n_neighbors=5)
-knn_rev.fit(X_train_rev_scaled, y_train_rev)
-knn_pred = knn_rev.predict(X_test_rev_scaled)
-revenue_models['K-Neighbors'] = knn_rev
-revenue_scores['K-Neighbors'] = {
-    'R2': r2_score(y_test_rev, knn_pred),
-    'RMSE': np.sqrt(mean_squared_error(y_test_rev, knn_pred))
-}
+# (ten, key trong registry, model, dung du lieu da chuan hoa?)
+revenue_specs = [
+    # Model 1: Random Forest
+    ('Random Forest', 'revenue/random_forest',
+     RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42), False),
+    # Model 2: Gradient Boosting
+    ('Gradient Boosting', 'revenue/gradient_boosting',
+     GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, random_state=42), False),
+    # Model 3: Neural Network (MLP)
+    ('Neural Network', 'revenue/mlp',
+     MLPRegressor(hidden_layer_sizes=(100, 50), max_iter=1000, random_state=42), True),
+    # Model 4: Support Vector Regression
+    ('Support Vector', 'revenue/svr', SVR(kernel='rbf', C=100, gamma=0.001), True),
+    # Model 5: K-Nearest Neighbors
+    ('K-Neighbors', 'revenue/knn', KNeighborsRegressor(n_neighbors=5), True),
+]
+for model_name, key, estimator, scaled in revenue_specs:
+    X_train, X_test = (X_train_rev_scaled, X_test_rev_scaled) if scaled else (X_train_rev, X_test_rev)
+    scheduler.add(model_name, key, estimator, X_train, y_train_rev, X_test, y_test_rev,
+                  regression_metrics,
+                  meta={**revenue_serving, 'scaler': 'revenue/scaler' if scaled else None})
+revenue_results = scheduler.run()
+print_schedule(revenue_results)
+for model_name, result in revenue_results.items():
+    revenue_models[model_name] = result['model']
+    revenue_scores[model_name] = result['scores']
+    model_timings[('Regression', model_name)] = result
+rf_rev = revenue_models['Random Forest']
 
 print("\nKET QUA DU DOAN DOANH THU:")
 for model_name, scores in revenue_scores.items():
@@ -516,6 +505,7 @@ for _, row in feature_importance.head(5).iterrows():
 # ========================================
 # 3.3.2. PHAN LOAI SAN PHAM (CLASSIFICATION)
 # ========================================
+metrics.section('classification')
 print("\n3.3.2. PHAN LOAI SAN PHAM - ADVANCED CLASSIFICATION")
 print("-" * 50)
 
@@ -529,8 +519,9 @@ X_train_cls, X_test_cls, y_train_cls, y_test_cls = train_test_split(
     X_ml, y_class, test_size=0.2, random_state=42, stratify=y_class
 )
 
-X_train_cls_scaled = scaler_rev.fit_transform(X_train_cls)
-X_test_cls_scaled = scaler_rev.transform(X_test_cls)
+scaler_cls = registry.fit_transformer('classification/scaler', StandardScaler(), X_train_cls)
+X_train_cls_scaled = scaler_cls.transform(X_train_cls)
+X_test_cls_scaled = scaler_cls.transform(X_test_cls)
 
 print("Training cac mo hinh phan loai...")
 
@@ -538,33 +529,31 @@ print("Training cac mo hinh phan loai...")
 class_models = {}
 class_scores = {}
 
-# Classification Model 1: Random Forest
-rf_cls = RandomForestClassifier(n_estimators=100, random_state=42)
-rf_cls.fit(X_train_cls, y_train_cls)
-rf_cls_pred = rf_cls.predict(X_test_cls)
-class_models['Random Forest'] = rf_cls
-class_scores['Random Forest'] = accuracy_score(y_test_cls, rf_cls_pred)
-
-# Classification Model 2: Neural Network
-mlp_cls = MLPClassifier(hidden_layer_sizes=(50, 25), max_iter=1000, random_state=42)
-mlp_cls.fit(X_train_cls_scaled, y_train_cls)
-mlp_cls_pred = mlp_cls.predict(X_test_cls_scaled)
-class_models['Neural Network'] = mlp_cls
-class_scores['Neural Network'] = accuracy_score(y_test_cls, mlp_cls_pred)
-
-# Classification Model 3: Support Vector Machine
-svm_cls = SVC(kernel='rbf', random_state=42)
-svm_cls.fit(X_train_cls_scaled, y_train_cls)
-svm_cls_pred = svm_cls.predict(X_test_cls_scaled)
-class_models['Support Vector'] = svm_cls
-class_scores['Support Vector'] = accuracy_score(y_test_cls, svm_cls_pred)
-
-# Classification Model 4: K-Nearest Neighbors
-knn_cls = KNeighborsClassifier(n_neighbors=7)
-knn_cls.fit(X_train_cls_scaled, y_train_cls)
-knn_cls_pred = knn_cls.predict(X_test_cls_scaled)
-class_models['K-Neighbors'] = knn_cls
-class_scores['K-Neighbors'] = accuracy_score(y_test_cls, knn_cls_pred)
+class_specs = [
+    # Classification Model 1: Random Forest
+    ('Random Forest', 'classification/random_forest',
+     RandomForestClassifier(n_estimators=100, random_state=42), False),
+    # Classification Model 2: Neural Network
+    ('Neural Network', 'classification/mlp',
+     MLPClassifier(hidden_layer_sizes=(50, 25), max_iter=1000, random_state=42), True),
+    # Classification Model 3: Support Vector Machine
+    ('Support Vector', 'classification/svc', SVC(kernel='rbf', random_state=42), True),
+    # Classification Model 4: K-Nearest Neighbors
+    ('K-Neighbors', 'classification/knn', KNeighborsClassifier(n_neighbors=7), True),
+]
+for model_name, key, estimator, scaled in class_specs:
+    X_train, X_test = (X_train_cls_scaled, X_test_cls_scaled) if scaled else (X_train_cls, X_test_cls)
+    scheduler.add(model_name, key, estimator, X_train, y_train_cls, X_test, y_test_cls,
+                  classification_metrics)
+class_results = scheduler.run()
+print_schedule(class_results)
+for model_name, result in class_results.items():
+    class_models[model_name] = result['model']
+    class_scores[model_name] = result['scores']['Accuracy']
+    model_timings[('Classification', model_name)] = result
+
+print(f"Model registry: train {len(registry.trained)}, dung lai {len(registry.reused)} "
+      f"(thu muc '{registry.root}')")
 
 print("\nKET QUA PHAN LOAI RATING:")
 for model_name, score in class_scores.items():
@@ -576,6 +565,7 @@ print(f"\nMo hinh tot nhat cho phan loai: {best_class_model}")
 # ========================================
 # 3.3.3. CUSTOMER LIFETIME VALUE & MARKET BASKET ANALYSIS
 # ========================================
+metrics.section('clv')
 print("\n3.3.3. CUSTOMER LIFETIME VALUE & BUSINESS INSIGHTS")
 print("-" * 50)
 
@@ -603,12 +593,12 @@ for i, row in cluster_metrics.iterrows():
           f"Avg Revenue = {row['Revenue_Mean']:10,.0f}")
 
 # Brand Performance Analysis
-brand_performance = df.groupby('brand').agg({
-    'revenue': 'sum',
-    'rating_average': 'mean',
-    'quantity_sold': 'sum',
-    'id': 'count'
-}).round(2)
+brand_performance = pd.concat([
+    olap('query', ['brand'], 'revenue', 'sum')['sum'],
+    olap('query', ['brand'], 'rating_average', 'mean')['mean'],
+    olap('query', ['brand'], 'quantity_sold', 'sum')['sum'],
+    olap('query', ['brand'], 'revenue', 'size')['size'],
+], axis=1).round(2)
 brand_performance.columns = ['Total_Revenue', 'Avg_Rating', 'Total_Quantity', 'Product_Count']
 brand_performance = brand_performance.sort_values('Total_Revenue', ascending=False)
 
@@ -620,72 +610,42 @@ for brand, row in brand_performance.head(5).iterrows():
 # ========================================
 # 3.3.4. VISUALIZATION CHO ADVANCED ANALYTICS
 # ========================================
+metrics.section('charts')
 print("\n3.3.4. ADVANCED ANALYTICS VISUALIZATION")
 print("-" * 45)
 
-fig, axes = plt.subplots(3, 2, figsize=(16, 18))
-fig.suptitle('MACHINE LEARNING & PREDICTIVE ANALYTICS', fontsize=16, fontweight='bold')
-
-# 1. Model Performance Comparison (Revenue)
-models = list(revenue_scores.keys())
-r2_scores = [revenue_scores[m]['R2'] for m in models]
-axes[0, 0].bar(models, r2_scores, color=['red', 'green', 'blue', 'orange', 'purple'])
-axes[0, 0].set_title('Model Performance - Revenue Prediction (R2)', fontweight='bold')
-axes[0, 0].set_ylabel('R2 Score')
-axes[0, 0].tick_params(axis='x', rotation=45)
-
-# 2. Classification Accuracy Comparison
-class_names = list(class_scores.keys())
-class_acc = list(class_scores.values())
-axes[0, 1].bar(class_names, class_acc, color=['darkred', 'darkgreen', 'darkblue', 'darkorange'])
-axes[0, 1].set_title('Classification Accuracy Comparison', fontweight='bold')
-axes[0, 1].set_ylabel('Accuracy')
-axes[0, 1].tick_params(axis='x', rotation=45)
-
-# 3. Feature Importance
-axes[1, 0].barh(feature_importance.head(6)['feature'], 
-               feature_importance.head(6)['importance'], color='coral')
-axes[1, 0].set_title('Feature Importance (Random Forest)', fontweight='bold')
-axes[1, 0].set_xlabel('Importance')
-
-# 4. Actual vs Predicted Revenue (Best Model)
+# Actual vs Predicted Revenue (Best Model)
 best_model = revenue_models[best_model_name]
 if best_model_name in ['Neural Network', 'Support Vector', 'K-Neighbors']:
     best_pred = best_model.predict(X_test_rev_scaled)
 else:
     best_pred = best_model.predict(X_test_rev)
-
-axes[1, 1].scatter(y_test_rev, best_pred, alpha=0.5, color='green')
-axes[1, 1].plot([y_test_rev.min(), y_test_rev.max()], 
-               [y_test_rev.min(), y_test_rev.max()], 'r--', lw=2)
-axes[1, 1].set_title(f'Actual vs Predicted Revenue ({best_model_name})', fontweight='bold')
-axes[1, 1].set_xlabel('Actual Revenue')
-axes[1, 1].set_ylabel('Predicted Revenue')
-
-# 5. CLV by Cluster
-axes[2, 0].bar(cluster_metrics.index, cluster_metrics['CLV_Score'], color='purple', alpha=0.7)
-axes[2, 0].set_title('Customer Lifetime Value by Cluster', fontweight='bold')
-axes[2, 0].set_xlabel('Cluster')
-axes[2, 0].set_ylabel('CLV Score')
-
-# 6. Brand Revenue Distribution (Top 10)
+prediction_index = chart_rendering.downsample(len(best_pred))
 top_brands = brand_performance.head(10)
-axes[2, 1].pie(top_brands['Total_Revenue'], labels=top_brands.index, 
-              autopct='%1.1f%%', startangle=90)
-axes[2, 1].set_title('Revenue Distribution - Top 10 Brands', fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('data/clean/advanced_analytics.png', dpi=300, bbox_inches='tight')
-plt.show()
+charts.submit(chart_rendering.ml_dashboard, {
+    'r2_scores': (list(revenue_scores.keys()), [revenue_scores[m]['R2'] for m in revenue_scores]),
+    'class_accuracy': (list(class_scores.keys()), list(class_scores.values())),
+    'feature_importance': (feature_importance.head(6)['feature'].tolist(),
+                           feature_importance.head(6)['importance'].to_numpy()),
+    'predictions': {'actual': np.asarray(y_test_rev)[prediction_index],
+                    'predicted': np.asarray(best_pred)[prediction_index], 'total': len(best_pred)},
+    'actual_range': (float(y_test_rev.min()), float(y_test_rev.max())),
+    'best_model': best_model_name,
+    'clv': (cluster_metrics.index.to_numpy(), cluster_metrics['CLV_Score'].to_numpy()),
+    'top_brands': (top_brands.index.tolist(), top_brands['Total_Revenue'].to_numpy()),
+}, 'data/clean/advanced_analytics.png')
 
-print("Da luu bieu do Advanced Analytics: 'data/clean/advanced_analytics.png'")
 
 # Luu ket qua ML
 ml_results = pd.DataFrame({
     'Model_Type': ['Regression'] * len(revenue_scores) + ['Classification'] * len(class_scores),
     'Model_Name': list(revenue_scores.keys()) + list(class_scores.keys()),
     'Score': [revenue_scores[m]['R2'] for m in revenue_scores.keys()] + list(class_scores.values()),
-    'Metric': ['R2'] * len(revenue_scores) + ['Accuracy'] * len(class_scores)
+    'Metric': ['R2'] * len(revenue_scores) + ['Accuracy'] * len(class_scores),
+    'RMSE': [revenue_scores[m]['RMSE'] for m in revenue_scores.keys()] + [np.nan] * len(class_scores),
+    'Fit_Seconds': [r['scores'].get('fit_seconds') for r in model_timings.values()],
+    'Predict_Seconds': [r['scores'].get('predict_seconds') for r in model_timings.values()],
+    'From_Registry': [r['cached'] for r in model_timings.values()]
 })
 ml_results.to_csv('data/clean/ml_results.csv', index=False)
 print("Da luu ket qua ML: 'data/clean/ml_results.csv'")
@@ -694,6 +654,12 @@ print("Da luu ket qua ML: 'data/clean/ml_results.csv'")
 cluster_metrics.to_csv('data/clean/cluster_clv_analysis.csv')
 print("Da luu phan tich CLV: 'data/clean/cluster_clv_analysis.csv'")
 
+# Cho cac bieu do dang ve o worker
+chart_status = charts.wait()
+print(f"\nBIEU DO (headless, dpi={charts.dpi}):")
+for path, status in chart_status.items():
+    print(f"   {'Da luu' if status == 'rendered' else 'Khong doi, bo qua'}: '{path}'")
+
 print(f"\nTONG KET PHAN 3 NANG CAO:")
 print("=" * 50)
 print("OLAP: Da phan tich doanh thu, rating theo brand/fulfillment/segment")
@@ -705,4 +671,5 @@ print("Business Intelligence: Da phan tich hieu suat thuong hieu")
 print("Advanced Visualization: Da tao dashboard ML hoan chinh")
 print(f"Mo hinh tot nhat - Revenue: {best_model_name} (R2={revenue_scores[best_model_name]['R2']:.3f})")
 print(f"Mo hinh tot nhat - Classification: {best_class_model} (Acc={class_scores[best_class_model]:.3f})")
-print("San sang cho bao cao va de xuat chien luoc kinh doanh nang cao!")
\ No newline at end of file
+print("San sang cho bao cao va de xuat chien luoc kinh doanh nang cao!")
+print(f"Metrics: '{metrics.write()}'")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Product Dedup
+Tìm các listing gần trùng nhau (cùng một sản phẩm thật được nhiều current_seller đăng lại,
+tên chỉ khác vài từ / mã) và gán khóa product_group để OLAP / ML gộp theo sản phẩm thật:
+  - Shingle: cặp âm tiết liền nhau của name, bộ ba âm tiết của description
+    (sau khi bỏ dấu, dùng chung tokenizer với product_search)
+  - MinHash: NAME_HASHES / DESCRIPTION_HASHES hàm băm độc lập dạng multiply-shift, mỗi hàm lấy
+    min trên các shingle của sản phẩm (vector hóa bằng numpy, không vòng lặp theo sản phẩm)
+  - LSH: chữ ký name chia thành BANDS dải, sản phẩm trùng khóa ở một dải là ứng viên
+    -> chỉ so các cặp ứng viên, không so toàn bộ n^2 cặp
+  - Cặp ứng viên được giữ nếu độ tương đồng ước lượng (Jaccard của name, description
+    giống nhau thì được cộng thêm) >= THRESHOLD và giá chênh không quá MAX_PRICE_RATIO
+  - Nhóm: thành phần liên thông của các cặp giữ lại, rồi tách chuỗi bắc cầu (A~B, B~C nhưng A khác C):
+    mọi cặp trong một nhóm phải đạt cùng tiêu chí (giới hạn đường kính nhóm), thành viên không đạt
+    được gom lại quanh representative mới trong phần còn lại của thành phần
+  - product_group = id nhỏ nhất trong nhóm (sản phẩm không trùng ai giữ id của chính nó)
+
+Kết quả ghi vào data/clean/product_groups.csv (id, product_group, group_size) và cột dẫn xuất
+product_group của columnar store (nếu có).
+
+Cách dùng:
+    python product_dedup.py
+    python product_dedup.py --input data/synthetic/catalog_1m.csv --threshold 0.8
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+import columnar_store
+from product_search import tokenize
+
+CLEAN_FILE = 'data/clean/products_clean.csv'
+GROUPS_FILE = 'data/clean/product_groups.csv'
+DEDUP_COLUMNS = ['id', 'name', 'description', 'current_seller', 'price']
+
+NAME_SHINGLE = 2
+DESCRIPTION_SHINGLE = 3
+NAME_HASHES = 64
+DESCRIPTION_HASHES = 32
+BANDS = 16                       # 16 dải x 4 hàm băm: cặp có Jaccard(name) ~0.5 có ~50% cơ hội thành ứng viên
+NAME_WEIGHT = 0.7
+THRESHOLD = 0.75
+MAX_PRICE_RATIO = 3.0
+BUCKET_WINDOW = 4                # mỗi sản phẩm chỉ so với tối đa 4 sản phẩm kế tiếp trong cùng bucket
+SKETCH_CHUNK = 100000
+PAIR_BLOCK = 256                 # tách nhóm: thành phần tối đa ngần này doc thì so mọi cặp trong một lần
+
+EMPTY = np.uint32(0xFFFFFFFF)
+MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def shingle_hashes(texts, size):
+    """(doc, hash 64 bit) của các shingle size âm tiết liền nhau; doc ngắn hơn size -> từng âm tiết là shingle"""
+    docs, codes, tokens = tokenize(texts)
+    token_hash = pd.util.hash_array(np.array(tokens, dtype=object)).astype(np.uint64)
+    hashes = token_hash[codes]
+    n = max(len(docs) - size + 1, 0)
+    shingles = hashes[:n].copy()
+    complete = np.ones(n, dtype=bool)
+    with np.errstate(over='ignore'):
+        for offset in range(1, size):
+            shingles = shingles * MIX + hashes[offset:offset + n]
+            complete &= docs[offset:offset + n] == docs[:n]
+
+    short = (np.bincount(docs, minlength=len(texts)) < size)[docs]
+    docs = np.concatenate([docs[:n][complete], docs[short]])
+    order = np.argsort(docs, kind='stable')
+    return docs[order], np.concatenate([shingles[complete], hashes[short]])[order]
+
+
+def minhash(docs, hashes, n_docs, n_hashes, seed=0):
+    """
+    Chữ ký MinHash (n_docs x n_hashes, uint32): hàm băm thứ k là (a_k * x + b_k) >> 32 (multiply-shift),
+    min theo từng doc bằng minimum.reduceat (docs đã sắp xếp). Doc không có shingle -> toàn EMPTY.
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(0, 2 ** 63, n_hashes, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 2 ** 63, n_hashes, dtype=np.int64).astype(np.uint64)
+    signature = np.full((n_docs, n_hashes), EMPTY, dtype=np.uint32)
+    if not len(docs):
+        return signature
+    starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+    present = docs[starts]
+    with np.errstate(over='ignore'):
+        for k in range(n_hashes):
+            values = ((hashes * a[k] + b[k]) >> np.uint64(32)).astype(np.uint32)
+            signature[present, k] = np.minimum.reduceat(values, starts)
+    return signature
+
+
+def text_signature(texts, size, n_hashes, seed, chunk_size=SKETCH_CHUNK):
+    """Chữ ký MinHash của một cột text; text trùng khớp (listing đăng lại nguyên văn) chỉ tính một lần"""
+    codes, uniques = pd.factorize(texts.fillna(''))
+    uniques = pd.Series(uniques)
+    signature = np.empty((len(uniques), n_hashes), dtype=np.uint32)
+    for start in range(0, len(uniques), chunk_size):
+        chunk = uniques.iloc[start:start + chunk_size]
+        docs, hashes = shingle_hashes(chunk, size)
+        signature[start:start + len(chunk)] = minhash(docs, hashes, len(chunk), n_hashes, seed)
+    return signature[codes]
+
+
+def signatures(frame):
+    """Chữ ký MinHash của name và description"""
+    return (text_signature(frame['name'], NAME_SHINGLE, NAME_HASHES, seed=1),
+            text_signature(frame['description'], DESCRIPTION_SHINGLE, DESCRIPTION_HASHES, seed=2))
+
+
+def band_pairs(signature, bands=BANDS, window=BUCKET_WINDOW):
+    """
+    Cặp ứng viên (left, right) theo từng dải LSH: khóa dải = băm các giá trị MinHash của dải,
+    sắp xếp theo khóa rồi ghép mỗi doc với tối đa window doc kế tiếp cùng khóa.
+    """
+    rows = signature.shape[1] // bands
+    docs = np.flatnonzero(signature[:, 0] != EMPTY)    # doc không có shingle không ghép với ai
+    for band in range(bands):
+        keys = np.zeros(len(docs), dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for column in range(band * rows, (band + 1) * rows):
+                keys = keys * MIX + signature[docs, column].astype(np.uint64)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys, sorted_docs = keys[order], docs[order]
+        for offset in range(1, window + 1):
+            same = sorted_keys[offset:] == sorted_keys[:-offset]
+            if not same.any():
+                break
+            yield sorted_docs[:-offset][same], sorted_docs[offset:][same]
+
+
+def similarity(name_signature, description_signature, left, right):
+    """
+    Jaccard ước lượng của cặp: max(name, NAME_WEIGHT * name + phần còn lại * description).
+    Mô tả chỉ làm tăng độ tương đồng (seller đăng lại thường viết mô tả khác), không có mô tả -> chỉ name.
+    """
+    name = np.count_nonzero(name_signature[left] == name_signature[right], axis=1) / name_signature.shape[1]
+    description = np.count_nonzero(description_signature[left] == description_signature[right], axis=1) \
+        / description_signature.shape[1]
+    description[(description_signature[left, 0] == EMPTY) | (description_signature[right, 0] == EMPTY)] = 0
+    return np.maximum(name, NAME_WEIGHT * name + (1 - NAME_WEIGHT) * description)
+
+
+def similar_pairs(name_signature, description_signature, left, right, threshold):
+    """
+    Mask các cặp có similarity >= threshold. So name trước; description chỉ cần cho các cặp
+    name chưa đủ ngưỡng nhưng có thể đạt nhờ description (name >= (threshold - (1 - NAME_WEIGHT)) / NAME_WEIGHT)
+    """
+    name = np.count_nonzero(name_signature[left] == name_signature[right], axis=1) / name_signature.shape[1]
+    keep = name >= threshold
+    undecided = np.flatnonzero(~keep & (name >= (threshold - (1 - NAME_WEIGHT)) / NAME_WEIGHT))
+    if len(undecided):
+        keep[undecided] = similarity(name_signature, description_signature,
+                                     left[undecided], right[undecided]) >= threshold
+    return keep
+
+
+def find_groups(frame, threshold=THRESHOLD, max_price_ratio=MAX_PRICE_RATIO):
+    """
+    DataFrame (id, product_group, group_size) cùng thứ tự dòng với frame,
+    kèm thống kê số cặp ứng viên / cặp trùng và thời gian từng bước
+    """
+    stats = {}
+    start = time.perf_counter()
+    name_signature, description_signature = signatures(frame)
+    stats['sketch_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    n = len(frame)
+    price = pd.to_numeric(frame['price'], errors='coerce').to_numpy(dtype=float) \
+        if 'price' in frame.columns else np.full(n, np.nan)
+    edges, candidates = [], 0
+    for left, right in band_pairs(name_signature):
+        candidates += len(left)
+        keep = similar_pairs(name_signature, description_signature, left, right, threshold)
+        keep &= price_close(price, left, right, max_price_ratio)
+        if keep.any():
+            # Một cặp có thể xuất hiện ở nhiều dải: khử trùng bằng sort trên khóa left * n + right
+            pair = np.minimum(left[keep], right[keep]) * n + np.maximum(left[keep], right[keep])
+            edges.append(pair)
+            if sum(len(e) for e in edges) > 4 * n:
+                edges = [_distinct(np.concatenate(edges))]
+    edges = _distinct(np.concatenate(edges)) if edges else np.array([], dtype=np.int64)
+    stats['candidate_pairs'] = candidates
+    stats['duplicate_pairs'] = len(edges)
+
+    graph = coo_matrix((np.ones(len(edges), dtype=np.int8), (edges // n, edges % n)), shape=(n, n))
+    _, components = connected_components(graph, directed=False)
+    degree = np.bincount(edges // n, minlength=n) + np.bincount(edges % n, minlength=n)
+    labels = split_chains(components, degree, lambda left, right: (
+        similar_pairs(name_signature, description_signature, left, right, threshold)
+        & price_close(price, left, right, max_price_ratio)))
+    ids = frame['id'].to_numpy(dtype=np.int64)
+    groups = pd.DataFrame({'id': ids, 'label': labels})
+    grouped = groups.groupby('label')['id']
+    groups['product_group'] = grouped.transform('min')
+    groups['group_size'] = grouped.transform('size')
+    stats['group_seconds'] = time.perf_counter() - start
+    stats['groups'] = int(groups['label'].nunique())
+    return groups[['id', 'product_group', 'group_size']], stats
+
+
+def price_close(price, left, right, max_price_ratio=MAX_PRICE_RATIO):
+    """Mask các cặp giá chênh không quá max_price_ratio lần (thiếu giá -> không loại)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.maximum(price[left], price[right]) / np.minimum(price[left], price[right])
+    return ~(ratio > max_price_ratio)
+
+
+def split_chains(components, degree, is_similar):
+    """
+    Nhãn nhóm từ nhãn thành phần liên thông sao cho mọi cặp trong nhóm đều giống nhau
+    (is_similar(left, right) -> mask; thành phần 2 doc đã là một cặp được giữ nên giữ nguyên).
+    Thành phần lớn hơn: lần lượt lấy doc chưa gán có degree lớn nhất làm representative, thêm từng doc
+    (degree giảm dần) nếu giống mọi thành viên đã có; doc còn lại sang nhóm sau.
+    """
+    labels = components.copy()
+    next_label = int(components.max()) + 1 if len(components) else 0
+    sizes = np.bincount(components, minlength=next_label)
+    multi = np.flatnonzero(sizes[components] > 2)
+    order = multi[np.lexsort((multi, -degree[multi], components[multi]))]
+    bounds = np.flatnonzero(np.r_[True, components[order][1:] != components[order][:-1], True])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        docs = order[start:end]
+        if len(docs) <= PAIR_BLOCK:
+            groups = _greedy_groups(docs, is_similar)
+        else:
+            groups = _greedy_groups_large(docs, is_similar)
+        for members in groups:
+            labels[members] = next_label
+            next_label += 1
+    return labels
+
+
+def _greedy_groups(docs, is_similar):
+    """Thành phần nhỏ: so mọi cặp trong một lần rồi chọn nhóm tham lam trên ma trận (chỉ số trong docs)"""
+    left, right = np.triu_indices(len(docs), 1)
+    similar = np.zeros((len(docs), len(docs)), dtype=bool)
+    similar[left, right] = is_similar(docs[left], docs[right])
+    similar |= similar.T
+    remaining = np.arange(len(docs))
+    while len(remaining):
+        members = [remaining[0]]
+        for i in remaining[1:]:
+            if similar[i, members].all():
+                members.append(i)
+        yield docs[members]
+        remaining = remaining[~np.isin(remaining, members)]
+
+
+def _greedy_groups_large(docs, is_similar):
+    """Thành phần lớn: lọc theo representative một lượt, chỉ doc qua được mới so với từng thành viên"""
+    remaining = docs
+    while len(remaining):
+        representative, others = remaining[0], remaining[1:]
+        close = is_similar(np.full(len(others), representative), others)
+        members, rest = [representative], ~close
+        for position in np.flatnonzero(close):
+            doc = others[position]
+            if len(members) == 1 or is_similar(np.full(len(members) - 1, doc), np.array(members[1:])).all():
+                members.append(doc)
+            else:
+                rest[position] = True
+        yield np.array(members)
+        remaining = others[rest]
+
+
+def _distinct(values):
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def load_products(input_file=None, store_dir=columnar_store.STORE_DIR):
+    """(DataFrame các cột DEDUP_COLUMNS, True nếu đọc từ columnar store)"""
+    if input_file is None and columnar_store.ARROW_AVAILABLE and columnar_store.store_exists(store_dir):
+        return columnar_store.read_table(DEDUP_COLUMNS, store_dir), True
+    frame = pd.read_csv(input_file or CLEAN_FILE, usecols=lambda c: c in DEDUP_COLUMNS)
+    return frame[frame['id'].notna()], False
+
+
+def run(input_file=None, output_file=GROUPS_FILE, store_dir=columnar_store.STORE_DIR, threshold=THRESHOLD):
+    """Tìm nhóm trùng, ghi product_groups.csv (+ cột product_group vào columnar store); trả về (frame, groups, stats)"""
+    frame, from_store = load_products(input_file, store_dir)
+    groups, stats = find_groups(frame, threshold)
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    groups.to_csv(output_file, index=False, encoding='utf-8')
+    if from_store:
+        columnar_store.write_column('product_group', groups['product_group'], store_dir)
+
+    duplicated = (groups['group_size'] > 1).to_numpy()
+    stats['products'] = len(groups)
+    stats['duplicated_products'] = int(duplicated.sum())
+    sellers = frame['current_seller'].to_numpy()[duplicated]
+    stats['cross_seller_groups'] = int((pd.Series(sellers).groupby(
+        groups['product_group'].to_numpy()[duplicated]).nunique() > 1).sum())
+    return frame, groups, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tìm sản phẩm gần trùng (MinHash + LSH), gán product_group')
+    parser.add_argument('--input', default=None, help='CSV sạch (mặc định: columnar store, không có thì CSV sạch)')
+    parser.add_argument('--output', default=GROUPS_FILE)
+    parser.add_argument('--store-dir', default=columnar_store.STORE_DIR)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Ngưỡng Jaccard ước lượng')
+    parser.add_argument('--show', type=int, default=5, help='In N nhóm lớn nhất')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frame, groups, stats = run(args.input, args.output, args.store_dir, args.threshold)
+    print(f"🔁 {stats['products']:,} sản phẩm -> {stats['groups']:,} nhóm "
+          f"({stats['duplicated_products']:,} sản phẩm nằm trong nhóm trùng, "
+          f"{stats['cross_seller_groups']:,} nhóm có nhiều seller)")
+    print(f"   Ứng viên LSH: {stats['candidate_pairs']:,} cặp, giữ {stats['duplicate_pairs']:,} cặp "
+          f"(MinHash {stats['sketch_seconds']:.2f}s, nhóm {stats['group_seconds']:.2f}s, "
+          f"tổng {time.perf_counter() - start:.2f}s)")
+    print(f"✅ Đã ghi '{args.output}'")
+
+    top = groups[groups['group_size'] > 1].drop_duplicates('product_group') \
+        .nlargest(args.show, 'group_size')['product_group']
+    for group in top:
+        members = frame[(groups['product_group'] == group).to_numpy()]
+        print(f"\n   Nhóm {group} ({len(members):,} listing):")
+        for _, row in members.head(5).iterrows():
+            print(f"     - [{row['current_seller']}] {str(row['name'])[:80]}")
+
+
+if __name__ == "__main__":
+    main()
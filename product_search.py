@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+"""
+Product Search
+Tìm kiếm full-text trên name / description của sản phẩm (thay cho LIKE quét toàn bảng):
+  - Chuẩn hóa tiếng Việt: lower + bỏ dấu (đ -> d, "Vali du lịch" ~ "vali du lich"),
+    tách theo âm tiết; name được index thêm cặp âm tiết liền nhau (du_lich, vali_keo)
+    để từ ghép tiếng Việt khớp chính xác được điểm cao hơn
+  - Inverted index dạng CSR (term -> doc ids + tf, mảng NumPy), xếp hạng BM25,
+    name có trọng số cao hơn description (NAME_WEIGHT)
+  - Lọc brand / price_segment / fulfillment_type qua mã facet của từng doc
+    (chỉ xét các doc đã khớp query, không quét cả catalog)
+  - Cập nhật tăng dần: add() / delete() tạo segment nhỏ + đánh dấu xóa, merge() gộp segment
+    và bỏ doc đã xóa; ETL incremental gọi apply_delta() với danh sách id mới / đổi / xóa
+  - Lưu ra data/search/ (postings đọc bằng memory-map)
+
+Cách dùng:
+    python product_search.py --build                           # index từ dữ liệu sạch
+    python product_search.py "balo laptop chong nuoc" --brand sakos -k 5
+    python product_search.py --bench 200                       # đo latency p50 / p99
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+INDEX_DIR = 'data/search'
+CLEAN_FILE = 'data/clean/products_clean.csv'
+FACETS = ['brand', 'price_segment', 'fulfillment_type']
+INDEX_COLUMNS = ['id', 'name', 'description'] + FACETS
+
+NAME_WEIGHT = 3.0
+K1 = 1.2
+B = 0.75
+BUILD_CHUNK = 100000
+MAX_SEGMENTS = 8
+SEED_DOCS = 1000
+# Nhiều doc cần tra hơn len(postings) / DENSE_LOOKUP -> rải postings vào mảng dùng chung thay vì tìm nhị phân
+DENSE_LOOKUP = 8
+WORD_PATTERN = re.compile(r'[^\W_]+')
+# Chữ không tách được bằng NFD (đ, và ð hay bị gõ nhầm thay cho đ)
+LETTER_MAP = str.maketrans({'đ': 'd', 'ð': 'd'})
+
+
+def fold(text):
+    """lower + bỏ dấu: tách dạng NFD rồi bỏ dấu kết hợp, đ -> d ('Vali Du Lịch' -> 'vali du lich')"""
+    decomposed = unicodedata.normalize('NFD', str(text).lower().translate(LETTER_MAP))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def words(text):
+    """Âm tiết / từ (chữ + số) sau khi bỏ dấu, dùng chung cho index và query"""
+    return WORD_PATTERN.findall(fold(text))
+
+
+def tokenize(texts):
+    """
+    (doc, mã token) theo thứ tự xuất hiện của một cột text + danh sách token (tokens[mã]).
+    Tách theo khoảng trắng rồi chỉ bỏ dấu / tách dấu câu trên các từ distinct
+    (vài nghìn từ mỗi chunk thay vì hàng triệu lần xuất hiện).
+    """
+    split = texts.fillna('').astype(str).str.lower().str.split()
+    n_words = split.str.len().to_numpy()
+    codes, uniques = pd.factorize(split.explode())   # doc không có từ nào -> một dòng NaN (mã -1)
+    word_docs = np.repeat(np.arange(len(split), dtype=np.int64), np.maximum(n_words, 1))[codes >= 0]
+    codes = codes[codes >= 0]
+
+    # Một từ thô (vd. 'lịch,' hay 'vali/balo') -> 0..n token
+    pieces = [words(word) for word in uniques]
+    counts = np.array([len(piece) for piece in pieces], dtype=np.int64)
+    piece_start = np.cumsum(counts) - counts
+    repeats = counts[codes]
+    position = np.repeat(piece_start[codes] - (np.cumsum(repeats) - repeats), repeats) + np.arange(repeats.sum())
+    return np.repeat(word_docs, repeats), position, [token for piece in pieces for token in piece]
+
+
+def query_terms(query):
+    """Term của câu query: âm tiết + cặp âm tiết liền nhau (không trùng, giữ thứ tự)"""
+    tokens = words(query)
+    return list(dict.fromkeys(tokens + [f'{a}_{b}' for a, b in zip(tokens, tokens[1:])]))
+
+
+def normalize_facet(values):
+    """Giá trị facet giống bước làm sạch (lower + strip, thiếu -> 'unknown')"""
+    return values.astype(object).where(values.notna(), 'unknown').astype(str).str.lower().str.strip()
+
+
+def prepare_documents(frame):
+    """Dữ liệu thô (từ ETL) chưa có price_segment -> chia khoảng giá giống data_preprocessing"""
+    if 'price_segment' not in frame.columns:
+        from data_preprocessing import PRICE_BINS, PRICE_LABELS
+        frame = frame.assign(price_segment=pd.cut(frame['price'], bins=PRICE_BINS, labels=PRICE_LABELS))
+    return frame
+
+
+def impact(tfs, lengths, avg_len):
+    """Phần tf của BM25 (chưa nhân idf) cho từng posting"""
+    return tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * lengths / avg_len))
+
+
+def _kth(values, k):
+    """Giá trị lớn thứ k (0 nếu chưa đủ k giá trị)"""
+    return float(np.partition(values, len(values) - k)[len(values) - k]) if len(values) >= k else 0.0
+
+
+def _union(parts):
+    """Hợp các mảng doc tăng dần (sort + bỏ trùng liền kề, nhanh hơn np.unique dạng hash)"""
+    if len(parts) == 1:
+        return parts[0]
+    docs = np.sort(np.concatenate(parts))
+    return docs[np.append(True, docs[1:] != docs[:-1])]
+
+
+def _exclude(docs, excluded):
+    """docs bỏ các phần tử có trong excluded (tìm nhị phân trên excluded đã sort)"""
+    if not len(excluded) or not len(docs):
+        return docs
+    excluded = np.sort(excluded)
+    positions = np.minimum(np.searchsorted(excluded, docs), len(excluded) - 1)
+    return docs[excluded[positions] != docs]
+
+
+class Segment:
+    """
+    Postings CSR: docs[indptr[t]:indptr[t + 1]] là các doc (tăng dần) chứa term t.
+    impacts = phần tf của BM25 tính sẵn cho từng posting (avg_len cố định lúc tạo segment, tfs giữ lại
+    để tính lại khi merge); max_impact[t] = impact lớn nhất của term t -> cận trên điểm của term,
+    dùng để bỏ qua các doc không thể vào top k
+    """
+
+    def __init__(self, indptr, docs, tfs, impacts, max_impact, avg_len):
+        self.indptr = indptr
+        self.docs = docs
+        self.tfs = tfs
+        self.impacts = impacts
+        self.max_impact = max_impact
+        self.avg_len = avg_len
+
+    @classmethod
+    def create(cls, indptr, docs, tfs, doc_len, avg_len):
+        impacts = impact(tfs, doc_len[docs], avg_len).astype(np.float32)
+        non_empty = np.flatnonzero(np.diff(indptr))
+        max_impact = np.zeros(len(indptr) - 1, dtype=np.float32)
+        if len(non_empty):
+            max_impact[non_empty] = np.maximum.reduceat(impacts, indptr[non_empty])
+        return cls(indptr, docs, tfs, impacts, max_impact, avg_len)
+
+    @classmethod
+    def from_triples(cls, terms, docs, tfs, n_terms, doc_len, avg_len):
+        """Gộp (term, doc) trùng (cộng tf), sắp theo term rồi doc"""
+        keys = (terms.astype(np.int64) << 32) | docs.astype(np.int64)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        tfs = np.bincount(inverse, weights=tfs).astype(np.float32)
+        indptr = np.searchsorted(keys >> 32, np.arange(n_terms + 1)).astype(np.int64)
+        return cls.create(indptr, (keys & 0xFFFFFFFF).astype(np.int32), tfs, doc_len, avg_len)
+
+    def postings(self, term):
+        """(docs, impacts) của term"""
+        if term + 1 >= len(self.indptr):
+            return self.docs[:0], self.impacts[:0]
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.docs[start:end], self.impacts[start:end]
+
+    def doc_freq(self, term):
+        return 0 if term + 1 >= len(self.indptr) else int(self.indptr[term + 1] - self.indptr[term])
+
+    def posting_terms(self):
+        """Term của từng posting (trải indptr ra theo độ dài)"""
+        return np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+
+
+class PostingList:
+    """Postings của một term trong một segment khi chấm điểm query"""
+
+    def __init__(self, segment, term, idf):
+        self.docs, self.impacts = segment.postings(term)
+        self.idf = np.float32(idf)
+        self.bound = idf * float(segment.max_impact[term])
+
+    def __len__(self):
+        return len(self.docs)
+
+    def scores(self, positions=slice(None)):
+        return self.idf * self.impacts[positions]
+
+    def lookup(self, docs):
+        """Điểm của term cho các doc bất kỳ (0 nếu doc không chứa term), tìm nhị phân trên postings"""
+        positions = np.minimum(np.searchsorted(self.docs, docs), len(self.docs) - 1)
+        found = self.docs[positions] == docs
+        result = np.zeros(len(docs), dtype=np.float32)
+        result[found] = self.scores(positions[found])
+        return result
+
+
+class ProductSearchIndex:
+    """Inverted index BM25 trên name / description, lọc theo facet"""
+
+    def __init__(self):
+        self.terms = []
+        self.vocab = {}
+        self.ids = np.array([], dtype=np.int64)
+        self.names = np.array([], dtype=object)
+        self.doc_len = np.array([], dtype=np.float32)
+        self.deleted = np.array([], dtype=bool)
+        self.n_deleted = 0
+        self.facet_values = {facet: [] for facet in FACETS}
+        self.facet_lookup = {facet: {} for facet in FACETS}
+        self.facet_codes = {facet: np.array([], dtype=np.int32) for facet in FACETS}
+        self.segments = []
+        self._doc_of = None
+        self._facet_docs = {}
+        self._scores = None
+
+    # ------------------------------------------------------------------
+    # Xây dựng / cập nhật
+    # ------------------------------------------------------------------
+    @classmethod
+    def build(cls, frames, chunk_size=BUILD_CHUNK):
+        """frames: DataFrame hoặc iterable các chunk (vd. pd.read_csv(..., chunksize=...))"""
+        if isinstance(frames, pd.DataFrame):
+            frame = frames
+            frames = (frame.iloc[start:start + chunk_size] for start in range(0, len(frame), chunk_size))
+        index = cls()
+        for frame in frames:
+            index.add(frame, merge=False)
+        index.merge()
+        return index
+
+    @property
+    def n_docs(self):
+        return len(self.ids)
+
+    @property
+    def n_live(self):
+        return self.n_docs - self.n_deleted
+
+    def avg_len(self):
+        live = self.doc_len[~self.deleted]
+        return float(live.mean()) if len(live) and live.mean() > 0 else 1.0
+
+    def _term_ids(self, uniques):
+        ids = np.empty(len(uniques), dtype=np.int64)
+        for i, term in enumerate(uniques):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = self.vocab[term] = len(self.terms)
+                self.terms.append(term)
+            ids[i] = term_id
+        return ids
+
+    def _encode_facet(self, facet, values):
+        lookup, known = self.facet_lookup[facet], self.facet_values[facet]
+        codes, uniques = pd.factorize(normalize_facet(values))
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            if value not in lookup:
+                lookup[value] = len(known)
+                known.append(value)
+            mapping[i] = lookup[value]
+        return mapping[codes]
+
+    def _tokenize(self, texts, first_doc, bigrams):
+        """(doc, term) theo thứ tự xuất hiện của một cột text + số âm tiết mỗi doc; doc đánh số từ first_doc"""
+        docs, codes, tokens = tokenize(texts)
+        terms = self._term_ids(tokens)[codes]
+        lengths = np.bincount(docs, minlength=len(texts))
+
+        if bigrams:
+            same = docs[1:] == docs[:-1]
+            keys = (terms[:-1][same] << 32) | terms[1:][same]
+            pair_codes, pair_keys = pd.factorize(keys)
+            pair_terms = self._term_ids([f'{self.terms[key >> 32]}_{self.terms[key & 0xFFFFFFFF]}'
+                                         for key in pair_keys])
+            terms = np.concatenate([terms, pair_terms[pair_codes]])
+            docs = np.concatenate([docs, docs[1:][same]])
+        return first_doc + docs, terms, lengths
+
+    def add(self, frame, merge=True):
+        """Thêm / cập nhật sản phẩm (id đã có -> bản cũ bị đánh dấu xóa)"""
+        frame = prepare_documents(frame).drop_duplicates('id', keep='last')
+        if frame.empty:
+            return 0
+        self.delete(frame['id'].to_numpy(dtype=np.int64))
+        first = self.n_docs
+        name_docs, name_terms, name_len = self._tokenize(frame['name'], first, bigrams=True)
+        desc_docs, desc_terms, desc_len = self._tokenize(frame['description'], first, bigrams=False)
+        self.ids = np.concatenate([self.ids, frame['id'].to_numpy(dtype=np.int64)])
+        self.names = np.concatenate([self.names, frame['name'].astype(object).to_numpy()])
+        self.doc_len = np.concatenate([self.doc_len,
+                                       (NAME_WEIGHT * name_len + desc_len).astype(np.float32)])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(frame), dtype=bool)])
+
+        weights = np.concatenate([np.full(len(name_terms), NAME_WEIGHT, dtype=np.float32),
+                                  np.ones(len(desc_terms), dtype=np.float32)])
+        self.segments.append(Segment.from_triples(np.concatenate([name_terms, desc_terms]),
+                                                  np.concatenate([name_docs, desc_docs]), weights,
+                                                  len(self.terms), self.doc_len, self.avg_len()))
+        for facet in FACETS:
+            self.facet_codes[facet] = np.concatenate([self.facet_codes[facet],
+                                                      self._encode_facet(facet, frame[facet])])
+        self._doc_of = None
+        self._facet_docs = {}
+        if merge and len(self.segments) > MAX_SEGMENTS:
+            self.merge()
+        return len(frame)
+
+    def _doc_lookup(self):
+        if self._doc_of is None:
+            live = np.flatnonzero(~self.deleted)
+            self._doc_of = pd.Series(live, index=self.ids[live])
+        return self._doc_of
+
+    def delete(self, product_ids):
+        """Đánh dấu xóa theo product id, trả về số doc bị xóa"""
+        if not self.n_docs or not len(product_ids):
+            return 0
+        lookup = self._doc_lookup()
+        docs = lookup.reindex(np.asarray(product_ids, dtype=np.int64)).dropna().to_numpy(dtype=np.int64)
+        if len(docs):
+            self.deleted[docs] = True
+            self.n_deleted += len(docs)
+            self._doc_of = None
+        return len(docs)
+
+    def apply_delta(self, frame, delta):
+        """delta của etl_incremental.diff_snapshot: {'new', 'changed', 'deleted'} -> mảng product id"""
+        self.delete(delta['deleted'])
+        upsert = np.concatenate([delta['new'], delta['changed']])
+        return self.add(frame[frame['id'].isin(upsert)])
+
+    def merge(self):
+        """
+        Gộp mọi segment thành một, bỏ doc đã xóa và đánh số lại doc.
+        Segment sau luôn chứa doc số lớn hơn -> nối postings của từng term theo thứ tự segment
+        là đã sắp xếp, chỉ cần tính vị trí đích (tuyến tính, không sort lại toàn bộ).
+        """
+        live = ~self.deleted
+        new_doc = (np.cumsum(live) - 1).astype(np.int32)
+        n_terms = len(self.terms)
+        counts = []
+        for segment in self.segments:
+            keep = live[segment.docs]
+            counts.append(np.bincount(segment.posting_terms()[keep], minlength=n_terms))
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(sum(counts) if counts else np.zeros(n_terms, dtype=np.int64), out=indptr[1:])
+        docs = np.empty(indptr[-1], dtype=np.int32)
+        tfs = np.empty(indptr[-1], dtype=np.float32)
+
+        offset = indptr[:-1].copy()
+        for segment, count in zip(self.segments, counts):
+            keep = live[segment.docs]
+            terms = segment.posting_terms()[keep]
+            start = np.zeros(n_terms + 1, dtype=np.int64)
+            np.cumsum(count, out=start[1:])
+            target = offset[terms] + np.arange(len(terms)) - start[terms]
+            docs[target] = new_doc[segment.docs[keep]]
+            tfs[target] = segment.tfs[keep]
+            offset += count
+
+        self.ids, self.names, self.doc_len = self.ids[live], self.names[live], self.doc_len[live]
+        for facet in FACETS:
+            self.facet_codes[facet] = self.facet_codes[facet][live]
+        self.deleted = np.zeros(len(self.ids), dtype=bool)
+        self.n_deleted = 0
+        # avg_len tính lại trên các doc còn lại -> max_impact được cập nhật
+        self.segments = [Segment.create(indptr, docs, tfs, self.doc_len, self.avg_len())]
+        self._doc_of = None
+        self._facet_docs = {}
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _facet_filter(self, filters):
+        """{facet: mảng bool theo mã giá trị (True = được chọn)}; None nếu không lọc"""
+        if not filters:
+            return None
+        wanted = {}
+        for facet, values in filters.items():
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            lookup = self.facet_lookup[facet]
+            allowed = np.zeros(len(self.facet_values[facet]) + 1, dtype=bool)
+            allowed[[lookup[v] for v in normalize_facet(pd.Series(values)) if v in lookup]] = True
+            wanted[facet] = allowed
+        return wanted
+
+    def _facet_postings(self, wanted):
+        """
+        (số doc, các đoạn doc) của facet chọn lọc nhất trong filter, qua chỉ mục facet -> doc
+        (tạo khi cần); chưa kiểm tra các facet còn lại
+        """
+        best = None
+        for facet, allowed in wanted.items():
+            if facet not in self._facet_docs:
+                codes = self.facet_codes[facet]
+                indptr = np.zeros(len(self.facet_values[facet]) + 1, dtype=np.int64)
+                np.cumsum(np.bincount(codes, minlength=len(self.facet_values[facet])), out=indptr[1:])
+                self._facet_docs[facet] = (np.argsort(codes, kind='stable').astype(np.int32), indptr)
+            order, indptr = self._facet_docs[facet]
+            values = np.flatnonzero(allowed[:-1])
+            size = int((indptr[values + 1] - indptr[values]).sum())
+            if best is None or size < best[0]:
+                best = (size, [order[indptr[v]:indptr[v + 1]] for v in values])
+        return best
+
+    def _filtered_docs(self, wanted, postings=None):
+        """Doc (tăng dần) thỏa mọi filter"""
+        _, parts = postings or self._facet_postings(wanted)
+        docs = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.int32)
+        return docs[self._matches(docs, wanted)]
+
+    def _matches(self, docs, wanted):
+        keep = ~self.deleted[docs]
+        for facet, allowed in (wanted or {}).items():
+            keep &= allowed[self.facet_codes[facet][docs]]
+        return keep
+
+    def _buffers(self):
+        """Mảng điểm theo doc dùng lại giữa các query (luôn được trả về 0 sau khi dùng)"""
+        if self._scores is None or len(self._scores) != self.n_docs:
+            self._scores = np.zeros(self.n_docs, dtype=np.float32)
+        return self._scores
+
+    def _lookup(self, posting, docs):
+        """Điểm của term cho docs; tập doc lớn -> ghi điểm cả postings vào mảng dùng chung rồi đọc ra"""
+        if len(docs) * DENSE_LOOKUP < len(posting):
+            return posting.lookup(docs)
+        accumulator = self._buffers()
+        accumulator[posting.docs] = posting.scores()
+        result = accumulator[docs]
+        accumulator[posting.docs] = 0
+        return result
+
+    def _score_segment(self, lists, wanted, k, theta):
+        """(doc, điểm) có thể vào top k trong một segment; theta = điểm thứ k đã biết"""
+        # 1. theta ban đầu: tính đủ điểm (tìm nhị phân trên các list khác) cho các doc
+        #    có impact cao nhất trong postings ngắn nhất
+        filtering = bool(wanted) or self.n_deleted > 0
+        pivot = min(lists, key=len)
+        positions = np.flatnonzero(self._matches(pivot.docs, wanted)) if filtering else slice(None)
+        seeds = pivot.docs[positions]
+        scores = pivot.scores(positions)
+        if len(lists) == 1:
+            theta = max(theta, _kth(scores, k))
+            return [(seeds[scores >= theta], scores[scores >= theta])]
+        n_seeds = max(SEED_DOCS, k)
+        if len(seeds) > n_seeds:
+            top = np.argpartition(-scores, n_seeds - 1)[:n_seeds]
+            seeds, scores = seeds[top], scores[top]
+        scores = scores + sum(self._lookup(posting, seeds) for posting in lists if posting is not pivot)
+        theta = max(theta, _kth(scores, k))
+        result = [(seeds[scores >= theta], scores[scores >= theta])]
+
+        # 2. Các term có tổng cận trên (từ nhỏ đến lớn) chưa đạt theta là "không thiết yếu":
+        #    doc chỉ chứa các term đó không thể vào top k -> ứng viên = doc của các list còn lại
+        lists = sorted(lists, key=lambda posting: posting.bound)
+        n_optional = int(np.searchsorted(np.cumsum([posting.bound for posting in lists]), theta, side='left'))
+        essential = lists[n_optional:]
+        if not essential:
+            return result
+
+        # 3. Doc trong một list thiết yếu chỉ có thể đạt theta nếu riêng điểm term đó
+        #    >= theta - tổng cận trên các term khác -> lọc từng list trước khi hợp lại
+        total = sum(posting.bound for posting in lists)
+        parts = [posting.docs[posting.scores() >= theta - (total - posting.bound)] for posting in essential]
+        candidates = _exclude(_union(parts), seeds)   # seeds đã tính đủ điểm ở bước 1
+        if filtering:
+            candidates = candidates[self._matches(candidates, wanted)]
+
+        # 4. Cộng dần điểm từng term (cận trên lớn trước), bỏ doc hết khả năng đạt theta
+        partial = np.zeros(len(candidates), dtype=np.float32)
+        remaining = total
+        for posting in reversed(lists):
+            partial += self._lookup(posting, candidates)
+            remaining -= posting.bound
+            alive = partial + remaining >= theta
+            candidates, partial = candidates[alive], partial[alive]
+        result.append((candidates, partial))
+        return result
+
+    def search(self, query, filters=None, k=10):
+        """
+        Top k sản phẩm theo BM25: list dict {id, name, score, brand, price_segment, fulfillment_type}.
+        filters: {'brand': 'sakos', 'price_segment': ['<100k', '100k-500k'], ...}
+
+        Dùng MaxScore: từ điểm thứ k của các doc chứa term hiếm nhất, bỏ qua các doc chỉ chứa
+        những term phổ biến có tổng cận trên quá thấp (doc bằng điểm thứ k vẫn được giữ) -> kết quả
+        giống chấm điểm toàn bộ postings, kể cả tie-break theo doc, nhưng thường chỉ đọc postings ngắn. Dùng chung bộ đệm -> không gọi song song từ nhiều thread.
+        """
+        terms = query_terms(query)
+        wanted = self._facet_filter(filters)
+        if not terms:
+            return self._filter_only(wanted, k)
+        term_ids = [self.vocab[t] for t in terms if t in self.vocab]
+        if not term_ids or k <= 0:
+            return []
+
+        n_live = max(self.n_live, 1)
+        idfs = {}
+        for term in term_ids:
+            df = sum(segment.doc_freq(term) for segment in self.segments)
+            idfs[term] = np.log(1 + (n_live - df + 0.5) / (df + 0.5))
+
+        by_segment = [[PostingList(segment, term, idf) for term, idf in idfs.items() if segment.doc_freq(term)]
+                      for segment in self.segments]
+        n_postings = sum(len(posting) for lists in by_segment for posting in lists)
+        facet_postings = self._facet_postings(wanted) if wanted else None
+        if facet_postings is not None and facet_postings[0] * DENSE_LOOKUP < n_postings:
+            # Filter chọn lọc (vd. một brand nhỏ): chỉ chấm điểm các doc thỏa filter
+            filtered = self._filtered_docs(wanted, facet_postings)
+            scores = sum(self._lookup(posting, filtered) for lists in by_segment for posting in lists)
+            docs, scores = filtered[scores > 0], scores[scores > 0]
+        else:
+            found, theta = [], 0.0
+            for lists in by_segment:
+                if lists:
+                    found += self._score_segment(lists, wanted, k, theta)
+                    theta = _kth(np.concatenate([scores for _, scores in found]), k)
+            if not found:
+                return []
+            docs = np.concatenate([docs for docs, _ in found])
+            scores = np.concatenate([scores for _, scores in found])
+        if len(docs) > k:
+            # Giữ mọi doc bằng điểm thứ k để tie-break theo doc không phụ thuộc argpartition
+            top = scores >= _kth(scores, k)
+            docs, scores = docs[top], scores[top]
+        order = np.lexsort((docs, -scores))[:k]
+        return self._results(docs[order], scores[order])
+
+    def _filter_only(self, wanted, k):
+        """Query rỗng: các doc thỏa điều kiện lọc (theo thứ tự trong index)"""
+        docs = self._filtered_docs(wanted)[:k] if wanted else np.flatnonzero(~self.deleted)[:k]
+        return self._results(docs, np.zeros(len(docs)))
+
+    def _results(self, docs, scores):
+        return [{
+            'id': int(self.ids[doc]), 'name': self.names[doc], 'score': round(float(score), 4),
+            **{facet: self.facet_values[facet][self.facet_codes[facet][doc]] for facet in FACETS},
+        } for doc, score in zip(docs, scores)]
+
+    # ------------------------------------------------------------------
+    # Lưu / nạp
+    # ------------------------------------------------------------------
+    def save(self, index_dir=INDEX_DIR):
+        if len(self.segments) != 1 or self.n_deleted:
+            self.merge()
+        os.makedirs(index_dir, exist_ok=True)
+        segment = self.segments[0]
+        arrays = {'indptr': segment.indptr, 'docs': segment.docs, 'tfs': segment.tfs,
+                  'impacts': segment.impacts, 'max_impact': segment.max_impact,
+                  'ids': self.ids, 'doc_len': self.doc_len,
+                  **{f'facet_{facet}': codes for facet, codes in self.facet_codes.items()}}
+        # File tạm + os.replace: postings đang được memory-map (kể cả bởi chính index này
+        # khi nạp từ index_dir) không bị ghi đè tại chỗ
+        for name, values in arrays.items():
+            _replace(os.path.join(index_dir, f'{name}.npy'),
+                     lambda f, values=values: np.save(f, np.ascontiguousarray(values)))
+        _replace(os.path.join(index_dir, 'names.npy'), lambda f: np.save(f, self.names, allow_pickle=True))
+        meta = {'terms': self.terms, 'facet_values': self.facet_values,
+                'n_docs': self.n_docs, 'avg_len': segment.avg_len}
+        _replace(os.path.join(index_dir, 'meta.json'),
+                 lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        index = cls()
+        with open(os.path.join(index_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        index.terms = meta['terms']
+        index.vocab = {term: i for i, term in enumerate(index.terms)}
+        index.facet_values = meta['facet_values']
+        index.facet_lookup = {facet: {v: i for i, v in enumerate(values)}
+                              for facet, values in index.facet_values.items()}
+        path = lambda name: os.path.join(index_dir, f'{name}.npy')
+        # Postings lớn nhất -> memory-map, chỉ trang được truy vấn mới được đọc
+        # (np.asarray: bỏ lớp np.memmap, tránh chi phí mỗi lần cắt mảng)
+        mapped = {name: np.asarray(np.load(path(name), mmap_mode='r')) for name in ['docs', 'tfs', 'impacts']}
+        index.segments = [Segment(np.load(path('indptr')), mapped['docs'], mapped['tfs'], mapped['impacts'],
+                                  np.load(path('max_impact')), meta['avg_len'])]
+        index.ids = np.load(path('ids'))
+        index.doc_len = np.load(path('doc_len'))
+        index.names = np.load(path('names'), allow_pickle=True)
+        index.facet_codes = {facet: np.load(path(f'facet_{facet}')) for facet in FACETS}
+        index.deleted = np.zeros(len(index.ids), dtype=bool)
+        return index
+
+
+def _replace(path, write):
+    """Ghi file qua file tạm cùng thư mục rồi os.replace (thay nguyên tử, không sửa inode cũ)"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def index_exists(index_dir=INDEX_DIR):
+    return os.path.exists(os.path.join(index_dir, 'meta.json'))
+
+
+def load_clean_products():
+    """Dữ liệu sạch: columnar store nếu có, ngược lại products_clean.csv"""
+    import columnar_store
+    if columnar_store.store_exists():
+        return columnar_store.read_table(INDEX_COLUMNS)
+    return pd.read_csv(CLEAN_FILE, usecols=INDEX_COLUMNS)
+
+
+def update_index(frame, delta=None, index_dir=INDEX_DIR):
+    """
+    Gọi từ ETL: delta (incremental) -> chỉ áp dụng id mới / đổi / xóa,
+    None (nạp toàn bộ) -> dựng lại index từ frame. Không làm gì nếu chưa có index.
+    """
+    if not index_exists(index_dir):
+        return None
+    if delta is None:
+        index = ProductSearchIndex.build(frame)
+    else:
+        index = ProductSearchIndex.load(index_dir)
+        index.apply_delta(frame, delta)
+        if len(index.segments) == 1 and not index.n_deleted:
+            return index.n_docs         # delta không chạm tới doc nào trong index
+    index.save(index_dir)
+    return index.n_docs
+
+
+def benchmark(index, n_queries, k=10, random_state=42):
+    """Latency (ms) của n_queries query lấy từ tên sản phẩm, có và không có filter"""
+    rng = np.random.RandomState(random_state)
+    docs = rng.randint(0, index.n_docs, n_queries)
+    latencies = []
+    for i, doc in enumerate(docs):
+        words = str(index.names[doc]).split()
+        query = ' '.join(words[:rng.randint(1, 4)])
+        filters = None
+        if i % 2:
+            facet = FACETS[i % len(FACETS)]
+            filters = {facet: index.facet_values[facet][index.facet_codes[facet][doc]]}
+        start = time.perf_counter()
+        index.search(query, filters, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, [50, 90, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tìm kiếm sản phẩm (BM25, tiếng Việt không dấu)')
+    parser.add_argument('query', nargs='?', default='')
+    parser.add_argument('--build', action='store_true', help='Dựng index từ dữ liệu sạch')
+    parser.add_argument('--input', default=None, help='CSV (thô hoặc sạch) thay cho dữ liệu sạch')
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    parser.add_argument('--brand', action='append')
+    parser.add_argument('--segment', action='append', help='price_segment, vd. 100k-500k')
+    parser.add_argument('--fulfillment', action='append')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--bench', type=int, default=0, help='Đo latency với N query ngẫu nhiên')
+    args = parser.parse_args()
+
+    if args.build:
+        start = time.perf_counter()
+        frames = pd.read_csv(args.input, usecols=lambda c: c in INDEX_COLUMNS + ['price'],
+                             chunksize=BUILD_CHUNK) if args.input else load_clean_products()
+        index = ProductSearchIndex.build(frames)
+        index.save(args.index_dir)
+        print(f"✅ Đã index {index.n_docs:,} sản phẩm, {len(index.terms):,} term "
+              f"({time.perf_counter() - start:.2f}s) -> '{args.index_dir}'")
+    else:
+        start = time.perf_counter()
+        index = ProductSearchIndex.load(args.index_dir)
+        print(f"📂 Nạp index {index.n_docs:,} sản phẩm ({time.perf_counter() - start:.2f}s)")
+
+    if args.query:
+        filters = {'brand': args.brand, 'price_segment': args.segment, 'fulfillment_type': args.fulfillment}
+        start = time.perf_counter()
+        results = index.search(args.query, filters, args.k)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n🔎 '{args.query}': {len(results)} kết quả ({elapsed:.2f} ms)")
+        for rank, result in enumerate(results, 1):
+            print(f"{rank:3}. [{result['score']:6.2f}] {result['name'][:80]} "
+                  f"({result['brand']}, {result['price_segment']}, {result['fulfillment_type']})")
+
+    if args.bench:
+        p50, p90, p99 = benchmark(index, args.bench, args.k)
+        print(f"\n⏱️  {args.bench} query: p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
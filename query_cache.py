@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Query Result Cache
+Cache kết quả truy vấn báo cáo theo (câu truy vấn đã chuẩn hóa, version của dữ liệu):
+  - Tầng bộ nhớ: LRU giới hạn số entry
+  - Tầng đĩa (tùy chọn): file pickle trong data/cache/query_results,
+    tự xóa file cũ nhất khi vượt quá dung lượng cho phép
+Version của warehouse = watermark_id mới nhất trong ETL_Watermark
+(mỗi lần ETL full / incremental có thay đổi và mỗi lần chấm điểm warehouse đều ghi một watermark mới),
+nên kết quả cũ tự hết hiệu lực mà không cần xóa cache.
+
+Ví dụ:
+    cache = default_cache()
+    version = warehouse_version(cursor)
+    rows = cached_fetchall(cursor, cache, "SELECT ...", version=version)
+    print(cache.stats())
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import threading
+from collections import OrderedDict
+
+from mysql.connector import Error
+
+DEFAULT_CACHE_DIR = 'data/cache/query_results'
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_DISK_BYTES = 64 * 1024 * 1024
+
+_QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+
+
+def normalize_query(query):
+    """
+    Chuẩn hóa câu SQL để các cách viết khác nhau (xuống dòng, thụt lề, chữ hoa/thường,
+    dấu ; cuối) dùng chung một key. Chuỗi trong dấu nháy được giữ nguyên.
+    Query không phải chuỗi (tuple tham số, ...) dùng repr().
+    """
+    if not isinstance(query, str):
+        return repr(query)
+    parts = _QUOTED.split(query.strip().rstrip(';'))
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\s+', ' ', parts[i]).lower()
+    return ''.join(parts).strip()
+
+
+def cache_key(query, version):
+    text = f'{normalize_query(query)}|{version}'
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    """
+    Cache 2 tầng: LRU trong bộ nhớ + thư mục pickle giới hạn dung lượng.
+    Dùng chung được giữa các thread (vd. worker của analytics_api): LRU + bộ đếm có khóa
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.pkl')
+
+    def _remember(self, key, value):
+        with self._lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def get(self, query, version):
+        """Trả về (found, value)"""
+        key = cache_key(query, version)
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return True, self.memory[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                os.utime(path)  # đánh dấu vừa dùng cho eviction theo LRU
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, query, version, value):
+        key = cache_key(query, version)
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+    def get_or_compute(self, query, version, compute):
+        """Lấy từ cache, nếu chưa có thì gọi compute() và lưu lại. version=None: không cache"""
+        if version is None:
+            return compute()
+        found, value = self.get(query, version)
+        if not found:
+            value = compute()
+            self.put(query, version, value)
+        return value
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.disk_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict_disk(self):
+        """Xóa các file ít được dùng nhất cho tới khi tổng dung lượng <= max_disk_bytes"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.disk_dir, name))
+            total -= size
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk_dir:
+            for _, _, name in self._disk_entries():
+                os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'disk_bytes': sum(size for _, size, _ in self._disk_entries()) if self.disk_dir else 0,
+        }
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Cache dùng chung trong process (có tầng đĩa để giữ kết quả giữa các lần chạy)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = QueryCache(disk_dir=DEFAULT_CACHE_DIR)
+    return _default_cache
+
+
+def warehouse_version(cursor):
+    """watermark_id mới nhất của ETL; None nếu chưa có bảng watermark (không dùng cache)"""
+    try:
+        cursor.execute('SELECT MAX(watermark_id) FROM ETL_Watermark')
+        row = cursor.fetchone()
+    except Error:
+        return None
+    return row[0] if row and row[0] is not None else None
+
+
+def file_version(path):
+    """Version của một file dữ liệu (kích thước + thời điểm sửa), None nếu không tồn tại"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def cached_fetchall(cursor, cache, sql, params=None, version=None):
+    """cursor.execute + fetchall có cache (version=None: luôn chạy truy vấn)"""
+    def run():
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    query = (normalize_query(sql), tuple(params)) if params else sql
+    return cache.get_or_compute(query, version, run)
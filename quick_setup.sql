@@ -0,0 +1,18 @@
+-- ========================================
+-- QUICK_SETUP.sql
+-- ========================================
+-- Tạo toàn bộ ProductDW bằng một lệnh (chạy từ thư mục gốc của repo):
+--   mysql --local-infile=1 -u root -p < quick_setup.sql
+
+SOURCE 00_mysql_create_database.sql;
+SOURCE 01_mysql_create_dimension_tables.sql;
+SOURCE 02_mysql_create_fact_tables.sql;
+SOURCE 03_mysql_import_csv_data.sql;
+SOURCE 04_mysql_populate_dimensions_fixed.sql;
+SOURCE 05_mysql_populate_fact_table_fixed.sql;
+SOURCE 06_mysql_create_etl_state_tables.sql;
+
+-- Aggregate tables (AGG_*) + views cho báo cáo
+SOURCE create_views.sql;
+
+SELECT 'ProductDW quick setup completed!' as Status;
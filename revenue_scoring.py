@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Revenue Scoring
+Dùng model dự đoán doanh thu tốt nhất trong ModelRegistry (R2 cao nhất, do part 3 train)
+để chấm điểm toàn bộ catalog hoặc sản phẩm mới:
+  - Batch  : dữ liệu sạch (columnar store / CSV) hoặc Fact_product_stats, theo từng chunk,
+             feature được dựng bằng phép toán vector trên cả chunk;
+             predicted_revenue được ghi lại hàng loạt (cột dẫn xuất / CSV / UPDATE JOIN bảng tạm)
+  - Online : RevenueScorer.predict(record hoặc list record) cho 1 hoặc vài sản phẩm,
+             model / encoder / scaler đã nạp sẵn trong bộ nhớ
+Encoder là bản chụp vocabulary lúc train (categorical_encoding.py); giá trị chưa gặp -> -1.
+
+Ví dụ:
+    scorer = RevenueScorer()
+    scorer.predict({'price': 250000, 'quantity_sold': 12, 'brand': 'sakos', ...})
+    python revenue_scoring.py --source clean
+    python revenue_scoring.py --source warehouse --chunk-size 20000
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+import columnar_store
+from bulk_loader import STAGING_TABLE, insert_values
+from etl_incremental import record_version_bump
+from model_registry import ModelRegistry
+
+MODEL_PREFIX = 'revenue/'
+SELECTION_METRIC = 'R2'
+DEFAULT_CHUNK_SIZE = 50000
+PREDICTION_COLUMN = 'predicted_revenue'
+CLEAN_CSV = 'data/clean/products_clean.csv'
+PREDICTIONS_CSV = 'data/clean/revenue_predictions.csv'
+FACT_TABLE = 'Fact_product_stats'
+SCORE_TABLE = 'Revenue_Scores'
+STAGING_INDEX = 'idx_staging_id'
+
+# Feature của fact lấy từ dimension + STAGING_Products (category, giá gốc), JOIN qua idx_staging_id
+WAREHOUSE_SELECT = """
+SELECT f.UniqueID, f.price, f.quantity_sold, f.rating_average, f.review_count,
+       b.brand_name AS brand, s.seller_name AS current_seller,
+       sp.category, sp.original_price
+FROM Fact_product_stats f
+JOIN DIM_Brand b ON b.brand_id = f.brand_id
+JOIN DIM_Seller s ON s.seller_id = f.seller_id
+LEFT JOIN STAGING_Products sp ON sp.id = f.product_id
+WHERE f.UniqueID > %s
+ORDER BY f.UniqueID
+LIMIT %s
+"""
+
+
+def best_model_key(registry, prefix=MODEL_PREFIX, metric=SELECTION_METRIC):
+    """Tên model (trong registry) có metric cao nhất và đủ thông tin để dựng feature"""
+    candidates = {name: entry['meta'][metric] for name, entry in registry.index.items()
+                  if name.startswith(prefix) and metric in entry['meta']
+                  and 'features' in entry['meta']}
+    if not candidates:
+        raise KeyError(f"Registry chưa có model '{prefix}*' - hãy chạy part3_olap_datamining.py")
+    return max(candidates, key=candidates.get)
+
+
+def discount_rate(price, original_price):
+    """Giống data_preprocessing.clean_chunk: 1 - price / original_price"""
+    price = np.asarray(price, dtype=float)
+    original_price = np.nan_to_num(np.asarray(original_price, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(original_price > 0, 1 - price / original_price, 0.0)
+
+
+class RevenueScorer:
+    """Model + encoder + scaler nạp một lần, dùng cho cả batch lẫn online"""
+
+    def __init__(self, registry=None, key=None):
+        registry = registry or ModelRegistry()
+        self.key = key or best_model_key(registry)
+        meta = registry.meta(self.key)
+        self.features = list(meta['features'])
+        self.model = registry.load(self.key).model
+        self.metric = meta.get(SELECTION_METRIC)
+
+        # feature -> (cột nguồn, encoder)
+        self.encoders = {feature: (column, registry.load(encoder_key).model)
+                         for feature, (column, encoder_key) in meta.get('encoders', {}).items()}
+
+        self.mean, self.scale = None, None
+        if meta.get('scaler'):
+            scaler = registry.load(meta['scaler']).model
+            self.mean, self.scale = scaler.mean_, scaler.scale_
+
+        self.rows = 0
+        self.seconds = 0.0
+
+    def transform(self, frame):
+        """DataFrame (cột gốc) -> ma trận feature đúng thứ tự lúc train"""
+        X = np.empty((len(frame), len(self.features)), dtype=float)
+        missing = pd.Series(np.nan, index=frame.index)
+        for j, feature in enumerate(self.features):
+            # Cột thiếu (bản ghi online không đủ trường) -> mã -1 / giá trị 0
+            if feature in self.encoders:
+                column, encoder = self.encoders[feature]
+                X[:, j] = encoder.transform(frame.get(column, missing))
+            elif feature == 'discount_rate' and feature not in frame and 'original_price' in frame:
+                X[:, j] = discount_rate(frame['price'], frame['original_price'])
+            else:
+                X[:, j] = pd.to_numeric(frame.get(feature, missing), errors='coerce').fillna(0).to_numpy()
+        return X
+
+    def transform_records(self, records):
+        """Như transform() nhưng đọc thẳng từ list dict (không dựng DataFrame, cho online)"""
+        X = np.zeros((len(records), len(self.features)), dtype=float)
+        for i, record in enumerate(records):
+            for j, feature in enumerate(self.features):
+                if feature in self.encoders:
+                    column, encoder = self.encoders[feature]
+                    X[i, j] = encoder.code(record.get(column))
+                elif feature == 'discount_rate' and feature not in record and 'original_price' in record:
+                    X[i, j] = discount_rate(record.get('price', 0), record['original_price'])
+                else:
+                    value = pd.to_numeric(record.get(feature), errors='coerce')
+                    X[i, j] = 0.0 if pd.isna(value) else value
+        return X
+
+    def _predict(self, X, n_rows):
+        start = time.perf_counter()
+        if self.mean is not None:
+            X = (X - self.mean) / self.scale
+        with warnings.catch_warnings():
+            # Model fit trên DataFrame, ở đây truyền ma trận cùng thứ tự cột
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            predictions = self.model.predict(X) if n_rows else np.empty(0)
+        # Doanh thu không âm (model tuyến tính cho ra số âm với sản phẩm quantity_sold = 0)
+        predictions = np.maximum(predictions, 0)
+        self.seconds += time.perf_counter() - start
+        self.rows += n_rows
+        return predictions
+
+    def score_frame(self, frame):
+        start = time.perf_counter()
+        X = self.transform(frame)
+        self.seconds += time.perf_counter() - start
+        return self._predict(X, len(frame))
+
+    def predict(self, records):
+        """Online: một dict hoặc list dict (micro-batch) -> giá trị / mảng predicted_revenue"""
+        single = isinstance(records, dict)
+        records = [records] if single else list(records)
+        start = time.perf_counter()
+        X = self.transform_records(records)
+        self.seconds += time.perf_counter() - start
+        predictions = self._predict(X, len(records))
+        return float(predictions[0]) if single else predictions
+
+    def score_chunks(self, frame, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Batch: chấm điểm DataFrame theo từng chunk, trả về mảng cùng thứ tự dòng"""
+        parts = [self.score_frame(frame.iloc[start:start + chunk_size])
+                 for start in range(0, len(frame), chunk_size)]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def throughput(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _source_columns(scorer):
+    columns = ['id']
+    for feature in scorer.features:
+        if feature in scorer.encoders:
+            columns.append(scorer.encoders[feature][0])
+        else:
+            columns.append(feature)
+    return list(dict.fromkeys(columns))
+
+
+def score_clean_dataset(scorer, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Chấm điểm dữ liệu sạch. Columnar store: lưu cột dẫn xuất predicted_revenue;
+    không có store: ghi id + predicted_revenue ra PREDICTIONS_CSV.
+    """
+    columns = _source_columns(scorer)
+    if columnar_store.store_exists():
+        df = columnar_store.read_table(columns)
+        predictions = scorer.score_chunks(df, chunk_size)
+        columnar_store.write_column(PREDICTION_COLUMN, predictions)
+        target = f'{columnar_store.STORE_DIR}/derived/{PREDICTION_COLUMN}.arrow'
+    else:
+        df = pd.read_csv(CLEAN_CSV, encoding='utf-8', usecols=columns, on_bad_lines='skip')
+        predictions = scorer.score_chunks(df, chunk_size)
+        pd.DataFrame({'id': df['id'], PREDICTION_COLUMN: predictions}).to_csv(
+            PREDICTIONS_CSV, index=False)
+        target = PREDICTIONS_CSV
+    return len(df), target
+
+
+def ensure_prediction_column(cursor):
+    """Thêm cột predicted_revenue vào Fact_product_stats nếu chưa có"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (FACT_TABLE, PREDICTION_COLUMN))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f'ALTER TABLE {FACT_TABLE} ADD COLUMN {PREDICTION_COLUMN} DECIMAL(18,2) NULL')
+
+
+def ensure_staging_index(cursor):
+    """Index STAGING_Products.id nếu chưa có (schema cũ), tránh quét lại staging ở mỗi chunk"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s AND SEQ_IN_INDEX = 1",
+        (STAGING_TABLE, 'id'))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f'ALTER TABLE {STAGING_TABLE} ADD INDEX {STAGING_INDEX} (id)')
+
+
+def score_warehouse(connection, scorer, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Chấm điểm Fact_product_stats theo khóa UniqueID tăng dần (keyset pagination),
+    mỗi chunk: INSERT kết quả vào bảng tạm rồi một câu UPDATE ... JOIN;
+    xong thì ghi watermark 'scoring' (version mới cho cache)
+    """
+    cursor = connection.cursor()
+    ensure_prediction_column(cursor)
+    ensure_staging_index(cursor)
+    cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS {SCORE_TABLE}')
+    cursor.execute(f'CREATE TEMPORARY TABLE {SCORE_TABLE} '
+                   f'(UniqueID BIGINT PRIMARY KEY, {PREDICTION_COLUMN} DECIMAL(18,2))')
+
+    last_id, total = 0, 0
+    while True:
+        cursor.execute(WAREHOUSE_SELECT, (last_id, chunk_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=[c[0] for c in cursor.description])
+        # Tên trong dimension giữ nguyên chữ hoa/thường, encoder train trên dữ liệu sạch (chữ thường)
+        for column in ('brand', 'current_seller'):
+            frame[column] = frame[column].str.lower().str.strip()
+        frame = frame.drop_duplicates('UniqueID')
+        predictions = np.round(scorer.score_frame(frame), 2)
+
+        cursor.execute(f'DELETE FROM {SCORE_TABLE}')
+        matrix = np.column_stack([frame['UniqueID'].to_numpy(dtype=object),
+                                  predictions.astype(object)])
+        insert_values(cursor, SCORE_TABLE, ['UniqueID', PREDICTION_COLUMN], matrix)
+        cursor.execute(f'UPDATE {FACT_TABLE} f JOIN {SCORE_TABLE} p ON p.UniqueID = f.UniqueID '
+                       f'SET f.{PREDICTION_COLUMN} = p.{PREDICTION_COLUMN}')
+        connection.commit()
+
+        last_id = int(frame['UniqueID'].iloc[-1])
+        total += len(frame)
+        print(f"   Đã chấm {total:,} dòng fact (đến UniqueID {last_id})")
+
+    cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS {SCORE_TABLE}')
+    # predicted_revenue đã đổi -> tăng version warehouse để cache theo version (API, báo cáo) đọc lại
+    record_version_bump(cursor, 'scoring', total, updated=total)
+    connection.commit()
+    cursor.close()
+    return total, f'{FACT_TABLE}.{PREDICTION_COLUMN}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chấm điểm predicted_revenue cho catalog')
+    parser.add_argument('--source', choices=['clean', 'warehouse'], default='clean')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--model', default=None,
+                        help="Tên model trong registry (mặc định: model 'revenue/*' có R2 cao nhất)")
+    args = parser.parse_args()
+
+    print("📈 REVENUE SCORING")
+    print("=" * 60)
+    start = time.perf_counter()
+    scorer = RevenueScorer(key=args.model)
+    print(f"Model: {scorer.key} (R2 = {scorer.metric:.3f}), nạp trong {time.perf_counter() - start:.2f}s")
+
+    if args.source == 'warehouse':
+        from db_config import get_connection
+        try:
+            connection = get_connection()
+        except Error as e:
+            print(f"❌ Lỗi kết nối MySQL: {e}")
+            return
+        try:
+            rows, target = score_warehouse(connection, scorer, args.chunk_size)
+        finally:
+            connection.close()
+    else:
+        rows, target = score_clean_dataset(scorer, args.chunk_size)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Đã chấm {rows:,} dòng -> {target}")
+    print(f"   Predict: {scorer.throughput():,.0f} dòng/giây "
+          f"(tính cả đọc/ghi: {rows / elapsed if elapsed else 0:,.0f} dòng/giây)")
+
+
+if __name__ == "__main__":
+    main()
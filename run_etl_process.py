@@ -4,29 +4,53 @@ Run ETL Process to Populate Dimension Tables
 Chạy quá trình ETL để populate các dimension tables
 """
 
-import mysql.connector
+import argparse
+import os
+import sys
 from mysql.connector import Error
-import time
 from datetime import datetime
 
-def run_etl_process():
-    """Chạy quá trình ETL hoàn chỉnh từ CSV đến Data Warehouse"""
+import instrumentation
+from aggregate_tables import AggregateRouter, refresh_aggregates
+from data_validation import Validator
+from bulk_loader import bulk_load_staging, DEFAULT_BATCH_SIZE
+from db_config import get_connection
+from dim_key_cache import DimensionKeyCache, insert_fact_rows, read_staging_for_fact
+from etl_incremental import run_incremental_etl, record_full_snapshot, record_unhashed_snapshot
+from fact_store import refresh_snapshot
+from product_search import update_index
+from query_cache import cached_fetchall, default_cache, warehouse_version
+
+CSV_FILE = 'vietnamese_tiki_products_backpacks_suitcases.csv'
+
+# 'auto' = thử LOAD DATA LOCAL INFILE trước, lỗi thì dùng INSERT VALUES nhiều dòng
+STAGING_LOAD_METHOD = 'auto'
+STAGING_BATCH_SIZE = DEFAULT_BATCH_SIZE
+
+def update_search_index(df, delta=None):
+    """Cập nhật index tìm kiếm sản phẩm (data/search) nếu đã được dựng"""
+    with instrumentation.span('search_index', rows=len(df)) as span:
+        n_docs = update_index(df, delta)
+        span['docs'] = n_docs
+    if n_docs is not None:
+        print(f"🔎 Search index: {n_docs:,} sản phẩm ({span['seconds']:.2f}s)")
+
+def run_etl_process(mode='full'):
+    """
+    Chạy quá trình ETL hoàn chỉnh từ CSV đến Data Warehouse
+    mode: 'full' (TRUNCATE và nạp lại) hoặc 'incremental' (chỉ áp dụng delta)
+    """
     print("🚀 BẮT ĐẦU QUÁ TRÌNH ETL HOÀN CHỈNH")
     print(f"⏰ Thời gian bắt đầu: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
     
+    connection = None
     try:
         # Import pandas để đọc CSV
         import pandas as pd
         
         # Kết nối MySQL
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='123456',
-            database='ProductDW',
-            charset='utf8mb4'
-        )
+        connection = get_connection()
         
         if connection.is_connected():
             print("✅ Kết nối MySQL thành công!")
@@ -37,157 +61,154 @@ def run_etl_process():
             
             # Step 1: Import CSV data
             print("📂 Bước 1: Import CSV data...")
+            df = None
+            validator = Validator(source=CSV_FILE)
             try:
-                df = pd.read_csv('vietnamese_tiki_products_backpacks_suitcases.csv')
+                with instrumentation.span('csv_read', bytes=os.path.getsize(CSV_FILE)) as span:
+                    df = pd.read_csv(CSV_FILE)
+                    span['rows'] = len(df)
                 print(f"✅ Đọc được {len(df)} records từ CSV")
                 
-                # Clear staging table
-                cursor.execute('TRUNCATE TABLE STAGING_Products')
-                
-                # Insert data
-                insert_query = '''
-                INSERT INTO STAGING_Products 
-                (row_index, id, name, description, original_price, price, fulfillment_type, 
-                 brand, review_count, rating_average, favourite_count, pay_later, 
-                 current_seller, date_created, number_of_images, vnd_cashback, has_video, 
-                 category, quantity_sold)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                '''
+                # Kiểm tra chất lượng dữ liệu: dòng vi phạm luật -> quarantine kèm mã lý do
+                with instrumentation.span('validate', rows=len(df)) as span:
+                    df = validator.validate(df)
+                    span['rejected'] = validator.rejected
+                validator.report()
                 
-                data_to_insert = []
-                for index, row in df.iterrows():
-                    data_to_insert.append(tuple(row))
-                    if len(data_to_insert) >= 500:
-                        cursor.executemany(insert_query, data_to_insert)
-                        data_to_insert = []
-                
-                if data_to_insert:
-                    cursor.executemany(insert_query, data_to_insert)
-                
-                connection.commit()
+                # Bulk load theo cột (LOAD DATA LOCAL INFILE, fallback VALUES batch)
+                with instrumentation.span('staging_insert', rows=len(df)) as span:
+                    stats = bulk_load_staging(connection, df, method=STAGING_LOAD_METHOD,
+                                              batch_size=STAGING_BATCH_SIZE)
+                    span['method'] = stats['method']
+                print(f"   Phương thức: {stats['method']}, {stats['seconds']:.2f}s "
+                      f"({stats['rows_per_sec']:,.0f} rows/sec)")
                 
                 cursor.execute('SELECT COUNT(*) FROM STAGING_Products')
                 count = cursor.fetchone()[0]
                 print(f"✅ Import thành công: {count} records vào STAGING_Products")
                 
             except FileNotFoundError:
+                if mode == 'incremental':
+                    # Không có snapshot thì không tính được delta; không rơi xuống nạp lại toàn bộ (TRUNCATE)
+                    print(f"❌ Không tìm thấy file CSV '{CSV_FILE}', dừng incremental ETL")
+                    raise
                 print("❌ Không tìm thấy file CSV, bỏ qua bước import")
-            except Exception as e:
-                print(f"⚠️  Lỗi import CSV: {e}")
-            
-            # Step 2: Clear existing data
-            print("\n🗑️ Bước 2: Xóa dữ liệu cũ...")
-            cursor.execute('TRUNCATE TABLE Fact_product_stats')
-            cursor.execute('TRUNCATE TABLE DIM_Brand')
-            cursor.execute('TRUNCATE TABLE DIM_Seller')
-            cursor.execute('TRUNCATE TABLE DIM_Fulfillment_Type')
-            print("✅ Đã xóa dữ liệu cũ")
-            
-            # Step 3: Populate dimensions
-            print("\n🏗️ Bước 3: Populate dimension tables...")
-            
-            # DIM_Brand
-            cursor.execute('''
-            INSERT IGNORE INTO DIM_Brand (brand_name)
-            SELECT DISTINCT 
-                CASE 
-                    WHEN brand IS NULL OR TRIM(brand) = '' THEN 'Unknown'
-                    ELSE TRIM(brand)
-                END as brand_name
-            FROM STAGING_Products
-            ''')
-            cursor.execute('SELECT COUNT(*) FROM DIM_Brand')
-            brand_count = cursor.fetchone()[0]
-            print(f"   DIM_Brand populated: {brand_count} records")
+            except Error as e:
+                # Staging lỗi thì dừng, không nạp fact / dimension từ staging dở dang
+                print(f"❌ Lỗi nạp STAGING_Products: {e}")
+                raise
             
-            # DIM_Seller
-            cursor.execute('''
-            INSERT IGNORE INTO DIM_Seller (seller_name)
-            SELECT DISTINCT
-                CASE 
-                    WHEN current_seller IS NULL OR TRIM(current_seller) = '' THEN 'Unknown Seller'
-                    ELSE TRIM(current_seller)
-                END as seller_name
-            FROM STAGING_Products
-            ''')
-            cursor.execute('SELECT COUNT(*) FROM DIM_Seller')
-            seller_count = cursor.fetchone()[0]
-            print(f"   DIM_Seller populated: {seller_count} records")
+            if mode == 'incremental':
+                # Incremental: chỉ áp dụng sản phẩm mới / thay đổi / bị xóa
+                print("\n🔁 Bước 2-4: Incremental ETL (delta theo product id)...")
+                with instrumentation.span('incremental', rows=len(df)):
+                    delta_stats = run_incremental_etl(connection, df)
+                print(f"   Mới: {delta_stats['new']:,} | Thay đổi: {delta_stats['changed']:,} | "
+                      f"Xóa: {delta_stats['deleted']:,} | Không đổi: {delta_stats['unchanged']:,} "
+                      f"({delta_stats['seconds']:.2f}s)")
+                if 'delta' in delta_stats:
+                    update_search_index(df, delta_stats['delta'])
+            else:
+                # Step 2: Clear existing data
+                print("\n🗑️ Bước 2: Xóa dữ liệu cũ...")
+                with instrumentation.span('truncate'):
+                    for table in ['Fact_product_stats', 'DIM_Brand', 'DIM_Seller', 'DIM_Fulfillment_Type']:
+                        cursor.execute(f'TRUNCATE TABLE {table}')
+                print("✅ Đã xóa dữ liệu cũ")
             
-            # DIM_Fulfillment_Type
-            cursor.execute('''
-            INSERT INTO DIM_Fulfillment_Type (fulfillment_type, description)
-            VALUES 
-                ('dropship', 'Dropshipping fulfillment'),
-                ('tiki_delivery', 'Tiki delivery'),
-                ('seller_delivery', 'Seller delivery'),
-                ('unknown', 'Unknown fulfillment')
-            ''')
-            cursor.execute('SELECT COUNT(*) FROM DIM_Fulfillment_Type')
-            fulfillment_count = cursor.fetchone()[0]
-            print(f"   DIM_Fulfillment_Type populated: {fulfillment_count} records")
+                # Step 3: Populate dimensions
+                print("\n🏗️ Bước 3: Populate dimension tables...")
             
-            # Step 4: Populate fact table
-            print("\n📊 Bước 4: Populate fact table...")
-            cursor.execute('''
-            INSERT INTO Fact_product_stats (
-                product_id, brand_id, seller_id, fulfillment_id,
-                price, quantity_sold, rating_average, review_count
-            )
-            SELECT 
-                sp.id as product_id,
-                db.brand_id,
-                ds.seller_id,
-                df.fulfillment_id,
-                IFNULL(sp.price, 0) as price,
-                IFNULL(sp.quantity_sold, 0) as quantity_sold,
-                IFNULL(sp.rating_average, 0.0) as rating_average,
-                IFNULL(sp.review_count, 0) as review_count
-            FROM STAGING_Products sp
-            INNER JOIN DIM_Brand db ON db.brand_name = CASE 
-                WHEN sp.brand IS NULL OR TRIM(sp.brand) = '' THEN 'Unknown'
-                ELSE TRIM(sp.brand)
-            END
-            INNER JOIN DIM_Seller ds ON ds.seller_name = CASE 
-                WHEN sp.current_seller IS NULL OR TRIM(sp.current_seller) = '' THEN 'Unknown Seller'
-                ELSE TRIM(sp.current_seller)
-            END
-            INNER JOIN DIM_Fulfillment_Type df ON df.fulfillment_type = CASE 
-                WHEN sp.fulfillment_type = 'dropship' THEN 'dropship'
-                WHEN sp.fulfillment_type = 'tiki_delivery' THEN 'tiki_delivery'
-                WHEN sp.fulfillment_type = 'seller_delivery' THEN 'seller_delivery'
-                ELSE 'unknown'
-            END
-            WHERE sp.id IS NOT NULL
-            ''')
-            
-            cursor.execute('SELECT COUNT(*) FROM Fact_product_stats')
-            fact_count = cursor.fetchone()[0]
-            print(f"   Fact_product_stats populated: {fact_count} records")
+                with instrumentation.span('dim_populate') as span:
+                    # DIM_Fulfillment_Type
+                    cursor.execute('''
+                    INSERT INTO DIM_Fulfillment_Type (fulfillment_type, description)
+                    VALUES 
+                        ('dropship', 'Dropshipping fulfillment'),
+                        ('tiki_delivery', 'Tiki delivery'),
+                        ('seller_delivery', 'Seller delivery'),
+                        ('unknown', 'Unknown fulfillment')
+                    ''')
+                    
+                    # DIM_Brand, DIM_Seller: gán surrogate key phía Python bằng cache
+                    # (tên mới được INSERT theo lô, không JOIN trên CASE/TRIM)
+                    dim_cache = DimensionKeyCache()
+                    dim_cache.invalidate()
+                    dim_cache.load(cursor)
+                    fact_df = df[df['id'].notna()] if df is not None else read_staging_for_fact(cursor)
+                    keys = dim_cache.resolve(cursor, fact_df)
+                    span['rows'] = len(fact_df)
+                
+                for table in ['DIM_Brand', 'DIM_Seller', 'DIM_Fulfillment_Type']:
+                    cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                    print(f"   {table} populated: {cursor.fetchone()[0]} records")
+                
+                # Step 4: Populate fact table
+                print("\n📊 Bước 4: Populate fact table...")
+                with instrumentation.span('fact_insert') as span:
+                    span['rows'] = insert_fact_rows(cursor, fact_df, keys)
+                dim_cache.save()
+                
+                cursor.execute('SELECT COUNT(*) FROM Fact_product_stats')
+                fact_count = cursor.fetchone()[0]
+                print(f"   Fact_product_stats populated: {fact_count} records")
+                
+                # Step 5: Tính lại các bảng aggregate (AGG_*)
+                print("\n📦 Bước 5: Refresh aggregate tables...")
+                with instrumentation.span('aggregates') as span:
+                    groups_by_table = refresh_aggregates(cursor)
+                    span['rows'] = sum(groups_by_table.values())
+                for table, groups in groups_by_table.items():
+                    print(f"   {table}: {groups} nhóm")
+                
+                # Lưu content hash để lần incremental sau so sánh (và watermark mới = version warehouse)
+                if df is not None:
+                    with instrumentation.span('snapshot', rows=len(df)):
+                        record_full_snapshot(connection, df)
+                    update_search_index(df)
+                else:
+                    with instrumentation.span('snapshot', rows=len(fact_df)):
+                        record_unhashed_snapshot(connection, fact_df['id'])
             
             # Re-enable foreign key checks
             cursor.execute('SET FOREIGN_KEY_CHECKS = 1')
             connection.commit()
             
+            # Snapshot fact store (dashboard / API) được dựng lại nếu đang dùng
+            with instrumentation.span('fact_store') as span:
+                store = refresh_snapshot(cursor)
+                span['rows'] = len(store) if store is not None else 0
+            if store is not None:
+                print(f"🗃️ Fact store: {len(store):,} dòng ({store.nbytes / 1024 / 1024:.1f} MB)")
+            
             print("\n✅ ETL Process hoàn thành!")
             
             # Kiểm tra kết quả cuối cùng
-            verify_etl_results(cursor)
+            with instrumentation.span('verify'):
+                verify_etl_results(cursor, validation=validator.summary())
             
             cursor.close()
             connection.close()
             
-    except Error as e:
-        print(f"❌ Lỗi ETL Process: {e}")
-    except Exception as e:
-        print(f"❌ Lỗi không xác định: {e}")
+    finally:
+        # Lỗi (kể cả staging) không bị nuốt ở đây: main() báo lỗi và thoát với exit code 1
+        if connection is not None and connection.is_connected():
+            connection.close()
 
-def verify_etl_results(cursor):
-    """Kiểm tra kết quả ETL"""
+def verify_etl_results(cursor, cache=None, validation=None):
+    """
+    Kiểm tra kết quả ETL
+    validation: Validator.summary() của lần nạp (số dòng bị loại theo mã lý do)
+    Kết quả truy vấn được cache theo version của warehouse (watermark ETL mới nhất),
+    chạy lại khi dữ liệu chưa đổi sẽ không truy vấn lại MySQL.
+    """
     print("\n🔍 KIỂM TRA KẾT QUẢ ETL")
     print("=" * 40)
     
+    cache = cache or default_cache()
     try:
+        version = warehouse_version(cursor)
+        
         # Đếm records trong các bảng - theo schema mới
         tables = [
             'DIM_Brand', 'DIM_Seller', 'DIM_Fulfillment_Type',
@@ -198,8 +219,8 @@ def verify_etl_results(cursor):
         
         for table in tables:
             try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
+                count = cached_fetchall(cursor, cache, f"SELECT COUNT(*) FROM {table}",
+                                        version=version)[0][0]
                 results[table] = count
                 print(f"📊 {table:20}: {count:,} records")
             except Error as e:
@@ -208,55 +229,29 @@ def verify_etl_results(cursor):
         print()
         
         # Kiểm tra một số thống kê chi tiết
+        # (đọc từ bảng aggregate nhỏ nhất đủ chiều, fallback về Fact_product_stats)
         print("📈 THỐNG KÊ CHI TIẾT:")
         print("-" * 30)
         
-
-        cursor.execute("""
-            SELECT b.brand_name, COUNT(*) as count
-            FROM DIM_Brand b
-            INNER JOIN Fact_product_stats f ON b.brand_id = f.brand_id
-            GROUP BY b.brand_id, b.brand_name
-            ORDER BY count DESC
-            LIMIT 5
-        """)
-        
-        brands = cursor.fetchall()
-        print("🏷️  Top 5 thương hiệu:")
+        router = AggregateRouter(cursor, cache=cache, version=version)
+        brands, source = router.query(['brand'], ['product_count'], order_by='product_count', limit=5)
+        print(f"🏷️  Top 5 thương hiệu (nguồn: {source}):")
         for i, (brand, count) in enumerate(brands, 1):
             print(f"   {i}. {brand}: {count:,} sản phẩm")
         
         print()
         
         # Top sellers  
-        cursor.execute("""
-            SELECT s.seller_name, COUNT(*) as count
-            FROM DIM_Seller s
-            INNER JOIN Fact_product_stats f ON s.seller_id = f.seller_id
-            GROUP BY s.seller_id, s.seller_name  
-            ORDER BY count DESC
-            LIMIT 5
-        """)
-        
-        sellers = cursor.fetchall()
-        print("🏪 Top 5 sellers:")
+        sellers, source = router.query(['seller'], ['product_count'], order_by='product_count', limit=5)
+        print(f"🏪 Top 5 sellers (nguồn: {source}):")
         for i, (seller, count) in enumerate(sellers, 1):
             print(f"   {i}. {seller}: {count:,} sản phẩm")
         
         print()
         
         # Price statistics - theo schema mới
-        cursor.execute("""
-            SELECT 
-                MIN(price) as min_price,
-                MAX(price) as max_price,
-                AVG(price) as avg_price,
-                COUNT(*) as total_products
-            FROM Fact_product_stats 
-            WHERE price > 0
-        """)
-        
-        price_stats = cursor.fetchone()
+        rows, source = router.query([], ['min_price', 'max_price', 'avg_price', 'priced_count'])
+        price_stats = rows[0] if rows else None
         if price_stats and price_stats[0] is not None:
             print("💰 Thống kê giá:")
             print(f"   Giá thấp nhất: {price_stats[0]:,.0f} VND")
@@ -269,13 +264,13 @@ def verify_etl_results(cursor):
         print()
         
         # Check data integrity
-        cursor.execute("""
+        rows = cached_fetchall(cursor, cache, """
             SELECT 
                 (SELECT COUNT(*) FROM Fact_product_stats) as fact_records,
                 (SELECT COUNT(*) FROM STAGING_Products) as staging_records
-        """)
+        """, version=version)
         
-        integrity = cursor.fetchone()
+        integrity = rows[0] if rows else None
         if integrity:
             fact_count = integrity[0]  
             staging_count = integrity[1]
@@ -284,6 +279,10 @@ def verify_etl_results(cursor):
             print("🔗 Kiểm tra tính toàn vẹn dữ liệu:")
             print(f"   Staging records: {staging_count:,}")
             print(f"   Fact records: {fact_count:,}")  
+            if validation is not None:
+                print(f"   Rejected (validation): {validation['rejected']:,} / {validation['rows']:,}")
+                for code, count in validation['reasons'].items():
+                    print(f"      {code}: {count:,}")
             print(f"   Success rate: {success_rate:.1f}%")
             
             if success_rate > 90:
@@ -293,23 +292,47 @@ def verify_etl_results(cursor):
             else:
                 print("   ❌ ETL có vấn đề, cần kiểm tra lại")
         
+        stats = cache.stats()
+        print(f"\n🗄️  Query cache: {stats['hits']} hit / {stats['misses']} miss "
+              f"(hit ratio {stats['hit_ratio']:.0%}, version {version})")
+        
     except Error as e:
         print(f"❌ Lỗi kiểm tra kết quả: {e}")
 
 def main():
     """Hàm chính"""
-    print("🏗️  ETL PROCESS - POPULATE DIMENSION TABLES")
-    print("=" * 60)
+    parser = argparse.ArgumentParser(description='ETL CSV -> ProductDW')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Chỉ áp dụng sản phẩm mới / thay đổi / bị xóa thay vì nạp lại toàn bộ')
+    parser.add_argument('--verify-only', action='store_true',
+                        help='Chỉ chạy báo cáo kiểm tra (dùng query cache nếu warehouse chưa đổi)')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    metrics = instrumentation.configure('run_etl_process', args.metrics_dir, args.profile, args.trace_memory)
     
-    start_time = time.time()
+    if args.verify_only:
+        connection = get_connection()
+        cursor = connection.cursor(buffered=True)
+        verify_etl_results(cursor)
+        cursor.close()
+        connection.close()
+        return
     
-    # Chạy ETL
-    run_etl_process()
+    print("🏗️  ETL PROCESS - POPULATE DIMENSION TABLES")
+    print("=" * 60)
     
-    end_time = time.time()
-    duration = end_time - start_time
+    # Chạy ETL (mỗi bước là một span con của 'etl')
+    try:
+        with metrics.span('etl') as run:
+            run_etl_process(mode='incremental' if args.incremental else 'full')
+    except Exception as e:
+        print(f"❌ ETL thất bại: {type(e).__name__}: {e}")
+        print(f"📏 Metrics: '{metrics.write()}'")
+        sys.exit(1)
     
-    print(f"\n⏱️  Thời gian thực hiện: {duration:.2f} giây")
+    metrics.report(depth=1)
+    print(f"\n⏱️  Thời gian thực hiện: {run['seconds']:.2f} giây")
+    print(f"📏 Metrics: '{metrics.write()}'")
     print("🎉 HOÀN THÀNH ETL PROCESS!")
     print()
 
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Streaming Ingestion
+Nhận sự kiện sản phẩm (JSON lines) theo thời gian thực bằng asyncio và ghi ra
+data/clean/streaming_results.csv / streaming_metrics.csv:
+  - Nguồn sự kiện: file JSON lines (phát lại theo tốc độ tùy chọn), socket TCP
+    (mỗi dòng một JSON) hoặc bộ sinh sự kiện trong process (hàng đợi asyncio)
+  - Micro-batch: gom tối đa batch_size sự kiện hoặc tới khi hết cửa sổ window giây
+  - Mỗi batch: predicted_revenue (RevenueScorer) và cluster_id (OnlineClusterer khởi tạo
+    từ KMeans của part 3: gán theo tâm cụm gần nhất, cập nhật tâm cụm theo mini-batch,
+    fit lại trong nền khi drift) tính vector hóa trên cả batch
+  - Aggregate theo cửa sổ: avg_price, avg_rating, total_quantity (int),
+    total_predicted_revenue, batch_size - ghi bằng kiểu số Python (không ghi bytes numpy)
+  - Sink CSV ghi theo lô (flush_rows dòng một lần) trong thread riêng,
+    không chặn vòng lặp sự kiện
+  - Độ trễ end-to-end (lúc nhận sự kiện -> lúc dòng kết quả được ghi xuống file)
+    được báo cáo theo percentile
+  - Dòng không phải JSON object (file / socket) và sự kiện không qua EVENT_RULES của data_validation
+    (price bắt buộc và > 0, quantity_sold / rating là số hợp lệ) được ghi vào
+    data/quarantine/rejected_events.jsonl rồi bỏ qua, không dừng cả luồng và không được chấm điểm,
+    gán cluster hay tính vào aggregate; sự kiện dùng 'rating' hoặc 'rating_average' đều được,
+    quantity_sold / rating thiếu nhận giá trị mặc định 0
+
+Ví dụ:
+    python streaming_ingest.py --source generate --events 5000 --rate 1000
+    python streaming_ingest.py --source file --input events.jsonl --batch-size 200 --window 0.5
+    python streaming_ingest.py --source socket --port 9009 --events 10000
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from data_validation import RULES, Validator
+from model_registry import ModelRegistry
+from online_clustering import load_clusterer
+from revenue_scoring import RevenueScorer
+
+RESULTS_FILE = 'data/clean/streaming_results.csv'
+METRICS_FILE = 'data/clean/streaming_metrics.csv'
+CATALOG_CSV = 'data/clean/products_clean.csv'
+QUARANTINE_FILE = 'data/quarantine/rejected_events.jsonl'
+
+RESULT_COLUMNS = ['id', 'product_id', 'name', 'brand', 'category', 'price', 'rating',
+                  'quantity_sold', 'timestamp', 'predicted_revenue', 'cluster_id']
+METRIC_COLUMNS = ['id', 'metric_name', 'value', 'timestamp']
+EVENT_COLUMNS = ['brand', 'category', 'current_seller', 'price', 'original_price',
+                 'rating_average', 'review_count', 'quantity_sold', 'favourite_count']
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WINDOW_SECONDS = 1.0
+DEFAULT_FLUSH_ROWS = 1000
+# Bộ đệm sink cũng được ghi nếu dòng cũ nhất đã chờ quá lâu (giới hạn độ trễ khi luồng thưa)
+DEFAULT_FLUSH_SECONDS = 1.0
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_PORT = 9009
+# Socket: dừng nếu không nhận thêm sự kiện trong khoảng này
+SOCKET_IDLE_SECONDS = 5.0
+
+# Luật kiểm tra từng micro-batch (cùng định nghĩa với ingest batch); quantity_sold / rating thiếu
+# vẫn được nhận (mặc định 0), nhưng có giá trị thì phải là số hợp lệ
+EVENT_RULES = {
+    'price': RULES['price'],
+    'quantity_sold': {**RULES['quantity_sold'], 'required': False},
+    'rating_average': RULES['rating_average'],
+}
+
+
+def sample_events(n_events, random_state=42):
+    """Sinh sự kiện giả lập từ catalog sạch (brand / category / seller có thật, giá dao động)"""
+    if columnar_store.store_exists():
+        catalog = columnar_store.read_table(EVENT_COLUMNS)
+    else:
+        catalog = pd.read_csv(CATALOG_CSV, usecols=EVENT_COLUMNS, on_bad_lines='skip')
+    rng = np.random.RandomState(random_state)
+    rows = catalog.iloc[rng.randint(0, len(catalog), size=n_events)].reset_index(drop=True)
+    price = np.round(rows['price'].to_numpy(dtype=float) * rng.lognormal(0, 0.1, size=n_events), 2)
+    quantity = rng.poisson(rows['quantity_sold'].fillna(0).to_numpy(dtype=float) / 10 + 1)
+    # Chuyển sẵn từng cột thành list kiểu Python (không truy cập DataFrame theo từng ô)
+    columns = {c: rows[c].astype(str).tolist() for c in ('brand', 'category', 'current_seller')}
+    for c in ('original_price', 'rating_average', 'review_count', 'favourite_count'):
+        columns[c] = np.nan_to_num(rows[c].to_numpy(dtype=float)).tolist()
+    for i in range(n_events):
+        yield {
+            'product_id': f'STR_{i:06d}',
+            'name': f'Streaming Product {i}',
+            'brand': columns['brand'][i],
+            'category': columns['category'][i],
+            'current_seller': columns['current_seller'][i],
+            'price': float(price[i]),
+            'original_price': columns['original_price'][i],
+            'rating': columns['rating_average'][i],
+            'review_count': int(columns['review_count'][i]),
+            'quantity_sold': int(quantity[i]),
+            'favourite_count': int(columns['favourite_count'][i]),
+        }
+
+
+# ----------------------------------------------------------------------------
+# Nguồn sự kiện (async generator trả về dict)
+# ----------------------------------------------------------------------------
+
+async def generated_events(n_events, rate=None):
+    """Bộ sinh trong process; rate = số sự kiện / giây (None = nhanh nhất có thể)"""
+    for i, event in enumerate(sample_events(n_events)):
+        yield event
+        if rate:
+            await asyncio.sleep(1 / rate)
+        elif i % DEFAULT_BATCH_SIZE == 0:
+            await asyncio.sleep(0)
+
+
+def quarantine_lines(lines, quarantine_file=QUARANTINE_FILE):
+    os.makedirs(os.path.dirname(quarantine_file) or '.', exist_ok=True)
+    with open(quarantine_file, 'a', encoding='utf-8') as f:
+        f.writelines(line + '\n' for line in lines)
+
+
+class EventDecoder:
+    """JSON line -> dict sự kiện; dòng hỏng được ghi vào quarantine và bỏ qua (trả về None)"""
+
+    def __init__(self, quarantine_file=QUARANTINE_FILE):
+        self.quarantine_file = quarantine_file
+        self.rejected = 0
+
+    def decode(self, line):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            return None
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        if isinstance(event, dict):
+            return event
+        self.rejected += 1
+        quarantine_lines([line.rstrip('\r\n')], self.quarantine_file)
+        return None
+
+
+async def file_events(path, rate=None, decoder=None):
+    """Đọc file JSON lines (mỗi dòng một sự kiện)"""
+    decoder = decoder or EventDecoder()
+    with open(path, encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            event = decoder.decode(line)
+            if event is not None:
+                yield event
+            if rate:
+                await asyncio.sleep(1 / rate)
+            elif i % DEFAULT_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+
+
+async def socket_events(host, port, max_events=None, idle_seconds=SOCKET_IDLE_SECONDS, decoder=None):
+    """Server TCP nhận JSON lines từ nhiều client; dừng khi đủ max_events hoặc hết idle_seconds"""
+    inbox = asyncio.Queue(DEFAULT_QUEUE_SIZE)
+    decoder = decoder or EventDecoder()
+
+    async def handle(reader, writer):
+        async for line in reader:
+            event = decoder.decode(line)
+            if event is not None:
+                await inbox.put(event)
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"   Lắng nghe sự kiện tại {host}:{port}")
+    received = 0
+    try:
+        while max_events is None or received < max_events:
+            try:
+                event = await asyncio.wait_for(inbox.get(), idle_seconds)
+            except asyncio.TimeoutError:
+                break
+            received += 1
+            yield event
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def micro_batches(queue, batch_size, window):
+    """Gom sự kiện từ queue thành batch (tối đa batch_size hoặc window giây); None = hết luồng"""
+    loop = asyncio.get_running_loop()
+    finished = False
+    while not finished:
+        first = await queue.get()
+        if first is None:
+            break
+        batch = [first]
+        deadline = loop.time() + window
+        while len(batch) < batch_size:
+            try:
+                event = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if event is None:
+                finished = True
+                break
+            batch.append(event)
+        yield batch
+
+
+# ----------------------------------------------------------------------------
+# Model và sink
+# ----------------------------------------------------------------------------
+
+class CsvSink:
+    """Ghi CSV theo lô: add() chỉ đưa vào bộ đệm, flush() ghi một lần trong thread riêng"""
+
+    def __init__(self, path, columns, flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.path = path
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.buffer = []
+        self.buffered_since = None
+        self.event_times = []
+        self.next_id = 1
+        self.writes = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(columns)
+
+    def add(self, rows, event_times=None):
+        if self.buffered_since is None:
+            self.buffered_since = time.time()
+        for row in rows:
+            self.buffer.append([self.next_id] + row)
+            self.next_id += 1
+        if event_times is not None:
+            self.event_times.extend(event_times)
+
+    @property
+    def full(self):
+        if len(self.buffer) >= self.flush_rows:
+            return True
+        return bool(self.buffer) and time.time() - self.buffered_since >= self.flush_seconds
+
+    def _write(self, rows):
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+
+    async def flush(self):
+        """Ghi bộ đệm, trả về độ trễ (giây) của các sự kiện vừa được ghi"""
+        if not self.buffer:
+            return []
+        rows, times = self.buffer, self.event_times
+        self.buffer, self.event_times, self.buffered_since = [], [], None
+        await asyncio.to_thread(self._write, rows)
+        self.writes += 1
+        done = time.time()
+        return [done - t for t in times]
+
+
+def window_metrics(frame, predicted):
+    """Aggregate của một cửa sổ (micro-batch) với kiểu số Python"""
+    return [
+        ('avg_price', float(frame['price'].mean())),
+        ('avg_rating', float(frame['rating_average'].mean())),
+        ('total_predicted_revenue', float(predicted.sum())),
+        ('total_quantity', int(frame['quantity_sold'].sum())),
+        ('batch_size', int(len(frame))),
+    ]
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {}
+    values = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+class StreamProcessor:
+    """Xử lý micro-batch: kiểm tra, chấm điểm, gán cluster, ghi kết quả + aggregate vào sink"""
+
+    def __init__(self, scorer, clusterer, results_sink, metrics_sink, quarantine_file=QUARANTINE_FILE):
+        self.scorer = scorer
+        self.clusterer = clusterer
+        self.results = results_sink
+        self.metrics = metrics_sink
+        self.validator = Validator(EVENT_RULES, quarantine_file=quarantine_file)
+        self.latencies = []
+        self.events = 0
+        self.batches = 0
+        self.rejected = 0
+
+    def validate(self, batch, frame):
+        """Các dòng qua EVENT_RULES; sự kiện bị loại -> quarantine (JSON line kèm '_reason')"""
+        valid, failures = self.validator.check(frame)
+        if valid.all():
+            return frame
+        rejected = np.flatnonzero(~valid)
+        reasons = ['|'.join(code for code, mask in failures.items() if mask[row]) for row in rejected]
+        quarantine_lines([json.dumps({'_reason': reason, **batch[row]}, ensure_ascii=False, default=str)
+                          for row, reason in zip(rejected, reasons)], self.validator.quarantine_file)
+        self.rejected += len(rejected)
+        return frame[valid].reset_index(drop=True)
+
+    def process(self, batch):
+        frame = pd.DataFrame(batch)
+        # rating: 'rating' hoặc 'rating_average'; kiểm tra giá trị gốc trước khi chuyển kiểu
+        missing = pd.Series(np.nan, index=frame.index)
+        rating = frame.get('rating', missing).astype(object)
+        frame['rating_average'] = rating.where(rating.notna(), frame.get('rating_average', missing))
+        frame = self.validate(batch, frame)
+        if frame.empty:
+            return
+        # Trường không bắt buộc bị thiếu -> mặc định (giống RevenueScorer.transform)
+        missing = pd.Series(np.nan, index=frame.index)
+        frame['rating_average'] = pd.to_numeric(frame['rating_average'], errors='coerce').fillna(0)
+        frame['price'] = pd.to_numeric(frame['price'])
+        frame['quantity_sold'] = pd.to_numeric(frame.get('quantity_sold', missing), errors='coerce') \
+            .fillna(0).astype(np.int64)
+        for column in ('product_id', 'brand', 'category'):
+            values = frame.get(column, missing).astype(object)
+            frame[column] = values.where(values.notna(), None)
+        predicted = self.scorer.score_frame(frame)
+        clusters = self.clusterer.partial_fit(frame)
+        timestamp = datetime.now().isoformat()
+
+        rows = [
+            [product_id, name, brand, category, float(price), float(rating), int(quantity),
+             timestamp, float(revenue), int(cluster)]
+            for product_id, name, brand, category, price, rating, quantity, revenue, cluster in zip(
+                frame['product_id'], frame.get('name', frame['product_id']), frame['brand'],
+                frame['category'], frame['price'], frame['rating_average'], frame['quantity_sold'],
+                predicted, clusters)
+        ]
+        self.results.add(rows, frame['event_time'].tolist())
+        metric_time = datetime.now().isoformat(sep=' ')
+        self.metrics.add([[name, value, metric_time] for name, value in window_metrics(frame, predicted)])
+        self.events += len(frame)
+        self.batches += 1
+
+    async def flush(self, force=False):
+        for sink in (self.results, self.metrics):
+            if force or sink.full:
+                self.latencies.extend(await sink.flush())
+
+
+async def _produce(source, queue):
+    # Sentinel luôn được gửi (kể cả khi nguồn lỗi) để consumer không chờ queue.get() mãi
+    try:
+        async for event in source:
+            event['event_time'] = time.time()
+            await queue.put(event)
+    finally:
+        await queue.put(None)
+
+
+async def run_stream(source, processor, batch_size=DEFAULT_BATCH_SIZE, window=DEFAULT_WINDOW_SECONDS,
+                     queue_size=DEFAULT_QUEUE_SIZE):
+    """Chạy producer + consumer tới khi nguồn hết sự kiện; trả về thống kê"""
+    queue = asyncio.Queue(queue_size)
+    start = time.perf_counter()
+    producer = asyncio.create_task(_produce(source, queue))
+    async for batch in micro_batches(queue, batch_size, window):
+        processor.process(batch)
+        await processor.flush()
+    await processor.flush(force=True)
+    await producer
+    elapsed = time.perf_counter() - start
+    return {
+        'events': processor.events,
+        'batches': processor.batches,
+        'seconds': elapsed,
+        'events_per_second': processor.events / elapsed if elapsed else 0.0,
+        'sink_writes': processor.results.writes + processor.metrics.writes,
+        'rejected': processor.rejected,
+        'latency': latency_summary(processor.latencies),
+    }
+
+
+def build_processor(registry, results_file=RESULTS_FILE, metrics_file=METRICS_FILE,
+                    flush_rows=DEFAULT_FLUSH_ROWS):
+    return StreamProcessor(RevenueScorer(registry), load_clusterer(registry),
+                           CsvSink(results_file, RESULT_COLUMNS, flush_rows),
+                           CsvSink(metrics_file, METRIC_COLUMNS, flush_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming ingestion sự kiện sản phẩm')
+    parser.add_argument('--source', choices=['generate', 'file', 'socket'], default='generate')
+    parser.add_argument('--input', help='File JSON lines (--source file)')
+    parser.add_argument('--events', type=int, default=2000,
+                        help='Số sự kiện sinh ra (generate) / tối đa nhận (socket)')
+    parser.add_argument('--rate', type=float, default=None, help='Số sự kiện / giây (generate, file)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW_SECONDS,
+                        help='Thời gian tối đa (giây) gom một micro-batch')
+    parser.add_argument('--flush-rows', type=int, default=DEFAULT_FLUSH_ROWS,
+                        help='Số dòng đệm trước khi ghi sink')
+    args = parser.parse_args()
+
+    print("🌊 STREAMING INGESTION")
+    print("=" * 60)
+    registry = ModelRegistry()
+    try:
+        processor = build_processor(registry, flush_rows=args.flush_rows)
+    except KeyError as e:
+        print(f"❌ Thiếu model trong registry ({e}) - hãy chạy part3_olap_datamining.py trước")
+        return
+
+    decoder = EventDecoder()
+    if args.source == 'file':
+        source = file_events(args.input, args.rate, decoder)
+    elif args.source == 'socket':
+        source = socket_events(args.host, args.port, args.events, decoder=decoder)
+    else:
+        source = generated_events(args.events, args.rate)
+
+    stats = asyncio.run(run_stream(source, processor, args.batch_size, args.window))
+    print(f"✅ {stats['events']:,} sự kiện, {stats['batches']:,} micro-batch, "
+          f"{stats['sink_writes']} lần ghi sink trong {stats['seconds']:.2f}s "
+          f"({stats['events_per_second']:,.0f} sự kiện/giây)")
+    if stats['latency']:
+        latency = stats['latency']
+        print(f"   Độ trễ end-to-end: p50 {latency['p50_ms']:.1f} ms, p90 {latency['p90_ms']:.1f} ms, "
+              f"p99 {latency['p99_ms']:.1f} ms, max {latency['max_ms']:.1f} ms")
+    if decoder.rejected or stats['rejected']:
+        print(f"   ⚠️  Bỏ qua {decoder.rejected:,} dòng không phải JSON object, "
+              f"{stats['rejected']:,} sự kiện không hợp lệ -> '{decoder.quarantine_file}'")
+    # Giữ tâm cụm đã cập nhật cho lần chạy sau
+    processor.clusterer.save(registry)
+    print(f"   Cluster: {processor.clusterer.refits} lần fit lại, "
+          f"{len(processor.clusterer.drift_events)} lần phát hiện drift")
+    print(f"   Kết quả: '{RESULTS_FILE}', metrics: '{METRICS_FILE}'")
+
+
+if __name__ == "__main__":
+    main()
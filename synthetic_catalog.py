@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Synthetic Catalog
+Sinh catalog sản phẩm giả lập (cùng schema với vietnamese_tiki_products_backpacks_suitcases.csv)
+ở các kích thước 10k / 1M / 10M dòng để đo khả năng mở rộng của pipeline.
+Phân phối học từ file thật:
+  - brand / current_seller: giữ tần suất thật cho các giá trị đã có (OEM chiếm đa số ...),
+    số giá trị distinct tăng theo luật Heaps (~ sqrt(số dòng)), đuôi theo Zipf với
+    số mũ fit từ rank-frequency của dữ liệu thật
+  - price: lấy mẫu log(price) thật + nhiễu (giữ đuôi dài), original_price theo tỉ lệ giảm giá thật
+  - quantity_sold: tỉ lệ 0 như dữ liệu thật, phần > 0 theo log-normal fit từ dữ liệu thật (đuôi dài)
+  - các cột còn lại (name, category, rating, review_count ...) lấy mẫu theo dòng thật,
+    name thêm mã model ngẫu nhiên để không trùng hàng loạt
+Ghi theo chunk nên sinh 10M dòng không cần giữ cả catalog trong bộ nhớ.
+
+Cách dùng:
+    python synthetic_catalog.py --rows 10k            # -> data/synthetic/catalog_10k.csv
+    python synthetic_catalog.py --rows 1m --seed 7
+    python synthetic_catalog.py --rows 250000 --output /tmp/catalog.csv
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CSV_FILE = 'vietnamese_tiki_products_backpacks_suitcases.csv'
+OUTPUT_DIR = 'data/synthetic'
+DEFAULT_CHUNK_SIZE = 500000
+
+SIZES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+
+# Cột lấy mẫu nguyên dòng từ dữ liệu thật (giữ tương quan rating / review / favourite ...)
+PROFILE_COLUMNS = ['name', 'description', 'fulfillment_type', 'review_count', 'rating_average',
+                   'favourite_count', 'pay_later', 'date_created', 'number_of_images',
+                   'vnd_cashback', 'has_video', 'category']
+OUTPUT_COLUMNS = ['id', 'name', 'description', 'original_price', 'price', 'fulfillment_type', 'brand',
+                  'review_count', 'rating_average', 'favourite_count', 'pay_later', 'current_seller',
+                  'date_created', 'number_of_images', 'vnd_cashback', 'has_video', 'category',
+                  'quantity_sold']
+
+PRICE_JITTER = 0.15     # độ lệch chuẩn nhiễu trên log(price)
+ID_OFFSET = 10 ** 9     # id giả lập không trùng id thật
+
+
+def parse_rows(value):
+    """'10k' / '1m' / '10m' hoặc số nguyên"""
+    return SIZES.get(str(value).lower()) or int(value)
+
+
+def size_label(rows):
+    for label, size in SIZES.items():
+        if size == rows:
+            return label
+    return str(rows)
+
+
+def default_output(rows):
+    return os.path.join(OUTPUT_DIR, f'catalog_{size_label(rows)}.csv')
+
+
+def fit_zipf(counts):
+    """(hệ số C, số mũ s) của count ~ C * rank^-s, fit bình phương tối thiểu trên log-log"""
+    ranks = np.arange(1, len(counts) + 1)
+    slope, intercept = np.polyfit(np.log(ranks), np.log(counts), 1)
+    return np.exp(intercept), max(-slope, 0.5)
+
+
+def vocabulary(counts, rows, source_rows, prefix):
+    """
+    (tên, xác suất) cho rows dòng: giữ giá trị thật với tần suất thật,
+    thêm giá trị '<prefix> <i>' theo Zipf khi catalog lớn hơn dữ liệu gốc.
+    """
+    counts = counts.sort_values(ascending=False)
+    names = list(counts.index)
+    weights = counts.to_numpy(dtype=float)
+    target = int(len(counts) * np.sqrt(max(rows / source_rows, 1.0)))
+    if target > len(counts):
+        scale, exponent = fit_zipf(weights)
+        ranks = np.arange(len(counts) + 1, target + 1)
+        names += [f'{prefix} {i:06d}' for i in range(1, len(ranks) + 1)]
+        weights = np.concatenate([weights, scale * ranks ** -exponent])
+    return np.array(names, dtype=object), weights / weights.sum()
+
+
+class CatalogProfile:
+    """Các phân phối học từ file thật, dùng để sinh từng chunk"""
+
+    def __init__(self, source):
+        self.source = source.reset_index(drop=True)
+        self.rows = len(source)
+        self.profile = {column: source[column].to_numpy() for column in PROFILE_COLUMNS}
+        self.log_price = np.log(source['price'].clip(lower=1).to_numpy(dtype=float))
+        self.price_ratio = (source['price'] / source['original_price'].where(source['original_price'] > 0)) \
+            .fillna(1.0).clip(0.05, 1.0).to_numpy()
+
+        quantity = source['quantity_sold'].to_numpy()
+        self.zero_sold = float((quantity == 0).mean())
+        log_sold = np.log(quantity[quantity > 0].astype(float))
+        self.sold_mu, self.sold_sigma = log_sold.mean(), log_sold.std()
+        self.max_sold = int(quantity.max()) * 10
+
+        self.null_rates = {column: float(source[column].isna().mean())
+                           for column in ('brand', 'current_seller')}
+
+    @classmethod
+    def from_csv(cls, path=CSV_FILE):
+        return cls(pd.read_csv(path, usecols=OUTPUT_COLUMNS))
+
+    def vocabularies(self, rows):
+        return {
+            'brand': vocabulary(self.source['brand'].value_counts(), rows, self.rows, 'Brand'),
+            'current_seller': vocabulary(self.source['current_seller'].value_counts(), rows, self.rows, 'Shop'),
+        }
+
+    def sample(self, rng, start, n, vocabularies):
+        """DataFrame n dòng, id bắt đầu từ ID_OFFSET + start"""
+        picks = rng.randint(0, self.rows, n)
+        chunk = pd.DataFrame({column: values[picks] for column, values in self.profile.items()})
+        chunk.insert(0, 'id', ID_OFFSET + start + np.arange(n, dtype=np.int64))
+
+        codes = pd.Series(rng.randint(10, 100, n)).astype(str)
+        letters = pd.Series(np.array(list('ABCDEFGHKLMNPQRSTVX'))[rng.randint(0, 19, n)])
+        chunk['name'] = chunk['name'].str.strip() + ' ' + letters + codes
+
+        price = np.exp(self.log_price[picks] + rng.normal(0, PRICE_JITTER, n)).round().clip(1000, None)
+        chunk['price'] = price.astype(np.int64)
+        chunk['original_price'] = (price / self.price_ratio[picks]).round().astype(np.int64)
+
+        for column, (names, probabilities) in vocabularies.items():
+            values = names[rng.choice(len(names), n, p=probabilities)]
+            values[rng.random_sample(n) < self.null_rates[column]] = None
+            chunk[column] = values
+
+        sold = np.maximum(np.exp(rng.normal(self.sold_mu, self.sold_sigma, n)).round(), 1)
+        sold[rng.random_sample(n) < self.zero_sold] = 0
+        chunk['quantity_sold'] = np.minimum(sold, self.max_sold).astype(np.int64)
+
+        chunk.index = pd.RangeIndex(start, start + n)
+        return chunk[OUTPUT_COLUMNS]
+
+
+def generate_catalog(rows, output_file=None, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, source=CSV_FILE):
+    """Ghi catalog rows dòng ra output_file theo chunk, trả về (đường dẫn, số giây)"""
+    output_file = output_file or default_output(rows)
+    start_time = time.perf_counter()
+    profile = CatalogProfile.from_csv(source)
+    vocabularies = profile.vocabularies(rows)
+    rng = np.random.RandomState(seed)
+
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    tmp_file = f'{output_file}.tmp'
+    for start in range(0, rows, chunk_size):
+        chunk = profile.sample(rng, start, min(chunk_size, rows - start), vocabularies)
+        chunk.to_csv(tmp_file, mode='w' if start == 0 else 'a', header=(start == 0),
+                     index=True, encoding='utf-8')
+    os.replace(tmp_file, output_file)
+    return output_file, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sinh catalog Tiki giả lập')
+    parser.add_argument('--rows', default='10k', help="Số dòng: 10k, 1m, 10m hoặc số nguyên")
+    parser.add_argument('--output', default=None, help=f'Mặc định {OUTPUT_DIR}/catalog_<rows>.csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--source', default=CSV_FILE, help='File thật để học phân phối')
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    output_file, seconds = generate_catalog(rows, args.output, args.seed, args.chunk_size, args.source)
+    size_mb = os.path.getsize(output_file) / (1024 * 1024)
+    print(f"✅ Đã sinh {rows:,} dòng -> '{output_file}' ({size_mb:,.1f} MB, {seconds:.2f}s, "
+          f"{rows / seconds:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module của repo là script ở thư mục gốc (không phải package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar_store
+
+pytestmark = pytest.mark.skipif(not columnar_store.ARROW_AVAILABLE, reason='cần pyarrow')
+
+
+def make_frame(n, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'id': np.arange(n, dtype=np.int64) + 1000 * seed,
+        'name': [f'Balo {i}' for i in range(n)],
+        'price': rng.uniform(1000, 500000, n),
+        'quantity_sold': rng.randint(0, 100, n),
+        'brand': rng.choice(['sakos', 'oem', None], n),
+        'fulfillment_type': rng.choice(['dropship', 'tiki_delivery'], n),
+    })
+
+
+def plain(df):
+    """Cột dictionary -> object để so sánh với DataFrame gốc"""
+    return df.astype({c: object for c in columnar_store.CATEGORICAL_COLUMNS if c in df.columns})
+
+
+def test_write_read_round_trip(tmp_path):
+    df = make_frame(500)
+    assert columnar_store.write_table(df, tmp_path) == len(df)
+    assert columnar_store.num_rows(tmp_path) == len(df)
+    pd.testing.assert_frame_equal(plain(columnar_store.read_table(store_dir=tmp_path)), plain(df))
+    pd.testing.assert_frame_equal(columnar_store.read_table(['price', 'id'], tmp_path), df[['price', 'id']])
+
+
+def test_batches_keep_dictionary_codes(tmp_path):
+    # Batch sau có giá trị phân loại mới -> từ điển chỉ được nối thêm (dictionary delta)
+    first, second = make_frame(300), make_frame(200, seed=1)
+    second.loc[::5, 'brand'] = 'samsonite'
+    writer = columnar_store.ColumnarWriter(tmp_path)
+    writer.write(first)
+    writer.write(second)
+    writer.close()
+    expected = pd.concat([first, second], ignore_index=True)
+    pd.testing.assert_frame_equal(plain(columnar_store.read_table(store_dir=tmp_path)), plain(expected))
+
+
+def test_derived_columns(tmp_path):
+    df = make_frame(100)
+    columnar_store.write_table(df, tmp_path)
+    clusters = np.arange(len(df)) % 4
+    columnar_store.write_column('cluster', clusters, tmp_path)
+    assert columnar_store.derived_columns(tmp_path) == ['cluster']
+    result = columnar_store.read_table(['id', 'cluster'], tmp_path)
+    np.testing.assert_array_equal(result['cluster'].to_numpy(), clusters)
+
+    with pytest.raises(ValueError):
+        columnar_store.write_column('short', clusters[:-1], tmp_path)
+    # Ghi lại base -> cột dẫn xuất cũ bị bỏ
+    columnar_store.write_table(make_frame(50), tmp_path)
+    assert columnar_store.derived_columns(tmp_path) == []
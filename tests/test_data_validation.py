@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_validation import SortedRuns, Validator
+
+
+def row(product_id, **overrides):
+    values = {'id': product_id, 'name': f'Balo {product_id}', 'price': 100000, 'original_price': 120000, 'quantity_sold': 3,
+              'rating_average': 4.5, 'review_count': 10, 'favourite_count': 1, 'fulfillment_type': 'dropship'}
+    values.update(overrides)
+    return values
+
+
+@pytest.fixture
+def validator(tmp_path):
+    return Validator(quarantine_file=str(tmp_path / 'rejected_rows.csv'), source='test.csv')
+
+
+@pytest.mark.parametrize('overrides, reason', [
+    ({'price': 0}, 'PRICE_OUT_OF_RANGE'),
+    ({'price': -5}, 'PRICE_OUT_OF_RANGE'),
+    ({'price': None}, 'PRICE_MISSING'),
+    ({'price': 'abc'}, 'PRICE_NOT_NUMBER'),
+    ({'rating_average': 5.5}, 'RATING_AVERAGE_OUT_OF_RANGE'),
+    ({'rating_average': -1}, 'RATING_AVERAGE_OUT_OF_RANGE'),
+    ({'fulfillment_type': 'drone'}, 'FULFILLMENT_TYPE_NOT_ALLOWED'),
+    ({'quantity_sold': 'many'}, 'QUANTITY_SOLD_NOT_INTEGER'),
+    ({'quantity_sold': 2.5}, 'QUANTITY_SOLD_NOT_INTEGER'),
+    ({'review_count': 'n/a'}, 'REVIEW_COUNT_NOT_NUMBER'),
+    ({'id': 'x1'}, 'ID_NOT_INTEGER'),
+    ({'name': None}, 'NAME_MISSING'),
+])
+def test_reason_codes(validator, overrides, reason):
+    chunk = pd.DataFrame([row(1), row(2, **overrides)])
+    valid = validator.validate(chunk)
+    assert valid['id'].tolist() == [1]
+    assert validator.rejected == 1 and validator.reasons[reason] == 1
+
+
+def test_valid_values_pass(validator):
+    # Viết hoa / khoảng trắng ở fulfillment_type, rating thiếu, số dạng chuỗi vẫn hợp lệ
+    chunk = pd.DataFrame([row(1, fulfillment_type=' Tiki_Delivery '), row(2, rating_average=None),
+                          row(3, price='250000', quantity_sold='0'), row(4, rating_average=5)])
+    assert len(validator.validate(chunk)) == 4 and validator.rejected == 0
+    assert validator.summary()['quarantine_file'] is None
+
+
+def test_duplicate_ids_across_chunks(validator):
+    rng = np.random.RandomState(0)
+    ids = rng.randint(0, 400, 2000)
+    prices = np.where(rng.rand(2000) < 0.1, -1, 1000)   # dòng lỗi không được "giữ chỗ" cho id
+    frame = pd.DataFrame([row(int(i), price=int(p)) for i, p in zip(ids, prices)])
+
+    kept = pd.concat([validator.validate(frame.iloc[start:start + 150])
+                      for start in range(0, len(frame), 150)])
+    expected = frame[frame['price'] > 0].drop_duplicates('id')
+    pd.testing.assert_frame_equal(kept, expected)
+    assert validator.reasons['ID_DUPLICATE'] == int((frame['price'] > 0).sum()) - len(expected)
+    assert validator.rows == len(frame) and validator.rows - validator.rejected == len(expected)
+
+
+def test_quarantine_file(validator):
+    validator.validate(pd.DataFrame([row(1), row(2, price=0, rating_average=9)]))
+    validator.validate(pd.DataFrame([row(1), row(3, fulfillment_type='drone')]))
+
+    quarantined = pd.read_csv(validator.quarantine_file)
+    assert quarantined.columns[:4].tolist() == ['_reason', '_source', '_chunk', '_row']
+    assert quarantined['_reason'].tolist() == ['PRICE_OUT_OF_RANGE|RATING_AVERAGE_OUT_OF_RANGE',
+                                               'ID_DUPLICATE', 'FULFILLMENT_TYPE_NOT_ALLOWED']
+    assert quarantined['_source'].unique().tolist() == ['test.csv']
+    assert quarantined['_chunk'].tolist() == [0, 1, 1]
+    assert quarantined['_row'].tolist() == [1, 2, 3]
+    assert quarantined['id'].tolist() == [2, 1, 3]
+
+
+def test_sorted_runs_membership():
+    rng = np.random.RandomState(1)
+    runs, seen = SortedRuns(), set()
+    for _ in range(50):
+        values = np.unique(rng.randint(0, 10000, 200))
+        new = values[~runs.contains(values)]
+        assert set(new.tolist()) == set(values.tolist()) - seen
+        runs.add_sorted(new)
+        seen.update(new.tolist())
+    assert len(runs) == len(seen)
+    assert len(runs.runs) <= int(np.log2(len(seen))) + 2
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl_incremental import compute_content_hashes, diff_snapshot, snapshot_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_FILE = 'vietnamese_tiki_products_backpacks_suitcases.csv'
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return pd.read_csv(os.path.join(ROOT, RAW_FILE), nrows=500)
+
+
+def saved_state(hashes):
+    """Trạng thái như đọc lại từ ETL_Product_State (load_previous_state)"""
+    rows = list(zip(hashes['product_id'].tolist(), hashes['content_hash'].tolist()))
+    state = pd.DataFrame(rows, columns=['product_id', 'content_hash'])
+    return state.astype({'product_id': 'int64', 'content_hash': np.uint64})
+
+
+def test_unchanged_snapshot_has_empty_delta(raw):
+    hashes = compute_content_hashes(raw)
+    delta = diff_snapshot(compute_content_hashes(raw.sample(frac=1, random_state=0)), saved_state(hashes))
+    assert all(len(ids) == 0 for ids in delta.values())
+
+
+def test_delta_new_changed_deleted(raw):
+    previous = saved_state(compute_content_hashes(raw.iloc[:400]))
+    current = raw.iloc[10:].copy()
+    current.loc[current.index[:5], 'price'] += 1000
+    current.loc[current.index[5], 'name'] = 'Tên mới'
+
+    delta = diff_snapshot(compute_content_hashes(current), previous)
+    assert sorted(delta['new']) == sorted(raw['id'].iloc[400:].drop_duplicates())
+    assert sorted(delta['changed']) == sorted(current['id'].iloc[:6])
+    assert sorted(delta['deleted']) == sorted(set(raw['id'].iloc[:10]) - set(current['id']))
+
+
+def test_snapshot_hash_ignores_row_order(raw):
+    hashes = compute_content_hashes(raw)
+    assert snapshot_hash(hashes) == snapshot_hash(compute_content_hashes(raw.iloc[::-1]))
+    changed = raw.copy()
+    changed.loc[0, 'quantity_sold'] += 1
+    assert snapshot_hash(hashes) != snapshot_hash(compute_content_hashes(changed))
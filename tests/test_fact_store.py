@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from fact_store import FactStore
+
+
+def make_frame(n, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'brand': rng.choice(['Sakos', 'sakos ', 'OEM', 'Samsonite'], n),
+        'current_seller': rng.choice(['Tiki Trading', 'Shop A', 'Shop B'], n),
+        'fulfillment_type': rng.choice(['dropship', 'tiki_delivery', 'seller_delivery'], n),
+        'price': rng.uniform(10000, 2000000, n).round(),
+        'quantity_sold': rng.randint(0, 500, n),
+        'rating_average': np.where(rng.rand(n) < 0.2, np.nan, rng.uniform(0, 5, n)),
+        'review_count': rng.randint(0, 100, n),
+    })
+
+
+def test_query_matches_pandas():
+    df = make_frame(2000)
+    store = FactStore.from_frame(df)
+    rows = dict(store.query(['fulfillment'], ['total_revenue']))
+    expected = (df['price'] * df['quantity_sold']).groupby(df['fulfillment_type']).sum()
+    assert rows.keys() == set(expected.index)
+    for name, value in expected.items():
+        assert np.isclose(rows[name], value)
+
+
+def test_save_load_round_trip(tmp_path):
+    store = FactStore.from_frame(make_frame(2000))
+    store.save(tmp_path)
+    metrics = ['product_count', 'total_revenue', 'avg_rating']
+    expected = store.query(['brand', 'seller'], metrics, order_by='total_revenue')
+    for mmap in (True, False):
+        loaded = FactStore.load(tmp_path, mmap=mmap)
+        assert len(loaded) == len(store)
+        assert loaded.query(['brand', 'seller'], metrics, order_by='total_revenue') == expected
+
+
+def test_resave_keeps_open_snapshot_readable(tmp_path):
+    FactStore.from_frame(make_frame(50000)).save(tmp_path)
+    serving = FactStore.load(tmp_path)
+    expected = serving.query(['brand'], ['total_revenue'])
+
+    # Snapshot mới (nhỏ hơn) ghi vào cùng thư mục trong lúc snapshot cũ đang được memory-map
+    FactStore.from_frame(make_frame(100, seed=1)).save(tmp_path)
+    assert serving.query(['brand'], ['total_revenue']) == expected
+    assert len(FactStore.load(tmp_path)) == 100
+    assert not [p for p in tmp_path.iterdir() if p.suffix == '.tmp']
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar_store
+from olap_cube import OlapCube
+
+AGGS = ['sum', 'count', 'mean', 'min', 'max', 'size']
+SEGMENTS = ['<100k', '100k-500k', '500k-1M', '>1M']
+
+
+def make_frame(n=600, seed=0):
+    rng = np.random.RandomState(seed)
+    price = rng.choice([50000, 250000, 750000, 1500000], n) * rng.uniform(0.9, 1.1, n)
+    df = pd.DataFrame({
+        'brand': rng.choice(['oem', 'sakos', 'mikkor', 'samsonite', None], n, p=[0.4, 0.2, 0.2, 0.15, 0.05]),
+        'current_seller': rng.choice(['Tiki Trading', 'Shop A', 'Shop B'], n),
+        'fulfillment_type': rng.choice(['dropship', 'tiki_delivery', 'seller_delivery'], n),
+        'price_segment': pd.cut(price, [0, 100000, 500000, 1000000, np.inf], labels=SEGMENTS).astype(str),
+        'category': rng.choice(['Balo', 'Vali', 'Túi'], n),
+        'price': price,
+        'quantity_sold': rng.randint(0, 50, n).astype(float),
+        'rating_average': np.where(rng.rand(n) < 0.3, np.nan, rng.uniform(1, 5, n)),
+        'review_count': rng.randint(0, 20, n),
+        'favourite_count': rng.randint(0, 5, n),
+    })
+    df['revenue'] = df['price'] * df['quantity_sold']
+    return df
+
+
+def assert_same(result, reference):
+    # Chỉ so giá trị: kiểu index (object / string) của groupby khác nhau giữa các bản pandas
+    pd.testing.assert_frame_equal(_plain(result), _plain(reference), check_dtype=False, check_names=False)
+
+
+def _plain(frame):
+    index = frame.index
+    if isinstance(index, pd.MultiIndex):
+        index = pd.MultiIndex.from_arrays([index.get_level_values(i).astype(object)
+                                           for i in range(index.nlevels)])
+    else:
+        index = pd.Index(index.astype(object))
+    return frame.set_axis(index).set_axis(pd.Index(frame.columns.astype(object)), axis=1)
+
+
+def expected(df, dims, measure):
+    grouped = df.dropna(subset=dims).groupby(dims)[measure]
+    return pd.DataFrame({agg: grouped.agg(agg) for agg in AGGS})
+
+
+@pytest.fixture(scope='module')
+def df():
+    return make_frame()
+
+
+@pytest.fixture(scope='module')
+def cube(df):
+    return OlapCube(df)
+
+
+@pytest.mark.parametrize('dims', [['brand'], ['fulfillment_type', 'price_segment'],
+                                  ['brand', 'current_seller', 'category'], ['price_segment']])
+@pytest.mark.parametrize('measure', ['revenue', 'rating_average'])
+def test_query_matches_groupby(df, cube, dims, measure):
+    result = cube.query(dims, measure, AGGS)
+    assert_same(result, expected(df, dims, measure))
+
+
+def test_where_rollup_and_drill_down(df, cube):
+    where = {'brand': ['oem', 'sakos'], 'category': 'Balo'}
+    subset = df[df['brand'].isin(['oem', 'sakos']) & (df['category'] == 'Balo')]
+    assert_same(cube.query(['fulfillment_type'], 'price', AGGS, where=where),
+                expected(subset, ['fulfillment_type'], 'price'))
+    assert_same(cube.rollup(['brand', 'category'], 'category', 'revenue', AGGS),
+                expected(df, ['brand'], 'revenue'))
+    assert_same(cube.drill_down(['brand'], 'category', 'revenue', AGGS),
+                expected(df, ['brand', 'category'], 'revenue'))
+
+
+def test_apex(df, cube):
+    apex = cube.query([], 'revenue', ['sum', 'count', 'size'])
+    assert np.isclose(apex['sum'].iloc[0], df['revenue'].sum())
+    assert apex['count'].iloc[0] == df['revenue'].count() and apex['size'].iloc[0] == len(df)
+
+
+def test_pivot(df, cube):
+    result = cube.pivot('brand', 'fulfillment_type', 'revenue')
+    reference = df.pivot_table(index='brand', columns='fulfillment_type', values='revenue',
+                               aggfunc='sum', fill_value=0)
+    assert_same(result, reference)
+
+
+def test_slice_and_top(df, cube):
+    sliced = cube.slice('fulfillment_type', 'tiki_delivery')
+    assert 'fulfillment_type' not in sliced.dimensions
+    subset = df[df['fulfillment_type'] == 'tiki_delivery']
+    assert_same(sliced.query(['category'], 'price', AGGS),
+                expected(subset, ['category'], 'price'))
+    reference = subset.groupby('brand')['revenue'].sum().nlargest(3)
+    pd.testing.assert_series_equal(sliced.top('brand', 'revenue', 3), reference,
+                                   check_names=False, check_index_type=False)
+
+
+def test_categorical_dimensions_sorted_like_groupby(df):
+    # Categorical theo thứ tự xuất hiện (như dictionary Arrow) -> kết quả vẫn theo thứ tự groupby trên giá trị
+    shuffled = df.iloc[::-1].reset_index(drop=True)
+    categorical = shuffled.assign(**{
+        dim: pd.Categorical(shuffled[dim], categories=pd.unique(shuffled[dim].dropna()))
+        for dim in ['price_segment', 'brand']})
+    result = OlapCube(categorical).query(['price_segment', 'brand'], 'revenue', AGGS)
+    assert_same(result, expected(shuffled, ['price_segment', 'brand'], 'revenue'))
+    assert list(result.index.get_level_values(0).unique()) == sorted(df['price_segment'].unique())
+
+
+@pytest.mark.skipif(not columnar_store.ARROW_AVAILABLE, reason='cần pyarrow')
+def test_cube_from_columnar_store(df, tmp_path):
+    columnar_store.write_table(df, tmp_path)
+    stored = columnar_store.read_table(store_dir=tmp_path)
+    assert isinstance(stored['price_segment'].dtype, pd.CategoricalDtype)
+    assert_same(OlapCube(stored).query(['price_segment'], 'revenue', AGGS),
+                expected(df, ['price_segment'], 'revenue'))
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from product_dedup import CLEAN_FILE, DEDUP_COLUMNS, find_groups
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ['balo', 'vali', 'kéo', 'nhựa', 'laptop', 'chống', 'nước', 'du', 'lịch', 'thời', 'trang', 'nam', 'nữ',
+         'đen', 'xám', 'xanh', 'cao', 'cấp', 'chính', 'hãng', 'size', 'lớn', 'nhỏ', 'khóa', 'số']
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['id', 'name', 'description', 'current_seller', 'price'])
+
+
+def groups_by_id(rows):
+    groups, _ = find_groups(frame(rows))
+    return dict(zip(groups['id'], groups['product_group']))
+
+
+def test_known_duplicates_and_non_duplicates():
+    name = 'Balo laptop Sakos Urban chống nước 15.6 inch màu đen cao cấp'
+    rows = [
+        (1, name, 'Balo chống nước, ngăn laptop riêng', 'Shop A', 450000),
+        (2, name.upper().replace(' chống', ', chống'), 'Mô tả khác hẳn', 'Shop B', 420000),
+        (3, 'Vali kéo nhựa PP khóa số TSA size 20 inch xanh navy', None, 'Shop A', 900000),
+        (4, 'Túi xách du lịch nữ thời trang cỡ lớn màu hồng', None, 'Shop C', 300000),
+        (5, name, None, 'Shop D', 4500000),        # cùng tên nhưng giá chênh > MAX_PRICE_RATIO
+    ]
+    groups = groups_by_id(rows)
+    assert groups[1] == groups[2] == 1
+    assert groups[3] == 3 and groups[4] == 4 and groups[5] == 5
+
+
+def test_chains_are_split():
+    # A ~ B và B ~ C (Jaccard cặp âm tiết ~0.8) nhưng A và C khác nhau (~0.65)
+    a, b, c = (' '.join(WORDS[start:start + 20]) for start in (0, 2, 4))
+    groups = groups_by_id([(10, a, None, 'S', 100000), (20, b, None, 'S', 100000), (30, c, None, 'S', 100000)])
+    assert groups[10] != groups[30]
+    assert groups[20] in (groups[10], groups[30])
+
+
+def test_same_seller_variants_not_chained():
+    # Dữ liệu thật: cùng seller đăng nhiều mẫu áo bọc vali, trước đây bị nối thành một nhóm 39 listing
+    products = pd.read_csv(os.path.join(ROOT, CLEAN_FILE), usecols=DEDUP_COLUMNS)
+    groups, _ = find_groups(products)
+    variants = products['name'].str.contains('Áo vỏ bọc vali', regex=False).to_numpy()
+    picked = [products.index[variants & products['name'].str.endswith(suffix).to_numpy()][0]
+              for suffix in ('H105 ', 'Gấu Đen', 'Nước Anh', 'Around-Tròn')]
+    assert groups['product_group'].iloc[picked].nunique() == 4
+    assert groups['group_size'].max() < 39
+    sizes = groups.groupby('product_group').size()
+    np.testing.assert_array_equal(groups['group_size'], sizes.loc[groups['product_group']].to_numpy())
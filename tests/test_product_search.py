@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from product_search import (CLEAN_FILE, INDEX_COLUMNS, PostingList, ProductSearchIndex, query_terms,
+                            update_index)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def products():
+    return pd.read_csv(os.path.join(ROOT, CLEAN_FILE), usecols=INDEX_COLUMNS)
+
+
+def brute_force(index, query, filters=None, k=10):
+    """Top k id bằng cách chấm điểm BM25 toàn bộ postings (tie-break theo doc như search())"""
+    term_ids = [index.vocab[t] for t in query_terms(query) if t in index.vocab]
+    n_live = max(index.n_live, 1)
+    scores = np.zeros(index.n_docs, dtype=np.float32)
+    for term in term_ids:
+        df = sum(segment.doc_freq(term) for segment in index.segments)
+        idf = np.log(1 + (n_live - df + 0.5) / (df + 0.5))
+        for segment in index.segments:
+            if not segment.doc_freq(term):
+                continue
+            posting = PostingList(segment, term, idf)
+            scores[posting.docs] += posting.scores()
+    keep = (scores > 0) & ~index.deleted
+    for facet, values in (filters or {}).items():
+        codes = [index.facet_lookup[facet][value] for value in values]
+        keep &= np.isin(index.facet_codes[facet], codes)
+    docs = np.flatnonzero(keep)
+    order = np.lexsort((docs, -scores[docs]))[:k]
+    return index.ids[docs[order]].tolist()
+
+
+def sample_queries(index, n, seed=0):
+    rng = np.random.RandomState(seed)
+    produced = 0
+    while produced < n:
+        doc = rng.randint(0, index.n_docs)
+        words = str(index.names[doc]).split()
+        start = rng.randint(0, max(len(words) - 1, 1))
+        query = ' '.join(words[start:start + rng.randint(1, 4)])
+        if query_terms(query):
+            produced += 1
+            yield query, doc
+
+
+def assert_matches_brute_force(index, n_queries=300, seed=0):
+    for i, (query, doc) in enumerate(sample_queries(index, n_queries, seed)):
+        filters = None
+        if i % 3 == 0:
+            filters = {'fulfillment_type': [index.facet_values['fulfillment_type'][
+                index.facet_codes['fulfillment_type'][doc]]]}
+        found = [result['id'] for result in index.search(query, filters, k=10)]
+        assert found == brute_force(index, query, filters, k=10), query
+
+
+def test_search_matches_brute_force(products):
+    assert_matches_brute_force(ProductSearchIndex.build(products))
+
+
+def test_search_matches_brute_force_with_segments_and_deletes(products):
+    index = ProductSearchIndex.build(products.iloc[:3000])
+    index.add(products.iloc[3000:])
+    index.delete(products['id'].iloc[::7].to_numpy())
+    assert len(index.segments) > 1 and index.n_deleted
+    assert_matches_brute_force(index, seed=1)
+
+
+def test_save_update_load_round_trip(products, tmp_path):
+    base, extra = products.iloc[:4000], products.iloc[4000:]
+    ProductSearchIndex.build(base).save(tmp_path)
+    expected = ProductSearchIndex.build(products[~products['id'].isin(base['id'].iloc[:100])])
+
+    empty = np.array([], dtype=np.int64)
+    # Delta chỉ xóa id không có trong index: không được ghi đè postings đang memory-map
+    update_index(products, {'new': empty, 'changed': empty, 'deleted': np.array([-1, -2])}, tmp_path)
+    assert ProductSearchIndex.load(tmp_path).n_docs == len(base)
+
+    delta = {'new': extra['id'].to_numpy(), 'changed': empty, 'deleted': base['id'].iloc[:100].to_numpy()}
+    update_index(products, delta, tmp_path)
+    loaded = ProductSearchIndex.load(tmp_path)
+    assert sorted(loaded.ids.tolist()) == sorted(expected.ids.tolist())
+    for query, _ in sample_queries(loaded, 50, seed=2):
+        assert [r['id'] for r in loaded.search(query)] == [r['id'] for r in expected.search(query)]
+    assert not [p for p in tmp_path.iterdir() if p.suffix == '.tmp']
@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+import numpy as np
+
+from streaming_ingest import METRIC_COLUMNS, RESULT_COLUMNS, CsvSink, StreamProcessor
+
+
+class FixedScorer:
+    def score_frame(self, frame):
+        return frame['price'].to_numpy(dtype=float) * frame['quantity_sold'].to_numpy()
+
+
+class SingleCluster:
+    def __init__(self):
+        self.seen = 0
+
+    def partial_fit(self, frame):
+        self.seen += len(frame)
+        return np.zeros(len(frame), dtype=int)
+
+
+def test_invalid_events_are_quarantined_not_scored(tmp_path):
+    results = CsvSink(str(tmp_path / 'results.csv'), RESULT_COLUMNS)
+    metrics = CsvSink(str(tmp_path / 'metrics.csv'), METRIC_COLUMNS)
+    quarantine = tmp_path / 'rejected_events.jsonl'
+    clusterer = SingleCluster()
+    processor = StreamProcessor(FixedScorer(), clusterer, results, metrics, quarantine_file=str(quarantine))
+
+    batch = [
+        {'product_id': 'a', 'price': 100000, 'quantity_sold': 2, 'rating': 4.5, 'event_time': 0.0},
+        {'event_time': 0.0},
+        {'product_id': 'b', 'price': 'abc', 'quantity_sold': 1, 'event_time': 0.0},
+        {'product_id': 'c', 'price': 50000, 'quantity_sold': 'many', 'event_time': 0.0},
+        {'product_id': 'd', 'price': 20000, 'rating_average': 3, 'event_time': 0.0},
+    ]
+    processor.process(batch)
+    asyncio.run(processor.flush(force=True))
+
+    assert processor.events == 2 and processor.rejected == 3 and clusterer.seen == 2
+    rejected = [json.loads(line) for line in quarantine.read_text(encoding='utf-8').splitlines()]
+    assert [event.get('product_id') for event in rejected] == [None, 'b', 'c']
+    assert 'PRICE_MISSING' in rejected[0]['_reason']
+    assert rejected[1]['_reason'] == 'PRICE_NOT_NUMBER'
+    assert rejected[2]['_reason'] == 'QUANTITY_SOLD_NOT_INTEGER'
+
+    lines = (tmp_path / 'metrics.csv').read_text(encoding='utf-8').splitlines()[1:]
+    values = {line.split(',')[1]: float(line.split(',')[2]) for line in lines}
+    assert values['avg_price'] == 60000 and values['batch_size'] == 2 and values['avg_rating'] == 3.75
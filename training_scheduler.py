@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Training Scheduler
+Train song song các model độc lập (vd. 5 model hồi quy, 4 model phân loại của part 3)
+trên một process pool, giới hạn bởi tổng số core cho phép (core budget):
+  - Số worker = min(số model cần train, core_budget)
+  - Phần core còn lại chia cho từng model: estimator có tham số n_jobs
+    (RandomForest, KNN, ...) được đặt n_jobs = core_budget // số worker,
+    BLAS/OpenMP trong worker cũng bị giới hạn cùng số thread đó
+  - Model chạy lâu nhất (theo thời gian fit lần trước trong registry) được xếp trước
+    để tổng thời gian gần với model chậm nhất thay vì tổng các model
+  - Model đã có trong ModelRegistry với cùng fingerprint thì không train lại
+Mỗi kết quả có điểm đánh giá (R2 / RMSE / Accuracy ...) và thời gian fit / predict
+(model vừa train cũng được ghi thành span 'fit/<tên>' của instrumentation).
+
+Ví dụ:
+    scheduler = TrainingScheduler(registry, core_budget=4)
+    scheduler.add('Random Forest', 'revenue/random_forest', RandomForestRegressor(),
+                  X_train, y_train, X_test, y_test, regression_metrics)
+    results = scheduler.run()
+    results['Random Forest']['scores']['R2']
+"""
+
+import os
+import time
+
+from joblib import Parallel, delayed, parallel_config
+
+import instrumentation
+from model_registry import fingerprint
+
+
+def core_budget(budget=None):
+    """Số core được dùng: budget > 0 giữ nguyên, <= 0 tính từ số core máy (-1 = tất cả)"""
+    cpus = os.cpu_count() or 1
+    if budget is None:
+        return cpus
+    if budget <= 0:
+        return max(cpus + 1 + budget, 1)
+    return budget
+
+
+def plan_workers(n_tasks, budget):
+    """(số worker, số thread cho mỗi model) sao cho worker * thread <= budget"""
+    n_workers = max(min(n_tasks, budget), 1)
+    return n_workers, max(budget // n_workers, 1)
+
+
+def _fit_and_score(estimator, X_train, y_train, X_test, y_test, metrics):
+    start = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = estimator.predict(X_test)
+    predict_seconds = time.perf_counter() - start
+
+    scores = dict(metrics(y_test, y_pred))
+    scores.update(fit_seconds=fit_seconds, predict_seconds=predict_seconds)
+    return estimator, scores
+
+
+class TrainingScheduler:
+    """Hàng đợi các model cần train, chạy song song bằng run()"""
+
+    def __init__(self, registry=None, core_budget=None):
+        self.registry = registry
+        self.core_budget = core_budget
+        self.tasks = []
+        self.seconds = 0.0
+
+    def add(self, name, key, estimator, X_train, y_train, X_test, y_test, metrics, meta=None):
+        """
+        metrics(y_true, y_pred) -> dict điểm đánh giá.
+        key: tên trong registry (None = không lưu / dùng lại).
+        meta: thông tin lưu kèm model (vd. features, scaler dùng khi predict)
+        """
+        self.tasks.append({
+            'name': name, 'key': key, 'estimator': estimator,
+            'data': (X_train, y_train, X_test, y_test), 'metrics': metrics, 'meta': meta or {},
+        })
+
+    def _expected_seconds(self, task):
+        # Chưa từng train -> coi là chậm nhất, cho chạy trước
+        if self.registry is None or task['key'] not in self.registry.index:
+            return float('inf')
+        return self.registry.index[task['key']].get('fit_seconds', float('inf'))
+
+    def run(self):
+        """
+        Train các model chưa có trong registry, trả về dict theo thứ tự add():
+        name -> {model, scores, cached}; scores gồm fit_seconds / predict_seconds
+        (của lần train đã lưu nếu cached=True)
+        """
+        start = time.perf_counter()
+        results, pending = {}, []
+        for task in self.tasks:
+            task['fingerprint'] = fingerprint(task['estimator'], *task['data'])
+            found = None
+            if self.registry is not None and task['key']:
+                found = self.registry.cached(task['key'], task['fingerprint'])
+            if found is not None:
+                model, _ = found
+                scores = self.registry.update_meta(task['key'], **task['meta'])
+                results[task['name']] = {'model': model, 'scores': scores, 'cached': True}
+            else:
+                pending.append(task)
+
+        if pending:
+            pending.sort(key=self._expected_seconds, reverse=True)
+            n_workers, threads = plan_workers(len(pending), core_budget(self.core_budget))
+            for task in pending:
+                if 'n_jobs' in task['estimator'].get_params():
+                    task['estimator'].set_params(n_jobs=threads)
+
+            with parallel_config(backend='loky', inner_max_num_threads=threads):
+                fitted = Parallel(n_jobs=n_workers)(
+                    delayed(_fit_and_score)(task['estimator'], *task['data'], task['metrics'])
+                    for task in pending
+                )
+            for task, (model, scores) in zip(pending, fitted):
+                instrumentation.record(f"fit/{task['name']}", scores['fit_seconds'], rows=len(task['data'][0]),
+                                       predict_seconds=scores['predict_seconds'])
+                scores.update(task['meta'])
+                if self.registry is not None and task['key']:
+                    self.registry.register(task['key'], model, task['fingerprint'],
+                                           scores, scores['fit_seconds'])
+                results[task['name']] = {'model': model, 'scores': scores, 'cached': False}
+
+        self.seconds = time.perf_counter() - start
+        names = [task['name'] for task in self.tasks]
+        self.tasks = []
+        return {name: results[name] for name in names}
+
+    @staticmethod
+    def sequential_seconds(results):
+        """Tổng thời gian fit nếu chạy tuần tự (model đã cache tính theo lần train đã lưu)"""
+        return sum(r['scores'].get('fit_seconds', 0.0) for r in results.values())